@@ -0,0 +1,508 @@
+import heapq
+import itertools
+import json
+import time
+from typing import Annotated, Iterable, Optional
+
+import anyio
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adapting to the observed latency (AIMD)
+
+    The limit grows by about one for every `limit` requests completed within
+    the target latency, and is multiplied by `backoff` when a request is
+    slower than the target or fails, at most once per target latency so a
+    burst of slow requests counts as one congestion signal.
+
+    Attributes:
+        limit (float): Current concurrency limit
+        min_limit (int): Minimum concurrency limit
+        max_limit (int): Maximum concurrency limit
+        target_latency (float): Latency above which the limit shrinks, in
+            seconds
+        backoff (float): Factor applied to the limit when it shrinks
+        in_flight (int): Requests currently admitted
+    """
+
+    def __init__(
+        self,
+        initial_limit: Annotated[int, "Initial concurrency limit"] = 16,
+        min_limit: Annotated[int, "Minimum concurrency limit"] = 1,
+        max_limit: Annotated[int, "Maximum concurrency limit"] = 256,
+        target_latency: Annotated[float, "Latency above which the limit shrinks"] = 1,
+        backoff: Annotated[float, "Factor applied when the limit shrinks"] = 0.9,
+    ) -> None:
+        """
+        Create a limiter
+
+        Args:
+            initial_limit (int): Initial concurrency limit
+            min_limit (int): Minimum concurrency limit
+            max_limit (int): Maximum concurrency limit
+            target_latency (float): Latency above which the limit shrinks, in
+                seconds
+            backoff (float): Factor applied to the limit when it shrinks
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.in_flight = 0
+        self._decreased_at = float("-inf")
+
+    @property
+    def available(self) -> Annotated[bool, "Whether a request can be admitted"]:
+        """
+        Whether a request can be admitted
+
+        Returns:
+            bool: True if fewer requests than the limit are in flight
+        """
+        return self.in_flight < int(self.limit)
+
+    def on_complete(
+        self,
+        latency: Annotated[float, "Latency of the request, in seconds"],
+        dropped: Annotated[bool, "Whether the request failed"] = False,
+    ) -> None:
+        """
+        Adapt the limit to a completed request
+
+        Args:
+            latency (float): Latency of the request, in seconds
+            dropped (bool): Whether the request failed with a server error
+        """
+        if dropped or latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._decreased_at >= self.target_latency:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._decreased_at = now
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+
+class RouteClass:
+    """
+    Class of routes sharing a concurrency limit and a priority
+
+    Attributes:
+        name (str): Name of the class
+        priority (int): Priority, lower values are admitted first
+        routes (list[tuple[str, str]]): (method, path prefix) of the routes,
+            "*" matches every method
+        max_queue (int): Maximum requests waiting for admission
+        queue_timeout (float): Maximum seconds a request waits for admission
+        limiter (AdaptiveLimiter): Concurrency limit of the class
+    """
+
+    def __init__(
+        self,
+        name: Annotated[str, "Name of the class"],
+        priority: Annotated[int, "Priority, lower values are admitted first"],
+        routes: Annotated[Iterable[tuple[str, str]], "(method, path prefix)"],
+        max_queue: Annotated[int, "Maximum requests waiting for admission"] = 64,
+        queue_timeout: Annotated[float, "Maximum seconds waiting"] = 1,
+        limiter: Annotated[
+            Optional[AdaptiveLimiter],
+            "Concurrency limit of the class",
+        ] = None,
+    ) -> None:
+        """
+        Create a route class
+
+        Args:
+            name (str): Name of the class
+            priority (int): Priority, lower values are admitted first
+            routes (Iterable[tuple[str, str]]): (method, path prefix) of the
+                routes, "*" matches every method
+            max_queue (int): Maximum requests waiting for admission
+            queue_timeout (float): Maximum seconds a request waits for
+                admission
+            limiter (AdaptiveLimiter): Concurrency limit of the class
+        """
+        self.name = name
+        self.priority = priority
+        self.routes = list(routes)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.limiter = limiter or AdaptiveLimiter()
+        self.queued = 0
+        self.shed = 0
+
+    def matches(
+        self,
+        method: Annotated[str, "HTTP method"],
+        path: Annotated[str, "Request path"],
+    ) -> Annotated[bool, "Whether the request belongs to the class"]:
+        """
+        Whether a request belongs to the class
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path, without the root path
+
+        Returns:
+            bool: True if the request belongs to the class
+        """
+        return any(
+            route_method in ("*", method) and path.startswith(prefix)
+            for route_method, prefix in self.routes
+        )
+
+
+def default_route_classes(
+    target_latency: Annotated[float, "Latency above which limits shrink"] = 1,
+    queue_timeout: Annotated[float, "Maximum seconds waiting"] = 1,
+) -> Annotated[list[RouteClass], "Route classes of the API"]:
+    """
+    Route classes of the API, search above chat above ingest
+
+    Args:
+        target_latency (float): Latency above which limits shrink, in seconds
+        queue_timeout (float): Maximum seconds a request waits for admission
+
+    Returns:
+        list[RouteClass]: Route classes of the API
+    """
+    return [
+        RouteClass(
+            name="search",
+            priority=0,
+            routes=[
+                ("GET", "/vector_store"),
+                ("POST", "/vector_store/search"),
+                ("POST", "/vector_store/federated_search"),
+                ("POST", "/rerank"),
+            ],
+            queue_timeout=queue_timeout,
+            limiter=AdaptiveLimiter(initial_limit=32, target_latency=target_latency),
+        ),
+        RouteClass(
+            name="chat",
+            priority=1,
+            routes=[("*", "/chat_llm")],
+            queue_timeout=queue_timeout,
+            limiter=AdaptiveLimiter(
+                initial_limit=16, target_latency=target_latency * 10
+            ),
+        ),
+        RouteClass(
+            name="ingest",
+            priority=2,
+            routes=[("POST", "/vector_store"), ("DELETE", "/vector_store")],
+            max_queue=16,
+            queue_timeout=queue_timeout,
+            limiter=AdaptiveLimiter(initial_limit=8, target_latency=target_latency),
+        ),
+    ]
+
+
+class _Waiter:
+    """Request waiting for admission"""
+
+    def __init__(self, route_class: RouteClass) -> None:
+        """
+        Create a waiter
+
+        Args:
+            route_class (RouteClass): Class of the request
+        """
+        self.route_class = route_class
+        self.event = anyio.Event()
+        self.admitted = False
+        self.cancelled = False
+
+
+class AdmissionController:
+    """
+    Admit requests within the concurrency limit of their class
+
+    Requests over the limit wait in a queue ordered by priority, bounded in
+    size and in waiting time. Requests that can't be admitted are shed with
+    a 503 and a Retry-After header instead of piling up, so the latency of the
+    admitted requests stays stable under overload.
+
+    Runs in the event loop, every method must be called from it.
+
+    Attributes:
+        route_classes (list[RouteClass]): Route classes
+        max_concurrency (int): Maximum requests in flight over every class,
+            None for no global limit
+        retry_after (int): Seconds sent in the Retry-After header
+    """
+
+    def __init__(
+        self,
+        route_classes: Annotated[list[RouteClass], "Route classes"],
+        max_concurrency: Annotated[
+            Optional[int],
+            "Maximum requests in flight over every class",
+        ] = None,
+        retry_after: Annotated[int, "Seconds sent in Retry-After"] = 1,
+    ) -> None:
+        """
+        Create an admission controller
+
+        Args:
+            route_classes (list[RouteClass]): Route classes
+            max_concurrency (int): Maximum requests in flight over every
+                class, None for no global limit
+            retry_after (int): Seconds sent in the Retry-After header
+        """
+        self.route_classes = route_classes
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._queue: list[tuple[int, int, _Waiter]] = []
+        self._sequence = itertools.count()
+
+    def classify(
+        self,
+        method: Annotated[str, "HTTP method"],
+        path: Annotated[str, "Request path"],
+    ) -> Annotated[Optional[RouteClass], "Class of the request"]:
+        """
+        Find the class of a request
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path, without the root path
+
+        Returns:
+            Optional[RouteClass]: Class of the request, None to admit it
+                without limit
+        """
+        for route_class in self.route_classes:
+            if route_class.matches(method, path):
+                return route_class
+        return None
+
+    def _can_admit(self, route_class: RouteClass) -> bool:
+        """
+        Whether a request of the class fits the limits
+
+        Args:
+            route_class (RouteClass): Class of the request
+
+        Returns:
+            bool: True if the request fits the class and global limits
+        """
+        return route_class.limiter.available and (
+            self.max_concurrency is None or self.in_flight < self.max_concurrency
+        )
+
+    def _admit(self, route_class: RouteClass) -> None:
+        """
+        Count a request as in flight
+
+        Args:
+            route_class (RouteClass): Class of the request
+        """
+        route_class.limiter.in_flight += 1
+        self.in_flight += 1
+
+    def _dispatch(self) -> None:
+        """Admit the waiting requests that fit, in priority order"""
+        blocked = []
+        while self._queue:
+            item = heapq.heappop(self._queue)
+            waiter = item[2]
+            if waiter.cancelled:
+                continue
+            if self._can_admit(waiter.route_class):
+                self._admit(waiter.route_class)
+                waiter.route_class.queued -= 1
+                waiter.admitted = True
+                waiter.event.set()
+            else:
+                blocked.append(item)
+                if self.max_concurrency is not None and (
+                    self.in_flight >= self.max_concurrency
+                ):
+                    break
+        for item in blocked:
+            heapq.heappush(self._queue, item)
+
+    async def acquire(
+        self,
+        route_class: Annotated[RouteClass, "Class of the request"],
+    ) -> Annotated[bool, "Whether the request is admitted"]:
+        """
+        Wait for the admission of a request
+
+        Args:
+            route_class (RouteClass): Class of the request
+
+        Returns:
+            bool: True if the request is admitted, False if it must be shed
+        """
+        if not self._queue and self._can_admit(route_class):
+            self._admit(route_class)
+            return True
+        if route_class.queued >= route_class.max_queue:
+            route_class.shed += 1
+            return False
+
+        waiter = _Waiter(route_class)
+        route_class.queued += 1
+        heapq.heappush(
+            self._queue, (route_class.priority, next(self._sequence), waiter)
+        )
+        self._dispatch()
+        try:
+            with anyio.move_on_after(route_class.queue_timeout):
+                await waiter.event.wait()
+        except BaseException:
+            if waiter.admitted:
+                self._release_slot(route_class)
+            else:
+                waiter.cancelled = True
+                route_class.queued -= 1
+            raise
+        if not waiter.admitted:
+            waiter.cancelled = True
+            route_class.queued -= 1
+            route_class.shed += 1
+        return waiter.admitted
+
+    def release(
+        self,
+        route_class: Annotated[RouteClass, "Class of the request"],
+        latency: Annotated[float, "Latency of the request, in seconds"],
+        dropped: Annotated[bool, "Whether the request failed"] = False,
+    ) -> None:
+        """
+        Release the slot of a completed request and admit waiting requests
+
+        Args:
+            route_class (RouteClass): Class of the request
+            latency (float): Latency of the request, in seconds
+            dropped (bool): Whether the request failed with a server error
+        """
+        route_class.limiter.on_complete(latency, dropped)
+        self._release_slot(route_class)
+
+    def _release_slot(self, route_class: RouteClass) -> None:
+        """
+        Free the slot of a request and admit waiting requests
+
+        Args:
+            route_class (RouteClass): Class of the request
+        """
+        route_class.limiter.in_flight -= 1
+        self.in_flight -= 1
+        self._dispatch()
+
+    def stats(self) -> Annotated[dict, "State of each route class"]:
+        """
+        State of each route class, for monitoring
+
+        Returns:
+            dict: Limit, requests in flight, queued and shed by route class
+        """
+        return {
+            route_class.name: {
+                "limit": round(route_class.limiter.limit, 3),
+                "in_flight": route_class.limiter.in_flight,
+                "queued": route_class.queued,
+                "shed": route_class.shed,
+            }
+            for route_class in self.route_classes
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an admission controller to HTTP requests
+
+    Attributes:
+        app (ASGIApp): Wrapped application
+        controller (AdmissionController): Admission controller
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: Annotated[AdmissionController, "Admission controller"],
+    ) -> None:
+        """
+        Wrap an application
+
+        Args:
+            app (ASGIApp): Wrapped application
+            controller (AdmissionController): Admission controller
+        """
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send) -> None:
+        """
+        Admit, queue or shed a request
+
+        Args:
+            scope (Scope): ASGI scope
+            receive (Receive): ASGI receive channel
+            send (Send): ASGI send channel
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+        route_class = self.controller.classify(scope["method"], path)
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+        if not await self.controller.acquire(route_class):
+            await self.shed(send)
+            return
+
+        status_code = 500
+        start = time.monotonic()
+
+        async def send_wrapper(message) -> None:
+            """
+            Record the status code of the response
+
+            Args:
+                message (Message): ASGI message
+            """
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.controller.release(
+                route_class,
+                latency=time.monotonic() - start,
+                dropped=status_code >= 500,
+            )
+
+    async def shed(self, send) -> None:
+        """
+        Reply 503 with a Retry-After header
+
+        Args:
+            send (Send): ASGI send channel
+        """
+        body = json.dumps({"detail": "Server overloaded, retry later"}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", str(self.controller.retry_after).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -13,3 +13,217 @@ CHROMA_PORT = os.getenv(
     "CHROMA_PORT",
     "8080",
 )
+
+CHAT_CONTEXT_MAX_TOKENS = int(
+    os.getenv(
+        "CHAT_CONTEXT_MAX_TOKENS",
+        "8000",
+    )
+)
+
+CHAT_SESSION_TTL = float(
+    os.getenv(
+        "CHAT_SESSION_TTL",
+        "86400",
+    )
+)
+CHAT_SESSION_DB = os.getenv(
+    "CHAT_SESSION_DB",
+    "",
+)
+
+SINGLE_FLIGHT_TTL = float(
+    os.getenv(
+        "SINGLE_FLIGHT_TTL",
+        "0",
+    )
+)
+
+QUERY_CACHE_SIZE = int(
+    os.getenv(
+        "QUERY_CACHE_SIZE",
+        "10000",
+    )
+)
+QUERY_CACHE_TTL = float(
+    os.getenv(
+        "QUERY_CACHE_TTL",
+        "60",
+    )
+)
+QUERY_CACHE_DB = os.getenv(
+    "QUERY_CACHE_DB",
+    "",
+)
+QUANTIZED_INDEX_DB = os.getenv(
+    "QUANTIZED_INDEX_DB",
+    ":memory:",
+)
+QUANTIZATION_RESCORE_FACTOR = int(
+    os.getenv(
+        "QUANTIZATION_RESCORE_FACTOR",
+        "4",
+    )
+)
+
+PAYLOAD_MAX_TOKENS = int(
+    os.getenv(
+        "PAYLOAD_MAX_TOKENS",
+        "2000000",
+    )
+)
+SEARCH_MAX_K = int(
+    os.getenv(
+        "SEARCH_MAX_K",
+        "1000",
+    )
+)
+SEARCH_MAX_EF = int(
+    os.getenv(
+        "SEARCH_MAX_EF",
+        "10000",
+    )
+)
+
+RERANK_CACHE_SIZE = int(
+    os.getenv(
+        "RERANK_CACHE_SIZE",
+        "100000",
+    )
+)
+RERANK_CACHE_DB = os.getenv(
+    "RERANK_CACHE_DB",
+    "",
+)
+RERANK_BATCH_SIZE = int(
+    os.getenv(
+        "RERANK_BATCH_SIZE",
+        "100",
+    )
+)
+RERANK_MAX_CONCURRENCY = int(
+    os.getenv(
+        "RERANK_MAX_CONCURRENCY",
+        "4",
+    )
+)
+RERANK_MAX_TOKENS = int(
+    os.getenv(
+        "RERANK_MAX_TOKENS",
+        "512",
+    )
+)
+
+COHERE_TIMEOUT = float(
+    os.getenv(
+        "COHERE_TIMEOUT",
+        "30",
+    )
+)
+COHERE_BASE_URL = os.getenv(
+    "COHERE_BASE_URL",
+    "",
+)
+# Requests per second to Cohere of each worker process, 0 for no limit
+COHERE_RATE_LIMIT = float(
+    os.getenv(
+        "COHERE_RATE_LIMIT",
+        "0",
+    )
+)
+# Requests per second to Chroma of each worker process, 0 for no limit
+CHROMA_RATE_LIMIT = float(
+    os.getenv(
+        "CHROMA_RATE_LIMIT",
+        "0",
+    )
+)
+RETRY_MAX_ATTEMPTS = int(
+    os.getenv(
+        "RETRY_MAX_ATTEMPTS",
+        "3",
+    )
+)
+HEDGE_DELAY = float(
+    os.getenv(
+        "HEDGE_DELAY",
+        "0.5",
+    )
+)
+EMBED_HEDGE_MAX_TEXTS = int(
+    os.getenv(
+        "EMBED_HEDGE_MAX_TEXTS",
+        "4",
+    )
+)
+CIRCUIT_FAILURE_THRESHOLD = int(
+    os.getenv(
+        "CIRCUIT_FAILURE_THRESHOLD",
+        "5",
+    )
+)
+CIRCUIT_RESET_TIMEOUT = float(
+    os.getenv(
+        "CIRCUIT_RESET_TIMEOUT",
+        "30",
+    )
+)
+
+API_MAX_CONCURRENCY = int(
+    os.getenv(
+        "API_MAX_CONCURRENCY",
+        "256",
+    )
+)
+ADMISSION_TARGET_LATENCY = float(
+    os.getenv(
+        "ADMISSION_TARGET_LATENCY",
+        "1",
+    )
+)
+ADMISSION_QUEUE_TIMEOUT = float(
+    os.getenv(
+        "ADMISSION_QUEUE_TIMEOUT",
+        "1",
+    )
+)
+
+API_HOST = os.getenv(
+    "API_HOST",
+    "0.0.0.0",
+)
+API_PORT = int(
+    os.getenv(
+        "API_PORT",
+        "8000",
+    )
+)
+API_WORKERS = int(
+    os.getenv(
+        "API_WORKERS",
+        "1",
+    )
+)
+API_PRELOAD = os.getenv("API_PRELOAD", "false").lower() in ("1", "true", "yes")
+
+EMBEDDINGS_CACHE_SIZE = int(
+    os.getenv(
+        "EMBEDDINGS_CACHE_SIZE",
+        "10000",
+    )
+)
+EMBEDDINGS_CACHE_DB = os.getenv(
+    "EMBEDDINGS_CACHE_DB",
+    "",
+)
+
+COLLECTION_REGISTRY_DB = os.getenv(
+    "COLLECTION_REGISTRY_DB",
+    ":memory:",
+)
+MIGRATION_STALE_AFTER = float(
+    os.getenv(
+        "MIGRATION_STALE_AFTER",
+        "300",
+    )
+)
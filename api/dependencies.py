@@ -1,15 +1,60 @@
+from functools import lru_cache
 from logging import getLogger
-from typing import List, Optional
+from typing import Optional
 
 import chromadb
 import cohere
+import numpy as np
 from chromadb import Documents, EmbeddingFunction
 
-from core.chat_llm import ChatLLMModel
+from core.cache import SQLiteCache
+from core.chat_llm import ChatContextManager, ChatLLMModel
+from core.embeddings import CachedEmbeddingsFunction
+from core.migration import CollectionRegistry, CollectionRouter
 from core.models.chat import ChatMessage, ChatMessageRole
-from core.rerank import RerankModel
-
-from .config import CHROMA_HOST, CHROMA_PORT, COHERE_API_KEY
+from core.quantization import QuantizedIndexes, SQLiteCodeStore
+from core.query_cache import QueryCache, SQLiteGenerations
+from core.rerank import BatchedRerankModel, CachedRerankModel, RerankModel
+from core.resilience import CircuitBreaker, Resilience, ResilientProxy, TokenBucket
+from core.sessions import InMemorySessionStore, SessionStore, SQLiteSessionStore
+from core.singleflight import SingleFlight
+
+from .admission import AdmissionController, default_route_classes
+from .config import (
+    ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_TARGET_LATENCY,
+    API_MAX_CONCURRENCY,
+    CHAT_CONTEXT_MAX_TOKENS,
+    CHAT_SESSION_DB,
+    CHAT_SESSION_TTL,
+    CHROMA_HOST,
+    CHROMA_PORT,
+    CHROMA_RATE_LIMIT,
+    CIRCUIT_FAILURE_THRESHOLD,
+    CIRCUIT_RESET_TIMEOUT,
+    COHERE_API_KEY,
+    COHERE_BASE_URL,
+    COHERE_RATE_LIMIT,
+    COHERE_TIMEOUT,
+    COLLECTION_REGISTRY_DB,
+    EMBED_HEDGE_MAX_TEXTS,
+    EMBEDDINGS_CACHE_DB,
+    EMBEDDINGS_CACHE_SIZE,
+    HEDGE_DELAY,
+    MIGRATION_STALE_AFTER,
+    QUANTIZATION_RESCORE_FACTOR,
+    QUANTIZED_INDEX_DB,
+    QUERY_CACHE_DB,
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL,
+    RERANK_BATCH_SIZE,
+    RERANK_CACHE_DB,
+    RERANK_CACHE_SIZE,
+    RERANK_MAX_CONCURRENCY,
+    RERANK_MAX_TOKENS,
+    RETRY_MAX_ATTEMPTS,
+    SINGLE_FLIGHT_TTL,
+)
 
 logger = getLogger(__name__)
 
@@ -17,35 +62,114 @@ logger.info("===== DEPENDENCIES.PY =====")
 
 logger.info("COHERE_API_KEY: %s", len(COHERE_API_KEY) * "*")
 
+logger.info("COHERE_BASE_URL: %s", COHERE_BASE_URL or "default")
+
 logger.info("CHROMA_HOST: %s", CHROMA_HOST)
 logger.info("CHROMA_PORT: %s", CHROMA_PORT)
 
 logger.info("===== DEPENDENCIES.PY =====")
 
-co = cohere.ClientV2(api_key=COHERE_API_KEY)
+# COHERE_BASE_URL points the client at a local stand-in, see `loadtest`
+co = cohere.ClientV2(
+    api_key=COHERE_API_KEY,
+    timeout=COHERE_TIMEOUT,
+    **({"base_url": COHERE_BASE_URL} if COHERE_BASE_URL else {}),
+)
+
+
+def create_resilience(name: str, rate_limit: float) -> Resilience:
+    """
+    Creates the resilience policy of a provider.
+
+    Args:
+        name (str): Name of the provider
+        rate_limit (float): Requests per second, 0 for no limit
+
+    Returns:
+        Resilience: Resilience policy
+    """
+    return Resilience(
+        name=name,
+        rate_limiter=TokenBucket(rate=rate_limit) if rate_limit > 0 else None,
+        circuit_breaker=CircuitBreaker(
+            failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=CIRCUIT_RESET_TIMEOUT,
+        ),
+        max_attempts=RETRY_MAX_ATTEMPTS,
+        hedge_delay=HEDGE_DELAY if HEDGE_DELAY > 0 else None,
+        acquire_timeout=5,
+    )
+
+
+cohere_resilience = create_resilience("cohere", COHERE_RATE_LIMIT)
+chroma_resilience = create_resilience("chroma", CHROMA_RATE_LIMIT)
+
+chat_context_manager = ChatContextManager(max_tokens=CHAT_CONTEXT_MAX_TOKENS)
+
+session_store = InMemorySessionStore(
+    ttl=CHAT_SESSION_TTL,
+    backing=(
+        SQLiteSessionStore(CHAT_SESSION_DB, ttl=CHAT_SESSION_TTL)
+        if CHAT_SESSION_DB
+        else None
+    ),
+)
+
+single_flight = SingleFlight(ttl=SINGLE_FLIGHT_TTL)
+
+query_cache = QueryCache(
+    max_entries=QUERY_CACHE_SIZE,
+    ttl=QUERY_CACHE_TTL,
+    generations=SQLiteGenerations(QUERY_CACHE_DB) if QUERY_CACHE_DB else None,
+)
+
+admission_controller = AdmissionController(
+    default_route_classes(
+        target_latency=ADMISSION_TARGET_LATENCY,
+        queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+    ),
+    max_concurrency=API_MAX_CONCURRENCY,
+)
 
 
 class CohereEmbeddingsFunction(EmbeddingFunction):
     """Cohere embeddings function."""
 
+    model_name = "embed-multilingual-v2.0"
+
+    def __init__(self, model_name: Optional[str] = None) -> None:
+        """
+        Create the embeddings function
+
+        Args:
+            model_name (str): Cohere embeddings model, the default when not set
+        """
+        if model_name is not None:
+            self.model_name = model_name
+
     # skipcq: PYL-W0622
-    def __call__(self, input: Documents) -> Optional[list[list[float]]]:
+    def __call__(self, input: Documents) -> list[np.ndarray]:
         """
         Call embeddings
 
+        Small batches, such as the query of a search, are hedged. Bulk batches
+        are sent once, since a duplicate of them would be billed twice.
+
         Args:
               input (Documents): embeddings input
 
         Returns:
-            Optional[list[list[float]]: Embeddings output
+            list[np.ndarray]: Embeddings output, rows of one float32 matrix
         """
-        response = co.embed(
+        response = cohere_resilience.call(
+            co.embed,
+            hedge=len(input) <= EMBED_HEDGE_MAX_TEXTS,
             texts=input,
-            model="embed-multilingual-v2.0",
+            model=self.model_name,
             input_type="search_document",
             embedding_types=["float"],
         )
-        return response.embeddings.float_
+        return list(np.asarray(response.embeddings.float_, dtype=np.float32))
 
 
 class CohereChatModel(ChatLLMModel):
@@ -62,13 +186,17 @@ class CohereChatModel(ChatLLMModel):
             str: Chat response
         """
         messages = [transform_chat_message(m) for m in chat_input.messages]
-        res = co.chat(messages=messages, model="command-r-plus-08-2024")
+        res = cohere_resilience.call(
+            co.chat, messages=messages, model="command-r-plus-08-2024"
+        )
         return res.message.content[0].text
 
 
 class CohereRerankModel(RerankModel):
     """Cohere rerank model."""
 
+    model_name = "rerank-multilingual-v2.0"
+
     def rerank_documents(self, query, docs) -> list[float]:
         """
         Rerank the documents based on the query.
@@ -80,40 +208,112 @@ class CohereRerankModel(RerankModel):
         Returns:
             List[float]: List of relevance scores
         """
-        res = co.rerank(documents=docs, query=query, model="rerank-multilingual-v2.0")
+        res = cohere_resilience.call(
+            co.rerank, documents=docs, query=query, model=self.model_name
+        )
         sorted_index = sorted(res.results, key=lambda x: x.index)
         return [el.relevance_score for el in sorted_index]
 
 
+CHROMA_HEDGED_METHODS = frozenset({"query", "get", "count"})
+CHROMA_COLLECTION_METHODS = frozenset(
+    {"get_collection", "get_or_create_collection", "create_collection"}
+)
+
+
 def get_chroma_client() -> chromadb.Client:
     """
     Creates a Chroma client to connect to the Chroma server.
 
+    Calls to the server and its collections go through the resilience policy,
+    reads are hedged.
+
     Returns:
         chromadb.Client: Chroma client
     """
     try:
-        return chromadb.HttpClient(
+        client = chromadb.HttpClient(
             host=CHROMA_HOST,
             port=CHROMA_PORT,
         )
     except BaseException as e:
         logger.error("Error creating Chroma client: %s", e)
         return chromadb.Client()
+    return ResilientProxy(
+        client,
+        chroma_resilience,
+        hedged=CHROMA_HEDGED_METHODS,
+        proxied_results=CHROMA_COLLECTION_METHODS,
+    )
 
 
-def get_embeddings_function() -> CohereEmbeddingsFunction:
+@lru_cache(maxsize=None)
+def get_embeddings_function_for_model(model_name: str) -> CachedEmbeddingsFunction:
     """
-    Creates a Cohere embeddings function.
+    Gets the Cohere embeddings function of a model, caching the embedding of
+    each text.
+
+    Args:
+        model_name (str): Cohere embeddings model
 
     Returns:
-        CohereEmbeddings: Cohere embeddings function
+        CachedEmbeddingsFunction: Cohere embeddings function
     """
-    return CohereEmbeddingsFunction(
-        cohere_api_key=COHERE_API_KEY,
+    return CachedEmbeddingsFunction(
+        CohereEmbeddingsFunction(model_name),
+        model_name=model_name,
+        max_entries=EMBEDDINGS_CACHE_SIZE,
+        persistent=SQLiteCache(EMBEDDINGS_CACHE_DB) if EMBEDDINGS_CACHE_DB else None,
     )
 
 
+embeddings_function = get_embeddings_function_for_model(
+    CohereEmbeddingsFunction.model_name
+)
+
+
+def get_embeddings_function() -> CachedEmbeddingsFunction:
+    """
+    Gets the Cohere embeddings function, caching the embedding of each text.
+
+    Returns:
+        CachedEmbeddingsFunction: Cohere embeddings function
+    """
+    return embeddings_function
+
+
+collection_router = CollectionRouter(
+    CollectionRegistry(
+        COLLECTION_REGISTRY_DB,
+        default_model=CohereEmbeddingsFunction.model_name,
+        stale_after=MIGRATION_STALE_AFTER,
+    ),
+    embeddings_for=get_embeddings_function_for_model,
+    quantized_indexes=QuantizedIndexes(
+        SQLiteCodeStore(QUANTIZED_INDEX_DB),
+        rescore_factor=QUANTIZATION_RESCORE_FACTOR,
+    ),
+)
+
+
+def get_collection_router() -> CollectionRouter:
+    """
+    Gets the collection router, serving each collection from the collection
+    and embeddings model of its last migration.
+
+    Returns:
+        CollectionRouter: Collection router
+    """
+    return collection_router
+
+
+COHERE_ROLES = {
+    ChatMessageRole.Human: "user",
+    ChatMessageRole.Ai: "assistant",
+    ChatMessageRole.System: "system",
+}
+
+
 def transform_chat_message(chat_message: ChatMessage) -> dict:
     """
     Transforms a chat message to a dictionary.
@@ -124,13 +324,8 @@ def transform_chat_message(chat_message: ChatMessage) -> dict:
     Returns:
         dict: Chat message dictionary
     """
-    role = "user"
-    if chat_message.role == ChatMessageRole.Ai:
-        role = "assistant"
-    if chat_message.role == ChatMessageRole.System:
-        role = "system"
     return {
-        "role": role,
+        "role": COHERE_ROLES.get(chat_message.role, "user"),
         "content": chat_message.content,
     }
 
@@ -145,11 +340,106 @@ def get_chat_model() -> CohereChatModel:
     return CohereChatModel()
 
 
-def get_rerank_model() -> CohereRerankModel:
+def get_chat_rate_limiter() -> Optional[TokenBucket]:
+    """
+    Gets the rate limiter of the Cohere calls.
+
+    Returns:
+        Optional[TokenBucket]: Rate limiter, None when COHERE_RATE_LIMIT is 0
+    """
+    return cohere_resilience.rate_limiter
+
+
+def get_chat_context_manager() -> ChatContextManager:
+    """
+    Gets the chat context manager shared by every request.
+
+    Returns:
+        ChatContextManager: Chat context manager
+    """
+    return chat_context_manager
+
+
+def get_session_store() -> SessionStore:
+    """
+    Gets the chat session store shared by every request.
+
+    Returns:
+        SessionStore: Chat session store
+    """
+    return session_store
+
+
+def get_single_flight() -> SingleFlight:
+    """
+    Gets the single-flight group coalescing identical searches and reranks.
+
+    Returns:
+        SingleFlight: Single-flight group
+    """
+    return single_flight
+
+
+def get_query_cache() -> QueryCache:
+    """
+    Gets the cache of search results shared by every request.
+
+    Returns:
+        QueryCache: Cache of search results
+    """
+    return query_cache
+
+
+rerank_model = CachedRerankModel(
+    BatchedRerankModel(
+        CohereRerankModel(),
+        batch_size=RERANK_BATCH_SIZE,
+        max_concurrency=RERANK_MAX_CONCURRENCY,
+        max_tokens=RERANK_MAX_TOKENS,
+    ),
+    max_entries=RERANK_CACHE_SIZE,
+    persistent=SQLiteCache(RERANK_CACHE_DB) if RERANK_CACHE_DB else None,
+)
+
+
+def get_rerank_model() -> CachedRerankModel:
+    """
+    Gets the rerank model, caching the score of each query and document.
+
+    Returns:
+        CachedRerankModel: Rerank model
+    """
+    return rerank_model
+
+
+def get_admission_stats() -> dict:
+    """
+    Gets the state of the admission control of each route class.
+
+    Returns:
+        dict: Concurrency limit, requests in flight, queued and shed by class
+    """
+    return admission_controller.stats()
+
+
+def get_resilience_stats() -> dict:
+    """
+    Gets the state of the resilience policy of each provider.
+
+    Returns:
+        dict: Circuit state, rate limit tokens and counters by provider
+    """
+    return {
+        resilience.name: resilience.stats()
+        for resilience in (cohere_resilience, chroma_resilience)
+    }
+
+
+def get_query_cache_stats() -> dict:
     """
-    Creates a rerank model.
+    Gets the size and hit ratio of the cache of search results.
 
     Returns:
-        CohereRerankModel: Rerank model
+        dict: Entries, bounds, hits, misses, hit ratio and invalidations
     """
-    return CohereRerankModel()
+    return query_cache.stats()
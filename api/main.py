@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 
-from .routes import chat_llm, rerank, vector_store
+from .admission import AdmissionMiddleware
+from .dependencies import admission_controller
+from .routes import chat_llm, metrics, migrations, rerank, vector_store
 
 app = FastAPI(
     root_path="/api/v1",
@@ -26,6 +28,7 @@ app = FastAPI(
     ],
 )
 
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
 
 app.include_router(
     router=vector_store.router,
@@ -44,3 +47,15 @@ app.include_router(
     prefix="/rerank",
     tags=["Rerank"],
 )
+
+app.include_router(
+    router=migrations.router,
+    prefix="/migrations",
+    tags=["Migrations"],
+)
+
+app.include_router(
+    router=metrics.router,
+    prefix="/metrics",
+    tags=["Metrics"],
+)
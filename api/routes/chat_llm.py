@@ -1,11 +1,34 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends
+import chromadb
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from pydantic import BaseModel, Field
 
-from core.chat_llm import ChatInput, ChatLLM
+from core.chat_llm import ChatContextManager, ChatInput, ChatLLM
+from core.filters import normalize_where
+from core.migration import CollectionRouter
+from core.models.chat import ChatMessage, ChatMessageRole
+from core.models.pipeline import PipelineDeadlines, PipelineResult
+from core.pipeline import RAGPipeline
+from core.query_cache import QueryCache
+from core.rerank import Rerank, RerankModel
+from core.resilience import TokenBucket
+from core.sessions import ChatSession, SessionStore
+from core.singleflight import SingleFlight
 
-from ..dependencies import get_chat_model
+from ..dependencies import (
+    CohereEmbeddingsFunction,
+    get_chat_context_manager,
+    get_chat_model,
+    get_chat_rate_limiter,
+    get_chroma_client,
+    get_collection_router,
+    get_embeddings_function,
+    get_query_cache,
+    get_rerank_model,
+    get_session_store,
+    get_single_flight,
+)
 
 router = APIRouter(dependencies=[Depends(get_chat_model)])
 
@@ -33,7 +56,12 @@ class ChatOutput(BaseModel):
     response_description="Response of the model",
 )
 def chat(
-    chat_input: Annotated[ChatInput, "Chat Input"], chat_model=Depends(get_chat_model)
+    chat_input: Annotated[ChatInput, "Chat Input"],
+    chat_model=Depends(get_chat_model),
+    context_manager: Annotated[
+        ChatContextManager,
+        Depends(get_chat_context_manager),
+    ] = None,
 ) -> Annotated[ChatOutput, "Chat Output"]:
     """
     Chat with the chat model
@@ -41,10 +69,361 @@ def chat(
     Args:
         chat_input (ChatInput): Chat input
         chat_model (BaseChatModel): Chat model
+        context_manager (ChatContextManager): Keeps the prompt within the
+            token budget
 
     Returns:
         ChatOutput: Chat output
     """
-    chat_llm = ChatLLM(chat_model=chat_model)
+    chat_llm = ChatLLM(chat_model=chat_model, context_manager=context_manager)
     res = chat_llm.chat(chat_input=chat_input)
     return ChatOutput(content=res)
+
+
+class CreateSessionInput(BaseModel):
+    """
+    Create session input
+
+    Attributes:
+        messages (list[ChatMessage]): Initial messages, e.g. a system prompt
+    """
+
+    messages: list[ChatMessage] = Field(
+        default_factory=list,
+        title="Messages",
+        description="Initial messages, e.g. a system prompt",
+    )
+
+
+class SessionChatOutput(ChatOutput):
+    """
+    Session chat output
+
+    Attributes:
+        session_id (str): Session ID
+    """
+
+    session_id: str = Field(
+        ...,
+        title="Session ID",
+        description="Session ID",
+        examples=["Uj9uY4N41cpSZb0MHBY_w"],
+    )
+
+
+@router.post(
+    "/sessions",
+    description="Create a chat session stored on the server",
+    summary="Create a chat session",
+    response_description="Created session",
+)
+def create_session(
+    session_input: Annotated[CreateSessionInput, "Create session input"],
+    session_store: Annotated[SessionStore, Depends(get_session_store)],
+) -> Annotated[ChatSession, "Created session"]:
+    """
+    Create a chat session stored on the server
+
+    Args:
+        session_input (CreateSessionInput): Create session input
+        session_store (SessionStore): Session store
+
+    Returns:
+        ChatSession: Created session
+    """
+    session_store.evict_expired()
+    return session_store.create(messages=session_input.messages)
+
+
+@router.get(
+    "/sessions/{session_id}",
+    description="Get a chat session",
+    summary="Get a chat session",
+    response_description="Chat session",
+)
+def get_session(
+    session_id: Annotated[str, "Session ID"],
+    session_store: Annotated[SessionStore, Depends(get_session_store)],
+) -> Annotated[ChatSession, "Chat session"]:
+    """
+    Get a chat session
+
+    Args:
+        session_id (str): Session ID
+        session_store (SessionStore): Session store
+
+    Returns:
+        ChatSession: Chat session
+    """
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return session
+
+
+@router.post(
+    "/sessions/{session_id}/messages",
+    description=(
+        "Append one message to a chat session and chat with the chat model, the"
+        " reply is appended to the session too"
+    ),
+    summary="Chat in a session",
+    response_description="Response of the model",
+)
+def chat_in_session(
+    session_id: Annotated[str, "Session ID"],
+    message: Annotated[ChatMessage, "Message to append"],
+    session_store: Annotated[SessionStore, Depends(get_session_store)],
+    chat_model=Depends(get_chat_model),
+    context_manager: Annotated[
+        ChatContextManager,
+        Depends(get_chat_context_manager),
+    ] = None,
+) -> Annotated[SessionChatOutput, "Session chat output"]:
+    """
+    Append one message to a chat session and chat with the chat model
+
+    Only the new message is sent and validated, the history is read from the
+    session store. The session ID is used as the conversation ID, so the
+    summary of older messages is cached per session.
+
+    Args:
+        session_id (str): Session ID
+        message (ChatMessage): Message to append
+        session_store (SessionStore): Session store
+        chat_model (BaseChatModel): Chat model
+        context_manager (ChatContextManager): Keeps the prompt within the
+            token budget
+
+    Returns:
+        SessionChatOutput: Session chat output
+    """
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    chat_llm = ChatLLM(chat_model=chat_model, context_manager=context_manager)
+    res = chat_llm.chat(
+        chat_input=ChatInput(
+            messages=[*session.messages, message],
+            conversation_id=session_id,
+        )
+    )
+    try:
+        session_store.extend(
+            session_id,
+            [message, ChatMessage(role=ChatMessageRole.Ai, content=res)],
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND) from e
+    return SessionChatOutput(content=res, session_id=session_id)
+
+
+@router.delete(
+    "/sessions/{session_id}",
+    description="Delete a chat session",
+    summary="Delete a chat session",
+    response_description="No content",
+)
+def delete_session(
+    session_id: Annotated[str, "Session ID"],
+    session_store: Annotated[SessionStore, Depends(get_session_store)],
+) -> Annotated[None, "No content"]:
+    """
+    Delete a chat session
+
+    Args:
+        session_id (str): Session ID
+        session_store (SessionStore): Session store
+
+    Returns:
+        None: No content
+    """
+    session_store.delete(session_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+class RAGInput(BaseModel):
+    """
+    RAG input
+
+    Attributes:
+        query (str): Question
+        messages (list[ChatMessage]): Earlier messages of the conversation
+        collection_names (list[str]): Collections searched
+        reference_id (str): Reference ID of the documents
+        where (dict): Metadata filter expression
+        k (int): Candidates retrieved per source
+        top_n (int): Documents in the context of the answer
+        lexical (bool): Also search the collections by keyword
+        speculate (bool): Start generation before every source is reranked
+        deadlines (PipelineDeadlines): Deadlines of the stages
+    """
+
+    model_config = {
+        "title": "RAG Input",
+        "strict": True,
+    }
+    query: str = Field(
+        ...,
+        title="Query",
+        description="Question",
+        examples=["Which country do Hoang Sa and Truong Sa belong to?"],
+    )
+    messages: list[ChatMessage] = Field(
+        default_factory=list,
+        title="Messages",
+        description="Earlier messages of the conversation",
+    )
+    collection_names: list[str] = Field(
+        ["default_collection"],
+        title="Collection names",
+        description="Collections searched concurrently",
+        examples=[["geography", "history"]],
+        min_length=1,
+    )
+    reference_id: Optional[str] = Field(
+        None,
+        title="Reference ID",
+        description="Reference ID of the documents",
+    )
+    where: Optional[dict] = Field(
+        None,
+        title="Where",
+        description="Metadata filter expression",
+        examples=[{"language": "vi"}],
+    )
+    k: int = Field(
+        10,
+        title="Number of candidates",
+        description="Candidates retrieved per collection and search kind",
+        gt=0,
+    )
+    top_n: int = Field(
+        3,
+        title="Number of context documents",
+        description="Reranked documents in the context of the answer",
+        gt=0,
+    )
+    lexical: bool = Field(
+        True,
+        title="Lexical",
+        description="Also search the collections by keyword",
+    )
+    speculate: bool = Field(
+        True,
+        title="Speculate",
+        description=(
+            "Start generation as soon as top_n documents are reranked, kept when"
+            " the remaining sources do not change them. A discarded speculation"
+            " costs one extra chat call, skipped when the chat rate limit is low"
+        ),
+    )
+    deadlines: PipelineDeadlines = Field(
+        default_factory=PipelineDeadlines,
+        title="Deadlines",
+        description="Deadlines of the stages, in seconds from the start",
+    )
+
+
+@router.post(
+    "/rag",
+    description=(
+        "Answer a question from the documents of several collections. Searches,"
+        " keyword lookups and reranks run concurrently, stragglers are dropped at"
+        " their deadline and generation may start before every source is reranked"
+    ),
+    summary="Answer from the collections",
+    response_description="Answer and its context",
+)
+def rag(
+    rag_input: Annotated[RAGInput, "RAG Input"],
+    chroma_client: Annotated[
+        chromadb.Client,
+        Depends(get_chroma_client),
+    ],
+    cohere_embeddings: Annotated[
+        CohereEmbeddingsFunction,
+        Depends(get_embeddings_function),
+    ],
+    rerank_model: Annotated[
+        RerankModel,
+        Depends(get_rerank_model),
+    ],
+    single_flight: Annotated[
+        SingleFlight,
+        Depends(get_single_flight),
+    ],
+    query_cache: Annotated[
+        QueryCache,
+        Depends(get_query_cache),
+    ],
+    collection_router: Annotated[
+        CollectionRouter,
+        Depends(get_collection_router),
+    ],
+    chat_model=Depends(get_chat_model),
+    context_manager: Annotated[
+        ChatContextManager,
+        Depends(get_chat_context_manager),
+    ] = None,
+    rate_limiter: Annotated[
+        Optional[TokenBucket],
+        Depends(get_chat_rate_limiter),
+    ] = None,
+) -> Annotated[PipelineResult, "Answer and its context"]:
+    """
+    Answer a question from the documents of several collections
+
+    Args:
+        rag_input (RAGInput): RAG input
+        chroma_client (chromadb.Client): Chroma client
+        cohere_embeddings (CohereEmbeddingsFunction): Embeddings function
+        rerank_model (RerankModel): Rerank model
+        single_flight (SingleFlight): Coalesces identical concurrent searches
+            and reranks
+        query_cache (QueryCache): Cache of search results
+        collection_router (CollectionRouter): Serves each collection from the
+            collection and embeddings model of its last migration
+        chat_model (BaseChatModel): Chat model
+        context_manager (ChatContextManager): Keeps the prompt within the
+            token budget
+        rate_limiter (TokenBucket): Rate limiter of the chat model, low
+            tokens skip speculation
+
+    Returns:
+        PipelineResult: Answer, its context, the skipped sources and the
+            timings of the stages
+    """
+    try:
+        where_filter = normalize_where(rag_input.where) if rag_input.where else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid where filter: {e}",
+        ) from e
+    pipeline = RAGPipeline(
+        vector_stores=[
+            collection_router.open(
+                collection_name,
+                chroma_client,
+                embeddings=cohere_embeddings,
+                single_flight=single_flight,
+                query_cache=query_cache,
+            )
+            for collection_name in dict.fromkeys(rag_input.collection_names)
+        ],
+        rerank=Rerank(model=rerank_model, single_flight=single_flight),
+        chat_llm=ChatLLM(chat_model=chat_model, context_manager=context_manager),
+        k=rag_input.k,
+        top_n=rag_input.top_n,
+        lexical=rag_input.lexical,
+        speculate=rag_input.speculate,
+        deadlines=rag_input.deadlines,
+        rate_limiter=rate_limiter,
+    )
+    return pipeline.run(
+        rag_input.query,
+        messages=rag_input.messages,
+        reference_id=rag_input.reference_id,
+        where=where_filter,
+    )
@@ -0,0 +1,98 @@
+from typing import Annotated
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from ..dependencies import (
+    get_admission_stats,
+    get_query_cache_stats,
+    get_resilience_stats,
+)
+
+router = APIRouter()
+
+
+class MetricsOutput(BaseModel):
+    """
+    Metrics output
+
+    Attributes:
+        providers (dict): Resilience state and counters by provider
+        admission (dict): Admission control state by route class
+        query_cache (dict): Size and hit ratio of the search result cache
+    """
+
+    providers: dict[str, dict] = Field(
+        ...,
+        title="Providers",
+        description=(
+            "Circuit breaker state, available rate limit tokens and call counters"
+            " by provider"
+        ),
+        examples=[
+            {
+                "cohere": {
+                    "calls": 120,
+                    "failures": 1,
+                    "retries": 3,
+                    "hedges": 4,
+                    "hedge_wins": 2,
+                    "rejected": 0,
+                    "circuit": "closed",
+                    "consecutive_failures": 0,
+                    "tokens": 9.5,
+                }
+            }
+        ],
+    )
+    admission: dict[str, dict] = Field(
+        ...,
+        title="Admission",
+        description=(
+            "Adaptive concurrency limit, requests in flight, queued and shed by"
+            " route class"
+        ),
+        examples=[{"search": {"limit": 33.5, "in_flight": 4, "queued": 0, "shed": 0}}],
+    )
+    query_cache: dict = Field(
+        ...,
+        title="Query cache",
+        description=(
+            "Cached search results, size and age bounds, hits, misses, hit ratio"
+            " and write invalidations"
+        ),
+        examples=[
+            {
+                "entries": 420,
+                "max_entries": 10000,
+                "ttl": 60.0,
+                "hits": 1200,
+                "misses": 800,
+                "hit_ratio": 0.6,
+                "invalidations": 12,
+            }
+        ],
+    )
+
+
+@router.get(
+    "",
+    description=(
+        "Get the state of the calls to the providers, of admission control and"
+        " of the query cache"
+    ),
+    summary="Get metrics",
+    response_description="Metrics",
+)
+def get_metrics() -> Annotated[MetricsOutput, "Metrics"]:
+    """
+    Get the state of the calls to the providers
+
+    Returns:
+        MetricsOutput: Metrics
+    """
+    return MetricsOutput(
+        providers=get_resilience_stats(),
+        admission=get_admission_stats(),
+        query_cache=get_query_cache_stats(),
+    )
@@ -0,0 +1,160 @@
+from typing import Annotated, Optional
+
+import chromadb
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import BaseModel, Field
+
+from core.migration import CollectionRouter, MigrationInProgressError, MigrationState
+
+from ..dependencies import get_chroma_client, get_collection_router
+
+router = APIRouter()
+
+
+class MigrationInput(BaseModel):
+    """
+    Migration input
+
+    Attributes:
+        collection_name (str): Collection to re-embed
+        model_name (str): New embeddings model
+        page_size (int): Documents read and embedded at once
+        rate (float): Documents embedded per second
+    """
+
+    collection_name: str = Field(
+        ...,
+        title="Collection name",
+        description="Collection to re-embed",
+        examples=["geography"],
+    )
+    model_name: str = Field(
+        ...,
+        title="Model name",
+        description="New embeddings model",
+        examples=["embed-multilingual-v3.0"],
+    )
+    page_size: int = Field(
+        100,
+        title="Page size",
+        description="Documents read and embedded at once",
+        gt=0,
+    )
+    rate: Optional[float] = Field(
+        None,
+        title="Rate",
+        description="Documents embedded per second, no limit when not set",
+        examples=[50],
+        gt=0,
+    )
+
+
+@router.post(
+    "",
+    description=(
+        "Re-embed a collection with another embeddings model in the background."
+        " Reads are served from the current collection until the new one is"
+        " complete, then every worker switches to it at once"
+    ),
+    summary="Start an embeddings model migration",
+    response_description="Running migration",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def start_migration(
+    migration_input: Annotated[MigrationInput, "Migration input"],
+    chroma_client: Annotated[chromadb.Client, Depends(get_chroma_client)],
+    collection_router: Annotated[CollectionRouter, Depends(get_collection_router)],
+) -> Annotated[MigrationState, "Running migration"]:
+    """
+    Start re-embedding a collection with another embeddings model
+
+    Args:
+        migration_input (MigrationInput): Migration input
+        chroma_client (chromadb.Client): Chroma client
+        collection_router (CollectionRouter): Collection router
+
+    Returns:
+        MigrationState: Running migration
+
+    Raises:
+        HTTPException: 409 if the collection is already being migrated, 422 if
+            it does not exist or already uses the model
+    """
+    try:
+        return collection_router.start_migration(
+            migration_input.collection_name,
+            chroma_client,
+            migration_input.model_name,
+            page_size=migration_input.page_size,
+            rate=migration_input.rate,
+        )
+    except MigrationInProgressError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+
+
+@router.get(
+    "/{collection_name}",
+    description="Get the progress of the last migration of a collection",
+    summary="Get a migration",
+    response_description="Migration",
+)
+def get_migration(
+    collection_name: Annotated[str, "Collection name"],
+    collection_router: Annotated[CollectionRouter, Depends(get_collection_router)],
+) -> Annotated[MigrationState, "Migration"]:
+    """
+    Get the progress of the last migration of a collection
+
+    Args:
+        collection_name (str): Collection name
+        collection_router (CollectionRouter): Collection router
+
+    Returns:
+        MigrationState: Migration
+
+    Raises:
+        HTTPException: 404 if the collection was never migrated
+    """
+    migration = collection_router.registry.get_migration(collection_name)
+    if migration is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Migration not found"
+        )
+    return migration
+
+
+@router.delete(
+    "/{collection_name}",
+    description=(
+        "Cancel the running migration of a collection, reads stay on the current"
+        " collection"
+    ),
+    summary="Cancel a migration",
+    response_description="No content",
+)
+def cancel_migration(
+    collection_name: Annotated[str, "Collection name"],
+    collection_router: Annotated[CollectionRouter, Depends(get_collection_router)],
+) -> Annotated[None, "No content"]:
+    """
+    Cancel the running migration of a collection
+
+    Args:
+        collection_name (str): Collection name
+        collection_router (CollectionRouter): Collection router
+
+    Returns:
+        None: No content
+
+    Raises:
+        HTTPException: 404 if no migration of the collection is running
+    """
+    if collection_router.registry.cancel_migration(collection_name) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="No running migration"
+        )
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,11 +1,14 @@
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Response
 from pydantic import BaseModel, Field
 
-from api.dependencies import get_rerank_model
+from api.dependencies import get_rerank_model, get_single_flight
+from api.serialization import MSGPACK_MEDIA_TYPE, encode_response
+from api.validation import check_columns
 from core.models.documents import Document, DocumentWithScore
 from core.rerank import Rerank, RerankModel
+from core.singleflight import SingleFlight
 
 router = APIRouter(dependencies=[Depends(get_rerank_model)])
 
@@ -93,6 +96,7 @@ class RerankOutput(BaseModel):
 def rerank_documents(
     rerank_input: RerankInput,
     rerank_model: Annotated[RerankModel, Depends(get_rerank_model)],
+    single_flight: Annotated[SingleFlight, Depends(get_single_flight)],
 ) -> RerankOutput:
     """
     Rerank the documents based on the query
@@ -100,12 +104,145 @@ def rerank_documents(
     Args:
         rerank_input (RerankInput): Rerank input
         rerank_model (RerankModel): Rerank model
+        single_flight (SingleFlight): Coalesces identical concurrent reranks
 
     Returns:
         RerankOutput: Rerank output
     """
-    rerank = Rerank(model=rerank_model)
+    rerank = Rerank(model=rerank_model, single_flight=single_flight)
     reranked_documents = rerank.rerank_documents(
         rerank_input.query, rerank_input.documents
     )
     return RerankOutput(query=rerank_input.query, documents=reranked_documents)
+
+
+class ColumnarRerankInput(BaseModel):
+    """
+    Columnar Rerank Input
+
+    Attributes:
+        query (str): Query
+        contents (list[str]): Contents of the documents
+        reference_ids (list[str]): Reference ID of each document
+        top_n (int): Number of documents to return
+    """
+
+    model_config = {
+        "title": "Columnar Rerank Input",
+        "strict": True,
+    }
+    query: str = Field(
+        ...,
+        title="Query",
+        description="Query",
+        examples=["Hoang Sa and Truong Sa belong to Vietnam"],
+    )
+    contents: list[str] = Field(
+        ...,
+        title="Contents",
+        description="Contents of the documents",
+        examples=[["Document 1", "Document 2"]],
+    )
+    reference_ids: Optional[list[Optional[str]]] = Field(
+        None,
+        title="Reference IDs",
+        description="Reference ID of each document, in the order of the contents",
+        examples=[["1", "2"]],
+    )
+    top_n: Optional[int] = Field(
+        None,
+        title="Top n",
+        description="Number of documents to return, every document when not set",
+        examples=[10],
+        gt=0,
+    )
+
+
+class ColumnarRerankOutput(BaseModel):
+    """
+    Columnar Rerank Output
+
+    Attributes:
+        query (str): Query
+        indices (list[int]): Positions of the documents in the input, best first
+        scores (list[float]): Score of each returned document
+        reference_ids (list[str]): Reference ID of each returned document
+    """
+
+    model_config = {
+        "title": "Columnar Rerank Output",
+        "strict": True,
+    }
+    query: str = Field(
+        ...,
+        title="Query",
+        description="Query",
+        examples=["Hoang Sa and Truong Sa belong to Vietnam"],
+    )
+    indices: list[int] = Field(
+        ...,
+        title="Indices",
+        description="Positions of the documents in the input contents, best first",
+        examples=[[1, 0]],
+    )
+    scores: list[float] = Field(
+        ...,
+        title="Scores",
+        description="Relevance score of each returned document",
+        examples=[[0.9, 0.8]],
+    )
+    reference_ids: Optional[list[Optional[str]]] = Field(
+        None,
+        title="Reference IDs",
+        description="Reference ID of each returned document, when given",
+        examples=[["2", "1"]],
+    )
+
+
+@router.post(
+    "/columns",
+    description=(
+        "Rerank documents given as columns of contents and reference IDs, without"
+        " a document object per item. The response is MessagePack when the Accept"
+        " header asks for application/x-msgpack, JSON otherwise"
+    ),
+    summary="Rerank columns of documents",
+    response_description="Positions and scores of the documents, best first",
+    response_model=ColumnarRerankOutput,
+    responses={200: {"content": {MSGPACK_MEDIA_TYPE: {}}}},
+)
+def rerank_columns(
+    rerank_input: ColumnarRerankInput,
+    rerank_model: Annotated[RerankModel, Depends(get_rerank_model)],
+    single_flight: Annotated[SingleFlight, Depends(get_single_flight)],
+    accept: Annotated[Optional[str], Header()] = None,
+) -> Response:
+    """
+    Rerank documents given as columns
+
+    Args:
+        rerank_input (ColumnarRerankInput): Columnar rerank input
+        rerank_model (RerankModel): Rerank model
+        single_flight (SingleFlight): Coalesces identical concurrent reranks
+        accept (str): Accept header, application/x-msgpack for MessagePack
+
+    Returns:
+        Response: Columnar Rerank Output, JSON or MessagePack
+    """
+    check_columns(rerank_input.contents, {"reference_ids": rerank_input.reference_ids})
+    rerank = Rerank(model=rerank_model, single_flight=single_flight)
+    order, scores = rerank.rerank_contents(rerank_input.query, rerank_input.contents)
+    order, scores = order[: rerank_input.top_n], scores[: rerank_input.top_n]
+    return encode_response(
+        {
+            "query": rerank_input.query,
+            "indices": order,
+            "scores": scores,
+            "reference_ids": (
+                [rerank_input.reference_ids[i] for i in order]
+                if rerank_input.reference_ids is not None
+                else None
+            ),
+        },
+        accept=accept,
+    )
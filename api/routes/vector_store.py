@@ -1,19 +1,42 @@
-from typing import Annotated, Optional, Tuple
+import json
+from typing import Annotated, Literal, Optional, Tuple, Union
 
 import chromadb
 import httpx
-from fastapi import APIRouter, Depends, Response, status
-from pydantic import BaseModel, Field
+import numpy as np
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from pydantic import BaseModel, Field, ValidationError
 
-from core.models.documents import Document, DocumentWithScore
+from core.embeddings import as_float32_matrix
+from core.expansion import INTERNAL_METADATA_KEYS
+from core.federation import FederatedVectorStore
+from core.filters import normalize_where
+from core.migration import CollectionRouter
+from core.models.diversity import DiversityParams
+from core.models.documents import Document, DocumentWithScore, MetadataValue
+from core.models.expansion import ExpansionParams
+from core.models.index import HnswIndexParams
+from core.query_cache import QueryCache
+from core.singleflight import SingleFlight
 from core.vector_store import VectorStore
 
+from ..config import SEARCH_MAX_EF, SEARCH_MAX_K
 from ..dependencies import (
     CohereEmbeddingsFunction,
     get_chroma_client,
+    get_collection_router,
     get_embeddings_function,
+    get_query_cache,
+    get_single_flight,
     logger,
 )
+from ..serialization import (
+    MSGPACK_MEDIA_TYPE,
+    decode_embedding,
+    encode_embedding,
+    encode_response,
+)
+from ..validation import check_columns
 
 router = APIRouter(
     dependencies=[
@@ -28,18 +51,24 @@ class AddDocumentInput(BaseModel):
     Add Document Input
 
     Attributes:
-        content (str): Document content
+        content (Union[str, list[str]]): Document content, or its chunks
         collection_name (str): Collection name
         reference_id (str): Reference ID
+        metadata (dict): Typed metadata of the document
+        index_params (HnswIndexParams): HNSW index parameters, used when the
+            collection is created
     """
 
     model_config = {
         "title": "Add Document Input",
         "strict": True,
     }
-    content: str = Field(
+    content: Union[str, list[str]] = Field(
         ...,
-        description="Document content",
+        description=(
+            "Document content, or its chunks in order. Chunks share a parent ID"
+            " so search hits can be expanded to their neighbours or parent"
+        ),
         title="Document content",
         examples=["Hoàng Sa và Trường Sa là của Việt Nam"],
     )
@@ -55,12 +84,33 @@ class AddDocumentInput(BaseModel):
         title="Reference ID",
         examples=["1"],
     )
+    metadata: dict[str, MetadataValue] = Field(
+        default_factory=dict,
+        description=(
+            "Typed metadata of the document, values must be strings, integers,"
+            " floats or booleans"
+        ),
+        title="Metadata",
+        examples=[{"language": "vi", "year": 2024}],
+    )
+    index_params: Optional[HnswIndexParams] = Field(
+        None,
+        description="HNSW index parameters, used when the collection is created",
+        title="Index parameters",
+    )
 
 
 class DocumentWithReference(DocumentWithScore):
     """Document with reference"""
 
     reference: dict = Field(description="Reference", title="Reference", default=None)
+    embedding: Optional[Union[list[float], str]] = Field(
+        None,
+        description=(
+            "Stored embedding, a list of floats or base64 of little-endian float32"
+        ),
+        title="Embedding",
+    )
 
 
 class SimilaritySearchResponse(BaseModel):
@@ -87,6 +137,384 @@ class SimilaritySearchResponse(BaseModel):
     )
 
 
+class BatchSearchInput(BaseModel):
+    """
+    Batch Search Input
+
+    Attributes:
+        collection_name (str): Collection name
+        queries (list[str]): Query strings
+        query_embeddings (list): Precomputed query embeddings
+        k (int): Number of documents to return per query
+    """
+
+    model_config = {
+        "title": "Batch Search Input",
+        "strict": True,
+    }
+    collection_name: str = Field(
+        ...,
+        description="Collection name",
+        title="Collection name",
+        examples=["geography"],
+    )
+    queries: list[str] = Field(
+        default_factory=list,
+        description="Query strings, ignored when query_embeddings is set",
+        title="Queries",
+        examples=[["capital of Vietnam"]],
+    )
+    query_embeddings: Optional[list[Union[str, list[float]]]] = Field(
+        None,
+        description=(
+            "Precomputed query embeddings, base64 of little-endian float32 or"
+            " lists of floats. The queries are not embedded when set"
+        ),
+        title="Query embeddings",
+    )
+    k: int = Field(
+        10,
+        description="Number of documents to return per query",
+        title="Number of documents",
+        ge=1,
+        le=SEARCH_MAX_K,
+    )
+    reference_id: Optional[str] = Field(
+        None,
+        description="Reference ID",
+        title="Reference ID",
+    )
+    search_ef: Optional[int] = Field(
+        None,
+        description="Search effort, size of the HNSW candidate list",
+        title="Search effort",
+        ge=1,
+        le=SEARCH_MAX_EF,
+    )
+    where: Optional[dict] = Field(
+        None,
+        description="Metadata filter expression",
+        title="Where",
+        examples=[{"language": "vi", "year": {"$gte": 2020}}],
+    )
+    filter_strategy: Literal["pre", "post"] = Field(
+        "pre",
+        description="Filter strategy",
+        title="Filter strategy",
+    )
+    min_score: Optional[float] = Field(
+        None,
+        description="Minimum similarity score of the documents",
+        title="Minimum score",
+        examples=[0.3],
+    )
+    diversity: Optional[DiversityParams] = Field(
+        None,
+        description=(
+            "Selects the documents among more candidates by maximal marginal"
+            " relevance and caps the documents of one reference ID"
+        ),
+        title="Diversity",
+    )
+    expansion: Optional[ExpansionParams] = Field(
+        None,
+        description=(
+            "Expands each document into its neighbouring chunks or its whole"
+            " parent, with one batched read for every query"
+        ),
+        title="Expansion",
+    )
+    fields: Literal["full", "snippet", "ids"] = Field(
+        "full",
+        description="Fields of each document",
+        title="Fields",
+    )
+    snippet_length: int = Field(
+        200,
+        description="Maximum characters of page_content when fields is snippet",
+        title="Snippet length",
+    )
+    include_embeddings: bool = Field(
+        False,
+        description="Return the stored embedding of each document",
+        title="Include embeddings",
+    )
+    embedding_format: Literal["float", "base64"] = Field(
+        "float",
+        description="Encoding of the returned embeddings",
+        title="Embedding format",
+    )
+
+
+class BatchSearchResponse(BaseModel):
+    """
+    Batch Search Response
+
+    Attributes:
+        results (list[SimilaritySearchResponse]): Results of each query
+    """
+
+    model_config = {
+        "title": "Batch Search Response",
+        "strict": True,
+    }
+    results: list[SimilaritySearchResponse] = Field(
+        ...,
+        description="Results of each query, in the order of the queries",
+        title="Results",
+    )
+
+
+class FederatedCollection(BaseModel):
+    """
+    Collection of a federated search
+
+    Attributes:
+        name (str): Collection name
+        weight (float): Weight of the normalized scores of the collection
+        timeout (float): Seconds after which the collection is skipped
+    """
+
+    model_config = {
+        "title": "Federated Collection",
+        "strict": True,
+    }
+    name: str = Field(
+        ...,
+        description="Collection name",
+        title="Collection name",
+        examples=["geography"],
+    )
+    weight: float = Field(
+        1.0,
+        description="Weight of the normalized scores of the collection",
+        title="Weight",
+        examples=[0.5],
+        ge=0,
+    )
+    timeout: Optional[float] = Field(
+        None,
+        description=(
+            "Seconds after which the collection is skipped, the timeout of the"
+            " search when not set"
+        ),
+        title="Timeout",
+        examples=[0.5],
+        gt=0,
+    )
+
+
+class FederatedSearchInput(BaseModel):
+    """
+    Federated Search Input
+
+    Attributes:
+        collections (list[FederatedCollection]): Collections searched
+        query (str): Query string
+        query_embedding (Union[str, list[float]]): Precomputed query embedding
+        k (int): Number of documents to return
+        normalization (str): Normalization of the scores of each collection
+        timeout (float): Seconds after which a collection is skipped
+    """
+
+    model_config = {
+        "title": "Federated Search Input",
+        "strict": True,
+    }
+    collections: list[FederatedCollection] = Field(
+        ...,
+        description="Collections searched concurrently, with their weights",
+        title="Collections",
+        examples=[[{"name": "geography"}, {"name": "history", "weight": 0.5}]],
+        min_length=1,
+    )
+    query: Optional[str] = Field(
+        None,
+        description="Query string, ignored when query_embedding is set",
+        title="Query",
+        examples=["capital of Vietnam"],
+    )
+    query_embedding: Optional[Union[str, list[float]]] = Field(
+        None,
+        description=(
+            "Precomputed query embedding, base64 of little-endian float32 or a"
+            " list of floats, used for every collection"
+        ),
+        title="Query embedding",
+    )
+    k: int = Field(
+        10,
+        description="Number of documents to return over every collection",
+        title="Number of documents",
+        ge=1,
+        le=SEARCH_MAX_K,
+    )
+    reference_id: Optional[str] = Field(
+        None,
+        description="Reference ID",
+        title="Reference ID",
+    )
+    search_ef: Optional[int] = Field(
+        None,
+        description="Search effort, size of the HNSW candidate list",
+        title="Search effort",
+        ge=1,
+        le=SEARCH_MAX_EF,
+    )
+    where: Optional[dict] = Field(
+        None,
+        description="Metadata filter expression",
+        title="Where",
+        examples=[{"language": "vi", "year": {"$gte": 2020}}],
+    )
+    filter_strategy: Literal["pre", "post"] = Field(
+        "pre",
+        description="Filter strategy",
+        title="Filter strategy",
+    )
+    min_score: Optional[float] = Field(
+        None,
+        description="Minimum similarity score of the documents, before normalization",
+        title="Minimum score",
+        examples=[0.3],
+    )
+    normalization: Literal["none", "min_max", "rank"] = Field(
+        "min_max",
+        description=(
+            "Normalization of the scores of each collection before weighting:"
+            " none keeps the similarity scores, min_max maps them to [0, 1],"
+            " rank scores by reciprocal rank"
+        ),
+        title="Normalization",
+    )
+    timeout: Optional[float] = Field(
+        None,
+        description=(
+            "Seconds after which a collection without its own timeout is skipped,"
+            " none to wait for every collection"
+        ),
+        title="Timeout",
+        examples=[1.0],
+        gt=0,
+    )
+    fields: Literal["full", "snippet", "ids"] = Field(
+        "full",
+        description="Fields of each document",
+        title="Fields",
+    )
+    snippet_length: int = Field(
+        200,
+        description="Maximum characters of page_content when fields is snippet",
+        title="Snippet length",
+    )
+    include_embeddings: bool = Field(
+        False,
+        description="Return the stored embedding of each document",
+        title="Include embeddings",
+    )
+    embedding_format: Literal["float", "base64"] = Field(
+        "float",
+        description="Encoding of the returned embeddings",
+        title="Embedding format",
+    )
+
+
+class FederatedDocument(DocumentWithReference):
+    """Document of a federated search, with its collection"""
+
+    collection_name: str = Field(
+        ...,
+        description="Collection the document comes from",
+        title="Collection name",
+        examples=["geography"],
+    )
+
+
+class FederatedSearchResponse(BaseModel):
+    """
+    Federated Search Response
+
+    Attributes:
+        documents (list[FederatedDocument]): Global top-k documents
+        query (str): Query string
+        skipped_collections (list[str]): Collections timed out or failed
+    """
+
+    model_config = {
+        "title": "Federated Search Response",
+        "strict": True,
+    }
+    documents: list[FederatedDocument] = Field(
+        ...,
+        description="Global top-k documents, by weighted normalized score",
+        title="List of documents",
+    )
+    query: str = Field(
+        ...,
+        description="Query string",
+        title="Query string",
+    )
+    skipped_collections: list[str] = Field(
+        default_factory=list,
+        description=(
+            "Collections skipped at their timeout or on error, the documents are"
+            " partial when not empty"
+        ),
+        title="Skipped collections",
+    )
+
+
+class ColumnarAddDocumentsInput(BaseModel):
+    """
+    Columnar Add Documents Input
+
+    Attributes:
+        collection_name (str): Collection name
+        contents (list[str]): Contents of the documents
+        reference_ids (list[str]): Reference ID of each document
+        metadata (dict[str, list]): Metadata columns, one value per document
+        index_params (HnswIndexParams): HNSW index parameters, used when the
+            collection is created
+    """
+
+    model_config = {
+        "title": "Columnar Add Documents Input",
+        "strict": True,
+    }
+    collection_name: str = Field(
+        ...,
+        description="Collection name",
+        title="Collection name",
+        examples=["geography"],
+    )
+    contents: list[str] = Field(
+        ...,
+        description="Contents of the documents, each one a separate document",
+        title="Contents",
+        examples=[["Hoàng Sa là của Việt Nam", "Trường Sa là của Việt Nam"]],
+    )
+    reference_ids: list[str] = Field(
+        ...,
+        description="Reference ID of each document, in the order of the contents",
+        title="Reference IDs",
+        examples=[["1", "2"]],
+    )
+    metadata: dict[str, list[Optional[MetadataValue]]] = Field(
+        default_factory=dict,
+        description=(
+            "Metadata columns, one string, integer, float, boolean or null value"
+            " per document. Null values are left out"
+        ),
+        title="Metadata",
+        examples=[{"language": ["vi", "vi"], "year": [2024, None]}],
+    )
+    index_params: Optional[HnswIndexParams] = Field(
+        None,
+        description="HNSW index parameters, used when the collection is created",
+        title="Index parameters",
+    )
+
+
 class AddDocumentResponse(BaseModel):
     """
     Add Document Response
@@ -127,6 +555,18 @@ def create_document(
         CohereEmbeddingsFunction,
         Depends(get_embeddings_function),
     ],
+    single_flight: Annotated[
+        SingleFlight,
+        Depends(get_single_flight),
+    ],
+    query_cache: Annotated[
+        QueryCache,
+        Depends(get_query_cache),
+    ],
+    collection_router: Annotated[
+        CollectionRouter,
+        Depends(get_collection_router),
+    ],
 ) -> Annotated[
     AddDocumentResponse,
     "Document added",
@@ -138,28 +578,259 @@ def create_document(
         document (AddDocumentInput): Add Document Input
         chroma_client (chromadb.Client): Chroma client
         cohere_embeddings (Embeddings): Embeddings function
+        single_flight (SingleFlight): Coalesces identical concurrent searches
+        query_cache (QueryCache): Cache of search results
+        collection_router (CollectionRouter): Serves each collection from the
+            collection and embeddings model of its last migration
 
     Returns:
         AddDocumentResponse: Document added
     """
-    vector_store = VectorStore(
-        collection_name=document.collection_name,
-        client=chroma_client,
+    vector_store = collection_router.open(
+        document.collection_name,
+        chroma_client,
         embeddings=cohere_embeddings,
+        index_params=document.index_params,
+        single_flight=single_flight,
+        query_cache=query_cache,
+        write=True,
     )
     ids = vector_store.add_documents(
-        [document.content],
+        ([document.content] if isinstance(document.content, str) else document.content),
         reference_id=document.reference_id,
+        metadata=document.metadata,
+    )
+    return AddDocumentResponse(ids=ids)
+
+
+@router.post(
+    "/columns",
+    description=(
+        "Add documents given as columns of contents, reference IDs and metadata,"
+        " validated in bulk without a document object per item"
+    ),
+    summary="Add columns of documents",
+    response_description="Documents added",
+)
+def create_documents_from_columns(
+    documents: Annotated[
+        ColumnarAddDocumentsInput,
+        "Columnar Add Documents Input",
+    ],
+    chroma_client: Annotated[
+        chromadb.Client,
+        Depends(get_chroma_client),
+    ],
+    cohere_embeddings: Annotated[
+        CohereEmbeddingsFunction,
+        Depends(get_embeddings_function),
+    ],
+    single_flight: Annotated[
+        SingleFlight,
+        Depends(get_single_flight),
+    ],
+    query_cache: Annotated[
+        QueryCache,
+        Depends(get_query_cache),
+    ],
+    collection_router: Annotated[
+        CollectionRouter,
+        Depends(get_collection_router),
+    ],
+) -> Annotated[AddDocumentResponse, "Documents added"]:
+    """
+    Add documents given as columns to the vector store
+
+    Args:
+        documents (ColumnarAddDocumentsInput): Columnar Add Documents Input
+        chroma_client (chromadb.Client): Chroma client
+        cohere_embeddings (Embeddings): Embeddings function
+        single_flight (SingleFlight): Coalesces identical concurrent searches
+        query_cache (QueryCache): Cache of search results
+        collection_router (CollectionRouter): Serves each collection from the
+            collection and embeddings model of its last migration
+
+    Returns:
+        AddDocumentResponse: Documents added
+    """
+    check_columns(
+        documents.contents,
+        {"reference_ids": documents.reference_ids, **documents.metadata},
+    )
+    vector_store = collection_router.open(
+        documents.collection_name,
+        chroma_client,
+        embeddings=cohere_embeddings,
+        index_params=documents.index_params,
+        single_flight=single_flight,
+        query_cache=query_cache,
+        write=True,
+    )
+    ids = vector_store.add_columns(
+        documents.contents,
+        reference_ids=documents.reference_ids,
+        metadata=documents.metadata,
     )
     return AddDocumentResponse(ids=ids)
 
 
+def parse_where(
+    where: Annotated[Optional[str], "Metadata filter expression, JSON encoded"],
+) -> Annotated[Optional[dict], "Normalized filter expression"]:
+    """
+    Parse and validate a JSON encoded metadata filter
+
+    Args:
+        where (str): Metadata filter expression, JSON encoded
+
+    Returns:
+        Optional[dict]: Normalized filter expression, None when not set
+
+    Raises:
+        HTTPException: 422 if the filter is invalid
+    """
+    try:
+        return normalize_where(json.loads(where)) if where else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid where filter: {e}",
+        ) from e
+
+
+def parse_query_embeddings(
+    query_embeddings: Annotated[
+        list[Union[str, list[float]]],
+        "Query embeddings, base64 of float32 or lists of floats",
+    ],
+) -> Annotated[np.ndarray, "float32 matrix, one row per query"]:
+    """
+    Decode query embeddings sent as base64 of float32 or lists of floats
+
+    Args:
+        query_embeddings (list[Union[str, list[float]]]): Query embeddings
+
+    Returns:
+        np.ndarray: float32 matrix, one row per query
+
+    Raises:
+        HTTPException: 422 if an embedding is invalid or the dimensions differ
+    """
+    try:
+        return as_float32_matrix(
+            [
+                (
+                    decode_embedding(embedding)
+                    if isinstance(embedding, str)
+                    else np.asarray(embedding, dtype=np.float32)
+                )
+                for embedding in query_embeddings
+            ]
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid query embeddings: {e}",
+        ) from e
+
+
+def project_documents(
+    vector_store: Annotated[VectorStore, "Vector store"],
+    result_documents: Annotated[
+        list[Tuple[Document, float]],
+        "Documents and their scores",
+    ],
+    fields: Annotated[str, "Fields of each document"] = "full",
+    snippet_length: Annotated[int, "Maximum characters of snippets"] = 200,
+    reference_callback: Annotated[Optional[str], "Reference callback"] = None,
+    include_embeddings: Annotated[bool, "Return the stored embeddings"] = False,
+    embedding_format: Annotated[str, "Encoding of the embeddings"] = "float",
+) -> Annotated[list[dict], "Projected documents"]:
+    """
+    Keep the requested fields of search results
+
+    The chunk keys recorded at ingest for expansion are left out of the
+    metadata.
+
+    Args:
+        vector_store (VectorStore): Vector store the documents come from
+        result_documents (list[Tuple[Document, float]]): Documents and their
+            scores
+        fields (str): "full", "snippet" or "ids"
+        snippet_length (int): Maximum characters of page_content when fields
+            is snippet
+        reference_callback (str): Reference callback url
+        include_embeddings (bool): Return the stored embedding of each document
+        embedding_format (str): "float" or "base64"
+
+    Returns:
+        list[dict]: Projected documents
+    """
+    embeddings = (
+        vector_store.get_embeddings([doc.id for doc, _ in result_documents])
+        if include_embeddings
+        else None
+    )
+
+    def map_documents(doc: Tuple[Document, float]) -> dict:
+        """
+        Map foreach document and return the result
+
+        Args:
+            doc (Tuple[Document, float]): A tuple contain document and score
+
+        Returns:
+            dict: Mapped document, with the requested fields only
+        """
+        mapped_document = {"id": doc[0].id, "score": doc[1]}
+        if fields == "ids":
+            return mapped_document
+        mapped_document["page_content"] = (
+            doc[0].page_content[:snippet_length]
+            if fields == "snippet"
+            else doc[0].page_content
+        )
+        mapped_document["metadata"] = doc[0].metadata.model_dump(
+            exclude=INTERNAL_METADATA_KEYS
+        )
+        mapped_document["reference"] = None
+        if reference_callback is not None:
+            try:
+                mapped_document["reference"] = httpx.get(
+                    url=reference_callback.format(
+                        reference_id=doc[0].metadata.reference_id
+                    ),
+                    timeout=1,
+                ).json()
+            except BaseException as e:
+                logger.warning("Call reference_callback error: %s", e)
+                mapped_document["reference"] = {"id": doc[0].metadata.reference_id}
+        return mapped_document
+
+    documents = list(map(map_documents, result_documents))
+    if embeddings is not None:
+        for document, embedding in zip(documents, embeddings):
+            document["embedding"] = (
+                encode_embedding(embedding)
+                if embedding_format == "base64"
+                else embedding
+            )
+    return documents
+
+
 @router.get(
     "",
     name="Similarity Search",
-    description="Search for similar documents",
+    description=(
+        "Search for similar documents. The response is MessagePack when the"
+        " Accept header asks for application/x-msgpack, JSON otherwise. It is"
+        " encoded without validation, the response model only documents its"
+        " shape"
+    ),
     summary="Search for similar documents",
     response_description="List of similar documents",
+    response_model=SimilaritySearchResponse,
+    responses={200: {"content": {MSGPACK_MEDIA_TYPE: {}}}},
 )
 def similarity_search(
     collection_name: Annotated[
@@ -174,23 +845,92 @@ def similarity_search(
         CohereEmbeddingsFunction,
         Depends(get_embeddings_function),
     ],
+    single_flight: Annotated[
+        SingleFlight,
+        Depends(get_single_flight),
+    ],
+    query_cache: Annotated[
+        QueryCache,
+        Depends(get_query_cache),
+    ],
+    collection_router: Annotated[
+        CollectionRouter,
+        Depends(get_collection_router),
+    ],
     query: Annotated[
-        str,
+        Optional[str],
         "Query string",
-    ],
+    ] = None,
+    query_embedding: Annotated[
+        Optional[str],
+        "Query embedding, base64 of little-endian float32",
+    ] = None,
     k: Annotated[
         int,
         "Number of documents to return",
+        Query(ge=1, le=SEARCH_MAX_K),
     ] = 10,
     reference_id: Annotated[
         Optional[str],
         "Reference ID",
     ] = None,
     reference_callback: Annotated[Optional[str], "Reference callback"] = None,
-) -> Annotated[
-    SimilaritySearchResponse,
-    "Similarity Search Response",
-]:
+    search_ef: Annotated[
+        Optional[int],
+        "Search effort, size of the HNSW candidate list",
+        Query(ge=1, le=SEARCH_MAX_EF),
+    ] = None,
+    where: Annotated[
+        Optional[str],
+        "Metadata filter expression, JSON encoded",
+    ] = None,
+    filter_strategy: Annotated[
+        Literal["pre", "post"],
+        "Filter strategy",
+    ] = "pre",
+    fields: Annotated[
+        Literal["full", "snippet", "ids"],
+        "Fields of each document",
+    ] = "full",
+    snippet_length: Annotated[
+        int,
+        "Maximum characters of page_content when fields is snippet",
+    ] = 200,
+    include_embeddings: Annotated[
+        bool,
+        "Return the stored embedding of each document",
+    ] = False,
+    embedding_format: Annotated[
+        Literal["float", "base64"],
+        "Encoding of the returned embeddings",
+    ] = "float",
+    min_score: Annotated[
+        Optional[float],
+        "Minimum similarity score of the documents",
+    ] = None,
+    mmr_lambda: Annotated[
+        Optional[float],
+        "Maximal marginal relevance trade-off, 1 for relevance, 0 for diversity",
+    ] = None,
+    max_per_reference: Annotated[
+        Optional[int],
+        "Maximum documents of one reference ID",
+    ] = None,
+    fetch_k: Annotated[
+        Optional[int],
+        "Candidates fetched before diversifying",
+        Query(ge=1, le=SEARCH_MAX_EF),
+    ] = None,
+    expand_window: Annotated[
+        int,
+        "Neighbouring chunks added on each side of a document",
+    ] = 0,
+    expand_parent: Annotated[
+        bool,
+        "Replace each document by its whole parent document",
+    ] = False,
+    accept: Annotated[Optional[str], Header()] = None,
+) -> Response:
     """
     Search for similar documents
 
@@ -198,57 +938,344 @@ def similarity_search(
         collection_name (str): Collection name
         chroma_client (chromadb.Client): Chroma client
         cohere_embeddings (CohereEmbeddingsFunction): Embeddings function
+        single_flight (SingleFlight): Coalesces identical concurrent searches
+        query_cache (QueryCache): Cache of search results
+        collection_router (CollectionRouter): Serves each collection from the
+            collection and embeddings model of its last migration
         query (str): Query string
+        query_embedding (str): Precomputed query embedding, base64 of
+            little-endian float32, the query is not embedded when set
         k (int): Number of documents to return
         reference_id (str): Reference ID
         reference_callback (str): Reference callback url
+        search_ef (int): Search effort, size of the HNSW candidate list
+        where (str): Metadata filter expression, JSON encoded, e.g.
+            {"language": "vi", "year": {"$gte": 2020}}
+        filter_strategy (str): "pre" pushes the filter down into Chroma, "post"
+            applies it on over-fetched results
+        fields (str): "full" returns every field, "snippet" truncates
+            page_content to snippet_length characters, "ids" only returns the
+            ID and score of each document
+        snippet_length (int): Maximum characters of page_content when fields
+            is snippet
+        include_embeddings (bool): Return the stored embedding of each document
+        embedding_format (str): "float" returns lists of floats, "base64"
+            returns base64 of little-endian float32 bytes
+        min_score (float): Minimum similarity score, less relevant documents
+            returned by Chroma are dropped before the results are built
+        mmr_lambda (float): Selects the documents by maximal marginal
+            relevance, 1 for relevance only, 0 for diversity only
+        max_per_reference (int): Maximum documents of one reference ID
+        fetch_k (int): Candidates fetched before diversifying, 4 times k when
+            not set
+        expand_window (int): Neighbouring chunks added on each side of a
+            document, overlapping windows of one parent are merged
+        expand_parent (bool): Replace each document by its whole parent
+        accept (str): Accept header, application/x-msgpack for MessagePack
 
     Returns:
-        SimilaritySearchResponse: Similarity Search Response
+        Response: Similarity Search Response, JSON or MessagePack
     """
-    vector_store = VectorStore(
-        collection_name=collection_name,
-        client=chroma_client,
+    if query is None and query_embedding is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either query or query_embedding is required",
+        )
+    where_filter = parse_where(where)
+    try:
+        diversity = DiversityParams(
+            mmr_lambda=mmr_lambda,
+            max_per_reference=max_per_reference,
+            fetch_k=fetch_k,
+        )
+        expansion = ExpansionParams(window=expand_window, parent=expand_parent)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=e.errors(include_url=False),
+        ) from e
+    embedding = (
+        parse_query_embeddings([query_embedding])[0]
+        if query_embedding is not None
+        else None
+    )
+    vector_store = collection_router.open(
+        collection_name,
+        chroma_client,
         embeddings=cohere_embeddings,
+        single_flight=single_flight,
+        query_cache=query_cache,
     )
     result_documents = vector_store.similarity_search(
         query=query,
         reference_id=reference_id,
         k=k,
+        search_ef=search_ef,
+        where=where_filter,
+        filter_strategy=filter_strategy,
+        query_embedding=embedding,
+        min_score=min_score,
+        diversity=diversity,
+    )
+    result_documents = vector_store.expand_results([result_documents], expansion)[0]
+    documents = project_documents(
+        vector_store,
+        result_documents,
+        fields=fields,
+        snippet_length=snippet_length,
+        reference_callback=reference_callback,
+        include_embeddings=include_embeddings,
+        embedding_format=embedding_format,
+    )
+    return encode_response(
+        {"documents": documents, "query": query or ""},
+        accept=accept,
     )
 
-    def map_documents(doc: Tuple[Document, float]):
-        """
-        Map foreach document and return the result
 
-        Args:
-            doc (Tuple[Document, float]): A tuple contain document and score
+@router.post(
+    "/search",
+    name="Batch Similarity Search",
+    description=(
+        "Search for the documents similar to several queries in one request,"
+        " with query strings or precomputed query embeddings. The response is"
+        " MessagePack when the Accept header asks for application/x-msgpack,"
+        " JSON otherwise. It is encoded without validation, the response model"
+        " only documents its shape"
+    ),
+    summary="Search for similar documents in batch",
+    response_description="List of similar documents for each query",
+    response_model=BatchSearchResponse,
+    responses={200: {"content": {MSGPACK_MEDIA_TYPE: {}}}},
+)
+def batch_similarity_search(
+    search_input: Annotated[
+        BatchSearchInput,
+        "Batch Search Input",
+    ],
+    chroma_client: Annotated[
+        chromadb.Client,
+        Depends(get_chroma_client),
+    ],
+    cohere_embeddings: Annotated[
+        CohereEmbeddingsFunction,
+        Depends(get_embeddings_function),
+    ],
+    collection_router: Annotated[
+        CollectionRouter,
+        Depends(get_collection_router),
+    ],
+    accept: Annotated[Optional[str], Header()] = None,
+) -> Response:
+    """
+    Search for the documents similar to several queries in one request
 
-        Returns:
-            DocumentWithReference: Mapped document
-        """
-        mapped_document = DocumentWithReference(
-            page_content=doc[0].page_content,
-            metadata=doc[0].metadata,
-            score=doc[1],
+    Query embeddings skip the embeddings function entirely, query strings are
+    embedded in one call. Every query is sent to Chroma in one query.
+
+    Args:
+        search_input (BatchSearchInput): Batch Search Input
+        chroma_client (chromadb.Client): Chroma client
+        cohere_embeddings (CohereEmbeddingsFunction): Embeddings function
+        collection_router (CollectionRouter): Serves each collection from the
+            collection and embeddings model of its last migration
+        accept (str): Accept header, application/x-msgpack for MessagePack
+
+    Returns:
+        Response: Batch Search Response, JSON or MessagePack
+    """
+    if search_input.query_embeddings is None and not search_input.queries:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either queries or query_embeddings is required",
         )
-        if reference_callback is not None:
-            try:
-                mapped_document.reference = httpx.get(
-                    url=reference_callback.format(
-                        reference_id=doc[0].metadata.reference_id
+    try:
+        where_filter = (
+            normalize_where(search_input.where) if search_input.where else None
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid where filter: {e}",
+        ) from e
+    embeddings = (
+        parse_query_embeddings(search_input.query_embeddings)
+        if search_input.query_embeddings is not None
+        else None
+    )
+    vector_store = collection_router.open(
+        search_input.collection_name,
+        chroma_client,
+        embeddings=cohere_embeddings,
+    )
+    results = vector_store.similarity_search_batch(
+        queries=search_input.queries,
+        query_embeddings=embeddings,
+        reference_id=search_input.reference_id,
+        k=search_input.k,
+        search_ef=search_input.search_ef,
+        where=where_filter,
+        filter_strategy=search_input.filter_strategy,
+        min_score=search_input.min_score,
+        diversity=search_input.diversity,
+    )
+    if search_input.expansion is not None:
+        results = vector_store.expand_results(results, search_input.expansion)
+    queries = search_input.queries or [""] * len(results)
+    return encode_response(
+        {
+            "results": [
+                {
+                    "query": query,
+                    "documents": project_documents(
+                        vector_store,
+                        result_documents,
+                        fields=search_input.fields,
+                        snippet_length=search_input.snippet_length,
+                        include_embeddings=search_input.include_embeddings,
+                        embedding_format=search_input.embedding_format,
                     ),
-                    timeout=1,
-                ).json()
-            except BaseException as e:
-                logger.warning("Call reference_callback error: %s", e)
-                mapped_document.reference = {"id": doc[0].metadata.reference_id}
-        return mapped_document
+                }
+                for query, result_documents in zip(queries, results)
+            ]
+        },
+        accept=accept,
+    )
 
-    documents = list(map(map_documents, result_documents))
-    return SimilaritySearchResponse(
-        documents=documents,
-        query=query,
+
+@router.post(
+    "/federated_search",
+    name="Federated Similarity Search",
+    description=(
+        "Search several collections concurrently with one query embedding and"
+        " merge the global top-k by weighted normalized score. Collections still"
+        " searching at their timeout are skipped. The response is MessagePack"
+        " when the Accept header asks for application/x-msgpack, JSON otherwise."
+        " It is encoded without validation, the response model only documents"
+        " its shape"
+    ),
+    summary="Search for similar documents in several collections",
+    response_description="Global top-k documents and the skipped collections",
+    response_model=FederatedSearchResponse,
+    responses={200: {"content": {MSGPACK_MEDIA_TYPE: {}}}},
+)
+def federated_similarity_search(
+    search_input: Annotated[
+        FederatedSearchInput,
+        "Federated Search Input",
+    ],
+    chroma_client: Annotated[
+        chromadb.Client,
+        Depends(get_chroma_client),
+    ],
+    cohere_embeddings: Annotated[
+        CohereEmbeddingsFunction,
+        Depends(get_embeddings_function),
+    ],
+    single_flight: Annotated[
+        SingleFlight,
+        Depends(get_single_flight),
+    ],
+    query_cache: Annotated[
+        QueryCache,
+        Depends(get_query_cache),
+    ],
+    collection_router: Annotated[
+        CollectionRouter,
+        Depends(get_collection_router),
+    ],
+    accept: Annotated[Optional[str], Header()] = None,
+) -> Response:
+    """
+    Search several collections and merge the global top-k
+
+    Args:
+        search_input (FederatedSearchInput): Federated Search Input
+        chroma_client (chromadb.Client): Chroma client
+        cohere_embeddings (CohereEmbeddingsFunction): Embeddings function
+        single_flight (SingleFlight): Coalesces identical concurrent searches
+        query_cache (QueryCache): Cache of search results
+        collection_router (CollectionRouter): Serves each collection from the
+            collection and embeddings model of its last migration
+        accept (str): Accept header, application/x-msgpack for MessagePack
+
+    Returns:
+        Response: Federated Search Response, JSON or MessagePack
+    """
+    if search_input.query_embedding is None and search_input.query is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either query or query_embedding is required",
+        )
+    names = [collection.name for collection in search_input.collections]
+    if len(set(names)) != len(names):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Collection names must be unique",
+        )
+    try:
+        where_filter = (
+            normalize_where(search_input.where) if search_input.where else None
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid where filter: {e}",
+        ) from e
+    query_embedding = (
+        parse_query_embeddings([search_input.query_embedding])[0]
+        if search_input.query_embedding is not None
+        else None
+    )
+    vector_stores = {
+        collection.name: collection_router.open(
+            collection.name,
+            chroma_client,
+            embeddings=cohere_embeddings,
+            single_flight=single_flight,
+            query_cache=query_cache,
+        )
+        for collection in search_input.collections
+    }
+    federated = FederatedVectorStore(
+        vector_stores,
+        weights={c.name: c.weight for c in search_input.collections},
+        timeouts={
+            c.name: c.timeout for c in search_input.collections if c.timeout is not None
+        },
+        timeout=search_input.timeout,
+        normalization=search_input.normalization,
+    )
+    hits, skipped = federated.similarity_search(
+        query=search_input.query,
+        reference_id=search_input.reference_id,
+        k=search_input.k,
+        search_ef=search_input.search_ef,
+        where=where_filter,
+        filter_strategy=search_input.filter_strategy,
+        query_embedding=query_embedding,
+        min_score=search_input.min_score,
+    )
+    documents: list[Optional[dict]] = [None] * len(hits)
+    for name, vector_store in vector_stores.items():
+        positions = [i for i, hit in enumerate(hits) if hit[0] == name]
+        projected = project_documents(
+            vector_store,
+            [(hits[i][1], hits[i][2]) for i in positions],
+            fields=search_input.fields,
+            snippet_length=search_input.snippet_length,
+            include_embeddings=search_input.include_embeddings,
+            embedding_format=search_input.embedding_format,
+        )
+        for i, document in zip(positions, projected):
+            documents[i] = {**document, "collection_name": name}
+    return encode_response(
+        {
+            "documents": documents,
+            "query": search_input.query or "",
+            "skipped_collections": skipped,
+        },
+        accept=accept,
     )
 
 
@@ -271,6 +1298,18 @@ def delete_documents_by_reference_id(
         chromadb.Client,
         Depends(get_chroma_client),
     ],
+    single_flight: Annotated[
+        SingleFlight,
+        Depends(get_single_flight),
+    ],
+    query_cache: Annotated[
+        QueryCache,
+        Depends(get_query_cache),
+    ],
+    collection_router: Annotated[
+        CollectionRouter,
+        Depends(get_collection_router),
+    ],
 ) -> Annotated[
     None,
     "No content",
@@ -282,13 +1321,20 @@ def delete_documents_by_reference_id(
         reference_id (str): Reference ID
         collection_name (str): Collection name
         chroma_client (chromadb.Client): Chroma client
+        single_flight (SingleFlight): Coalesces identical concurrent searches
+        query_cache (QueryCache): Cache of search results
+        collection_router (CollectionRouter): Serves each collection from the
+            collection and embeddings model of its last migration
 
     Returns:
         None: No content
     """
-    vector_store = VectorStore(
-        collection_name=collection_name,
-        client=chroma_client,
+    vector_store = collection_router.open(
+        collection_name,
+        chroma_client,
+        single_flight=single_flight,
+        query_cache=query_cache,
+        write=True,
     )
     vector_store.delete_by_reference_id(reference_id=reference_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,131 @@
+import base64
+from typing import Annotated, Any, Optional
+
+import numpy as np
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def encode_embedding(
+    embedding: Annotated[np.ndarray, "Embedding"],
+) -> Annotated[str, "Base64 of the little-endian float32 bytes"]:
+    """
+    Encode an embedding as base64 of its little-endian float32 bytes
+
+    Args:
+        embedding (np.ndarray): Embedding
+
+    Returns:
+        str: Base64 of the little-endian float32 bytes
+    """
+    return base64.b64encode(
+        np.ascontiguousarray(embedding, dtype="<f4").tobytes()
+    ).decode("ascii")
+
+
+def decode_embedding(
+    encoded: Annotated[str, "Base64 of the little-endian float32 bytes"],
+) -> Annotated[np.ndarray, "Embedding"]:
+    """
+    Decode an embedding encoded by `encode_embedding`
+
+    Args:
+        encoded (str): Base64 of the little-endian float32 bytes
+
+    Returns:
+        np.ndarray: float32 embedding
+
+    Raises:
+        ValueError: If the value is not base64 of float32 bytes
+    """
+    data = base64.b64decode(encoded, validate=True)
+    if len(data) == 0 or len(data) % 4 != 0:
+        raise ValueError("Embedding must be base64 of little-endian float32 bytes")
+    return np.frombuffer(data, dtype="<f4").astype(np.float32, copy=False)
+
+
+def _default(value: Any) -> Any:
+    """
+    Convert values the encoders don't know natively
+
+    Args:
+        value (Any): Value
+
+    Returns:
+        Any: Encodable value
+
+    Raises:
+        TypeError: If the value can't be encoded
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def encode_response(
+    content: Annotated[Any, "Response content"],
+    accept: Annotated[Optional[str], "Accept header"] = None,
+) -> Annotated[Response, "Encoded response"]:
+    """
+    Encode a response with the fastest encoder the client accepts
+
+    MessagePack is used when the client asks for it, otherwise JSON through
+    orjson when it is installed. The content is encoded as is, without going
+    through the pydantic response models.
+
+    Args:
+        content (Any): Response content, dicts, lists, scalars and numpy arrays
+        accept (str): Accept header of the request
+
+    Returns:
+        Response: Encoded response
+    """
+    if accept and MSGPACK_MEDIA_TYPE in accept and msgpack is not None:
+        return Response(
+            content=msgpack.packb(content, default=_default, use_bin_type=True),
+            media_type=MSGPACK_MEDIA_TYPE,
+        )
+    if orjson is not None:
+        return Response(
+            content=orjson.dumps(
+                content,
+                default=_default,
+                option=orjson.OPT_SERIALIZE_NUMPY,
+            ),
+            media_type=JSON_MEDIA_TYPE,
+        )
+    return JSONResponse(content=_to_builtin(content))
+
+
+def _to_builtin(value: Any) -> Any:
+    """
+    Recursively convert numpy values for the standard json encoder
+
+    Args:
+        value (Any): Value
+
+    Returns:
+        Any: Value made of builtin types
+    """
+    if isinstance(value, dict):
+        return {key: _to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return _default(value)
+    return value
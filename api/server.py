@@ -0,0 +1,127 @@
+import argparse
+import importlib
+from typing import Annotated, Optional, Sequence
+
+import uvicorn
+
+from .config import (
+    API_HOST,
+    API_PORT,
+    API_PRELOAD,
+    API_WORKERS,
+    CHAT_SESSION_DB,
+    COLLECTION_REGISTRY_DB,
+    QUANTIZED_INDEX_DB,
+    QUERY_CACHE_DB,
+)
+
+APP = "api.main:app"
+
+#: Databases of the state every worker must see, a path shared by the workers
+#: is required to run more than one
+SHARED_STATE = {
+    "CHAT_SESSION_DB": CHAT_SESSION_DB,
+    "COLLECTION_REGISTRY_DB": COLLECTION_REGISTRY_DB,
+    "QUANTIZED_INDEX_DB": QUANTIZED_INDEX_DB,
+    "QUERY_CACHE_DB": QUERY_CACHE_DB,
+}
+
+
+def in_memory_state(
+    shared_state: Annotated[
+        Optional[dict[str, str]],
+        "Path of each shared state database",
+    ] = None,
+) -> Annotated[list[str], "Settings of the state kept in process memory"]:
+    """
+    Settings of the shared state kept in the memory of each process
+
+    Args:
+        shared_state (dict[str, str]): Path of each shared state database,
+            SHARED_STATE when not set
+
+    Returns:
+        list[str]: Settings without a database file
+    """
+    return [
+        name
+        for name, path in (shared_state or SHARED_STATE).items()
+        if path in ("", ":memory:")
+    ]
+
+
+def parse_args(
+    argv: Annotated[Optional[Sequence[str]], "Command line arguments"] = None,
+) -> argparse.Namespace:
+    """
+    Parse the command line, defaulting to the environment configuration
+
+    Args:
+        argv (Sequence[str]): Command line arguments, sys.argv when not set
+
+    Returns:
+        argparse.Namespace: host, port, workers and preload
+    """
+    parser = argparse.ArgumentParser(description="Run the Flexible RAG API")
+    parser.add_argument("--host", default=API_HOST, help="Bind address")
+    parser.add_argument("--port", type=int, default=API_PORT, help="Bind port")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=API_WORKERS,
+        help="Number of worker processes, each with its own event loop",
+    )
+    parser.add_argument(
+        "--preload",
+        action=argparse.BooleanOptionalAction,
+        default=API_PRELOAD,
+        help="Import the application before starting the workers",
+    )
+    return parser.parse_args(argv)
+
+
+def main(
+    argv: Annotated[Optional[Sequence[str]], "Command line arguments"] = None,
+) -> None:
+    """
+    Run the API with one or more worker processes
+
+    Workers are separate processes, so in-memory caches, single-flight groups
+    and admission limits are per worker. Sessions, the collection registry,
+    the quantized codes and the query cache generations must be seen by every
+    worker, so more than one worker requires CHAT_SESSION_DB,
+    COLLECTION_REGISTRY_DB, QUANTIZED_INDEX_DB and QUERY_CACHE_DB to point at
+    shared paths. Point RERANK_CACHE_DB and EMBEDDINGS_CACHE_DB at shared
+    paths too to share those caches between workers.
+
+    Preloading imports the application in the supervisor first, so
+    configuration and import errors fail once at startup instead of in every
+    worker. Workers are spawned, not forked, so they still import the
+    application themselves.
+
+    Args:
+        argv (Sequence[str]): Command line arguments, sys.argv when not set
+
+    Raises:
+        SystemExit: If several workers would keep shared state in memory
+    """
+    args = parse_args(argv)
+    in_memory = in_memory_state()
+    if args.workers > 1 and in_memory:
+        raise SystemExit(
+            f"{args.workers} workers need shared database paths for"
+            f" {', '.join(in_memory)}, run 1 worker or set them"
+        )
+    if args.preload:
+        importlib.import_module(APP.split(":")[0])
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import math
+from typing import Annotated, Optional
+
+from fastapi import HTTPException, status
+
+from .config import PAYLOAD_MAX_TOKENS
+
+
+def check_columns(
+    contents: Annotated[list[str], "Contents of the documents"],
+    columns: Annotated[
+        Optional[dict[str, Optional[list]]],
+        "Other columns, one value per document",
+    ] = None,
+    max_tokens: Annotated[int, "Token budget of the contents"] = PAYLOAD_MAX_TOKENS,
+) -> None:
+    """
+    Validate a columnar payload in bulk, before any per-item work
+
+    The tokens are estimated from the total length of the contents, about 4
+    characters per token like `count_tokens`, without visiting each text.
+
+    Args:
+        contents (list[str]): Contents of the documents
+        columns (dict[str, list]): Other columns, one value per document,
+            None columns are skipped
+        max_tokens (int): Token budget of the contents
+
+    Raises:
+        HTTPException: 422 if a column does not have one value per document,
+            413 if the contents exceed the token budget
+    """
+    for name, column in (columns or {}).items():
+        if column is not None and len(column) != len(contents):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=(
+                    f"Column {name} has {len(column)} values, expected {len(contents)}"
+                ),
+            )
+    tokens = math.ceil(sum(map(len, contents)) / 4)
+    if tokens > max_tokens:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Payload has about {tokens} tokens, the limit is {max_tokens}",
+        )
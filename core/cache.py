@@ -0,0 +1,299 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Annotated, Any, Hashable, Iterable, Optional
+
+_MISSING = object()
+
+
+def content_hash(text: Annotated[str, "Text"]) -> Annotated[str, "SHA-256 of the text"]:
+    """
+    Hash a text for cache keys
+
+    Args:
+        text (str): Text
+
+    Returns:
+        str: Hex SHA-256 of the UTF-8 text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def connect(
+    path: Annotated[str, "Path of the database file"],
+) -> Annotated[sqlite3.Connection, "Connection"]:
+    """
+    Open a SQLite database shared by several threads and processes
+
+    The write-ahead log lets readers run while another process writes, and
+    writers wait for the lock instead of failing at once.
+
+    Args:
+        path (str): Path of the database file
+
+    Returns:
+        sqlite3.Connection: Connection, usable from any thread
+    """
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache with LRU eviction and an optional TTL
+
+    Attributes:
+        max_entries (int): Maximum number of entries
+        ttl (float): Seconds an entry stays valid, None to never expire
+    """
+
+    def __init__(
+        self,
+        max_entries: Annotated[int, "Maximum number of entries"] = 1024,
+        ttl: Annotated[Optional[float], "Seconds an entry stays valid"] = None,
+    ) -> None:
+        """
+        Create a cache
+
+        Args:
+            max_entries (int): Maximum number of entries
+            ttl (float): Seconds an entry stays valid, None to never expire
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """
+        Number of entries, including expired ones not evicted yet
+
+        Returns:
+            int: Number of entries
+        """
+        return len(self._entries)
+
+    def get(
+        self,
+        key: Annotated[Hashable, "Key"],
+        default: Annotated[Any, "Returned when the key is missing"] = None,
+    ) -> Annotated[Any, "Cached value"]:
+        """
+        Get a value and mark it as recently used
+
+        Args:
+            key (Hashable): Key
+            default (Any): Returned when the key is missing or expired
+
+        Returns:
+            Any: Cached value
+        """
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(
+        self,
+        key: Annotated[Hashable, "Key"],
+        value: Annotated[Any, "Value"],
+    ) -> None:
+        """
+        Set a value, evicting the least recently used entries when full
+
+        Args:
+            key (Hashable): Key
+            value (Any): Value
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(
+        self,
+        keys: Annotated[Iterable[Hashable], "Keys"],
+    ) -> Annotated[dict, "Cached values of the keys found"]:
+        """
+        Get the values of several keys
+
+        Args:
+            keys (Iterable[Hashable]): Keys
+
+        Returns:
+            dict: Cached values of the keys found, missing keys are left out
+        """
+        values = {}
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                values[key] = value
+        return values
+
+    def set_many(self, items: Annotated[dict, "Values by key"]) -> None:
+        """
+        Set several values
+
+        Args:
+            items (dict): Values by key
+        """
+        for key, value in items.items():
+            self.set(key, value)
+
+    def delete(self, key: Annotated[Hashable, "Key"]) -> None:
+        """
+        Delete a value
+
+        Args:
+            key (Hashable): Key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Delete every value"""
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache:
+    """
+    Persistent cache in SQLite, shared by every process using the same file
+
+    Keys are strings, bytes values are stored as is and other values as JSON.
+
+    Attributes:
+        path (str): Path of the database file
+        ttl (float): Seconds an entry stays valid, None to never expire
+    """
+
+    #: Keys per query, below the SQLite limit of bound parameters
+    batch_size: int = 500
+
+    def __init__(
+        self,
+        path: Annotated[str, "Path of the database file"],
+        ttl: Annotated[Optional[float], "Seconds an entry stays valid"] = None,
+    ) -> None:
+        """
+        Open or create the database
+
+        Args:
+            path (str): Path of the database file
+            ttl (float): Seconds an entry stays valid, None to never expire
+        """
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = connect(path)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY, value NOT NULL, expires_at REAL)"
+            )
+
+    def get(
+        self,
+        key: Annotated[str, "Key"],
+        default: Annotated[Any, "Returned when the key is missing"] = None,
+    ) -> Annotated[Any, "Cached value"]:
+        """
+        Get a value
+
+        Args:
+            key (str): Key
+            default (Any): Returned when the key is missing or expired
+
+        Returns:
+            Any: Cached value
+        """
+        return self.get_many([key]).get(key, default)
+
+    def get_many(
+        self,
+        keys: Annotated[Iterable[str], "Keys"],
+    ) -> Annotated[dict, "Cached values of the keys found"]:
+        """
+        Get the values of several keys in one query
+
+        Args:
+            keys (Iterable[str]): Keys
+
+        Returns:
+            dict: Cached values of the keys found, missing keys are left out
+        """
+        keys = list(keys)
+        now = time.time()
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), self.batch_size):
+                batch = keys[start : start + self.batch_size]
+                rows += self._connection.execute(
+                    "SELECT key, value FROM cache WHERE key IN"
+                    f" ({', '.join('?' * len(batch))})"
+                    " AND (expires_at IS NULL OR expires_at >= ?)",
+                    (*batch, now),
+                ).fetchall()
+        return {
+            key: value if isinstance(value, bytes) else json.loads(value)
+            for key, value in rows
+        }
+
+    def set(self, key: Annotated[str, "Key"], value: Annotated[Any, "Value"]) -> None:
+        """
+        Set a value
+
+        Args:
+            key (str): Key
+            value (Any): Value, bytes or JSON serializable
+        """
+        self.set_many({key: value})
+
+    def set_many(self, items: Annotated[dict, "Values by key"]) -> None:
+        """
+        Set several values in one transaction
+
+        Args:
+            items (dict): Values by key, bytes or JSON serializable
+        """
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at)"
+                " VALUES (?, ?, ?)",
+                [
+                    (
+                        key,
+                        value if isinstance(value, bytes) else json.dumps(value),
+                        expires_at,
+                    )
+                    for key, value in items.items()
+                ],
+            )
+
+    def delete(self, key: Annotated[str, "Key"]) -> None:
+        """
+        Delete a value
+
+        Args:
+            key (str): Key
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """Delete every value"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM cache")
@@ -1,9 +1,12 @@
+import hashlib
+import math
 from abc import ABC, abstractmethod
-from typing import Annotated
+from typing import Annotated, Callable, Optional
 
 from pydantic import BaseModel, Field
 
-from core.models.chat import ChatMessage
+from core.cache import LRUCache
+from core.models.chat import ChatMessage, ChatMessageRole
 
 
 class ChatInput(BaseModel):
@@ -12,6 +15,8 @@ class ChatInput(BaseModel):
 
     Attributes:
         messages (list[ChatMessage]): Messages
+        conversation_id (str): Conversation ID, used to cache the summary of
+            older messages
     """
 
     messages: list[ChatMessage] = Field(
@@ -19,6 +24,12 @@ class ChatInput(BaseModel):
         title="Messages",
         description="Messages",
     )
+    conversation_id: Optional[str] = Field(
+        None,
+        title="Conversation ID",
+        description="Conversation ID, used to cache the summary of older messages",
+        examples=["Uj9uY4N41cpSZb0MHBY_w"],
+    )
 
 
 class ChatLLMModel(ABC):
@@ -37,25 +48,272 @@ class ChatLLMModel(ABC):
         """
 
 
+def count_tokens(text: Annotated[str, "Text"]) -> Annotated[int, "Number of tokens"]:
+    """
+    Estimate the number of tokens of a text, about 4 characters per token
+
+    Args:
+        text (str): Text
+
+    Returns:
+        int: Number of tokens
+    """
+    return math.ceil(len(text) / 4)
+
+
+def truncate_tokens(
+    text: Annotated[str, "Text"],
+    max_tokens: Annotated[int, "Maximum number of tokens"],
+    token_counter: Annotated[Callable[[str], int], "Token counter"] = count_tokens,
+) -> Annotated[str, "Text within max_tokens"]:
+    """
+    Cut a text to a number of tokens, keeping the longest prefix that fits
+
+    Args:
+        text (str): Text
+        max_tokens (int): Maximum number of tokens
+        token_counter (Callable[[str], int]): Token counter
+
+    Returns:
+        str: Text within max_tokens
+    """
+    if token_counter(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if token_counter(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation in a few sentences. Keep names, facts,"
+    " decisions and open questions, drop greetings and small talk."
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+def messages_digest(
+    messages: Annotated[list[ChatMessage], "Messages"],
+) -> Annotated[str, "Hex SHA-256 of the messages"]:
+    """
+    Digest of the roles and contents of messages
+
+    Args:
+        messages (list[ChatMessage]): Messages
+
+    Returns:
+        str: Hex SHA-256 of the messages
+    """
+    digest = hashlib.sha256()
+    for m in messages:
+        digest.update(f"{m.role.value}\0{m.content}\0".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ChatContextManager:
+    """
+    Keep the prompt of long conversations within a token budget
+
+    System messages and the most recent messages that fit the budget are sent
+    as is. Older messages are replaced by a rolling summary, cached per
+    conversation ID with a digest of the messages it covers, so each message
+    is only summarized once and a summary is never reused for other messages.
+    The budget includes the summary and its prefix, and a newest message
+    exceeding it alone is truncated.
+
+    Attributes:
+        max_tokens (int): Token budget of the prompt
+        summary_max_tokens (int): Token budget of the summary
+        summarizer (ChatLLMModel): Model used to summarize, the chat model
+            when not set
+        token_counter (Callable[[str], int]): Token counter
+    """
+
+    def __init__(
+        self,
+        max_tokens: Annotated[int, "Token budget of the prompt"] = 8000,
+        summary_max_tokens: Annotated[int, "Token budget of the summary"] = 500,
+        summarizer: Annotated[
+            Optional[ChatLLMModel],
+            "Model used to summarize, the chat model when not set",
+        ] = None,
+        token_counter: Annotated[
+            Callable[[str], int],
+            "Token counter",
+        ] = count_tokens,
+        cache_size: Annotated[int, "Conversations whose summary is cached"] = 1024,
+    ) -> None:
+        """
+        Create a context manager
+
+        Args:
+            max_tokens (int): Token budget of the prompt
+            summary_max_tokens (int): Token budget of the summary
+            summarizer (ChatLLMModel): Model used to summarize, the chat model
+                when not set
+            token_counter (Callable[[str], int]): Token counter
+            cache_size (int): Conversations whose summary is cached
+        """
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+        self.token_counter = token_counter
+        self.summaries = LRUCache(max_entries=cache_size)
+
+    def prepare(
+        self,
+        chat_input: Annotated[ChatInput, "Chat Input"],
+        chat_model: Annotated[ChatLLMModel, "Chat model"],
+    ) -> Annotated[ChatInput, "Chat input within the token budget"]:
+        """
+        Trim the messages to the token budget, summarizing the older ones
+
+        Args:
+            chat_input (ChatInput): Chat input
+            chat_model (ChatLLMModel): Chat model, summarizes when no
+                summarizer is set
+
+        Returns:
+            ChatInput: Chat input within the token budget
+        """
+        pinned = [m for m in chat_input.messages if m.role == ChatMessageRole.System]
+        turns = [m for m in chat_input.messages if m.role != ChatMessageRole.System]
+        budget = self.max_tokens - sum(self.token_counter(m.content) for m in pinned)
+        if sum(self.token_counter(m.content) for m in turns) <= budget:
+            return chat_input
+
+        if len(turns) > 1:
+            # Room for the summary of the older turns, with its prefix
+            budget -= self.summary_max_tokens + self.token_counter(SUMMARY_PREFIX)
+        kept = len(turns)
+        used = 0
+        while kept > 0:
+            tokens = self.token_counter(turns[kept - 1].content)
+            if used + tokens > budget:
+                break
+            used += tokens
+            kept -= 1
+        if kept == len(turns):
+            # The newest turn alone exceeds the budget, it is cut to fit
+            newest = turns[-1]
+            turns[-1] = newest.model_copy(
+                update={"content": self.truncate(newest.content, max(budget, 0))}
+            )
+            kept -= 1
+        if kept == 0:
+            return ChatInput(
+                messages=[*pinned, *turns], conversation_id=chat_input.conversation_id
+            )
+        summary = self.summarize(
+            turns[:kept], chat_input.conversation_id, self.summarizer or chat_model
+        )
+        messages = [
+            *pinned,
+            ChatMessage(role=ChatMessageRole.System, content=SUMMARY_PREFIX + summary),
+            *turns[kept:],
+        ]
+        return ChatInput(messages=messages, conversation_id=chat_input.conversation_id)
+
+    def summarize(
+        self,
+        messages: Annotated[list[ChatMessage], "Older messages"],
+        conversation_id: Annotated[Optional[str], "Conversation ID"],
+        summarizer: Annotated[ChatLLMModel, "Model used to summarize"],
+    ) -> Annotated[str, "Summary"]:
+        """
+        Summarize the older messages, reusing the cached rolling summary
+
+        The cached summary covers a prefix of the messages, only the messages
+        after it are sent to the summarizer together with the previous summary.
+        It is reused only when the digest of that prefix matches, so a
+        conversation ID sent with other messages gets a new summary.
+
+        Args:
+            messages (list[ChatMessage]): Older messages
+            conversation_id (str): Conversation ID, None to skip the cache
+            summarizer (ChatLLMModel): Model used to summarize
+
+        Returns:
+            str: Summary
+        """
+        covered, summary = 0, ""
+        if conversation_id is not None:
+            covered, digest, summary = self.summaries.get(conversation_id, (0, "", ""))
+            if covered > len(messages) or digest != messages_digest(messages[:covered]):
+                covered, summary = 0, ""
+        if covered == len(messages):
+            return summary
+
+        transcript = "\n".join(
+            f"{m.role.value}: {m.content}" for m in messages[covered:]
+        )
+        if summary:
+            transcript = f"{SUMMARY_PREFIX}{summary}\n\n{transcript}"
+        summary = summarizer.chat(
+            ChatInput(
+                messages=[
+                    ChatMessage(role=ChatMessageRole.System, content=SUMMARY_PROMPT),
+                    ChatMessage(role=ChatMessageRole.Human, content=transcript),
+                ]
+            )
+        )
+        summary = self.truncate(summary, self.summary_max_tokens)
+        if conversation_id is not None:
+            self.summaries.set(
+                conversation_id, (len(messages), messages_digest(messages), summary)
+            )
+        return summary
+
+    def truncate(
+        self,
+        text: Annotated[str, "Text"],
+        max_tokens: Annotated[int, "Maximum number of tokens"],
+    ) -> Annotated[str, "Text within max_tokens"]:
+        """
+        Cut a text to a number of tokens
+
+        Args:
+            text (str): Text
+            max_tokens (int): Maximum number of tokens
+
+        Returns:
+            str: Text within max_tokens
+        """
+        return truncate_tokens(text, max_tokens, self.token_counter)
+
+
 class ChatLLM:
     """
     Chat with a language model
 
     Attributes:
         chat_model (BaseChatModel): A chat model
+        context_manager (ChatContextManager): Keeps the prompt within a token
+            budget, None to send every message
     """
 
     def __init__(
         self,
         chat_model: Annotated[ChatLLMModel, "A chat model"],
+        context_manager: Annotated[
+            Optional[ChatContextManager],
+            "Keeps the prompt within a token budget",
+        ] = None,
     ) -> None:
         """
         Create a ChatLLM
 
         Args:
             chat_model (BaseChatModel): A chat model
+            context_manager (ChatContextManager): Keeps the prompt within a
+                token budget, None to send every message
         """
         self.chat_model = chat_model
+        self.context_manager = context_manager
 
     def chat(self, chat_input: Annotated[ChatInput, "Chat Input"]) -> str:
         """
@@ -67,4 +325,6 @@ class ChatLLM:
         Returns:
             str: Chat output
         """
+        if self.context_manager is not None:
+            chat_input = self.context_manager.prepare(chat_input, self.chat_model)
         return self.chat_model.chat(chat_input)
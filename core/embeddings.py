@@ -0,0 +1,116 @@
+from typing import Annotated, Optional, Sequence, Union
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
+
+from core.cache import LRUCache, SQLiteCache, content_hash
+
+
+def as_float32_matrix(
+    embeddings: Annotated[
+        Union[np.ndarray, Sequence[Sequence[float]]],
+        "Embeddings",
+    ],
+) -> Annotated[np.ndarray, "Contiguous float32 matrix"]:
+    """
+    Convert embeddings to a contiguous float32 matrix, one row per embedding
+
+    A contiguous float32 matrix is returned as is, a list of float32 arrays is
+    stacked with one copy and no Python float objects.
+
+    Args:
+        embeddings (Union[np.ndarray, Sequence[Sequence[float]]]): Embeddings
+
+    Returns:
+        np.ndarray: Contiguous float32 matrix
+    """
+    if len(embeddings) == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.ascontiguousarray(embeddings, dtype=np.float32)
+
+
+class CachedEmbeddingsFunction(EmbeddingFunction):
+    """
+    Embeddings function caching the embedding of each text
+
+    Embeddings are kept in an in-memory LRU cache and, optionally, a
+    persistent cache shared by every worker process using the same file, so a
+    text is embedded once for the whole deployment. Only uncached texts are
+    sent to the backend function.
+
+    Attributes:
+        embeddings (EmbeddingFunction): Backend embeddings function
+        model_name (str): Name of the backend model, part of the cache keys
+        memory (LRUCache): In-memory cache
+        persistent (SQLiteCache): Shared persistent cache, None to keep
+            embeddings in memory only
+    """
+
+    def __init__(
+        self,
+        embeddings: Annotated[EmbeddingFunction, "Backend embeddings function"],
+        model_name: Annotated[Optional[str], "Name of the backend model"] = None,
+        max_entries: Annotated[int, "Embeddings kept in memory"] = 10_000,
+        persistent: Annotated[
+            Optional[SQLiteCache],
+            "Shared persistent cache",
+        ] = None,
+    ) -> None:
+        """
+        Wrap an embeddings function with a cache
+
+        Args:
+            embeddings (EmbeddingFunction): Backend embeddings function
+            model_name (str): Name of the backend model, the class name of the
+                function when not set
+            max_entries (int): Embeddings kept in memory
+            persistent (SQLiteCache): Shared persistent cache, None to keep
+                embeddings in memory only
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name or type(embeddings).__name__
+        self.memory = LRUCache(max_entries=max_entries)
+        self.persistent = persistent
+
+    # skipcq: PYL-W0622
+    def __call__(self, input: Documents) -> list[np.ndarray]:
+        """
+        Embed the texts, sending only the uncached ones to the backend
+
+        Embeddings are cached as read-only float32 arrays in memory and as
+        little-endian float32 bytes in the persistent cache.
+
+        Args:
+            input (Documents): Texts
+
+        Returns:
+            list[np.ndarray]: One float32 embedding per text
+        """
+        keys = [f"{self.model_name}:{content_hash(text)}" for text in input]
+        embeddings = self.memory.get_many(keys)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in embeddings]
+        if missing and self.persistent is not None:
+            found = {
+                key: np.frombuffer(value, dtype="<f4")
+                for key, value in self.persistent.get_many(missing).items()
+            }
+            self.memory.set_many(found)
+            embeddings.update(found)
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            texts = dict(zip(keys, input))
+            matrix = as_float32_matrix(self.embeddings([texts[k] for k in missing]))
+            matrix.flags.writeable = False
+            fresh = dict(zip(missing, matrix))
+            self.memory.set_many(fresh)
+            if self.persistent is not None:
+                self.persistent.set_many(
+                    {
+                        key: row.astype("<f4", copy=False).tobytes()
+                        for key, row in fresh.items()
+                    }
+                )
+            embeddings.update(fresh)
+        return [embeddings[key] for key in keys]
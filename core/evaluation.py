@@ -0,0 +1,75 @@
+from typing import Annotated, Sequence
+
+import numpy as np
+
+from core.scoring import distances
+
+
+def exact_top_k(
+    matrix: Annotated[np.ndarray, "Matrix of vectors, one per row"],
+    queries: Annotated[np.ndarray, "Query vectors, one per row"],
+    k: Annotated[int, "Number of neighbours"],
+    space: Annotated[str, "Distance space"] = "cosine",
+) -> Annotated[list[list[int]], "Row indices of the exact neighbours of each query"]:
+    """
+    Brute-force nearest neighbours, used as the ground truth for recall
+
+    Args:
+        matrix (np.ndarray): Matrix of vectors, one per row
+        queries (np.ndarray): Query vectors, one per row
+        k (int): Number of neighbours
+        space (str): Distance space
+
+    Returns:
+        list[list[int]]: Row indices of the exact neighbours of each query
+    """
+    k = min(k, len(matrix))
+    result = []
+    for query in queries:
+        dist = distances(query, matrix, space)
+        top = np.argpartition(dist, k - 1)[:k] if k > 0 else np.empty(0, dtype=int)
+        result.append(top[np.argsort(dist[top])].tolist())
+    return result
+
+
+def recall_at_k(
+    found: Annotated[Sequence[Sequence], "Retrieved ids for each query"],
+    expected: Annotated[Sequence[Sequence], "Ground truth ids for each query"],
+) -> Annotated[float, "Mean recall over all queries"]:
+    """
+    Mean recall of the retrieved ids against the ground truth
+
+    Args:
+        found (Sequence[Sequence]): Retrieved ids for each query
+        expected (Sequence[Sequence]): Ground truth ids for each query
+
+    Returns:
+        float: Mean recall over all queries
+    """
+    recalls = [
+        len(set(f) & set(e)) / len(e) for f, e in zip(found, expected) if len(e) > 0
+    ]
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def latency_summary(
+    samples: Annotated[Sequence[float], "Latency samples in seconds"],
+) -> Annotated[dict[str, float], "Mean, p50, p95 and p99 latency in milliseconds"]:
+    """
+    Summarize latency samples
+
+    Args:
+        samples (Sequence[float]): Latency samples in seconds
+
+    Returns:
+        dict[str, float]: Mean, p50, p95 and p99 latency in milliseconds
+    """
+    if len(samples) == 0:
+        return {"mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    millis = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "mean_ms": float(millis.mean()),
+        "p50_ms": float(np.percentile(millis, 50)),
+        "p95_ms": float(np.percentile(millis, 95)),
+        "p99_ms": float(np.percentile(millis, 99)),
+    }
@@ -0,0 +1,90 @@
+from typing import Annotated, Optional, Tuple
+
+#: Metadata keys recorded on every chunk at ingest
+PARENT_ID_KEY = "parent_id"
+CHUNK_KEY = "chunk"
+CHUNK_COUNT_KEY = "chunk_count"
+
+#: Keys only used to expand hits, not returned to API clients
+INTERNAL_METADATA_KEYS = frozenset({PARENT_ID_KEY, CHUNK_KEY, CHUNK_COUNT_KEY})
+
+
+def chunk_id(
+    parent_id: Annotated[str, "Parent document ID"],
+    ordinal: Annotated[int, "Position of the chunk in its parent"],
+) -> Annotated[str, "Document ID of the chunk"]:
+    """
+    ID of a chunk, derived from its parent so neighbours are fetched by ID
+
+    Args:
+        parent_id (str): Parent document ID
+        ordinal (int): Position of the chunk in its parent
+
+    Returns:
+        str: Document ID of the chunk
+    """
+    return f"{parent_id}:{ordinal}"
+
+
+def chunk_window(
+    metadata: Annotated[Optional[dict], "Metadata of a hit"],
+    window: Annotated[int, "Neighbouring chunks on each side"] = 0,
+    parent: Annotated[bool, "Whole parent document"] = False,
+) -> Annotated[Optional[Tuple[str, int, int]], "Parent ID and chunk range"]:
+    """
+    Range of chunks a hit expands to
+
+    Args:
+        metadata (dict): Metadata of a hit
+        window (int): Neighbouring chunks added on each side
+        parent (bool): Expand to the whole parent document
+
+    Returns:
+        Optional[Tuple[str, int, int]]: Parent ID, first and last chunk
+            ordinals, None for documents ingested without chunk metadata
+    """
+    metadata = metadata or {}
+    if PARENT_ID_KEY not in metadata or CHUNK_KEY not in metadata:
+        return None
+    ordinal = metadata[CHUNK_KEY]
+    last = metadata.get(CHUNK_COUNT_KEY, ordinal + window + 1) - 1
+    if parent:
+        return metadata[PARENT_ID_KEY], 0, last
+    return (
+        metadata[PARENT_ID_KEY],
+        max(0, ordinal - window),
+        min(last, ordinal + window),
+    )
+
+
+def merge_windows(
+    windows: Annotated[
+        list[Tuple[str, int, int, int]],
+        "Parent ID, first and last chunk, position of the hit",
+    ],
+) -> Annotated[
+    list[Tuple[str, int, int, list[int]]],
+    "Merged windows and the positions of their hits",
+]:
+    """
+    Merge the overlapping or adjacent windows of the same parent
+
+    Args:
+        windows (list[Tuple[str, int, int, int]]): Parent ID, first and last
+            chunk ordinals, and position of the hit in the results
+
+    Returns:
+        list[Tuple[str, int, int, list[int]]]: Parent ID, first and last chunk
+            ordinals, and positions of the merged hits, ordered by their best
+            (lowest) position
+    """
+    merged = []
+    for parent_id, start, end, position in sorted(windows):
+        if merged and merged[-1][0] == parent_id and start <= merged[-1][2] + 1:
+            merged[-1][2] = max(merged[-1][2], end)
+            merged[-1][3].append(position)
+        else:
+            merged.append([parent_id, start, end, [position]])
+    return sorted(
+        (tuple(window) for window in merged), key=lambda window: min(window[3])
+    )
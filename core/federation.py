@@ -0,0 +1,257 @@
+import heapq
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from logging import getLogger
+from typing import Annotated, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from core.models.documents import Document
+from core.vector_store import VectorStore
+
+logger = getLogger(__name__)
+
+#: Score normalizations applied to the results of each collection before
+#: weighting and merging
+NORMALIZATIONS = ("none", "min_max", "rank")
+
+#: Smoothing constant of reciprocal rank normalization
+RANK_CONSTANT = 60
+
+
+def normalize_scores(
+    scores: Annotated[Sequence[float], "Scores of one collection, best first"],
+    normalization: Annotated[str, "Normalization"] = "min_max",
+) -> Annotated[list[float], "Normalized scores"]:
+    """
+    Put the scores of collections with different models or distance spaces
+    on one scale
+
+    Args:
+        scores (Sequence[float]): Scores of one collection, best first
+        normalization (str): "none" keeps the similarity scores, comparable
+            when the collections share a model and distance space. "min_max"
+            maps the scores of each collection to [0, 1], the best hit to 1.
+            "rank" scores by reciprocal rank, 1 / (60 + rank)
+
+    Returns:
+        list[float]: Normalized scores
+
+    Raises:
+        ValueError: If the normalization is unknown
+    """
+    if normalization == "none":
+        return list(scores)
+    if normalization == "rank":
+        return [1 / (RANK_CONSTANT + rank) for rank in range(1, len(scores) + 1)]
+    if normalization == "min_max":
+        if len(scores) == 0:
+            return []
+        low, high = min(scores), max(scores)
+        if high == low:
+            return [1.0] * len(scores)
+        return [(score - low) / (high - low) for score in scores]
+    raise ValueError(
+        f"Unknown normalization {normalization}, expected one of {NORMALIZATIONS}"
+    )
+
+
+class FederatedVectorStore:
+    """
+    Search several collections as one
+
+    The query is embedded once per embeddings function, every collection is
+    searched concurrently, and the normalized and weighted scores are merged
+    into a global top-k. Collections still searching at their timeout are
+    skipped and the results of the others are returned.
+
+    Attributes:
+        vector_stores (dict[str, VectorStore]): Vector store of each
+            collection name
+        weights (dict[str, float]): Weight of the scores of each collection
+        timeouts (dict[str, float]): Timeout of each collection, in seconds
+        timeout (float): Timeout of the collections without their own
+        normalization (str): Normalization of the scores of each collection
+    """
+
+    def __init__(
+        self,
+        vector_stores: Annotated[
+            dict[str, VectorStore],
+            "Vector store of each collection name",
+        ],
+        weights: Annotated[
+            Optional[dict[str, float]],
+            "Weight of the scores of each collection, 1 by default",
+        ] = None,
+        timeouts: Annotated[
+            Optional[dict[str, float]],
+            "Timeout of each collection, in seconds",
+        ] = None,
+        timeout: Annotated[
+            Optional[float],
+            "Timeout of the collections without their own",
+        ] = None,
+        normalization: Annotated[
+            str,
+            "Normalization of the scores of each collection",
+        ] = "min_max",
+    ) -> None:
+        """
+        Federate vector stores
+
+        Args:
+            vector_stores (dict[str, VectorStore]): Vector store of each
+                collection name
+            weights (dict[str, float]): Weight of the scores of each
+                collection, 1 when not set
+            timeouts (dict[str, float]): Timeout of each collection, in
+                seconds from the start of the search
+            timeout (float): Timeout of the collections without their own,
+                None to wait for them
+            normalization (str): "none", "min_max" or "rank", see
+                `normalize_scores`
+
+        Raises:
+            ValueError: If the normalization is unknown or a weight is negative
+        """
+        if normalization not in NORMALIZATIONS:
+            raise ValueError(
+                f"Unknown normalization {normalization},"
+                f" expected one of {NORMALIZATIONS}"
+            )
+        if any(weight < 0 for weight in (weights or {}).values()):
+            raise ValueError("Weights must not be negative")
+        self.vector_stores = vector_stores
+        self.weights = weights or {}
+        self.timeouts = timeouts or {}
+        self.timeout = timeout
+        self.normalization = normalization
+
+    def similarity_search(
+        self,
+        query: Annotated[Optional[str], "Query string"] = None,
+        reference_id: Annotated[Optional[str], "Reference ID"] = None,
+        k: Annotated[int, "Number of result documents"] = 3,
+        search_ef: Annotated[
+            Optional[int],
+            "Search effort, size of the HNSW candidate list for this query",
+        ] = None,
+        where: Annotated[Optional[dict], "Metadata filter expression"] = None,
+        filter_strategy: Annotated[str, "Filter strategy, pre or post"] = "pre",
+        query_embedding: Annotated[
+            Optional[Union[np.ndarray, Sequence[float]]],
+            "Precomputed query embedding",
+        ] = None,
+        min_score: Annotated[
+            Optional[float],
+            "Minimum similarity score, before normalization",
+        ] = None,
+    ) -> Tuple[list[Tuple[str, Document, float]], list[str]]:
+        """
+        Search every collection concurrently and merge the global top-k
+
+        Each collection returns its own top-k, so the merged top-k is exact
+        for every normalization.
+
+        Args:
+            query (str): Query string
+            reference_id (str): Reference ID
+            k (int): Number of result documents
+            search_ef (int): Search effort, size of the HNSW candidate list
+                for this query
+            where (dict): Metadata filter expression
+            filter_strategy (str): Filter strategy, pre or post
+            query_embedding (Union[np.ndarray, Sequence[float]]): Precomputed
+                query embedding, used for every collection
+            min_score (float): Minimum similarity score of each collection,
+                applied before normalization
+
+        Returns:
+            Tuple[list[Tuple[str, Document, float]], list[str]]: Collection
+                name, document and weighted score of the hits, best first, and
+                the collections skipped at their timeout or on error
+        """
+        if query_embedding is None and query is None:
+            raise ValueError("Either query or query_embedding is required")
+        start = time.monotonic()
+        options = {
+            "reference_id": reference_id,
+            "k": k,
+            "search_ef": search_ef,
+            "where": where,
+            "filter_strategy": filter_strategy,
+            "min_score": min_score,
+        }
+        embedders = {}
+        for vector_store in self.vector_stores.values():
+            embedders.setdefault(id(vector_store.embeddings), vector_store)
+        executor = ThreadPoolExecutor(
+            max_workers=len(embedders) + len(self.vector_stores)
+        )
+        try:
+            embeddings: dict[int, Future] = {}
+            if query_embedding is None:
+                embeddings = {
+                    key: executor.submit(vector_store.embed, [query])
+                    for key, vector_store in embedders.items()
+                }
+
+            def search(
+                vector_store: VectorStore,
+            ) -> list[Tuple[Document, float]]:
+                """
+                Search one collection once the query is embedded
+
+                Args:
+                    vector_store (VectorStore): Vector store of the collection
+
+                Returns:
+                    list[Tuple[Document, float]]: Documents and their scores
+                """
+                return vector_store.similarity_search(
+                    query=query,
+                    query_embedding=(
+                        query_embedding
+                        if query_embedding is not None
+                        else embeddings[id(vector_store.embeddings)].result()[0]
+                    ),
+                    **options,
+                )
+
+            searches = {
+                name: executor.submit(search, vector_store)
+                for name, vector_store in self.vector_stores.items()
+            }
+            hits: list[Tuple[str, Document, float]] = []
+            skipped: list[str] = []
+            for name, future in searches.items():
+                timeout = self.timeouts.get(name, self.timeout)
+                try:
+                    results = future.result(
+                        timeout=(
+                            None
+                            if timeout is None
+                            else max(0.0, timeout - (time.monotonic() - start))
+                        )
+                    )
+                except FutureTimeoutError:
+                    logger.warning("Search of %s timed out", name)
+                    skipped.append(name)
+                    continue
+                except Exception as e:
+                    logger.warning("Search of %s failed: %s", name, e)
+                    skipped.append(name)
+                    continue
+                weight = self.weights.get(name, 1.0)
+                scores = normalize_scores(
+                    [score for _, score in results], self.normalization
+                )
+                hits.extend(
+                    (name, document, weight * score)
+                    for (document, _), score in zip(results, scores)
+                )
+            return heapq.nlargest(k, hits, key=lambda hit: hit[2]), skipped
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,165 @@
+from typing import Annotated, Any, Optional
+
+COMPARISON_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin"}
+LOGICAL_OPERATORS = {"$and", "$or"}
+FILTER_STRATEGIES = ("pre", "post")
+
+
+def _is_scalar(value: Any) -> bool:
+    """
+    Whether a value can be stored as Chroma metadata
+
+    Args:
+        value (Any): Value
+
+    Returns:
+        bool: True for strings, integers, floats and booleans
+    """
+    return isinstance(value, (str, int, float, bool))
+
+
+def _validate_condition(field: str, condition: Any) -> dict:
+    """
+    Validate the condition on a single field
+
+    Args:
+        field (str): Metadata field
+        condition (Any): A scalar for equality, or a single-operator dict
+
+    Returns:
+        dict: The condition as {field: {operator: value}}
+
+    Raises:
+        ValueError: If the condition is not valid
+    """
+    if _is_scalar(condition):
+        return {field: {"$eq": condition}}
+    if not isinstance(condition, dict) or len(condition) != 1:
+        raise ValueError(f"Condition on {field} must be a value or one operator")
+    operator, value = next(iter(condition.items()))
+    if operator not in COMPARISON_OPERATORS:
+        raise ValueError(f"Unsupported operator {operator} on {field}")
+    if operator in ("$in", "$nin"):
+        if not isinstance(value, list) or not value:
+            raise ValueError(f"{operator} on {field} expects a non-empty list")
+        if not all(_is_scalar(v) for v in value):
+            raise ValueError(f"{operator} on {field} expects a list of values")
+    elif operator in ("$gt", "$gte", "$lt", "$lte"):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{operator} on {field} expects a number")
+    elif not _is_scalar(value):
+        raise ValueError(f"{operator} on {field} expects a value")
+    return {field: {operator: value}}
+
+
+def normalize_where(
+    where: Annotated[dict, "Filter expression"],
+) -> Annotated[dict, "Filter expression accepted by Chroma"]:
+    """
+    Validate a filter expression and rewrite it the way Chroma expects
+
+    Chroma only accepts one key per dict, so {"a": 1, "b": 2} becomes
+    {"$and": [{"a": {"$eq": 1}}, {"b": {"$eq": 2}}]}.
+
+    Args:
+        where (dict): Filter expression
+
+    Returns:
+        dict: Filter expression accepted by Chroma
+
+    Raises:
+        ValueError: If the expression is not valid
+    """
+    if not isinstance(where, dict) or len(where) == 0:
+        raise ValueError("Filter must be a non-empty object")
+    clauses = []
+    for key, value in where.items():
+        if key in LOGICAL_OPERATORS:
+            if not isinstance(value, list) or len(value) == 0:
+                raise ValueError(f"{key} expects a non-empty list of filters")
+            children = [normalize_where(child) for child in value]
+            clauses.append(children[0] if len(children) == 1 else {key: children})
+        elif key.startswith("$"):
+            raise ValueError(f"Unsupported operator {key}")
+        else:
+            clauses.append(_validate_condition(key, value))
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def build_where(
+    reference_id: Annotated[Optional[str], "Reference ID"] = None,
+    where: Annotated[Optional[dict], "Filter expression"] = None,
+) -> Annotated[Optional[dict], "Filter expression accepted by Chroma"]:
+    """
+    Combine the reference ID and a filter expression into a Chroma filter
+
+    Args:
+        reference_id (str): Reference ID
+        where (dict): Filter expression
+
+    Returns:
+        Optional[dict]: Filter expression accepted by Chroma, None if empty
+    """
+    conditions = {}
+    if reference_id is not None:
+        conditions["reference_id"] = reference_id
+    if where:
+        return normalize_where({**conditions, "$and": [where]})
+    return normalize_where(conditions) if conditions else None
+
+
+def _compare(operator: str, actual: Any, expected: Any) -> bool:
+    """
+    Apply a comparison operator
+
+    Args:
+        operator (str): Comparison operator
+        actual (Any): Value in the metadata, None when missing
+        expected (Any): Value in the filter
+
+    Returns:
+        bool: Whether the metadata value satisfies the operator
+    """
+    if operator == "$eq":
+        return actual == expected
+    if operator == "$ne":
+        return actual != expected
+    if operator == "$in":
+        return actual in expected
+    if operator == "$nin":
+        return actual not in expected
+    if isinstance(actual, bool) or not isinstance(actual, (int, float)):
+        return False
+    if operator == "$gt":
+        return actual > expected
+    if operator == "$gte":
+        return actual >= expected
+    if operator == "$lt":
+        return actual < expected
+    return actual <= expected
+
+
+def matches(
+    metadata: Annotated[Optional[dict], "Document metadata"],
+    where: Annotated[Optional[dict], "Normalized filter expression"],
+) -> Annotated[bool, "Whether the metadata satisfies the filter"]:
+    """
+    Evaluate a normalized filter expression on the client side
+
+    Args:
+        metadata (dict): Document metadata
+        where (dict): Filter expression returned by `normalize_where`
+
+    Returns:
+        bool: Whether the metadata satisfies the filter
+    """
+    if not where:
+        return True
+    metadata = metadata or {}
+    key, value = next(iter(where.items()))
+    if key == "$and":
+        return all(matches(metadata, child) for child in value)
+    if key == "$or":
+        return any(matches(metadata, child) for child in value)
+    operator, expected = next(iter(value.items()))
+    return _compare(operator, metadata.get(key), expected)
@@ -0,0 +1,852 @@
+import re
+import threading
+import time
+from logging import getLogger
+from typing import Annotated, Callable, Iterable, Literal, Optional, Tuple, Union
+
+import chromadb
+import chromadb.api.client
+import chromadb.errors
+import nanoid
+from pydantic import BaseModel, Field
+
+from core.cache import connect
+from core.models.index import HnswIndexParams
+from core.quantization import QuantizedIndexes
+from core.query_cache import QueryCache
+from core.resilience import TokenBucket
+from core.singleflight import SingleFlight
+from core.vector_store import VectorStore
+
+logger = getLogger(__name__)
+
+
+class MigrationInProgressError(RuntimeError):
+    """Raised when a collection already has a running migration"""
+
+
+class MigrationState(BaseModel):
+    """
+    Progress of the migration of a collection to another embeddings model
+
+    Attributes:
+        collection_name (str): Logical collection name
+        source (str): Collection serving reads during the migration
+        source_model (str): Embeddings model of the source collection
+        target (str): Shadow collection the documents are re-embedded into
+        model_name (str): Embeddings model of the shadow collection
+        status (str): "running", "completed", "failed" or "cancelled"
+        total (int): Documents in the source when the migration started
+        migrated (int): Documents re-embedded so far
+        skipped (int): Documents without text, which cannot be re-embedded
+        error (str): Error that stopped the migration
+        started_at (float): Unix time the migration started
+        updated_at (float): Unix time of the last progress
+    """
+
+    model_config = {
+        "title": "Migration State",
+    }
+    collection_name: str = Field(
+        ...,
+        title="Collection name",
+        description="Logical collection name",
+        examples=["geography"],
+    )
+    source: str = Field(
+        ...,
+        title="Source",
+        description="Collection serving reads during the migration",
+        examples=["geography"],
+    )
+    source_model: str = Field(
+        ...,
+        title="Source model",
+        description="Embeddings model of the source collection",
+        examples=["embed-multilingual-v2.0"],
+    )
+    target: str = Field(
+        ...,
+        title="Target",
+        description="Shadow collection the documents are re-embedded into",
+        examples=["geography-embed-multilingual-v3.0"],
+    )
+    model_name: str = Field(
+        ...,
+        title="Model name",
+        description="Embeddings model of the shadow collection",
+        examples=["embed-multilingual-v3.0"],
+    )
+    status: Literal["running", "completed", "failed", "cancelled"] = Field(
+        "running",
+        title="Status",
+        description="Status of the migration",
+    )
+    total: int = Field(
+        0,
+        title="Total",
+        description="Documents in the source when the migration started",
+    )
+    migrated: int = Field(
+        0,
+        title="Migrated",
+        description="Documents re-embedded so far",
+    )
+    skipped: int = Field(
+        0,
+        title="Skipped",
+        description="Documents without text, which cannot be re-embedded",
+    )
+    error: Optional[str] = Field(
+        None,
+        title="Error",
+        description="Error that stopped the migration",
+    )
+    started_at: float = Field(
+        default_factory=time.time,
+        title="Started at",
+        description="Unix time the migration started",
+    )
+    updated_at: float = Field(
+        default_factory=time.time,
+        title="Updated at",
+        description="Unix time of the last progress",
+    )
+
+
+def shadow_collection_name(
+    collection_name: Annotated[str, "Collection name"],
+    model_name: Annotated[str, "Embeddings model"],
+) -> Annotated[str, "Name of the shadow collection"]:
+    """
+    Name of the collection a collection is re-embedded into with a model
+
+    Args:
+        collection_name (str): Collection name
+        model_name (str): Embeddings model
+
+    Returns:
+        str: Name of the shadow collection, valid for Chroma
+    """
+    name = re.sub(r"[^a-zA-Z0-9._-]", "-", f"{collection_name}-{model_name}")
+    return name[:512].strip("-._")
+
+
+def chunks(
+    items: Annotated[list, "Items"],
+    size: Annotated[int, "Chunk size"],
+) -> Iterable[list]:
+    """
+    Split a list into consecutive chunks
+
+    Args:
+        items (list): Items
+        size (int): Chunk size
+
+    Returns:
+        Iterable[list]: Chunks of at most size items
+    """
+    return (items[i : i + size] for i in range(0, len(items), size))
+
+
+class CollectionRegistry:
+    """
+    Collection and embeddings model serving each logical collection name,
+    with the state of the migrations, in SQLite so every worker agrees
+
+    Collections that were never migrated are served under their own name
+    with the default model.
+
+    Attributes:
+        path (str): Path of the database file
+        default_model (str): Embeddings model of collections never migrated
+        stale_after (float): Seconds without progress after which a running
+            migration is considered dead and can be restarted
+    """
+
+    def __init__(
+        self,
+        path: Annotated[str, "Path of the database file"] = ":memory:",
+        default_model: Annotated[str, "Embeddings model by default"] = "",
+        stale_after: Annotated[float, "Seconds without progress"] = 300,
+    ) -> None:
+        """
+        Open or create the database
+
+        Args:
+            path (str): Path of the database file, ":memory:" for one process
+            default_model (str): Embeddings model of collections never migrated
+            stale_after (float): Seconds without progress after which a
+                running migration can be restarted
+        """
+        self.path = path
+        self.default_model = default_model
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._connection = connect(path)
+        with self._lock, self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS collections (
+                    name TEXT PRIMARY KEY,
+                    collection TEXT NOT NULL,
+                    model_name TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS migrations (
+                    name TEXT PRIMARY KEY,
+                    target TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    state TEXT NOT NULL
+                );
+                """
+            )
+
+    def resolve(
+        self,
+        collection_name: Annotated[str, "Logical collection name"],
+    ) -> Annotated[Tuple[str, str], "Collection and embeddings model"]:
+        """
+        Find the collection serving a logical collection name
+
+        Args:
+            collection_name (str): Logical collection name
+
+        Returns:
+            Tuple[str, str]: Collection name and embeddings model
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT collection, model_name FROM collections WHERE name = ?",
+                (collection_name,),
+            ).fetchone()
+        return tuple(row) if row else (collection_name, self.default_model)
+
+    def get_migration(
+        self,
+        collection_name: Annotated[str, "Logical collection name"],
+    ) -> Annotated[Optional[MigrationState], "Last migration"]:
+        """
+        Get the last migration of a collection
+
+        Args:
+            collection_name (str): Logical collection name
+
+        Returns:
+            Optional[MigrationState]: Last migration, None if never migrated
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT state FROM migrations WHERE name = ?", (collection_name,)
+            ).fetchone()
+        return MigrationState.model_validate_json(row[0]) if row else None
+
+    def begin_migration(
+        self,
+        state: Annotated[MigrationState, "Running migration"],
+    ) -> None:
+        """
+        Record a new migration, unless one is already running
+
+        Args:
+            state (MigrationState): Running migration
+
+        Raises:
+            MigrationInProgressError: If a migration of the collection is
+                running and made progress recently
+        """
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                """
+                INSERT INTO migrations (name, target, status, updated_at, state)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (name) DO UPDATE SET
+                    target = excluded.target,
+                    status = excluded.status,
+                    updated_at = excluded.updated_at,
+                    state = excluded.state
+                WHERE status != 'running' OR updated_at < ?
+                """,
+                (
+                    state.collection_name,
+                    state.target,
+                    state.status,
+                    state.updated_at,
+                    state.model_dump_json(),
+                    time.time() - self.stale_after,
+                ),
+            )
+        if cursor.rowcount == 0:
+            raise MigrationInProgressError(
+                f"Collection {state.collection_name} is already being migrated"
+            )
+
+    def update_migration(
+        self,
+        state: Annotated[MigrationState, "Migration"],
+        swap: Annotated[bool, "Serve the collection from the target"] = False,
+    ) -> Annotated[bool, "Whether the migration was still running"]:
+        """
+        Save the progress of a running migration
+
+        Nothing is saved if the migration was cancelled or replaced in the
+        meantime. With swap, the logical collection is served from the target
+        collection in the same transaction, so every worker switches at once.
+
+        Args:
+            state (MigrationState): Migration
+            swap (bool): Serve the collection from the target
+
+        Returns:
+            bool: True if the migration was still running and was saved
+        """
+        state.updated_at = time.time()
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                """
+                UPDATE migrations SET status = ?, updated_at = ?, state = ?
+                WHERE name = ? AND target = ? AND status = 'running'
+                """,
+                (
+                    state.status,
+                    state.updated_at,
+                    state.model_dump_json(),
+                    state.collection_name,
+                    state.target,
+                ),
+            )
+            if cursor.rowcount == 0:
+                return False
+            if swap:
+                self._connection.execute(
+                    """
+                    INSERT OR REPLACE INTO collections (name, collection, model_name)
+                    VALUES (?, ?, ?)
+                    """,
+                    (state.collection_name, state.target, state.model_name),
+                )
+        return True
+
+    def cancel_migration(
+        self,
+        collection_name: Annotated[str, "Logical collection name"],
+    ) -> Annotated[Optional[MigrationState], "Cancelled migration"]:
+        """
+        Cancel the running migration of a collection, the worker running it
+        stops after its current batch
+
+        Args:
+            collection_name (str): Logical collection name
+
+        Returns:
+            Optional[MigrationState]: Cancelled migration, None if no
+                migration was running
+        """
+        state = self.get_migration(collection_name)
+        if state is None or state.status != "running":
+            return None
+        state.status = "cancelled"
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                """
+                UPDATE migrations SET status = ?, state = ?
+                WHERE name = ? AND target = ? AND status = 'running'
+                """,
+                (state.status, state.model_dump_json(), collection_name, state.target),
+            )
+        return state if cursor.rowcount else None
+
+
+class DualWriteVectorStore:
+    """
+    Vector store writing to the collection serving reads and to the shadow
+    collection of its running migration
+
+    Writes to the shadow collection are best effort, the migration copies the
+    documents it misses before swapping.
+
+    Attributes:
+        primary (VectorStore): Collection serving reads
+        shadow (VectorStore): Shadow collection, with the new embeddings model
+    """
+
+    def __init__(
+        self,
+        primary: Annotated[VectorStore, "Collection serving reads"],
+        shadow: Annotated[VectorStore, "Shadow collection"],
+    ) -> None:
+        """
+        Write to both collections
+
+        Args:
+            primary (VectorStore): Collection serving reads
+            shadow (VectorStore): Shadow collection, with the new embeddings
+                model
+        """
+        self.primary = primary
+        self.shadow = shadow
+
+    def add_documents(
+        self,
+        documents: Annotated[list[str], "List of documents"],
+        reference_id: Annotated[Optional[str], "Reference ID"] = None,
+        metadata: Annotated[Optional[dict], "Metadata of the documents"] = None,
+    ) -> Annotated[list[str], "List of document IDs"]:
+        """
+        Add documents to both collections, with the same IDs and parent
+
+        Args:
+            documents (list[str]): List of documents
+            reference_id (str): Reference id
+            metadata (dict): Metadata of the documents
+
+        Returns:
+            list[str]: List of document IDs
+        """
+        parent_id = nanoid.generate()
+        ids = self.primary.add_documents(
+            documents, reference_id=reference_id, metadata=metadata, parent_id=parent_id
+        )
+        try:
+            self.shadow.add_documents(
+                documents,
+                reference_id=reference_id,
+                metadata=metadata,
+                ids=ids,
+                parent_id=parent_id,
+            )
+        except Exception as e:
+            logger.warning("Write to %s failed: %s", self.shadow.collection.name, e)
+        return ids
+
+    def add_columns(
+        self,
+        contents: Annotated[list[str], "Contents of the documents"],
+        reference_ids: Annotated[
+            Optional[list[Optional[str]]],
+            "Reference ID of each document",
+        ] = None,
+        metadata: Annotated[
+            Optional[dict[str, list]],
+            "Metadata columns, one value per document",
+        ] = None,
+    ) -> Annotated[list[str], "List of document IDs"]:
+        """
+        Add documents given as columns to both collections, with the same IDs
+
+        Args:
+            contents (list[str]): Contents of the documents
+            reference_ids (list[str]): Reference ID of each document
+            metadata (dict[str, list]): Metadata columns, one value per
+                document
+
+        Returns:
+            list[str]: List of document IDs
+        """
+        parent_ids = [nanoid.generate() for _ in contents]
+        ids = self.primary.add_columns(
+            contents,
+            reference_ids=reference_ids,
+            metadata=metadata,
+            parent_ids=parent_ids,
+        )
+        try:
+            self.shadow.add_columns(
+                contents,
+                reference_ids=reference_ids,
+                metadata=metadata,
+                parent_ids=parent_ids,
+            )
+        except Exception as e:
+            logger.warning("Write to %s failed: %s", self.shadow.collection.name, e)
+        return ids
+
+    def delete_by_reference_id(
+        self,
+        reference_id: Annotated[str, "Reference ID"],
+    ) -> None:
+        """
+        Delete documents by reference_id from both collections
+
+        Args:
+            reference_id (str): Reference ID
+        """
+        self.primary.delete_by_reference_id(reference_id)
+        try:
+            self.shadow.delete_by_reference_id(reference_id)
+        except Exception as e:
+            logger.warning("Delete from %s failed: %s", self.shadow.collection.name, e)
+
+
+class EmbeddingMigration:
+    """
+    Re-embed a collection into a shadow collection with another embeddings
+    model, in throttled batches, then serve the collection from it
+
+    Reads keep using the source collection until the swap. Writes made during
+    the migration go to both collections through DualWriteVectorStore, and a
+    final pass copies the documents the paging missed and drops the ones
+    deleted meanwhile.
+
+    Attributes:
+        registry (CollectionRegistry): Collection registry
+        state (MigrationState): Progress of the migration
+        page_size (int): Documents read and embedded at once
+    """
+
+    def __init__(
+        self,
+        registry: Annotated[CollectionRegistry, "Collection registry"],
+        client: Annotated[chromadb.api.client.Client, "Chroma client"],
+        collection_name: Annotated[str, "Logical collection name"],
+        model_name: Annotated[str, "New embeddings model"],
+        embeddings: Annotated[chromadb.Embeddings, "New embeddings function"],
+        page_size: Annotated[int, "Documents embedded at once"] = 100,
+        rate: Annotated[Optional[float], "Documents embedded per second"] = None,
+    ) -> None:
+        """
+        Prepare the migration, nothing runs until start or run
+
+        Args:
+            registry (CollectionRegistry): Collection registry
+            client (chromadb.api.client.Client): Chroma client
+            collection_name (str): Logical collection name
+            model_name (str): New embeddings model
+            embeddings (chromadb.Embeddings): Embeddings function of the model
+            page_size (int): Documents read and embedded at once
+            rate (float): Documents embedded per second, None for no limit
+        """
+        source, source_model = registry.resolve(collection_name)
+        self.registry = registry
+        self.client = client
+        self.embeddings = embeddings
+        self.page_size = page_size
+        self.rate_limiter = (
+            TokenBucket(rate=rate, capacity=max(rate, page_size)) if rate else None
+        )
+        self.state = MigrationState(
+            collection_name=collection_name,
+            source=source,
+            source_model=source_model,
+            target=shadow_collection_name(collection_name, model_name),
+            model_name=model_name,
+        )
+        self._skipped = set()
+
+    def begin(self) -> Annotated[MigrationState, "Running migration"]:
+        """
+        Create the shadow collection and record the migration as running,
+        from then on writes to the collection also go to the shadow
+
+        Returns:
+            MigrationState: Running migration
+
+        Raises:
+            MigrationInProgressError: If the collection is already migrating
+            ValueError: If the collection does not exist or already uses the
+                model
+        """
+        if self.state.target == self.state.source:
+            raise ValueError(
+                f"Collection {self.state.collection_name} already uses"
+                f" {self.state.model_name}"
+            )
+        try:
+            source = self.client.get_collection(self.state.source)
+        except chromadb.errors.ChromaError as e:
+            raise ValueError(f"Collection {self.state.source} not found") from e
+        metadata = source.metadata or {}
+        self.source = VectorStore(
+            collection_name=self.state.source, client=self.client, embeddings=None
+        )
+        self.target = VectorStore(
+            collection_name=self.state.target,
+            client=self.client,
+            embeddings=self.embeddings,
+            index_params=HnswIndexParams.from_metadata(metadata),
+            metadata={
+                key: value
+                for key, value in metadata.items()
+                if not key.startswith("hnsw:")
+            },
+        )
+        self.state.total = source.count()
+        self.registry.begin_migration(self.state)
+        return self.state
+
+    def start(self) -> Annotated[MigrationState, "Running migration"]:
+        """
+        Begin the migration and run it in a background thread
+
+        Returns:
+            MigrationState: Running migration
+        """
+        state = self.begin()
+        threading.Thread(
+            target=self.run, name=f"migration-{state.collection_name}", daemon=True
+        ).start()
+        return state
+
+    def run(self) -> Annotated[MigrationState, "Final state"]:
+        """
+        Copy every document, reconcile and swap, begin must have been called
+
+        Returns:
+            MigrationState: Final state of the migration
+        """
+        try:
+            offset = 0
+            while True:
+                page = self.source.collection.get(
+                    limit=self.page_size,
+                    offset=offset,
+                    include=["documents", "metadatas"],
+                )
+                self._copy(page["ids"], page["documents"], page["metadatas"])
+                offset += len(page["ids"])
+                if not self.registry.update_migration(self.state):
+                    return self._stopped()
+                if len(page["ids"]) < self.page_size:
+                    break
+            self._reconcile()
+            self.state.status = "completed"
+            if not self.registry.update_migration(self.state, swap=True):
+                return self._stopped()
+        except Exception as e:
+            logger.error("Migration of %s failed: %s", self.state.collection_name, e)
+            self.state.status = "failed"
+            self.state.error = str(e)
+            self.registry.update_migration(self.state)
+        return self.state
+
+    def _stopped(self) -> MigrationState:
+        """
+        Reload the state of a migration cancelled or replaced elsewhere
+
+        Returns:
+            MigrationState: State recorded in the registry
+        """
+        return self.registry.get_migration(self.state.collection_name) or self.state
+
+    def _copy(
+        self,
+        ids: Annotated[list[str], "Document IDs"],
+        documents: Annotated[list[Optional[str]], "Documents"],
+        metadatas: Annotated[list[Optional[dict]], "Metadata of the documents"],
+    ) -> None:
+        """
+        Re-embed documents into the shadow collection, keeping their IDs
+
+        Args:
+            ids (list[str]): Document IDs
+            documents (list[Optional[str]]): Documents, None when the text was
+                not stored
+            metadatas (list[Optional[dict]]): Metadata of the documents
+        """
+        rows = [
+            (id, document, metadata)
+            for id, document, metadata in zip(ids, documents, metadatas)
+            if document is not None
+        ]
+        self._skipped.update(
+            id for id, document in zip(ids, documents) if document is None
+        )
+        self.state.skipped = len(self._skipped)
+        if len(rows) == 0:
+            return
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(len(rows))
+        self.target.collection.upsert(
+            ids=[id for id, _, _ in rows],
+            documents=[document for _, document, _ in rows],
+            metadatas=[metadata or None for _, _, metadata in rows],
+            embeddings=list(self.target.embed([document for _, document, _ in rows])),
+        )
+        self.state.migrated += len(rows)
+
+    def _ids(
+        self,
+        vector_store: Annotated[VectorStore, "Vector store"],
+    ) -> Annotated[set[str], "Document IDs"]:
+        """
+        Read every document ID of a collection, page by page
+
+        Args:
+            vector_store (VectorStore): Vector store
+
+        Returns:
+            set[str]: Document IDs
+        """
+        ids = set()
+        while True:
+            page = vector_store.collection.get(
+                limit=self.page_size * 10, offset=len(ids), include=[]
+            )
+            ids.update(page["ids"])
+            if len(page["ids"]) < self.page_size * 10:
+                return ids
+
+    def _reconcile(self) -> None:
+        """
+        Copy the documents the paging missed and delete the ones deleted
+        from the source since they were copied
+
+        The shadow IDs are read first, so a document written to both
+        collections in between is copied again rather than deleted.
+        """
+        target_ids = self._ids(self.target)
+        source_ids = self._ids(self.source)
+        extra = list(target_ids - source_ids)
+        missing = list(source_ids - target_ids - self._skipped)
+        for batch in chunks(extra, self.page_size):
+            self.target.collection.delete(ids=batch)
+        for batch in chunks(missing, self.page_size):
+            page = self.source.collection.get(
+                ids=batch, include=["documents", "metadatas"]
+            )
+            self._copy(page["ids"], page["documents"], page["metadatas"])
+
+
+class CollectionRouter:
+    """
+    Open the collection serving a logical collection name, with the
+    embeddings model it was built with
+
+    Attributes:
+        registry (CollectionRegistry): Collection registry
+        embeddings_for (Callable[[str], chromadb.Embeddings]): Embeddings
+            function of a model
+        quantized_indexes (QuantizedIndexes): Quantized indexes of the
+            collections that enable quantization
+    """
+
+    def __init__(
+        self,
+        registry: Annotated[CollectionRegistry, "Collection registry"],
+        embeddings_for: Annotated[
+            Callable[[str], chromadb.Embeddings],
+            "Embeddings function of a model",
+        ],
+        quantized_indexes: Annotated[
+            Optional[QuantizedIndexes],
+            "Quantized indexes of the collections that enable quantization",
+        ] = None,
+    ) -> None:
+        """
+        Route collections through a registry
+
+        Args:
+            registry (CollectionRegistry): Collection registry
+            embeddings_for (Callable[[str], chromadb.Embeddings]): Embeddings
+                function of a model
+            quantized_indexes (QuantizedIndexes): Quantized indexes of the
+                collections that enable quantization, none when not set
+        """
+        self.registry = registry
+        self.embeddings_for = embeddings_for
+        self.quantized_indexes = quantized_indexes
+
+    def open(
+        self,
+        collection_name: Annotated[str, "Logical collection name"],
+        client: Annotated[chromadb.api.client.Client, "Chroma client"],
+        embeddings: Annotated[
+            Optional[chromadb.Embeddings],
+            "Embeddings function of the default model",
+        ] = None,
+        index_params: Annotated[
+            Optional[HnswIndexParams],
+            "HNSW index parameters, used when the collection is created",
+        ] = None,
+        single_flight: Annotated[
+            Optional[SingleFlight],
+            "Coalesces identical concurrent searches",
+        ] = None,
+        query_cache: Annotated[
+            Optional[QueryCache],
+            "Cache of search results",
+        ] = None,
+        write: Annotated[bool, "Whether the store is written to"] = False,
+    ) -> Annotated[
+        Union[VectorStore, DualWriteVectorStore],
+        "Vector store of the collection",
+    ]:
+        """
+        Open the collection serving a logical collection name
+
+        Args:
+            collection_name (str): Logical collection name
+            client (chromadb.api.client.Client): Chroma client
+            embeddings (chromadb.Embeddings): Embeddings function of the
+                default model, used unless the collection was migrated
+            index_params (HnswIndexParams): HNSW index parameters, used when
+                the collection is created
+            single_flight (SingleFlight): Coalesces identical concurrent
+                searches
+            query_cache (QueryCache): Cache of search results
+            write (bool): Also write to the shadow collection of a running
+                migration
+
+        Returns:
+            Union[VectorStore, DualWriteVectorStore]: Vector store of the
+                collection
+        """
+        name, model_name = self.registry.resolve(collection_name)
+        vector_store = VectorStore(
+            collection_name=name,
+            client=client,
+            embeddings=(
+                embeddings
+                if model_name == self.registry.default_model
+                else self.embeddings_for(model_name)
+            ),
+            index_params=index_params,
+            single_flight=single_flight,
+            query_cache=query_cache,
+            quantized_indexes=self.quantized_indexes,
+        )
+        if not write:
+            return vector_store
+        migration = self.registry.get_migration(collection_name)
+        if migration is None or migration.status != "running":
+            return vector_store
+        return DualWriteVectorStore(
+            vector_store,
+            VectorStore(
+                collection_name=migration.target,
+                client=client,
+                embeddings=self.embeddings_for(migration.model_name),
+            ),
+        )
+
+    def start_migration(
+        self,
+        collection_name: Annotated[str, "Logical collection name"],
+        client: Annotated[chromadb.api.client.Client, "Chroma client"],
+        model_name: Annotated[str, "New embeddings model"],
+        page_size: Annotated[int, "Documents embedded at once"] = 100,
+        rate: Annotated[Optional[float], "Documents embedded per second"] = None,
+    ) -> Annotated[MigrationState, "Running migration"]:
+        """
+        Start migrating a collection to another embeddings model in the
+        background
+
+        Args:
+            collection_name (str): Logical collection name
+            client (chromadb.api.client.Client): Chroma client
+            model_name (str): New embeddings model
+            page_size (int): Documents read and embedded at once
+            rate (float): Documents embedded per second, None for no limit
+
+        Returns:
+            MigrationState: Running migration
+        """
+        return EmbeddingMigration(
+            self.registry,
+            client,
+            collection_name,
+            model_name,
+            self.embeddings_for(model_name),
+            page_size=page_size,
+            rate=rate,
+        ).start()
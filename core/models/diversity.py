@@ -0,0 +1,55 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class DiversityParams(BaseModel):
+    """
+    Diversification of similarity search results
+
+    Attributes:
+        mmr_lambda (float): Trade-off of maximal marginal relevance between
+            relevance (1) and diversity (0), None to keep the relevance order
+        max_per_reference (int): Maximum documents of one reference ID
+        fetch_k (int): Candidates fetched before selecting the results
+    """
+
+    model_config = {
+        "title": "Diversity Parameters",
+        "strict": True,
+    }
+    mmr_lambda: Optional[float] = Field(
+        None,
+        title="MMR lambda",
+        description=(
+            "Trade-off of maximal marginal relevance between relevance (1) and"
+            " diversity (0), the relevance order is kept when not set"
+        ),
+        examples=[0.5],
+        ge=0,
+        le=1,
+    )
+    max_per_reference: Optional[int] = Field(
+        None,
+        title="Maximum per reference",
+        description="Maximum documents of one reference ID",
+        examples=[2],
+        gt=0,
+    )
+    fetch_k: Optional[int] = Field(
+        None,
+        title="Fetch k",
+        description="Candidates fetched before selecting, 4 times k when not set",
+        examples=[40],
+        gt=0,
+    )
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the results are diversified at all
+
+        Returns:
+            bool: True if MMR or a per-reference cap is set
+        """
+        return self.mmr_lambda is not None or self.max_per_reference is not None
@@ -1,10 +1,17 @@
-from pydantic import BaseModel, Field
+from typing import Optional, Union
+
+from pydantic import BaseModel, Field, StrictBool, StrictFloat, StrictInt, StrictStr
+
+MetadataValue = Union[StrictStr, StrictInt, StrictFloat, StrictBool]
 
 
 class DocumentMetadata(BaseModel):
     """
     Metadata for Document with Score
 
+    Any other field is kept as typed metadata, its value must be a string,
+    an integer, a float or a boolean so it can be filtered on in Chroma.
+
     Attributes:
         reference_id (str): Reference ID
     """
@@ -12,9 +19,11 @@ class DocumentMetadata(BaseModel):
     model_config = {
         "title": "Document with Score Metadata",
         "strict": True,
+        "extra": "allow",
     }
-    reference_id: str = Field(
-        ...,
+    __pydantic_extra__: dict[str, MetadataValue]
+    reference_id: Optional[str] = Field(
+        None,
         title="Reference ID",
         description="Reference ID",
         examples=["1"],
@@ -26,6 +35,7 @@ class Document(BaseModel):
     Document with Score
 
     Attributes:
+        id (str): Document ID, set on documents read from the vector store
         page_content (str): Page content
         metadata (DocumentWithScoreMetadata): Metadata
         score (float): Score
@@ -35,6 +45,12 @@ class Document(BaseModel):
         "title": "Document with Score",
         "strict": True,
     }
+    id: Optional[str] = Field(
+        None,
+        title="ID",
+        description="Document ID, set on documents read from the vector store",
+        examples=["Uj9uY4N41cpSZb0MHBY_w"],
+    )
     page_content: str = Field(
         ...,
         title="Page content",
@@ -63,6 +79,9 @@ class DocumentWithScore(Document):
     score: float = Field(
         ...,
         title="Score",
-        description="Score",
+        description=(
+            "Similarity score, higher is more similar: cosine similarity, inner"
+            " product, or 1 / (1 + squared L2 distance) by distance space"
+        ),
         examples=[0.99],
     )
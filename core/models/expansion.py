@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+
+
+class ExpansionParams(BaseModel):
+    """
+    Expansion of search hits into their neighbouring chunks or parent document
+
+    Attributes:
+        window (int): Neighbouring chunks added on each side of a hit
+        parent (bool): Replace each hit by its whole parent document
+    """
+
+    model_config = {
+        "title": "Expansion Parameters",
+        "strict": True,
+    }
+    window: int = Field(
+        0,
+        title="Window",
+        description="Neighbouring chunks added on each side of a hit",
+        examples=[1],
+        ge=0,
+    )
+    parent: bool = Field(
+        False,
+        title="Parent",
+        description="Replace each hit by its whole parent document",
+    )
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether the hits are expanded at all
+
+        Returns:
+            bool: True if a window or the parent is requested
+        """
+        return self.window > 0 or self.parent
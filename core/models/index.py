@@ -0,0 +1,111 @@
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+#: Collection metadata key of the quantization setting, outside the "hnsw:"
+#: keys Chroma reads
+QUANTIZATION_KEY = "quantization"
+
+
+class HnswIndexParams(BaseModel):
+    """
+    HNSW index parameters of a collection
+
+    Attributes:
+        space (str): Distance space
+        M (int): Maximum number of neighbours of each node
+        construction_ef (int): Size of the candidate list while building
+        search_ef (int): Default size of the candidate list while searching
+        num_threads (int): Threads used to build the index
+        quantization (str): Quantized codes searched before rescoring with
+            the full-precision vectors, None to search the HNSW index only
+    """
+
+    model_config = {
+        "title": "HNSW Index Parameters",
+        "strict": True,
+    }
+    space: Literal["cosine", "l2", "ip"] = Field(
+        "cosine",
+        title="Distance space",
+        description="Distance space",
+        examples=["cosine"],
+    )
+    M: Optional[int] = Field(
+        None,
+        title="M",
+        description="Maximum number of neighbours of each node",
+        examples=[16],
+        gt=0,
+    )
+    construction_ef: Optional[int] = Field(
+        None,
+        title="Construction ef",
+        description="Size of the candidate list while building the index",
+        examples=[100],
+        gt=0,
+    )
+    search_ef: Optional[int] = Field(
+        None,
+        title="Search ef",
+        description="Default size of the candidate list while searching",
+        examples=[10],
+        gt=0,
+    )
+    num_threads: Optional[int] = Field(
+        None,
+        title="Number of threads",
+        description="Threads used to build the index",
+        examples=[4],
+        gt=0,
+    )
+    quantization: Optional[Literal["int8", "pq"]] = Field(
+        None,
+        title="Quantization",
+        description=(
+            "Quantized codes searched before rescoring the best candidates"
+            " with the full-precision vectors, instead of the HNSW index"
+        ),
+        examples=["int8"],
+    )
+
+    def to_metadata(self) -> dict:
+        """
+        Convert to Chroma collection metadata
+
+        Returns:
+            dict: Collection metadata with the "hnsw:" keys that are set, and
+                the quantization setting when set
+        """
+        metadata = {
+            f"hnsw:{key}": value
+            for key, value in self.model_dump(exclude={"quantization"}).items()
+            if value is not None
+        }
+        if self.quantization is not None:
+            metadata[QUANTIZATION_KEY] = self.quantization
+        return metadata
+
+    @classmethod
+    def from_metadata(
+        cls,
+        metadata: Optional[dict],
+    ) -> "HnswIndexParams":
+        """
+        Read the index parameters from Chroma collection metadata
+
+        Args:
+            metadata (dict): Collection metadata
+
+        Returns:
+            HnswIndexParams: Index parameters, defaults for the missing keys
+        """
+        metadata = metadata or {}
+        return cls(
+            **{
+                key: metadata[f"hnsw:{key}"]
+                for key in cls.model_fields
+                if f"hnsw:{key}" in metadata
+            },
+            quantization=metadata.get(QUANTIZATION_KEY),
+        )
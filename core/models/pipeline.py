@@ -0,0 +1,93 @@
+from pydantic import BaseModel, Field
+
+from core.models.documents import DocumentWithScore
+
+
+class PipelineDeadlines(BaseModel):
+    """
+    Deadlines of the stages of the RAG pipeline, in seconds from its start
+
+    Attributes:
+        retrieval (float): Searches still running are dropped
+        rerank (float): Reranks still running are dropped and generation
+            starts with the context ranked so far
+    """
+
+    model_config = {
+        "title": "Pipeline Deadlines",
+        "strict": True,
+    }
+    retrieval: float = Field(
+        1.0,
+        title="Retrieval deadline",
+        description="Seconds after which searches still running are dropped",
+        examples=[1.0],
+        gt=0,
+    )
+    rerank: float = Field(
+        2.0,
+        title="Rerank deadline",
+        description=(
+            "Seconds after which reranks still running are dropped and generation"
+            " starts with the context ranked so far"
+        ),
+        examples=[2.0],
+        gt=0,
+    )
+
+
+class PipelineResult(BaseModel):
+    """
+    Answer of the RAG pipeline
+
+    Attributes:
+        answer (str): Answer of the chat model
+        documents (list[DocumentWithScore]): Context of the answer, by rerank
+            score
+        skipped_sources (list[str]): Sources dropped at a deadline or failed
+        speculative (bool): Whether the answer was generated before every
+            source was reranked
+        timings (dict[str, float]): Seconds from the start to the first
+            reranked candidates, the final context and the answer
+    """
+
+    model_config = {
+        "title": "Pipeline Result",
+    }
+    answer: str = Field(
+        ...,
+        title="Answer",
+        description="Answer of the chat model",
+        examples=["Hoang Sa and Truong Sa belong to Vietnam."],
+    )
+    documents: list[DocumentWithScore] = Field(
+        ...,
+        title="Documents",
+        description="Context of the answer, by rerank score",
+    )
+    skipped_sources: list[str] = Field(
+        default_factory=list,
+        title="Skipped sources",
+        description=(
+            "Searches and reranks dropped at their deadline or failed, the answer"
+            " is based on partial results when not empty"
+        ),
+        examples=[["geography/vector"]],
+    )
+    speculative: bool = Field(
+        False,
+        title="Speculative",
+        description=(
+            "Whether the answer was generated before every source was reranked,"
+            " from a context the remaining sources did not change"
+        ),
+    )
+    timings: dict[str, float] = Field(
+        default_factory=dict,
+        title="Timings",
+        description=(
+            "Seconds from the start to the first reranked candidates, the final"
+            " context and the answer"
+        ),
+        examples=[{"first_candidates": 0.21, "context": 0.48, "answer": 1.9}],
+    )
@@ -0,0 +1,379 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from logging import getLogger
+from typing import Annotated, Any, Optional
+
+from core.chat_llm import ChatInput, ChatLLM
+from core.models.chat import ChatMessage, ChatMessageRole
+from core.models.documents import Document, DocumentWithScore
+from core.models.pipeline import PipelineDeadlines, PipelineResult
+from core.rerank import Rerank
+from core.resilience import TokenBucket
+from core.vector_store import VectorStore
+
+logger = getLogger(__name__)
+
+#: Rate limit tokens required to speculate, one for the speculative answer and
+#: one for the answer generated again when it is discarded
+SPECULATION_MIN_TOKENS = 2
+
+CONTEXT_PROMPT = (
+    "Answer the question with the following documents. Say so when they do not"
+    " contain the answer."
+)
+
+
+def document_key(
+    document: Annotated[Document, "Document"],
+) -> Annotated[str, "Key of the document"]:
+    """
+    Key identifying a document across the sources
+
+    Args:
+        document (Document): Document
+
+    Returns:
+        str: Document ID, or its content when it has no ID
+    """
+    return document.id or document.page_content
+
+
+def format_context(
+    documents: Annotated[list[Document], "Context documents"],
+) -> Annotated[str, "System message with the context"]:
+    """
+    Format the context documents as a numbered list after the instructions
+
+    Args:
+        documents (list[Document]): Context documents
+
+    Returns:
+        str: System message with the context
+    """
+    return "\n\n".join(
+        [
+            CONTEXT_PROMPT,
+            *(
+                f"[{i}] {document.page_content}"
+                for i, document in enumerate(documents, start=1)
+            ),
+        ]
+    )
+
+
+class RAGPipeline:
+    """
+    Retrieve, rerank and generate with overlapping stages
+
+    The query is embedded once per embeddings function while the lexical
+    lookups run. Each collection is searched as soon as its embedding is
+    ready, and each candidate set is reranked as soon as it arrives, without
+    the candidates already sent to the reranker. Sources still running at
+    their deadline are dropped and the answer is based on partial results.
+
+    When speculating, generation starts as soon as `top_n` documents are
+    reranked. The speculative answer is kept if the remaining sources do not
+    change the top `top_n`, otherwise it is discarded and the answer is
+    generated again from the final context. At most one speculative answer
+    is generated per run, so a discarded speculation costs one extra chat
+    call and one chat rate limit token. Speculation is skipped while the
+    rate limiter has fewer than SPECULATION_MIN_TOKENS tokens.
+
+    Attributes:
+        vector_stores (list[VectorStore]): Collections searched
+        rerank (Rerank): Reranks the candidates of each source
+        chat_llm (ChatLLM): Generates the answer
+        k (int): Candidates retrieved per source
+        top_n (int): Documents in the context of the answer
+        lexical (bool): Whether the collections are also searched by keyword
+        speculate (bool): Whether generation starts before every source is
+            reranked
+        deadlines (PipelineDeadlines): Deadlines of the stages
+        rate_limiter (TokenBucket): Rate limiter of the chat model
+    """
+
+    def __init__(
+        self,
+        vector_stores: Annotated[list[VectorStore], "Collections searched"],
+        rerank: Annotated[Rerank, "Reranks the candidates of each source"],
+        chat_llm: Annotated[ChatLLM, "Generates the answer"],
+        k: Annotated[int, "Candidates retrieved per source"] = 10,
+        top_n: Annotated[int, "Documents in the context of the answer"] = 3,
+        lexical: Annotated[bool, "Also search the collections by keyword"] = True,
+        speculate: Annotated[bool, "Start generation before every rerank"] = True,
+        deadlines: Annotated[
+            Optional[PipelineDeadlines],
+            "Deadlines of the stages",
+        ] = None,
+        rate_limiter: Annotated[
+            Optional[TokenBucket],
+            "Rate limiter of the chat model",
+        ] = None,
+    ) -> None:
+        """
+        Create a pipeline
+
+        Args:
+            vector_stores (list[VectorStore]): Collections searched
+            rerank (Rerank): Reranks the candidates of each source
+            chat_llm (ChatLLM): Generates the answer
+            k (int): Candidates retrieved per source
+            top_n (int): Documents in the context of the answer
+            lexical (bool): Also search the collections by keyword
+            speculate (bool): Start generation as soon as `top_n` documents
+                are reranked. A speculative answer discarded because the
+                context changed still runs to completion, so it costs one
+                extra chat call and rate limit token, at most once per run
+            deadlines (PipelineDeadlines): Deadlines of the stages, the
+                defaults when not set
+            rate_limiter (TokenBucket): Rate limiter of the chat model, only
+                speculate while it has SPECULATION_MIN_TOKENS tokens
+        """
+        if k < 1 or top_n < 1:
+            raise ValueError("k and top_n must be positive")
+        self.vector_stores = vector_stores
+        self.rerank = rerank
+        self.chat_llm = chat_llm
+        self.k = k
+        self.top_n = top_n
+        self.lexical = lexical
+        self.speculate = speculate
+        self.deadlines = deadlines or PipelineDeadlines()
+        self.rate_limiter = rate_limiter
+
+    def run(
+        self,
+        query: Annotated[str, "Question"],
+        messages: Annotated[
+            Optional[list[ChatMessage]],
+            "Earlier messages of the conversation",
+        ] = None,
+        reference_id: Annotated[Optional[str], "Reference ID"] = None,
+        where: Annotated[Optional[dict], "Metadata filter expression"] = None,
+    ) -> Annotated[PipelineResult, "Answer and its context"]:
+        """
+        Answer a question from the documents of the collections
+
+        Args:
+            query (str): Question
+            messages (list[ChatMessage]): Earlier messages of the conversation
+            reference_id (str): Reference ID the documents belong to
+            where (dict): Metadata filter expression of the documents
+
+        Returns:
+            PipelineResult: Answer, its context, the skipped sources and the
+                timings of the stages
+        """
+        start = time.monotonic()
+        embedders = {}
+        for vector_store in self.vector_stores:
+            embedders.setdefault(id(vector_store.embeddings), vector_store)
+        sources = len(self.vector_stores) * (2 if self.lexical else 1)
+        # One thread per task, so no task waits behind a straggler
+        executor = ThreadPoolExecutor(max_workers=len(embedders) + 2 * sources + 2)
+        try:
+            embeddings = {
+                key: executor.submit(vector_store.embed, [query])
+                for key, vector_store in embedders.items()
+            }
+            searches: dict[Future, str] = {}
+            for vector_store in self.vector_stores:
+                name = vector_store.collection.name
+                search = executor.submit(
+                    self._vector_search,
+                    vector_store,
+                    embeddings[id(vector_store.embeddings)],
+                    query,
+                    reference_id,
+                    where,
+                )
+                searches[search] = f"{name}/vector"
+                if self.lexical:
+                    search = executor.submit(
+                        vector_store.keyword_search,
+                        query,
+                        reference_id=reference_id,
+                        k=self.k,
+                        where=where,
+                    )
+                    searches[search] = f"{name}/lexical"
+
+            reranks: dict[Future, str] = {}
+            ranked: dict[str, DocumentWithScore] = {}
+            sent: set[str] = set()
+            skipped: list[str] = []
+            timings: dict[str, float] = {}
+            speculation: Optional[tuple[list[str], Future]] = None
+            while searches or reranks:
+                now = time.monotonic() - start
+                if searches and now >= self.deadlines.retrieval:
+                    skipped.extend(searches.values())
+                    searches.clear()
+                if now >= self.deadlines.rerank:
+                    skipped.extend([*searches.values(), *reranks.values()])
+                    break
+                if not searches and not reranks:
+                    break
+                deadline = self.deadlines.rerank
+                if searches:
+                    deadline = min(deadline, self.deadlines.retrieval)
+                done, _ = wait(
+                    [*searches, *reranks],
+                    timeout=deadline - now,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    if future in searches:
+                        source = searches.pop(future)
+                        candidates = self._result(future, source, skipped)
+                        new = [
+                            document
+                            for document, _ in candidates or []
+                            if document_key(document) not in sent
+                        ]
+                        sent.update(document_key(document) for document in new)
+                        if len(new) > 0:
+                            rerank = executor.submit(
+                                self.rerank.rerank_documents, query, new
+                            )
+                            reranks[rerank] = source
+                        continue
+                    source = reranks.pop(future)
+                    for document in self._result(future, source, skipped) or []:
+                        ranked[document_key(document)] = document
+                    timings.setdefault("first_candidates", time.monotonic() - start)
+                    top = self._top(ranked)
+                    if (
+                        self.speculate
+                        and speculation is None
+                        and len(top) == self.top_n
+                        and (searches or reranks)
+                        and (
+                            self.rate_limiter is None
+                            or self.rate_limiter.tokens >= SPECULATION_MIN_TOKENS
+                        )
+                    ):
+                        speculation = (
+                            [document_key(document) for document in top],
+                            executor.submit(self.generate, query, top, messages),
+                        )
+
+            top = self._top(ranked)
+            timings["context"] = time.monotonic() - start
+            speculative = speculation is not None and speculation[0] == [
+                document_key(document) for document in top
+            ]
+            answer = (
+                speculation[1].result()
+                if speculative
+                else self.generate(query, top, messages)
+            )
+            timings["answer"] = time.monotonic() - start
+            return PipelineResult(
+                answer=answer,
+                documents=top,
+                skipped_sources=skipped,
+                speculative=speculative,
+                timings=timings,
+            )
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def generate(
+        self,
+        query: Annotated[str, "Question"],
+        documents: Annotated[list[Document], "Context documents"],
+        messages: Annotated[
+            Optional[list[ChatMessage]],
+            "Earlier messages of the conversation",
+        ] = None,
+    ) -> Annotated[str, "Answer"]:
+        """
+        Answer a question from context documents
+
+        Args:
+            query (str): Question
+            documents (list[Document]): Context documents
+            messages (list[ChatMessage]): Earlier messages of the conversation
+
+        Returns:
+            str: Answer
+        """
+        return self.chat_llm.chat(
+            ChatInput(
+                messages=[
+                    ChatMessage(
+                        role=ChatMessageRole.System,
+                        content=format_context(documents),
+                    ),
+                    *(messages or []),
+                    ChatMessage(role=ChatMessageRole.Human, content=query),
+                ]
+            )
+        )
+
+    def _vector_search(
+        self,
+        vector_store: VectorStore,
+        embedding: Future,
+        query: str,
+        reference_id: Optional[str],
+        where: Optional[dict],
+    ) -> list[tuple[Document, float]]:
+        """
+        Search a collection once the query is embedded
+
+        Args:
+            vector_store (VectorStore): Collection searched
+            embedding (Future): Embedding of the query, a one row matrix
+            query (str): Question
+            reference_id (str): Reference ID
+            where (dict): Metadata filter expression
+
+        Returns:
+            list[tuple[Document, float]]: Documents and their similarity scores
+        """
+        return vector_store.similarity_search(
+            query=query,
+            query_embedding=embedding.result()[0],
+            reference_id=reference_id,
+            k=self.k,
+            where=where,
+        )
+
+    def _top(
+        self,
+        ranked: dict[str, DocumentWithScore],
+    ) -> list[DocumentWithScore]:
+        """
+        Best reranked documents
+
+        Args:
+            ranked (dict[str, DocumentWithScore]): Reranked documents by key
+
+        Returns:
+            list[DocumentWithScore]: Top `top_n` documents, best first
+        """
+        return sorted(
+            ranked.values(), key=lambda document: document.score, reverse=True
+        )[: self.top_n]
+
+    @staticmethod
+    def _result(future: Future, source: str, skipped: list[str]) -> Optional[Any]:
+        """
+        Result of a finished stage, None when it failed
+
+        Args:
+            future (Future): Finished stage
+            source (str): Source of the stage
+            skipped (list[str]): Skipped sources, the source is added on failure
+
+        Returns:
+            Optional[Any]: Result of the stage, None when it failed
+        """
+        try:
+            return future.result()
+        except Exception as e:
+            logger.warning("%s failed: %s", source, e)
+            skipped.append(source)
+            return None
@@ -0,0 +1,1251 @@
+import io
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Annotated, Optional, Sequence, Tuple
+
+import chromadb
+import numpy as np
+from pydantic import BaseModel, Field
+
+from core.cache import connect
+from core.evaluation import exact_top_k, latency_summary, recall_at_k
+from core.models.index import QUANTIZATION_KEY
+from core.scoring import distances
+
+if TYPE_CHECKING:
+    from core.vector_store import VectorStore
+
+
+class Quantizer(ABC):
+    """
+    Compress float32 vectors into compact codes
+
+    Attributes:
+        name (str): Name of the quantization setting
+    """
+
+    name: str = "none"
+
+    #: Type of the codes
+    code_dtype: type = np.uint8
+
+    #: Number of vectors decoded at once when computing distances
+    chunk_size: int = 4096
+
+    @property
+    @abstractmethod
+    def dimensions(self) -> Annotated[int, "Dimensions of the vectors"]:
+        """
+        Dimensions of the vectors the quantizer was fit on
+
+        Returns:
+            int: Dimensions of the vectors
+        """
+
+    @abstractmethod
+    def get_state(self) -> Annotated[dict[str, np.ndarray], "Fitted parameters"]:
+        """
+        Fitted parameters of the quantizer
+
+        Returns:
+            dict[str, np.ndarray]: Fitted parameters by name
+        """
+
+    @abstractmethod
+    def set_state(
+        self,
+        state: Annotated[dict[str, np.ndarray], "Fitted parameters"],
+    ) -> "Quantizer":
+        """
+        Restore fitted parameters saved by `get_state`
+
+        Args:
+            state (dict[str, np.ndarray]): Fitted parameters by name
+
+        Returns:
+            Quantizer: The fitted quantizer
+        """
+
+    def to_bytes(self) -> Annotated[bytes, "Fitted parameters as npz"]:
+        """
+        Serialize the fitted parameters
+
+        Returns:
+            bytes: Fitted parameters in the npz format
+        """
+        buffer = io.BytesIO()
+        np.savez(buffer, **self.get_state())
+        return buffer.getvalue()
+
+    def load_bytes(
+        self,
+        data: Annotated[bytes, "Fitted parameters as npz"],
+    ) -> "Quantizer":
+        """
+        Restore fitted parameters serialized by `to_bytes`
+
+        Args:
+            data (bytes): Fitted parameters in the npz format
+
+        Returns:
+            Quantizer: The fitted quantizer
+        """
+        with np.load(io.BytesIO(data), allow_pickle=False) as state:
+            return self.set_state({key: state[key] for key in state.files})
+
+    @abstractmethod
+    def fit(
+        self,
+        vectors: Annotated[np.ndarray, "Training vectors"],
+    ) -> "Quantizer":
+        """
+        Learn the quantization parameters from training vectors
+
+        Args:
+            vectors (np.ndarray): Training vectors, one per row
+
+        Returns:
+            Quantizer: The fitted quantizer
+        """
+
+    @abstractmethod
+    def encode(
+        self,
+        vectors: Annotated[np.ndarray, "Vectors to encode"],
+    ) -> Annotated[np.ndarray, "Codes"]:
+        """
+        Encode vectors into codes
+
+        Args:
+            vectors (np.ndarray): Vectors to encode, one per row
+
+        Returns:
+            np.ndarray: Codes, one row per vector
+        """
+
+    @abstractmethod
+    def decode(
+        self,
+        codes: Annotated[np.ndarray, "Codes"],
+    ) -> Annotated[np.ndarray, "Approximate vectors"]:
+        """
+        Reconstruct approximate float32 vectors from codes
+
+        Args:
+            codes (np.ndarray): Codes, one row per vector
+
+        Returns:
+            np.ndarray: Approximate vectors, one per row
+        """
+
+    def distances(
+        self,
+        query: Annotated[np.ndarray, "Query vector"],
+        codes: Annotated[np.ndarray, "Codes"],
+        space: Annotated[str, "Distance space"] = "cosine",
+    ) -> Annotated[np.ndarray, "Approximate distances"]:
+        """
+        Approximate distances from the query to each encoded vector
+
+        Codes are decoded in chunks so the full float32 matrix is never
+        materialized.
+
+        Args:
+            query (np.ndarray): Query vector
+            codes (np.ndarray): Codes, one row per vector
+            space (str): Distance space
+
+        Returns:
+            np.ndarray: Approximate distances
+        """
+        result = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), self.chunk_size):
+            chunk = self.decode(codes[start : start + self.chunk_size])
+            result[start : start + len(chunk)] = distances(query, chunk, space)
+        return result
+
+
+class ScalarQuantizer(Quantizer):
+    """
+    int8 scalar quantization, one byte per dimension
+
+    Each dimension is scaled from its observed [min, max] range to [-128, 127].
+    """
+
+    name = "int8"
+    code_dtype = np.int8
+
+    def __init__(self) -> None:
+        """Create an int8 scalar quantizer"""
+        self.offset: Optional[np.ndarray] = None
+        self.scale: Optional[np.ndarray] = None
+
+    @property
+    def dimensions(self) -> int:
+        """
+        Dimensions of the vectors the quantizer was fit on
+
+        Returns:
+            int: Dimensions of the vectors
+        """
+        return len(self.offset)
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """
+        Offset and scale of each dimension
+
+        Returns:
+            dict[str, np.ndarray]: Offset and scale
+        """
+        return {"offset": self.offset, "scale": self.scale}
+
+    def set_state(self, state: dict[str, np.ndarray]) -> "ScalarQuantizer":
+        """
+        Restore the offset and scale of each dimension
+
+        Args:
+            state (dict[str, np.ndarray]): Offset and scale
+
+        Returns:
+            ScalarQuantizer: The fitted quantizer
+        """
+        self.offset = np.asarray(state["offset"], dtype=np.float32)
+        self.scale = np.asarray(state["scale"], dtype=np.float32)
+        return self
+
+    def fit(self, vectors: np.ndarray) -> "ScalarQuantizer":
+        """
+        Learn the range of each dimension
+
+        Args:
+            vectors (np.ndarray): Training vectors, one per row
+
+        Returns:
+            ScalarQuantizer: The fitted quantizer
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        low = vectors.min(axis=0)
+        high = vectors.max(axis=0)
+        self.scale = np.maximum(high - low, 1e-12) / 255.0
+        self.offset = low + 128.0 * self.scale
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Encode vectors into int8 codes
+
+        Args:
+            vectors (np.ndarray): Vectors to encode, one per row
+
+        Returns:
+            np.ndarray: int8 codes
+        """
+        scaled = (np.asarray(vectors, dtype=np.float32) - self.offset) / self.scale
+        return np.clip(np.rint(scaled), -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Reconstruct vectors from int8 codes
+
+        Args:
+            codes (np.ndarray): int8 codes
+
+        Returns:
+            np.ndarray: Approximate vectors
+        """
+        return codes.astype(np.float32) * self.scale + self.offset
+
+
+class ProductQuantizer(Quantizer):
+    """
+    Product quantization
+
+    Vectors are split into `subspaces` slices and each slice is replaced by the
+    index of its nearest centroid, so a vector costs `subspaces` bytes.
+    """
+
+    name = "pq"
+
+    def __init__(
+        self,
+        subspaces: Annotated[int, "Number of subspaces"] = 8,
+        centroids: Annotated[int, "Centroids per subspace, at most 256"] = 256,
+        iterations: Annotated[int, "k-means iterations"] = 20,
+        seed: Annotated[int, "Random seed"] = 0,
+    ) -> None:
+        """
+        Create a product quantizer
+
+        Args:
+            subspaces (int): Number of subspaces, must divide the dimensions
+            centroids (int): Centroids per subspace, at most 256
+            iterations (int): k-means iterations
+            seed (int): Random seed
+        """
+        if not 0 < centroids <= 256:
+            raise ValueError("centroids must be between 1 and 256")
+        self.subspaces = subspaces
+        self.centroids = centroids
+        self.iterations = iterations
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None
+
+    @property
+    def dimensions(self) -> int:
+        """
+        Dimensions of the vectors the quantizer was fit on
+
+        Returns:
+            int: Dimensions of the vectors
+        """
+        return self.codebooks.shape[0] * self.codebooks.shape[2]
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        """
+        Codebook of each subspace
+
+        Returns:
+            dict[str, np.ndarray]: Codebooks of shape (subspaces, centroids,
+                dimensions / subspaces)
+        """
+        return {"codebooks": self.codebooks}
+
+    def set_state(self, state: dict[str, np.ndarray]) -> "ProductQuantizer":
+        """
+        Restore the codebooks, with their number of subspaces and centroids
+
+        Args:
+            state (dict[str, np.ndarray]): Codebooks
+
+        Returns:
+            ProductQuantizer: The fitted quantizer
+        """
+        self.codebooks = np.asarray(state["codebooks"], dtype=np.float32)
+        self.subspaces, self.centroids = self.codebooks.shape[:2]
+        return self
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Split vectors into subspaces
+
+        Args:
+            vectors (np.ndarray): Vectors, one per row
+
+        Returns:
+            np.ndarray: Array of shape (subspaces, n, dimensions / subspaces)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[1] % self.subspaces != 0:
+            raise ValueError(
+                f"{vectors.shape[1]} dimensions can't be split into"
+                f" {self.subspaces} subspaces"
+            )
+        return vectors.reshape(len(vectors), self.subspaces, -1).transpose(1, 0, 2)
+
+    @staticmethod
+    def _nearest(points: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        """
+        Index of the nearest centroid of each point
+
+        Args:
+            points (np.ndarray): Points, one per row
+            centroids (np.ndarray): Centroids, one per row
+
+        Returns:
+            np.ndarray: Index of the nearest centroid
+        """
+        dist = (
+            np.einsum("ij,ij->i", points, points)[:, None]
+            - 2 * points @ centroids.T
+            + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+        )
+        return dist.argmin(axis=1)
+
+    def fit(self, vectors: np.ndarray) -> "ProductQuantizer":
+        """
+        Learn one codebook per subspace with k-means
+
+        Args:
+            vectors (np.ndarray): Training vectors, one per row
+
+        Returns:
+            ProductQuantizer: The fitted quantizer
+        """
+        rng = np.random.default_rng(self.seed)
+        parts = self._split(vectors)
+        count = min(self.centroids, parts.shape[1])
+        codebooks = np.zeros(
+            (self.subspaces, self.centroids, parts.shape[2]), dtype=np.float32
+        )
+        for j, points in enumerate(parts):
+            centroids = points[rng.choice(len(points), count, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._nearest(points, centroids)
+                for c in range(count):
+                    members = points[assignment == c]
+                    if len(members) > 0:
+                        centroids[c] = members.mean(axis=0)
+            codebooks[j, :count] = centroids
+            codebooks[j, count:] = centroids[0]
+        self.codebooks = codebooks
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Encode vectors into centroid indices
+
+        Args:
+            vectors (np.ndarray): Vectors to encode, one per row
+
+        Returns:
+            np.ndarray: uint8 codes of shape (n, subspaces)
+        """
+        parts = self._split(vectors)
+        return np.stack(
+            [
+                self._nearest(points, codebook)
+                for points, codebook in zip(parts, self.codebooks)
+            ],
+            axis=1,
+        ).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Reconstruct vectors from centroid indices
+
+        Args:
+            codes (np.ndarray): uint8 codes of shape (n, subspaces)
+
+        Returns:
+            np.ndarray: Approximate vectors
+        """
+        parts = self.codebooks[np.arange(self.subspaces), codes]
+        return parts.reshape(len(codes), -1)
+
+    def distances(
+        self,
+        query: np.ndarray,
+        codes: np.ndarray,
+        space: str = "cosine",
+    ) -> np.ndarray:
+        """
+        Approximate distances using per-subspace lookup tables
+
+        Args:
+            query (np.ndarray): Query vector
+            codes (np.ndarray): uint8 codes of shape (n, subspaces)
+            space (str): Distance space
+
+        Returns:
+            np.ndarray: Approximate distances
+        """
+        if space == "cosine":
+            return super().distances(query, codes, space)
+        query_parts = np.asarray(query, dtype=np.float32).reshape(self.subspaces, -1)
+        if space == "l2":
+            diff = self.codebooks - query_parts[:, None, :]
+            table = np.einsum("mcd,mcd->mc", diff, diff)
+            return table[np.arange(self.subspaces), codes].sum(axis=1)
+        table = np.einsum("mcd,md->mc", self.codebooks, query_parts)
+        return 1.0 - table[np.arange(self.subspaces), codes].sum(axis=1)
+
+
+#: Quantizer of each quantization setting of a collection
+QUANTIZERS: dict[str, type[Quantizer]] = {
+    ScalarQuantizer.name: ScalarQuantizer,
+    ProductQuantizer.name: ProductQuantizer,
+}
+
+
+class SQLiteCodeStore:
+    """
+    Quantizers and codes of the quantized collections, persisted in SQLite
+
+    Every worker reads the same database, so a collection is encoded once
+    and its codes survive restarts. Each fit of a quantizer starts a new
+    generation and every code records the generation it was encoded with.
+    Fits and deletions also start a new epoch, which tells the readers to
+    reload the codes instead of reading the new rows only.
+
+    Attributes:
+        path (str): Path of the database file, ":memory:" to keep the codes
+            in this process only
+    """
+
+    def __init__(
+        self,
+        path: Annotated[str, "Path of the database file"] = ":memory:",
+    ) -> None:
+        """
+        Open or create the database
+
+        Args:
+            path (str): Path of the database file, ":memory:" to keep the
+                codes in this process only
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = connect(path)
+        with self._lock, self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS quantizers (
+                    collection TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    state BLOB NOT NULL,
+                    fitted_size INTEGER NOT NULL,
+                    generation INTEGER NOT NULL,
+                    epoch INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS codes (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    collection TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    reference_id TEXT,
+                    generation INTEGER NOT NULL,
+                    code BLOB NOT NULL,
+                    UNIQUE (collection, id)
+                );
+                CREATE INDEX IF NOT EXISTS codes_collection_seq
+                    ON codes (collection, seq);
+                """
+            )
+
+    def quantizer(
+        self,
+        collection: Annotated[str, "Collection ID"],
+    ) -> Annotated[
+        Optional[tuple[str, bytes, int, int, int]],
+        "Name, state, fitted size, generation and epoch",
+    ]:
+        """
+        Fitted quantizer of a collection
+
+        Args:
+            collection (str): Collection ID
+
+        Returns:
+            Optional[tuple[str, bytes, int, int, int]]: Name, serialized
+                state, number of training vectors, generation and epoch,
+                None before the first fit
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT name, state, fitted_size, generation, epoch"
+                " FROM quantizers WHERE collection = ?",
+                (collection,),
+            ).fetchone()
+
+    def last_seq(
+        self,
+        collection: Annotated[str, "Collection ID"],
+    ) -> Annotated[int, "Sequence number of the last code written"]:
+        """
+        Sequence number of the last code written to a collection
+
+        Args:
+            collection (str): Collection ID
+
+        Returns:
+            int: Sequence number of the last code, 0 without codes
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM codes WHERE collection = ?",
+                (collection,),
+            ).fetchone()[0]
+
+    def codes_since(
+        self,
+        collection: Annotated[str, "Collection ID"],
+        seq: Annotated[int, "Sequence number of the last code read"],
+    ) -> Annotated[
+        list[tuple[int, str, Optional[str], int, bytes]],
+        "Codes written after seq",
+    ]:
+        """
+        Codes written to a collection after a sequence number
+
+        Args:
+            collection (str): Collection ID
+            seq (int): Sequence number of the last code read, 0 for every code
+
+        Returns:
+            list[tuple[int, str, Optional[str], int, bytes]]: Sequence number,
+                document ID, reference ID, generation and code of each row,
+                in the order they were written
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT seq, id, reference_id, generation, code FROM codes"
+                " WHERE collection = ? AND seq > ? ORDER BY seq",
+                (collection, seq),
+            ).fetchall()
+
+    def add(
+        self,
+        collection: Annotated[str, "Collection ID"],
+        generation: Annotated[int, "Generation the codes were encoded with"],
+        rows: Annotated[
+            list[tuple[str, Optional[str], bytes]],
+            "Document ID, reference ID and code of each document",
+        ],
+    ) -> Annotated[bool, "Whether the codes were written"]:
+        """
+        Write codes, unless the quantizer was refit since they were encoded
+
+        Args:
+            collection (str): Collection ID
+            generation (int): Generation of the quantizer the codes were
+                encoded with
+            rows (list[tuple[str, Optional[str], bytes]]): Document ID,
+                reference ID and code of each document
+
+        Returns:
+            bool: True if the codes were written, False if the generation
+                of the collection changed
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT generation FROM quantizers WHERE collection = ?",
+                (collection,),
+            ).fetchone()
+            if row is None or row[0] != generation:
+                return False
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO codes"
+                " (collection, id, reference_id, generation, code)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(collection, *row[:2], generation, row[2]) for row in rows],
+            )
+        return True
+
+    def replace(
+        self,
+        collection: Annotated[str, "Collection ID"],
+        quantizer: Annotated[Quantizer, "Fitted quantizer"],
+        fitted_size: Annotated[int, "Number of training vectors"],
+        rows: Annotated[
+            list[tuple[str, Optional[str], bytes]],
+            "Document ID, reference ID and code of each document",
+        ],
+        before_seq: Annotated[int, "Last sequence number the codes replace"],
+    ) -> None:
+        """
+        Save a new fit of the quantizer with the codes encoded by it
+
+        Codes written after `before_seq` are kept, a reader re-encodes them
+        when their generation is older.
+
+        Args:
+            collection (str): Collection ID
+            quantizer (Quantizer): Fitted quantizer
+            fitted_size (int): Number of training vectors
+            rows (list[tuple[str, Optional[str], bytes]]): Document ID,
+                reference ID and code of each document
+            before_seq (int): Sequence number of the last code read before
+                the fit, older codes are deleted
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT generation, epoch FROM quantizers WHERE collection = ?",
+                (collection,),
+            ).fetchone()
+            generation, epoch = (row[0] + 1, row[1] + 1) if row else (1, 1)
+            self._connection.execute(
+                "INSERT OR REPLACE INTO quantizers"
+                " (collection, name, state, fitted_size, generation, epoch)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    collection,
+                    quantizer.name,
+                    quantizer.to_bytes(),
+                    fitted_size,
+                    generation,
+                    epoch,
+                ),
+            )
+            self._connection.execute(
+                "DELETE FROM codes WHERE collection = ? AND seq <= ?",
+                (collection, before_seq),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO codes"
+                " (collection, id, reference_id, generation, code)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(collection, *row[:2], generation, row[2]) for row in rows],
+            )
+
+    def delete_by_reference_id(
+        self,
+        collection: Annotated[str, "Collection ID"],
+        reference_id: Annotated[str, "Reference ID"],
+    ) -> None:
+        """
+        Delete the codes of a reference ID
+
+        Args:
+            collection (str): Collection ID
+            reference_id (str): Reference ID
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM codes WHERE collection = ? AND reference_id = ?",
+                (collection, reference_id),
+            )
+            self._connection.execute(
+                "UPDATE quantizers SET epoch = epoch + 1 WHERE collection = ?",
+                (collection,),
+            )
+
+
+class QuantizedIndex:
+    """
+    Quantized codes of a collection, searched instead of its HNSW index
+
+    The codes are persisted in a `SQLiteCodeStore` and loaded in memory,
+    where a search scans them for the best `k * rescore_factor` candidates.
+    Only the full-precision vectors of these candidates are read from Chroma
+    to rescore them exactly, so a search reads the codes, 1 byte per
+    dimension with int8 and `subspaces` bytes per vector with pq, instead of
+    float32 vectors. Chroma still stores the full-precision vectors.
+
+    Before each search or write, the codes written by other workers are read
+    back, all of them after a refit or a deletion. Codes encoded by an older
+    fit of the quantizer are re-encoded from their vectors in Chroma.
+
+    The quantizer is fit on the first `train_size` vectors. A collection
+    smaller than that is refit each time it doubles, so the first documents
+    added don't fix the codes of every later one.
+
+    Attributes:
+        collection (chromadb.Collection): Indexed collection
+        quantizer (Quantizer): Quantizer used for the codes
+        store (SQLiteCodeStore): Persisted quantizer and codes
+        rescore_factor (int): Candidates rescored per requested document
+        ids (list[str]): Document ID of each code
+        reference_ids (list[Optional[str]]): Reference ID of each code
+        codes (np.ndarray): Codes, one row per document
+        fitted_size (int): Vectors the quantizer was fit on
+    """
+
+    def __init__(
+        self,
+        collection: Annotated[chromadb.Collection, "Indexed collection"],
+        quantizer: Annotated[Quantizer, "Quantizer"],
+        store: Annotated[
+            Optional[SQLiteCodeStore],
+            "Persisted quantizer and codes",
+        ] = None,
+        rescore_factor: Annotated[int, "Candidates rescored per document"] = 4,
+        page_size: Annotated[int, "Vectors read from Chroma per page"] = 1000,
+        train_size: Annotated[int, "Vectors used to fit the quantizer"] = 10000,
+    ) -> None:
+        """
+        Create the quantized index of a collection
+
+        Args:
+            collection (chromadb.Collection): Indexed collection
+            quantizer (Quantizer): Quantizer, refit when the collection grows
+            store (SQLiteCodeStore): Persisted quantizer and codes, kept in
+                this process when not set
+            rescore_factor (int): Candidates rescored per requested document
+            page_size (int): Vectors read from Chroma per page
+            train_size (int): Vectors used to fit the quantizer
+        """
+        self.collection = collection
+        self.quantizer = quantizer
+        self.store = store or SQLiteCodeStore()
+        self.rescore_factor = rescore_factor
+        self.page_size = page_size
+        self.train_size = train_size
+        self.key = str(collection.id)
+        self.ids: list[str] = []
+        self.reference_ids: list[Optional[str]] = []
+        self.codes: Optional[np.ndarray] = None
+        self.fitted_size = 0
+        self._positions: dict[str, int] = {}
+        self._generation: Optional[int] = None
+        self._epoch: Optional[int] = None
+        self._seq = 0
+        self._lock = threading.RLock()
+
+    @property
+    def memory_bytes(self) -> Annotated[int, "Bytes used by the codes"]:
+        """
+        Bytes used by the codes
+
+        Returns:
+            int: Bytes used by the codes
+        """
+        return 0 if self.codes is None else int(self.codes.nbytes)
+
+    @property
+    def full_precision_bytes(self) -> Annotated[int, "Bytes of the float32 vectors"]:
+        """
+        Bytes the same vectors take as float32
+
+        Returns:
+            int: Bytes of the float32 vectors
+        """
+        if self.codes is None:
+            return 0
+        return len(self.ids) * self.quantizer.dimensions * 4
+
+    def _reset(self) -> None:
+        """Forget the codes loaded in memory"""
+        self.ids, self.reference_ids, self.codes = [], [], None
+        self._positions = {}
+        self._seq = 0
+
+    def _apply(
+        self,
+        ids: Sequence[str],
+        reference_ids: Sequence[Optional[str]],
+        codes: np.ndarray,
+    ) -> None:
+        """
+        Add codes to the index in memory, replacing those of known IDs
+
+        The arrays are replaced rather than changed in place, so a search
+        running meanwhile keeps a consistent view.
+
+        Args:
+            ids (Sequence[str]): Document IDs
+            reference_ids (Sequence[Optional[str]]): Reference IDs
+            codes (np.ndarray): Codes, one row per document
+        """
+        known = 0 if self.codes is None else len(self.codes)
+        rows = [] if self.codes is None else [self.codes]
+        updated = None
+        added = []
+        for i, (doc_id, reference_id) in enumerate(zip(ids, reference_ids)):
+            position = self._positions.get(doc_id)
+            if position is None:
+                self._positions[doc_id] = known + len(added)
+                self.ids.append(doc_id)
+                self.reference_ids.append(reference_id)
+                added.append(i)
+            elif position < known:
+                if updated is None:
+                    updated = self.codes.copy()
+                    rows[0] = updated
+                updated[position] = codes[i]
+                self.reference_ids[position] = reference_id
+            else:
+                added[position - known] = i
+        if added:
+            rows.append(codes[added])
+        if rows:
+            self.codes = np.concatenate(rows) if len(rows) > 1 else rows[0]
+
+    def _encode_rows(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        metadatas: Sequence[Optional[dict]],
+    ) -> tuple[list[tuple[str, Optional[str], bytes]], np.ndarray]:
+        """
+        Encode vectors into rows of the code store
+
+        Args:
+            ids (Sequence[str]): Document IDs
+            embeddings (np.ndarray): Full-precision vectors
+            metadatas (Sequence[Optional[dict]]): Document metadatas
+
+        Returns:
+            tuple[list, np.ndarray]: Document ID, reference ID and code bytes
+                of each document, and the codes
+        """
+        codes = self.quantizer.encode(np.asarray(embeddings, dtype=np.float32))
+        return [
+            (doc_id, (metadata or {}).get("reference_id"), code.tobytes())
+            for doc_id, metadata, code in zip(ids, metadatas, codes)
+        ], codes
+
+    def sync(self) -> None:
+        """
+        Read back the codes written since the last sync, by any worker
+
+        A collection without a fitted quantizer is built from Chroma when it
+        has documents, such as one imported or migrated without its codes.
+        """
+        with self._lock:
+            record = self.store.quantizer(self.key)
+            if record is None:
+                self._reset()
+                self._generation = self._epoch = None
+                self.fitted_size = 0
+                if self.collection.count() > 0:
+                    self.build()
+                return
+            name, state, fitted_size, generation, epoch = record
+            if generation != self._generation:
+                self.quantizer = QUANTIZERS[name]().load_bytes(state)
+                self.fitted_size = fitted_size
+            if generation != self._generation or epoch != self._epoch:
+                self._reset()
+            self._generation, self._epoch = generation, epoch
+            rows = self.store.codes_since(self.key, self._seq)
+            if len(rows) == 0:
+                return
+            self._seq = rows[-1][0]
+            current = [row for row in rows if row[3] == generation]
+            if current:
+                self._apply(
+                    [row[1] for row in current],
+                    [row[2] for row in current],
+                    np.frombuffer(
+                        b"".join(row[4] for row in current),
+                        dtype=self.quantizer.code_dtype,
+                    ).reshape(len(current), -1),
+                )
+            stale = [row[1] for row in rows if row[3] != generation]
+            if stale:
+                res = self.collection.get(
+                    ids=stale, include=["embeddings", "metadatas"]
+                )
+                self._add_encoded(res["ids"], res["embeddings"], res["metadatas"])
+
+    def _add_encoded(
+        self,
+        ids: Sequence[str],
+        embeddings: np.ndarray,
+        metadatas: Sequence[Optional[dict]],
+    ) -> None:
+        """
+        Encode vectors with the current quantizer, persist and load them
+
+        Args:
+            ids (Sequence[str]): Document IDs
+            embeddings (np.ndarray): Full-precision vectors
+            metadatas (Sequence[Optional[dict]]): Document metadatas
+        """
+        if len(ids) == 0:
+            return
+        rows, codes = self._encode_rows(ids, embeddings, metadatas)
+        if self.store.add(self.key, self._generation, rows):
+            self._apply(ids, [row[1] for row in rows], codes)
+        else:
+            # Refit by another worker meanwhile, the codes are re-encoded
+            # with its quantizer
+            self.sync()
+            rows, codes = self._encode_rows(ids, embeddings, metadatas)
+            if self.store.add(self.key, self._generation, rows):
+                self._apply(ids, [row[1] for row in rows], codes)
+
+    def build(self) -> None:
+        """Read every vector of the collection page by page, fit and encode"""
+        with self._lock:
+            before_seq = self.store.last_seq(self.key)
+            pending: list[Tuple[list[str], np.ndarray, list]] = []
+            pending_count = 0
+            rows: list[tuple[str, Optional[str], bytes]] = []
+            fitted_size = 0
+            offset = 0
+            while True:
+                page = self.collection.get(
+                    include=["embeddings", "metadatas"],
+                    limit=self.page_size,
+                    offset=offset,
+                )
+                if len(page["ids"]) == 0:
+                    break
+                offset += len(page["ids"])
+                embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+                if fitted_size > 0:
+                    rows += self._encode_rows(
+                        page["ids"], embeddings, page["metadatas"]
+                    )[0]
+                    continue
+                pending.append((page["ids"], embeddings, page["metadatas"]))
+                pending_count += len(page["ids"])
+                if pending_count >= self.train_size:
+                    fitted_size = self._fit(pending, rows)
+                    pending = []
+            if pending:
+                fitted_size = self._fit(pending, rows)
+            if fitted_size == 0:
+                return
+            self.store.replace(self.key, self.quantizer, fitted_size, rows, before_seq)
+            self._generation = None
+            self.sync()
+
+    def _fit(
+        self,
+        pending: list[Tuple[list[str], np.ndarray, list]],
+        rows: list[tuple[str, Optional[str], bytes]],
+    ) -> int:
+        """
+        Fit the quantizer on the buffered pages, then encode them
+
+        Args:
+            pending (list): Buffered (ids, embeddings, metadatas) pages
+            rows (list): Rows of the code store, the encoded pages are added
+
+        Returns:
+            int: Number of training vectors
+        """
+        training = np.concatenate([embeddings for _, embeddings, _ in pending])
+        self.quantizer.fit(training)
+        for ids, embeddings, metadatas in pending:
+            rows += self._encode_rows(ids, embeddings, metadatas)[0]
+        return len(training)
+
+    def add(
+        self,
+        ids: Annotated[Sequence[str], "Document IDs"],
+        embeddings: Annotated[
+            Optional[np.ndarray],
+            "Full-precision vectors, read from Chroma when not set",
+        ],
+        metadatas: Annotated[Sequence[Optional[dict]], "Document metadatas"],
+    ) -> None:
+        """
+        Encode documents just added to the collection
+
+        Args:
+            ids (Sequence[str]): Document IDs
+            embeddings (np.ndarray): Full-precision vectors, read from Chroma
+                when not set
+            metadatas (Sequence[Optional[dict]]): Document metadatas
+        """
+        with self._lock:
+            # Builds the index when the collection had none, the documents
+            # are then already encoded
+            self.sync()
+            added = sum(1 for doc_id in ids if doc_id not in self._positions)
+            if added == 0:
+                return
+            if self.fitted_size < self.train_size and len(self.ids) + added >= min(
+                self.train_size, 2 * self.fitted_size
+            ):
+                # Refit on the grown collection, each vector is re-encoded a
+                # bounded number of times until train_size is reached
+                self.build()
+                return
+            if embeddings is None:
+                embeddings = self.collection.get(ids=list(ids), include=["embeddings"])[
+                    "embeddings"
+                ]
+            self._add_encoded(ids, embeddings, metadatas)
+
+    def delete_by_reference_id(
+        self,
+        reference_id: Annotated[str, "Reference ID"],
+    ) -> None:
+        """
+        Delete the codes of a reference ID
+
+        Args:
+            reference_id (str): Reference ID
+        """
+        with self._lock:
+            self.store.delete_by_reference_id(self.key, reference_id)
+            self.sync()
+
+    def candidates(
+        self,
+        query_vector: Annotated[np.ndarray, "Query vector"],
+        k: Annotated[int, "Number of result documents"],
+        reference_id: Annotated[Optional[str], "Reference ID"] = None,
+        space: Annotated[str, "Distance space"] = "cosine",
+    ) -> Annotated[list[str], "IDs of the candidates to rescore"]:
+        """
+        IDs of the best `k * rescore_factor` candidates by approximate distance
+
+        Args:
+            query_vector (np.ndarray): Query vector
+            k (int): Number of result documents
+            reference_id (str): Reference ID
+            space (str): Distance space of the collection
+
+        Returns:
+            list[str]: IDs of the candidates to rescore, best first
+        """
+        with self._lock:
+            self.sync()
+            ids, reference_ids = self.ids, self.reference_ids
+            codes, quantizer = self.codes, self.quantizer
+        if codes is None or len(codes) == 0:
+            return []
+        rows = np.arange(len(codes))
+        if reference_id is not None:
+            rows = np.flatnonzero(
+                np.asarray(reference_ids, dtype=object) == reference_id
+            )
+        if len(rows) == 0:
+            return []
+        approx = quantizer.distances(query_vector, codes[rows], space)
+        count = min(len(rows), k * self.rescore_factor)
+        best = np.argpartition(approx, count - 1)[:count]
+        return [ids[rows[i]] for i in best[np.argsort(approx[best])]]
+
+
+class QuantizedIndexes:
+    """
+    Quantized indexes of the collections that enable quantization
+
+    A collection enables quantization with the "quantization" key of its
+    metadata, set from `HnswIndexParams.quantization` when it is created.
+    The indexes are shared by the requests of a process, their codes by
+    every process using the same code store.
+
+    Attributes:
+        store (SQLiteCodeStore): Persisted quantizers and codes
+        rescore_factor (int): Candidates rescored per requested document
+        train_size (int): Vectors used to fit the quantizers
+    """
+
+    def __init__(
+        self,
+        store: Annotated[
+            Optional[SQLiteCodeStore],
+            "Persisted quantizers and codes",
+        ] = None,
+        rescore_factor: Annotated[int, "Candidates rescored per document"] = 4,
+        train_size: Annotated[int, "Vectors used to fit the quantizers"] = 10000,
+    ) -> None:
+        """
+        Create the registry of quantized indexes
+
+        Args:
+            store (SQLiteCodeStore): Persisted quantizers and codes, kept in
+                this process when not set
+            rescore_factor (int): Candidates rescored per requested document
+            train_size (int): Vectors used to fit the quantizers
+        """
+        self.store = store or SQLiteCodeStore()
+        self.rescore_factor = rescore_factor
+        self.train_size = train_size
+        self._indexes: dict[str, QuantizedIndex] = {}
+        self._lock = threading.Lock()
+
+    def open(
+        self,
+        collection: Annotated[chromadb.Collection, "Collection"],
+    ) -> Annotated[Optional[QuantizedIndex], "Quantized index"]:
+        """
+        Quantized index of a collection
+
+        Args:
+            collection (chromadb.Collection): Collection
+
+        Returns:
+            Optional[QuantizedIndex]: Quantized index, None when the
+                collection doesn't enable quantization
+        """
+        name = (collection.metadata or {}).get(QUANTIZATION_KEY)
+        if name not in QUANTIZERS:
+            return None
+        with self._lock:
+            index = self._indexes.get(str(collection.id))
+            if index is None:
+                index = QuantizedIndex(
+                    collection,
+                    QUANTIZERS[name](),
+                    store=self.store,
+                    rescore_factor=self.rescore_factor,
+                    train_size=self.train_size,
+                )
+                self._indexes[str(collection.id)] = index
+            # The latest handle, bound to the client of the request
+            index.collection = collection
+            return index
+
+
+class QuantizationReport(BaseModel):
+    """
+    Recall, latency and memory of a quantization setting on a collection
+
+    Attributes:
+        quantizer (str): Name of the quantization setting
+        recall_at_k (float): Recall of the rescored results against exact search
+        mean_ms (float): Mean search latency in milliseconds
+        p95_ms (float): 95th percentile search latency in milliseconds
+        memory_bytes (int): Bytes used by the codes
+        full_precision_bytes (int): Bytes of the same vectors as float32
+        compression_ratio (float): full_precision_bytes / memory_bytes
+    """
+
+    quantizer: str = Field(..., title="Quantizer", description="Quantization setting")
+    recall_at_k: float = Field(..., title="Recall@k", description="Recall@k")
+    mean_ms: float = Field(..., title="Mean latency", description="Mean latency (ms)")
+    p95_ms: float = Field(..., title="p95 latency", description="p95 latency (ms)")
+    memory_bytes: int = Field(..., title="Memory", description="Bytes of the codes")
+    full_precision_bytes: int = Field(
+        ...,
+        title="Full-precision memory",
+        description="Bytes of the float32 vectors",
+    )
+    compression_ratio: float = Field(
+        ...,
+        title="Compression ratio",
+        description="Full-precision bytes divided by the bytes of the codes",
+    )
+
+
+def evaluate_quantizers(
+    vector_store: Annotated["VectorStore", "Vector store to evaluate on"],
+    quantizers: Annotated[Sequence[Quantizer], "Quantizers to compare"],
+    queries: Annotated[Sequence[str], "Held-out queries"],
+    k: Annotated[int, "Number of result documents"] = 10,
+    rescore_factor: Annotated[int, "Candidates rescored per document"] = 4,
+) -> Annotated[list[QuantizationReport], "One report per quantizer"]:
+    """
+    Compare quantization settings on a collection
+
+    Recall is measured against an exact brute-force search over the
+    full-precision vectors of the collection. Each setting is built in a
+    code store kept in memory, the collection is not changed.
+
+    Args:
+        vector_store (VectorStore): Vector store to evaluate on
+        quantizers (Sequence[Quantizer]): Quantizers to compare
+        queries (Sequence[str]): Held-out queries
+        k (int): Number of result documents
+        rescore_factor (int): Candidates rescored per document
+
+    Returns:
+        list[QuantizationReport]: One report per quantizer
+    """
+    everything = vector_store.collection.get(include=["embeddings"])
+    matrix = np.asarray(everything["embeddings"], dtype=np.float32)
+    query_vectors = np.asarray(vector_store.embeddings(list(queries)), np.float32)
+    truth = [
+        [everything["ids"][i] for i in row]
+        for row in exact_top_k(matrix, query_vectors, k, vector_store.space)
+    ]
+    reports = []
+    for quantizer in quantizers:
+        index = QuantizedIndex(
+            vector_store.collection, quantizer, rescore_factor=rescore_factor
+        )
+        index.build()
+        found, samples = [], []
+        for query_vector in query_vectors:
+            start = time.perf_counter()
+            candidate_ids = index.candidates(query_vector, k, space=vector_store.space)
+            res = vector_store.collection.get(ids=candidate_ids, include=["embeddings"])
+            exact = distances(
+                query_vector,
+                np.asarray(res["embeddings"], dtype=np.float32),
+                vector_store.space,
+            )
+            found.append([res["ids"][i] for i in np.argsort(exact)[:k]])
+            samples.append(time.perf_counter() - start)
+        latency = latency_summary(samples)
+        reports.append(
+            QuantizationReport(
+                quantizer=quantizer.name,
+                recall_at_k=recall_at_k(found, truth),
+                mean_ms=latency["mean_ms"],
+                p95_ms=latency["p95_ms"],
+                memory_bytes=index.memory_bytes,
+                full_precision_bytes=index.full_precision_bytes,
+                compression_ratio=index.full_precision_bytes
+                / max(index.memory_bytes, 1),
+            )
+        )
+    return reports
@@ -0,0 +1,225 @@
+import threading
+from typing import Annotated, Any, Callable, Hashable, Optional
+
+from core.cache import LRUCache, connect
+
+_MISSING = object()
+
+
+class Generations:
+    """
+    Generation counter of each namespace, in memory
+
+    Bumping the generation of a namespace makes every result cached under an
+    older generation unreachable.
+    """
+
+    def __init__(self) -> None:
+        """Create counters, every namespace starts at generation 0"""
+        self._generations: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        namespace: Annotated[str, "Namespace"],
+    ) -> Annotated[int, "Current generation"]:
+        """
+        Get the current generation of a namespace
+
+        Args:
+            namespace (str): Namespace
+
+        Returns:
+            int: Current generation
+        """
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump(
+        self,
+        namespace: Annotated[str, "Namespace"],
+    ) -> Annotated[int, "New generation"]:
+        """
+        Move a namespace to its next generation
+
+        Args:
+            namespace (str): Namespace
+
+        Returns:
+            int: New generation
+        """
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            return self._generations[namespace]
+
+
+class SQLiteGenerations(Generations):
+    """
+    Generation counter of each namespace in SQLite, so a write handled by one
+    worker invalidates the cached results of every worker
+
+    Attributes:
+        path (str): Path of the database file
+    """
+
+    def __init__(self, path: Annotated[str, "Path of the database file"]) -> None:
+        """
+        Open or create the database
+
+        Args:
+            path (str): Path of the database file
+        """
+        super().__init__()
+        self.path = path
+        self._connection = connect(path)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS generations (
+                    namespace TEXT PRIMARY KEY,
+                    generation INTEGER NOT NULL
+                )
+                """
+            )
+
+    def get(self, namespace: str) -> int:
+        """
+        Get the current generation of a namespace
+
+        Args:
+            namespace (str): Namespace
+
+        Returns:
+            int: Current generation
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT generation FROM generations WHERE namespace = ?",
+                (namespace,),
+            ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, namespace: str) -> int:
+        """
+        Move a namespace to its next generation
+
+        Args:
+            namespace (str): Namespace
+
+        Returns:
+            int: New generation
+        """
+        with self._lock, self._connection:
+            return self._connection.execute(
+                """
+                INSERT INTO generations (namespace, generation) VALUES (?, 1)
+                ON CONFLICT (namespace) DO UPDATE SET generation = generation + 1
+                RETURNING generation
+                """,
+                (namespace,),
+            ).fetchone()[0]
+
+
+class QueryCache:
+    """
+    Cache of search results by namespace, e.g. a collection name
+
+    Results are cached under the generation of their namespace when they
+    were computed. Writes bump the generation, so results computed before a
+    write are never served after it, and results computed while a write was
+    in progress are not cached. Entries are bounded in number and age.
+
+    Results are shared between callers and must not be modified.
+
+    Attributes:
+        generations (Generations): Generation counter of each namespace
+        hits (int): Lookups served from the cache
+        misses (int): Lookups computed
+        invalidations (int): Generation bumps
+    """
+
+    def __init__(
+        self,
+        max_entries: Annotated[int, "Maximum number of cached results"] = 10000,
+        ttl: Annotated[Optional[float], "Seconds a result is cached"] = 60,
+        generations: Annotated[
+            Optional[Generations],
+            "Generation counter of each namespace",
+        ] = None,
+    ) -> None:
+        """
+        Create a query cache
+
+        Args:
+            max_entries (int): Maximum number of cached results
+            ttl (float): Seconds a result is cached, None to keep results
+                until they are evicted or invalidated
+            generations (Generations): Generation counter of each namespace,
+                in memory when not set
+        """
+        self.results = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.generations = generations or Generations()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def get_or_compute(
+        self,
+        namespace: Annotated[str, "Namespace of the key"],
+        key: Annotated[Hashable, "Key of the result"],
+        fn: Annotated[Callable[[], Any], "Computation"],
+    ) -> Annotated[Any, "Result, cached or computed"]:
+        """
+        Get a cached result, or compute and cache it
+
+        Args:
+            namespace (str): Namespace of the key, invalidated together
+            key (Hashable): Key of the result
+            fn (Callable[[], Any]): Computation
+
+        Returns:
+            Any: Result, cached or computed
+        """
+        generation = self.generations.get(namespace)
+        full_key = (namespace, generation, key)
+        result = self.results.get(full_key, _MISSING)
+        with self._lock:
+            if result is not _MISSING:
+                self.hits += 1
+                return result
+            self.misses += 1
+        result = fn()
+        if self.generations.get(namespace) == generation:
+            self.results.set(full_key, result)
+        return result
+
+    def invalidate(self, namespace: Annotated[str, "Namespace"]) -> None:
+        """
+        Drop the cached results of a namespace
+
+        Args:
+            namespace (str): Namespace
+        """
+        self.generations.bump(namespace)
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> Annotated[dict, "Size and hit ratio"]:
+        """
+        Size, bounds and hit ratio of the cache
+
+        Returns:
+            dict: Entries, bounds, hits, misses, hit ratio and invalidations
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.results),
+                "max_entries": self.results.max_entries,
+                "ttl": self.results.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
@@ -1,12 +1,26 @@
+import hashlib
 from abc import ABC, abstractmethod
-from typing import Annotated, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Callable, List, Optional, Tuple
 
+import numpy as np
+
+from core.cache import LRUCache, SQLiteCache, content_hash
+from core.chat_llm import count_tokens, truncate_tokens
 from core.models.documents import DocumentWithScore
+from core.singleflight import SingleFlight
 from core.vector_store import Document
 
 
 class RerankModel(ABC):
-    """Rerank Model"""
+    """
+    Rerank Model
+
+    Attributes:
+        model_name (str): Name of the backend model, part of the cache keys
+    """
+
+    model_name: str = ""
 
     @abstractmethod
     def rerank_documents(
@@ -26,17 +40,191 @@ class RerankModel(ABC):
         """
 
 
+class CachedRerankModel(RerankModel):
+    """
+    Rerank model caching the score of each (model, query, document)
+
+    Relevance scores of a document don't depend on the other candidates, so
+    scores are cached per document and only uncached documents are sent to the
+    backend model. Scores are kept in an in-memory LRU cache and, optionally, a
+    persistent cache shared between processes and restarts.
+
+    Attributes:
+        model (RerankModel): Backend rerank model
+        memory (LRUCache): In-memory cache
+        persistent (SQLiteCache): Persistent cache, None to keep scores in
+            memory only
+    """
+
+    def __init__(
+        self,
+        model: Annotated[RerankModel, "Backend rerank model"],
+        max_entries: Annotated[int, "Scores kept in memory"] = 100_000,
+        persistent: Annotated[
+            Optional[SQLiteCache],
+            "Persistent cache",
+        ] = None,
+    ) -> None:
+        """
+        Wrap a rerank model with a score cache
+
+        Args:
+            model (RerankModel): Backend rerank model
+            max_entries (int): Scores kept in memory
+            persistent (SQLiteCache): Persistent cache, None to keep scores in
+                memory only
+        """
+        self.model = model
+        self.model_name = model.model_name or type(model).__name__
+        self.memory = LRUCache(max_entries=max_entries)
+        self.persistent = persistent
+
+    def rerank_documents(
+        self,
+        query: Annotated[str, "The query use to rerank"],
+        docs: Annotated[List[str], "List of documents"],
+    ) -> Annotated[List[float], "List of scores for each document"]:
+        """
+        Score the documents, sending only the uncached ones to the model
+
+        Args:
+            query (str): The query use to rerank
+            docs (List[str]): List of documents
+
+        Returns:
+            List[float]: List of relevance scores, in the order of `docs`
+        """
+        prefix = f"{self.model_name}:{content_hash(query)}:"
+        keys = [prefix + content_hash(doc) for doc in docs]
+        scores: dict[str, float] = self.memory.get_many(keys)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in scores]
+        if missing and self.persistent is not None:
+            found = self.persistent.get_many(missing)
+            self.memory.set_many(found)
+            scores.update(found)
+            missing = [key for key in missing if key not in found]
+
+        if missing:
+            texts = {key: doc for key, doc in zip(keys, docs)}
+            fresh = dict(
+                zip(
+                    missing,
+                    self.model.rerank_documents(query, [texts[k] for k in missing]),
+                )
+            )
+            self.memory.set_many(fresh)
+            if self.persistent is not None:
+                self.persistent.set_many(fresh)
+            scores.update(fresh)
+        return [scores[key] for key in keys]
+
+
+class BatchedRerankModel(RerankModel):
+    """
+    Rerank model splitting large candidate sets into concurrent batches
+
+    Documents are cut to the token limit of the model, split into batches of
+    at most `batch_size` documents and scored concurrently, at most
+    `max_concurrency` batches at a time. Scores are merged back in the order
+    of the documents, so the latency is about the one of the slowest batch.
+
+    Attributes:
+        model (RerankModel): Backend rerank model
+        batch_size (int): Maximum documents per call to the model
+        max_concurrency (int): Maximum concurrent calls to the model
+        max_tokens (int): Tokens kept of each document, None to send
+            documents as is
+        token_counter (Callable[[str], int]): Token counter
+    """
+
+    def __init__(
+        self,
+        model: Annotated[RerankModel, "Backend rerank model"],
+        batch_size: Annotated[int, "Maximum documents per call"] = 100,
+        max_concurrency: Annotated[int, "Maximum concurrent calls"] = 4,
+        max_tokens: Annotated[Optional[int], "Tokens kept of each document"] = None,
+        token_counter: Annotated[
+            Callable[[str], int],
+            "Token counter",
+        ] = count_tokens,
+    ) -> None:
+        """
+        Wrap a rerank model with batching
+
+        Args:
+            model (RerankModel): Backend rerank model
+            batch_size (int): Maximum documents per call to the model
+            max_concurrency (int): Maximum concurrent calls to the model
+            max_tokens (int): Tokens kept of each document, None to send
+                documents as is
+            token_counter (Callable[[str], int]): Token counter
+        """
+        if batch_size < 1 or max_concurrency < 1:
+            raise ValueError("batch_size and max_concurrency must be positive")
+        self.model = model
+        self.model_name = model.model_name
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+
+    def rerank_documents(
+        self,
+        query: Annotated[str, "The query use to rerank"],
+        docs: Annotated[List[str], "List of documents"],
+    ) -> Annotated[List[float], "List of scores for each document"]:
+        """
+        Score the documents in concurrent batches
+
+        Args:
+            query (str): The query use to rerank
+            docs (List[str]): List of documents
+
+        Returns:
+            List[float]: List of relevance scores, in the order of `docs`
+        """
+        if self.max_tokens is not None:
+            docs = [
+                truncate_tokens(doc, self.max_tokens, self.token_counter)
+                for doc in docs
+            ]
+        batches = [
+            docs[start : start + self.batch_size]
+            for start in range(0, len(docs), self.batch_size)
+        ]
+        if len(batches) <= 1:
+            return self.model.rerank_documents(query, docs) if docs else []
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(batches))
+        ) as executor:
+            results = executor.map(
+                lambda batch: self.model.rerank_documents(query, batch), batches
+            )
+            return [score for scores in results for score in scores]
+
+
 class Rerank:
     """Rerank"""
 
-    def __init__(self, model: Annotated[RerankModel, "Rerank model"]) -> None:
+    def __init__(
+        self,
+        model: Annotated[RerankModel, "Rerank model"],
+        single_flight: Annotated[
+            Optional[SingleFlight],
+            "Coalesces identical concurrent reranks",
+        ] = None,
+    ) -> None:
         """
         Initialize the rerank model
 
         Args:
             model (RerankModel): Rerank model
+            single_flight (SingleFlight): Coalesces identical concurrent
+                reranks
         """
         self.model = model
+        self.single_flight = single_flight
 
     def rerank_documents(
         self,
@@ -49,6 +237,78 @@ class Rerank:
         """
         Rerank the documents based on the query
 
+        Args:
+            query (str): The query use to rerank
+            docs (List[Document]): List of documents
+
+        Returns:
+            List[DocumentWithScore]: List of documents and sorted by score
+        """
+        if self.single_flight is None:
+            return self._rerank_documents(query, docs)
+        digest = hashlib.sha256(query.encode("utf-8"))
+        for doc in docs:
+            digest.update(b"\0" + doc.model_dump_json().encode("utf-8"))
+        return list(
+            self.single_flight.do(
+                digest.hexdigest(),
+                lambda: self._rerank_documents(query, docs),
+                namespace="rerank",
+            )
+        )
+
+    def rerank_contents(
+        self,
+        query: Annotated[str, "The query use to rerank"],
+        contents: Annotated[List[str], "Contents of the documents"],
+    ) -> Annotated[
+        Tuple[np.ndarray, np.ndarray],
+        "Positions of the contents best first, and their scores",
+    ]:
+        """
+        Rerank plain contents, without building a document per item
+
+        Args:
+            query (str): The query use to rerank
+            contents (List[str]): Contents of the documents
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Positions of the contents sorted
+                by score, best first, and their scores in the same order.
+                Coalesced results are shared and must not be modified
+        """
+
+        def rank() -> Tuple[np.ndarray, np.ndarray]:
+            """
+            Score the contents with the model and sort them
+
+            Returns:
+                Tuple[np.ndarray, np.ndarray]: Positions and scores, best first
+            """
+            scores = np.asarray(
+                self.model.rerank_documents(query, contents) if contents else [],
+                dtype=np.float64,
+            )
+            order = np.argsort(-scores, kind="stable")
+            return order, scores[order]
+
+        if self.single_flight is None:
+            return rank()
+        digest = hashlib.sha256(query.encode("utf-8"))
+        for content in contents:
+            digest.update(b"\0" + content.encode("utf-8"))
+        return self.single_flight.do(
+            "contents:" + digest.hexdigest(), rank, namespace="rerank"
+        )
+
+    def _rerank_documents(
+        self,
+        query: str,
+        docs: List[Document],
+    ) -> List[DocumentWithScore]:
+        """
+        Rerank the documents with the model
+
         Args:
             query (str): The query use to rerank
             docs (List[Document]): List of documents
@@ -59,6 +319,7 @@ class Rerank:
         scores = self.model.rerank_documents(query, [doc.page_content for doc in docs])
         mapped_documents = [
             DocumentWithScore(
+                id=doc.id,
                 page_content=doc.page_content,
                 metadata=doc.metadata,
                 score=score,
@@ -0,0 +1,576 @@
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Annotated, Any, Callable, Optional
+
+import httpx
+from chromadb.errors import ChromaError
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the circuit breaker is open"""
+
+
+class RateLimitedError(RuntimeError):
+    """Raised when no rate limit token is available in time"""
+
+
+#: Transport errors retried whatever their cause, the request may not have
+#: reached the provider or its response was lost
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, httpx.TransportError)
+
+#: Status codes of transient provider responses, with every 5xx
+TRANSIENT_STATUS_CODES = (408, 429)
+
+
+def is_retryable(
+    error: Annotated[BaseException, "Error raised by the call"],
+) -> Annotated[bool, "Whether the call should be retried"]:
+    """
+    Whether an error is transient. Only connection and timeout errors and
+    408, 429 and 5xx responses are retried. Chroma errors, invalid arguments
+    and any other error are the caller's mistake and fail at once, so they
+    neither waste attempts nor open the circuit breaker
+
+    Args:
+        error (BaseException): Error raised by the call
+
+    Returns:
+        bool: True if the call should be retried
+    """
+    if isinstance(error, (CircuitOpenError, RateLimitedError)):
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    if isinstance(error, (ChromaError, ValueError)):
+        return False
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if not isinstance(status_code, int):
+        return False
+    return status_code in TRANSIENT_STATUS_CODES or status_code >= 500
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter
+
+    Attributes:
+        rate (float): Tokens added per second
+        capacity (float): Maximum number of tokens, the allowed burst
+    """
+
+    def __init__(
+        self,
+        rate: Annotated[float, "Tokens added per second"],
+        capacity: Annotated[Optional[float], "Maximum number of tokens"] = None,
+    ) -> None:
+        """
+        Create a full token bucket
+
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum number of tokens, `rate` when not set
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> Annotated[float, "Available tokens"]:
+        """
+        Available tokens
+
+        Returns:
+            float: Available tokens
+        """
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def _refill(self) -> None:
+        """Add the tokens accumulated since the last update"""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+
+    def try_acquire(self, tokens: Annotated[float, "Tokens"] = 1) -> bool:
+        """
+        Take tokens if they are available, without waiting
+
+        Args:
+            tokens (float): Tokens
+
+        Returns:
+            bool: True if the tokens were taken
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(
+        self,
+        tokens: Annotated[float, "Tokens"] = 1,
+        timeout: Annotated[Optional[float], "Maximum seconds to wait"] = None,
+    ) -> Annotated[bool, "Whether the tokens were taken"]:
+        """
+        Take tokens, waiting until they are available
+
+        Args:
+            tokens (float): Tokens
+            timeout (float): Maximum seconds to wait, None to wait forever
+
+        Returns:
+            bool: True if the tokens were taken, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_time = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait_time = min(wait_time, remaining)
+            time.sleep(wait_time)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker failing fast after consecutive failures
+
+    The circuit opens after `failure_threshold` consecutive failures and
+    rejects calls for `reset_timeout` seconds. Then it is half open and lets
+    one call through, closing on success and opening again on failure.
+
+    Attributes:
+        failure_threshold (int): Consecutive failures opening the circuit
+        reset_timeout (float): Seconds the circuit stays open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: Annotated[int, "Failures opening the circuit"] = 5,
+        reset_timeout: Annotated[float, "Seconds the circuit stays open"] = 30,
+    ) -> None:
+        """
+        Create a closed circuit breaker
+
+        Args:
+            failure_threshold (int): Consecutive failures opening the circuit
+            reset_timeout (float): Seconds the circuit stays open
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> Annotated[str, "State of the circuit"]:
+        """
+        State of the circuit
+
+        Returns:
+            str: "closed", "open" or "half_open"
+        """
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        """
+        State of the circuit, the lock must be held
+
+        Returns:
+            str: "closed", "open" or "half_open"
+        """
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self) -> None:
+        """
+        Check a call may go through
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half open with a
+                probe call already in flight
+        """
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError("Circuit breaker is open")
+
+    def cancel(self) -> None:
+        """Give back the probe of an allowed call that was not sent"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        """Close the circuit"""
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Count a failure, opening the circuit at the threshold"""
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class Resilience:
+    """
+    Resilience policy of calls to one provider
+
+    Each call goes through the circuit breaker and the rate limiter, transient
+    errors are retried with exponential backoff and full jitter. Hedged calls
+    send a duplicate request when the first one is slower than `hedge_delay`,
+    whose response is used when the first request fails, trading a little
+    extra load for fewer slow retries. Hedges only go out when a rate limit
+    token is free.
+
+    Attributes:
+        name (str): Name of the provider
+        rate_limiter (TokenBucket): Rate limiter, None for no limit
+        circuit_breaker (CircuitBreaker): Circuit breaker, None to never fail
+            fast
+        max_attempts (int): Attempts per call, including the first one
+        base_delay (float): Backoff of the first retry, in seconds
+        max_delay (float): Maximum backoff, in seconds
+        hedge_delay (float): Seconds before a hedged call sends a duplicate,
+            None to disable hedging
+        acquire_timeout (float): Maximum seconds to wait for a rate limit
+            token, None to wait forever
+        retryable (Callable[[BaseException], bool]): Whether an error is
+            transient
+    """
+
+    def __init__(
+        self,
+        name: Annotated[str, "Name of the provider"],
+        rate_limiter: Annotated[Optional[TokenBucket], "Rate limiter"] = None,
+        circuit_breaker: Annotated[
+            Optional[CircuitBreaker],
+            "Circuit breaker",
+        ] = None,
+        max_attempts: Annotated[int, "Attempts per call"] = 3,
+        base_delay: Annotated[float, "Backoff of the first retry"] = 0.1,
+        max_delay: Annotated[float, "Maximum backoff"] = 2.0,
+        hedge_delay: Annotated[
+            Optional[float],
+            "Seconds before a hedged call sends a duplicate",
+        ] = None,
+        acquire_timeout: Annotated[
+            Optional[float],
+            "Maximum seconds to wait for a rate limit token",
+        ] = None,
+        retryable: Annotated[
+            Callable[[BaseException], bool],
+            "Whether an error is transient",
+        ] = is_retryable,
+        max_workers: Annotated[int, "Threads running duplicate requests"] = 16,
+    ) -> None:
+        """
+        Create a resilience policy
+
+        Args:
+            name (str): Name of the provider
+            rate_limiter (TokenBucket): Rate limiter, None for no limit
+            circuit_breaker (CircuitBreaker): Circuit breaker, None to never
+                fail fast
+            max_attempts (int): Attempts per call, including the first one
+            base_delay (float): Backoff of the first retry, in seconds
+            max_delay (float): Maximum backoff, in seconds
+            hedge_delay (float): Seconds before a hedged call sends a
+                duplicate, None to disable hedging
+            acquire_timeout (float): Maximum seconds to wait for a rate limit
+                token, None to wait forever
+            retryable (Callable[[BaseException], bool]): Whether an error is
+                transient
+            max_workers (int): Threads running the duplicate requests
+        """
+        self.name = name
+        self.rate_limiter = rate_limiter
+        self.circuit_breaker = circuit_breaker
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_delay = hedge_delay
+        self.acquire_timeout = acquire_timeout
+        self.retryable = retryable
+        self.counters = {
+            "calls": 0,
+            "failures": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "rejected": 0,
+        }
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"hedge-{name}"
+        )
+        self._lock = threading.Lock()
+
+    def _count(self, counter: Annotated[str, "Counter name"]) -> None:
+        """
+        Increment a counter
+
+        Args:
+            counter (str): Counter name
+        """
+        with self._lock:
+            self.counters[counter] += 1
+
+    def backoff(self, attempt: Annotated[int, "Failed attempt, from 1"]) -> float:
+        """
+        Jittered backoff before the next attempt
+
+        Args:
+            attempt (int): Failed attempt, from 1
+
+        Returns:
+            float: Seconds to wait, uniform in [0, min(max_delay,
+                base_delay * 2 ** (attempt - 1))]
+        """
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    def call(
+        self,
+        fn: Annotated[Callable[..., Any], "Function calling the provider"],
+        *args: Any,
+        hedge: Annotated[bool, "Send a duplicate request when slow"] = False,
+        **kwargs: Any,
+    ) -> Annotated[Any, "Result of the call"]:
+        """
+        Call the provider with the resilience policy
+
+        Args:
+            fn (Callable[..., Any]): Function calling the provider
+            *args (Any): Positional arguments of `fn`
+            hedge (bool): Send a duplicate request when the first one is
+                slower than `hedge_delay`, only for idempotent reads
+            **kwargs (Any): Keyword arguments of `fn`
+
+        Returns:
+            Any: Result of the call
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            RateLimitedError: If no rate limit token is available in time
+        """
+        self._count("calls")
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.allow()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(
+                timeout=self.acquire_timeout
+            ):
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.cancel()
+                self._count("rejected")
+                raise RateLimitedError(f"Rate limit of {self.name} exceeded")
+            try:
+                if hedge and self.hedge_delay is not None:
+                    result = self._hedged(fn, args, kwargs)
+                else:
+                    result = fn(*args, **kwargs)
+            except Exception as e:
+                retryable = self.retryable(e)
+                if self.circuit_breaker is not None:
+                    if retryable:
+                        self.circuit_breaker.record_failure()
+                    else:
+                        self.circuit_breaker.record_success()
+                if not retryable or attempt == self.max_attempts:
+                    self._count("failures")
+                    raise
+                self._count("retries")
+                time.sleep(self.backoff(attempt))
+            else:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                return result
+
+    def _hedged(
+        self,
+        fn: Callable[..., Any],
+        args: tuple,
+        kwargs: dict,
+    ) -> Any:
+        """
+        Run `fn`, sending a duplicate when it is slower than `hedge_delay`
+
+        The first request runs on the caller's thread, so calls are not
+        limited by the size of the pool, which only runs the duplicates. The
+        caller's request can't be abandoned: its result is returned when it
+        succeeds, the duplicate's when it fails, saving a retry and its
+        backoff.
+
+        Args:
+            fn (Callable[..., Any]): Function calling the provider
+            args (tuple): Positional arguments of `fn`
+            kwargs (dict): Keyword arguments of `fn`
+
+        Returns:
+            Any: Result of the first request, or of the duplicate when the
+                first one fails
+
+        Raises:
+            Exception: The error of the first request when every request fails
+        """
+        lock = threading.Lock()
+        hedge: list[Future] = []
+        finished = False
+
+        def send_hedge() -> None:
+            """Send the duplicate if the first request is still running"""
+            with lock:
+                if finished or (
+                    self.rate_limiter is not None
+                    and not self.rate_limiter.try_acquire()
+                ):
+                    return
+                self._count("hedges")
+                hedge.append(self._executor.submit(fn, *args, **kwargs))
+
+        timer = threading.Timer(self.hedge_delay, send_hedge)
+        timer.daemon = True
+        timer.start()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with lock:
+                finished = True
+            if not hedge or hedge[0].exception() is not None:
+                raise
+            self._count("hedge_wins")
+            return hedge[0].result()
+        finally:
+            with lock:
+                finished = True
+            timer.cancel()
+
+    def stats(self) -> Annotated[dict, "State and counters"]:
+        """
+        State and counters of the policy, for monitoring
+
+        Returns:
+            dict: Circuit state, consecutive failures, available rate limit
+                tokens and call counters
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        if self.circuit_breaker is not None:
+            stats["circuit"] = self.circuit_breaker.state
+            stats["consecutive_failures"] = self.circuit_breaker.failures
+        if self.rate_limiter is not None:
+            stats["tokens"] = round(self.rate_limiter.tokens, 3)
+        return stats
+
+
+class ResilientProxy:
+    """
+    Proxy routing the method calls of an object through a resilience policy
+
+    Attributes that are not callable are returned as is. Results of the
+    methods in `proxied_results` are wrapped too, e.g. the collections
+    returned by a Chroma client.
+
+    Attributes:
+        target (Any): Proxied object
+        resilience (Resilience): Resilience policy
+        hedged (frozenset[str]): Methods called with hedging
+        proxied_results (frozenset[str]): Methods whose results are proxied
+    """
+
+    def __init__(
+        self,
+        target: Annotated[Any, "Proxied object"],
+        resilience: Annotated[Resilience, "Resilience policy"],
+        hedged: Annotated[frozenset, "Methods called with hedging"] = frozenset(),
+        proxied_results: Annotated[
+            frozenset,
+            "Methods whose results are proxied",
+        ] = frozenset(),
+    ) -> None:
+        """
+        Wrap an object
+
+        Args:
+            target (Any): Proxied object
+            resilience (Resilience): Resilience policy
+            hedged (frozenset[str]): Methods called with hedging, only
+                idempotent reads
+            proxied_results (frozenset[str]): Methods whose results are
+                proxied
+        """
+        self.target = target
+        self.resilience = resilience
+        self.hedged = frozenset(hedged)
+        self.proxied_results = frozenset(proxied_results)
+
+    def __getattr__(self, name: str) -> Any:
+        """
+        Get an attribute of the proxied object, wrapping methods
+
+        Args:
+            name (str): Attribute name
+
+        Returns:
+            Any: Attribute, methods call through the resilience policy
+        """
+        attribute = getattr(self.target, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            """
+            Call the method through the resilience policy
+
+            Returns:
+                Any: Result of the method
+            """
+            result = self.resilience.call(
+                attribute, *args, hedge=name in self.hedged, **kwargs
+            )
+            if name in self.proxied_results:
+                return ResilientProxy(
+                    result, self.resilience, self.hedged, self.proxied_results
+                )
+            return result
+
+        return call
@@ -0,0 +1,127 @@
+from typing import Annotated, Hashable, Optional, Sequence, Union
+
+import numpy as np
+
+SPACES = ("cosine", "l2", "ip")
+
+
+def distances(
+    query: Annotated[np.ndarray, "Query vector"],
+    matrix: Annotated[np.ndarray, "Matrix of vectors, one per row"],
+    space: Annotated[str, "Distance space"] = "cosine",
+) -> Annotated[np.ndarray, "Distance from the query to each row"]:
+    """
+    Compute distances the same way Chroma does for a distance space
+
+    Args:
+        query (np.ndarray): Query vector
+        matrix (np.ndarray): Matrix of vectors, one per row
+        space (str): Distance space, one of "cosine", "l2" or "ip"
+
+    Returns:
+        np.ndarray: Distance from the query to each row
+    """
+    query = np.asarray(query, dtype=np.float32)
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if len(matrix) == 0:
+        return np.empty(0, dtype=np.float32)
+    if space == "cosine":
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        return 1.0 - (matrix @ query) / np.maximum(norms, 1e-12)
+    if space == "l2":
+        diff = matrix - query
+        return np.einsum("ij,ij->i", diff, diff)
+    if space == "ip":
+        return 1.0 - matrix @ query
+    raise ValueError(f"Unsupported distance space: {space}")
+
+
+def distance_to_score(
+    distance: Annotated[Union[float, np.ndarray], "Distances returned by Chroma"],
+    space: Annotated[str, "Distance space"] = "cosine",
+) -> Annotated[Union[float, np.ndarray], "Similarity scores"]:
+    """
+    Convert Chroma distances to similarity scores, higher is more similar
+
+    - cosine: cosine similarity `1 - distance`, in [-1, 1]
+    - ip: inner product `1 - distance`, unbounded
+    - l2: `1 / (1 + distance)` of the squared euclidean distance, in (0, 1]
+
+    Args:
+        distance (Union[float, np.ndarray]): Distances returned by Chroma
+        space (str): Distance space, one of "cosine", "l2" or "ip"
+
+    Returns:
+        Union[float, np.ndarray]: Similarity scores, same shape as distance
+    """
+    if space in ("cosine", "ip"):
+        return 1.0 - distance
+    if space == "l2":
+        return 1.0 / (1.0 + np.maximum(distance, 0.0))
+    raise ValueError(f"Unsupported distance space: {space}")
+
+
+def mmr_select(
+    query: Annotated[np.ndarray, "Query vector"],
+    candidates: Annotated[np.ndarray, "Candidate vectors, one per row"],
+    k: Annotated[int, "Number of candidates to select"],
+    lambda_mult: Annotated[float, "Relevance and diversity trade-off"] = 0.5,
+    groups: Annotated[Optional[Sequence[Hashable]], "Group of each candidate"] = None,
+    max_per_group: Annotated[Optional[int], "Maximum candidates per group"] = None,
+) -> Annotated[list[int], "Positions of the selected candidates"]:
+    """
+    Select candidates by maximal marginal relevance
+
+    Each step picks the candidate maximizing
+    `lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected))`
+    with cosine similarities. The similarities to the query are computed once
+    and the similarity to the selected set is updated with one matrix-vector
+    product per step. With `lambda_mult=1` the relevance order is kept and
+    only the group cap applies.
+
+    Args:
+        query (np.ndarray): Query vector
+        candidates (np.ndarray): Candidate vectors, one per row
+        k (int): Number of candidates to select
+        lambda_mult (float): 1 for relevance only, 0 for diversity only
+        groups (Sequence[Hashable]): Group of each candidate, e.g. its
+            reference ID
+        max_per_group (int): Maximum candidates selected from one group
+
+    Returns:
+        list[int]: Positions of the selected candidates, in selection order
+    """
+    candidates = np.asarray(candidates, dtype=np.float32)
+    if len(candidates) == 0 or k <= 0:
+        return []
+    normalized = candidates / np.maximum(
+        np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12
+    )
+    query = np.asarray(query, dtype=np.float32)
+    relevance = normalized @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    capped = groups is not None and max_per_group is not None
+    if capped:
+        index = {}
+        codes = np.array([index.setdefault(group, len(index)) for group in groups])
+        counts = np.zeros(len(index), dtype=np.int64)
+    selected = []
+    while len(selected) < k and available.any():
+        # Redundancy is -inf until the first pick and never updated with
+        # lambda_mult=1, so it only enters the score once it is finite
+        scores = (
+            relevance
+            if len(selected) == 0 or lambda_mult >= 1
+            else lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        )
+        i = int(np.argmax(np.where(available, scores, -np.inf)))
+        selected.append(i)
+        available[i] = False
+        if capped:
+            counts[codes[i]] += 1
+            if counts[codes[i]] >= max_per_group:
+                available &= codes != codes[i]
+        if lambda_mult < 1:
+            redundancy = np.maximum(redundancy, normalized @ normalized[i])
+    return selected
@@ -0,0 +1,675 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Annotated, Optional
+
+import nanoid
+from pydantic import BaseModel, Field
+
+from core.cache import connect
+from core.models.chat import ChatMessage, ChatMessageRole
+
+
+class ChatSession(BaseModel):
+    """
+    Chat session
+
+    Attributes:
+        id (str): Session ID
+        messages (list[ChatMessage]): Messages of the session
+        updated_at (float): Unix time of the last change
+    """
+
+    id: str = Field(
+        ...,
+        title="Session ID",
+        description="Session ID",
+        examples=["Uj9uY4N41cpSZb0MHBY_w"],
+    )
+    messages: list[ChatMessage] = Field(
+        default_factory=list,
+        title="Messages",
+        description="Messages of the session",
+    )
+    updated_at: float = Field(
+        ...,
+        title="Updated at",
+        description="Unix time of the last change",
+    )
+
+
+class SessionStore(ABC):
+    """
+    Store of chat sessions, sessions expire `ttl` seconds after their last change
+
+    Attributes:
+        ttl (float): Seconds a session is kept after its last change, None to
+            keep sessions forever
+    """
+
+    def __init__(
+        self,
+        ttl: Annotated[Optional[float], "Seconds a session is kept"] = None,
+    ) -> None:
+        """
+        Create a session store
+
+        Args:
+            ttl (float): Seconds a session is kept after its last change, None
+                to keep sessions forever
+        """
+        self.ttl = ttl
+
+    def expired(
+        self,
+        updated_at: Annotated[float, "Unix time of the last change"],
+    ) -> Annotated[bool, "Whether the session is expired"]:
+        """
+        Whether a session changed at `updated_at` is expired
+
+        Args:
+            updated_at (float): Unix time of the last change
+
+        Returns:
+            bool: True if the session is expired
+        """
+        return self.ttl is not None and updated_at + self.ttl < time.time()
+
+    def create(
+        self,
+        messages: Annotated[
+            Optional[list[ChatMessage]],
+            "Initial messages",
+        ] = None,
+    ) -> Annotated[ChatSession, "New session"]:
+        """
+        Create a session
+
+        Args:
+            messages (list[ChatMessage]): Initial messages
+
+        Returns:
+            ChatSession: New session
+        """
+        session = ChatSession(
+            id=nanoid.generate(),
+            messages=list(messages or []),
+            updated_at=time.time(),
+        )
+        self.save(session)
+        return session
+
+    @abstractmethod
+    def save(self, session: Annotated[ChatSession, "Session"]) -> None:
+        """
+        Create or replace a session
+
+        Args:
+            session (ChatSession): Session
+        """
+
+    @abstractmethod
+    def get(
+        self,
+        session_id: Annotated[str, "Session ID"],
+    ) -> Annotated[Optional[ChatSession], "Session, None if missing or expired"]:
+        """
+        Get a session
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            Optional[ChatSession]: Session, None if missing or expired
+        """
+
+    @abstractmethod
+    def append(
+        self,
+        session_id: Annotated[str, "Session ID"],
+        messages: Annotated[list[ChatMessage], "Messages to append"],
+    ) -> Annotated[ChatSession, "Updated session"]:
+        """
+        Append messages to a session
+
+        Args:
+            session_id (str): Session ID
+            messages (list[ChatMessage]): Messages to append
+
+        Returns:
+            ChatSession: Updated session
+
+        Raises:
+            KeyError: If the session is missing or expired
+        """
+
+    def extend(
+        self,
+        session_id: Annotated[str, "Session ID"],
+        messages: Annotated[list[ChatMessage], "Messages to append"],
+    ) -> Annotated[tuple[float, int], "Version of the updated session"]:
+        """
+        Append messages to a session without reading it back
+
+        Args:
+            session_id (str): Session ID
+            messages (list[ChatMessage]): Messages to append
+
+        Returns:
+            tuple[float, int]: Unix time of the last change and number of
+                messages of the updated session
+
+        Raises:
+            KeyError: If the session is missing or expired
+        """
+        session = self.append(session_id, messages)
+        return session.updated_at, len(session.messages)
+
+    def messages_from(
+        self,
+        session_id: Annotated[str, "Session ID"],
+        start: Annotated[int, "Position of the first message"],
+    ) -> Annotated[
+        Optional[ChatSession],
+        "Session with the messages from start, None if missing or expired",
+    ]:
+        """
+        Get a session with only its messages from a position on
+
+        Args:
+            session_id (str): Session ID
+            start (int): Position of the first message
+
+        Returns:
+            Optional[ChatSession]: Session with the messages from `start`,
+                None if missing or expired
+        """
+        session = self.get(session_id)
+        if session is None:
+            return None
+        return session.model_copy(update={"messages": session.messages[start:]})
+
+    def version(
+        self,
+        session_id: Annotated[str, "Session ID"],
+    ) -> Annotated[
+        Optional[tuple[float, int]],
+        "Last change and number of messages, None if missing or expired",
+    ]:
+        """
+        Version of a session, changed by every write
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            Optional[tuple[float, int]]: Unix time of the last change and
+                number of messages, None if missing or expired
+        """
+        session = self.get(session_id)
+        if session is None:
+            return None
+        return session.updated_at, len(session.messages)
+
+    @abstractmethod
+    def delete(self, session_id: Annotated[str, "Session ID"]) -> None:
+        """
+        Delete a session
+
+        Args:
+            session_id (str): Session ID
+        """
+
+    @abstractmethod
+    def evict_expired(self) -> Annotated[int, "Number of evicted sessions"]:
+        """
+        Delete every expired session
+
+        Returns:
+            int: Number of evicted sessions
+        """
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store persisted in SQLite, messages are appended row by row
+
+    Attributes:
+        path (str): Path of the database file
+    """
+
+    def __init__(
+        self,
+        path: Annotated[str, "Path of the database file"],
+        ttl: Annotated[Optional[float], "Seconds a session is kept"] = None,
+    ) -> None:
+        """
+        Open or create the database
+
+        Args:
+            path (str): Path of the database file
+            ttl (float): Seconds a session is kept after its last change
+        """
+        super().__init__(ttl=ttl)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = connect(path)
+        with self._lock, self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    id TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS messages (
+                    session_id TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    PRIMARY KEY (session_id, position)
+                );
+                """
+            )
+
+    def save(self, session: ChatSession) -> None:
+        """
+        Create or replace a session
+
+        Args:
+            session (ChatSession): Session
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM messages WHERE session_id = ?", (session.id,)
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sessions (id, updated_at) VALUES (?, ?)",
+                (session.id, session.updated_at),
+            )
+            self._connection.executemany(
+                "INSERT INTO messages (session_id, position, role, content)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (session.id, i, m.role.value, m.content)
+                    for i, m in enumerate(session.messages)
+                ],
+            )
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """
+        Get a session
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            Optional[ChatSession]: Session, None if missing or expired
+        """
+        return self.messages_from(session_id, 0)
+
+    def messages_from(self, session_id: str, start: int) -> Optional[ChatSession]:
+        """
+        Get a session, reading only the rows of the messages from `start`
+
+        Args:
+            session_id (str): Session ID
+            start (int): Position of the first message
+
+        Returns:
+            Optional[ChatSession]: Session with the messages from `start`,
+                None if missing or expired
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None or self.expired(row[0]):
+                return None
+            messages = self._connection.execute(
+                "SELECT role, content FROM messages"
+                " WHERE session_id = ? AND position >= ? ORDER BY position",
+                (session_id, start),
+            ).fetchall()
+        return ChatSession(
+            id=session_id,
+            messages=[
+                ChatMessage(role=ChatMessageRole(role), content=content)
+                for role, content in messages
+            ],
+            updated_at=row[0],
+        )
+
+    def version(self, session_id: str) -> Optional[tuple[float, int]]:
+        """
+        Version of a session, without reading its messages
+
+        Positions run from 0, so the number of messages is the last position
+        plus one, found in the primary key index without counting the rows.
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            Optional[tuple[float, int]]: Unix time of the last change and
+                number of messages, None if missing or expired
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT updated_at, (SELECT COALESCE(MAX(position) + 1, 0)"
+                " FROM messages WHERE session_id = ?) FROM sessions WHERE id = ?",
+                (session_id, session_id),
+            ).fetchone()
+        if row is None or self.expired(row[0]):
+            return None
+        return row[0], row[1]
+
+    def append(self, session_id: str, messages: list[ChatMessage]) -> ChatSession:
+        """
+        Append messages to a session without rewriting the previous ones
+
+        Args:
+            session_id (str): Session ID
+            messages (list[ChatMessage]): Messages to append
+
+        Returns:
+            ChatSession: Updated session
+
+        Raises:
+            KeyError: If the session is missing or expired
+        """
+        self.extend(session_id, messages)
+        return self.get(session_id)
+
+    def extend(self, session_id: str, messages: list[ChatMessage]) -> tuple[float, int]:
+        """
+        Insert the new messages only
+
+        Args:
+            session_id (str): Session ID
+            messages (list[ChatMessage]): Messages to append
+
+        Returns:
+            tuple[float, int]: Unix time of the last change and number of
+                messages of the updated session
+
+        Raises:
+            KeyError: If the session is missing or expired
+        """
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None or self.expired(row[0]):
+                raise KeyError(session_id)
+            # Positions are computed by the insert itself, so appends from
+            # several processes sharing the database don't collide
+            self._connection.executemany(
+                "INSERT INTO messages (session_id, position, role, content)"
+                " SELECT ?, COALESCE(MAX(position) + 1, 0), ?, ? FROM messages"
+                " WHERE session_id = ?",
+                [(session_id, m.role.value, m.content, session_id) for m in messages],
+            )
+            self._connection.execute(
+                "UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id)
+            )
+            (count,) = self._connection.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM messages"
+                " WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+        return now, count
+
+    def delete(self, session_id: str) -> None:
+        """
+        Delete a session
+
+        Args:
+            session_id (str): Session ID
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM messages WHERE session_id = ?", (session_id,)
+            )
+            self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def evict_expired(self) -> int:
+        """
+        Delete every expired session
+
+        Returns:
+            int: Number of evicted sessions
+        """
+        if self.ttl is None:
+            return 0
+        deadline = time.time() - self.ttl
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM messages WHERE session_id IN"
+                " (SELECT id FROM sessions WHERE updated_at < ?)",
+                (deadline,),
+            )
+            return self._connection.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (deadline,)
+            ).rowcount
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    In-memory session store, optionally backed by another store
+
+    Writes go to both stores so sessions survive restarts and are shared by
+    every worker. The backing store is authoritative: the copy in memory is
+    served only while its version matches the backing store, so turns added
+    by another worker are read back before they are missed. Only the
+    messages missing from the copy are read back, and a write that no other
+    worker raced is applied to the copy without reading anything.
+
+    Attributes:
+        backing (SessionStore): Backing store, None to keep sessions in memory
+            only
+    """
+
+    def __init__(
+        self,
+        ttl: Annotated[Optional[float], "Seconds a session is kept"] = None,
+        backing: Annotated[Optional[SessionStore], "Backing store"] = None,
+    ) -> None:
+        """
+        Create an in-memory session store
+
+        Args:
+            ttl (float): Seconds a session is kept after its last change
+            backing (SessionStore): Backing store, None to keep sessions in
+                memory only
+        """
+        super().__init__(ttl=ttl)
+        self.backing = backing
+        self._sessions: dict[str, ChatSession] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _copy(session: ChatSession) -> ChatSession:
+        """
+        Copy a session so callers can't change the stored message list
+
+        Messages are never modified in place, so they are shared.
+
+        Args:
+            session (ChatSession): Session
+
+        Returns:
+            ChatSession: Copy of the session
+        """
+        return session.model_copy(update={"messages": list(session.messages)})
+
+    def save(self, session: ChatSession) -> None:
+        """
+        Create or replace a session
+
+        Args:
+            session (ChatSession): Session
+        """
+        with self._lock:
+            self._sessions[session.id] = self._copy(session)
+        if self.backing is not None:
+            self.backing.save(session)
+
+    def get(self, session_id: str) -> Optional[ChatSession]:
+        """
+        Get a session
+
+        Args:
+            session_id (str): Session ID
+
+        Returns:
+            Optional[ChatSession]: Session, None if missing or expired
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and self.expired(session.updated_at):
+                del self._sessions[session_id]
+                session = None
+        if self.backing is not None:
+            version = self.backing.version(session_id)
+            if version is None:
+                with self._lock:
+                    self._sessions.pop(session_id, None)
+                return None
+            if session is None or version != (
+                session.updated_at,
+                len(session.messages),
+            ):
+                session = self._read_back(session_id, session, version[1])
+                if session is None:
+                    return None
+        return self._copy(session) if session is not None else None
+
+    def _read_back(
+        self,
+        session_id: str,
+        cached: Optional[ChatSession],
+        count: int,
+    ) -> Optional[ChatSession]:
+        """
+        Refresh the copy in memory from the backing store
+
+        Only the messages after the copy are read when the backing store has
+        more of them, the whole session otherwise.
+
+        Args:
+            session_id (str): Session ID
+            cached (ChatSession): Copy in memory, None when missing
+            count (int): Number of messages in the backing store
+
+        Returns:
+            Optional[ChatSession]: Session, None if missing or expired
+        """
+        start = 0
+        if cached is not None and count > len(cached.messages):
+            start = len(cached.messages)
+        session = self.backing.messages_from(session_id, start)
+        if session is None:
+            return None
+        if start > 0:
+            session = session.model_copy(
+                update={"messages": [*cached.messages, *session.messages]}
+            )
+        with self._lock:
+            self._sessions[session_id] = session
+        return session
+
+    def append(self, session_id: str, messages: list[ChatMessage]) -> ChatSession:
+        """
+        Append messages to a session
+
+        Args:
+            session_id (str): Session ID
+            messages (list[ChatMessage]): Messages to append
+
+        Returns:
+            ChatSession: Updated session, with the turns of other workers
+
+        Raises:
+            KeyError: If the session is missing or expired
+        """
+        self.extend(session_id, messages)
+        session = self.get(session_id)
+        if session is None:
+            raise KeyError(session_id)
+        return session
+
+    def extend(self, session_id: str, messages: list[ChatMessage]) -> tuple[float, int]:
+        """
+        Append messages to a session without reading it back
+
+        With a backing store, the copy in memory is extended when the write
+        moved the backing store exactly one step past it, so no other worker
+        wrote in between. Otherwise the next `get` reads the new messages.
+
+        Args:
+            session_id (str): Session ID
+            messages (list[ChatMessage]): Messages to append
+
+        Returns:
+            tuple[float, int]: Unix time of the last change and number of
+                messages of the updated session
+
+        Raises:
+            KeyError: If the session is missing or expired
+        """
+        if self.backing is not None:
+            with self._lock:
+                cached = self._sessions.get(session_id)
+            version = self.backing.extend(session_id, messages)
+            with self._lock:
+                if (
+                    cached is not None
+                    and self._sessions.get(session_id) is cached
+                    and version[1] == len(cached.messages) + len(messages)
+                ):
+                    self._sessions[session_id] = cached.model_copy(
+                        update={
+                            "messages": [*cached.messages, *messages],
+                            "updated_at": version[0],
+                        }
+                    )
+            return version
+        if self.get(session_id) is None:
+            raise KeyError(session_id)
+        with self._lock:
+            session = self._sessions[session_id]
+            session.messages.extend(messages)
+            session.updated_at = time.time()
+            return session.updated_at, len(session.messages)
+
+    def delete(self, session_id: str) -> None:
+        """
+        Delete a session
+
+        Args:
+            session_id (str): Session ID
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.backing is not None:
+            self.backing.delete(session_id)
+
+    def evict_expired(self) -> int:
+        """
+        Delete every expired session
+
+        Returns:
+            int: Number of sessions evicted from memory
+        """
+        with self._lock:
+            expired = [
+                session_id
+                for session_id, session in self._sessions.items()
+                if self.expired(session.updated_at)
+            ]
+            for session_id in expired:
+                del self._sessions[session_id]
+        if self.backing is not None:
+            self.backing.evict_expired()
+        return len(expired)
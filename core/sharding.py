@@ -0,0 +1,274 @@
+import hashlib
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Optional, Sequence, Tuple
+
+import chromadb
+import chromadb.api.client
+import nanoid
+from chromadb.utils import embedding_functions
+
+from core.models.documents import Document
+from core.models.index import HnswIndexParams
+from core.vector_store import VectorStore
+
+SHARD_COUNT_KEY = "shard:count"
+SHARD_INDEX_KEY = "shard:index"
+
+
+def shard_for(
+    key: Annotated[str, "Routing key, usually the reference ID"],
+    shard_count: Annotated[int, "Number of shards"],
+) -> Annotated[int, "Index of the owning shard"]:
+    """
+    Stable shard index of a routing key
+
+    Python's `hash` is salted per process, so a digest is used to keep the
+    routing identical across workers and restarts.
+
+    Args:
+        key (str): Routing key, usually the reference ID
+        shard_count (int): Number of shards
+
+    Returns:
+        int: Index of the owning shard
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shard_count
+
+
+def shard_collection_name(
+    collection_name: Annotated[str, "Collection name"],
+    index: Annotated[int, "Shard index"],
+) -> Annotated[str, "Name of the shard collection"]:
+    """
+    Name of the Chroma collection holding a shard
+
+    Args:
+        collection_name (str): Collection name
+        index (int): Shard index
+
+    Returns:
+        str: Name of the shard collection
+    """
+    return f"{collection_name}_shard{index}"
+
+
+class ShardedVectorStore:
+    """
+    Vector store spread over several collections or Chroma hosts
+
+    Documents are routed to a shard by the hash of their reference ID, or of
+    their parent ID when they have none. Searches fan out to every shard in
+    parallel and the top-k are merged. The API routes don't use it yet, they
+    open one collection per name through `CollectionRouter`.
+
+    Attributes:
+        collection_name (str): Collection name
+        shard_count (int): Number of shards
+        shards (list[VectorStore]): One vector store per shard
+    """
+
+    def __init__(
+        self,
+        collection_name: Annotated[
+            str,
+            "Collection name",
+        ] = "default_collection",
+        shard_count: Annotated[
+            Optional[int],
+            "Number of shards, read from the collection when not set",
+        ] = None,
+        clients: Annotated[
+            Optional[Sequence[chromadb.api.client.Client]],
+            "Chroma clients, shards are assigned to them round-robin",
+        ] = None,
+        embeddings: Annotated[
+            Optional[chromadb.Embeddings],
+            "Embeddings function",
+        ] = embedding_functions.DefaultEmbeddingFunction(),
+        index_params: Annotated[
+            Optional[HnswIndexParams],
+            "HNSW index parameters, used when the shards are created",
+        ] = None,
+    ) -> None:
+        """
+        Open or create a sharded collection
+
+        The shard count is stored in the metadata of every shard, so it only
+        has to be given when the collection is created.
+
+        Args:
+            collection_name (str): Collection name
+            shard_count (int): Number of shards, read from the collection when
+                not set
+            clients (Sequence[chromadb.api.client.Client]): Chroma clients,
+                shards are assigned to them round-robin
+            embeddings (chromadb.Embeddings): Embeddings function
+            index_params (HnswIndexParams): HNSW index parameters, used when
+                the shards are created
+
+        Raises:
+            ValueError: If shard_count differs from the existing collection
+        """
+        clients = list(clients or [chromadb.Client()])
+        existing = self._existing_shard_count(collection_name, clients[0])
+        if shard_count is None:
+            shard_count = existing or 1
+        if existing is not None and existing != shard_count:
+            raise ValueError(
+                f"Collection {collection_name} has {existing} shards,"
+                f" got shard_count={shard_count}"
+            )
+        self.collection_name = collection_name
+        self.shard_count = shard_count
+        self.embeddings = embeddings
+        self.shards = [
+            VectorStore(
+                collection_name=shard_collection_name(collection_name, i),
+                client=clients[i % len(clients)],
+                embeddings=embeddings,
+                index_params=index_params,
+                metadata={SHARD_COUNT_KEY: shard_count, SHARD_INDEX_KEY: i},
+            )
+            for i in range(shard_count)
+        ]
+
+    @staticmethod
+    def _existing_shard_count(
+        collection_name: str,
+        client: chromadb.api.client.Client,
+    ) -> Optional[int]:
+        """
+        Shard count stored in the first shard, if it exists
+
+        Args:
+            collection_name (str): Collection name
+            client (chromadb.api.client.Client): Client holding the first shard
+
+        Returns:
+            Optional[int]: Shard count, None for a new collection
+        """
+        try:
+            collection = client.get_collection(
+                name=shard_collection_name(collection_name, 0)
+            )
+        except Exception:
+            return None
+        return (collection.metadata or {}).get(SHARD_COUNT_KEY)
+
+    def shard_of(
+        self,
+        reference_id: Annotated[str, "Reference ID"],
+    ) -> Annotated[VectorStore, "Owning shard"]:
+        """
+        Shard owning a reference ID
+
+        Args:
+            reference_id (str): Reference ID
+
+        Returns:
+            VectorStore: Owning shard
+        """
+        return self.shards[shard_for(reference_id, self.shard_count)]
+
+    def add_documents(
+        self,
+        documents: Annotated[list[str], "List of documents"],
+        reference_id: Annotated[Optional[str], "Reference ID"] = None,
+        metadata: Annotated[Optional[dict], "Metadata of the documents"] = None,
+    ) -> Annotated[list[str], "List of document IDs"]:
+        """
+        Add documents to the shard owning their reference ID
+
+        Documents without a reference ID are routed by the parent ID they
+        are given, so every chunk of one parent lands on the same shard and
+        can be expanded from there.
+
+        Args:
+            documents (list[str]): List of documents
+            reference_id (str): Reference ID
+            metadata (dict): Metadata of the documents
+
+        Returns:
+            list[str]: List of document IDs, in the order of the documents
+        """
+        if reference_id is not None:
+            return self.shard_of(reference_id).add_documents(
+                documents, reference_id=reference_id, metadata=metadata
+            )
+        parent_id = nanoid.generate()
+        return self.shards[shard_for(parent_id, self.shard_count)].add_documents(
+            documents, metadata=metadata, parent_id=parent_id
+        )
+
+    def similarity_search(
+        self,
+        query: Annotated[str, "Query string"],
+        reference_id: Annotated[Optional[str], "Reference ID"] = None,
+        k: Annotated[int, "Number of result documents"] = 3,
+        search_ef: Annotated[
+            Optional[int],
+            "Search effort, size of the HNSW candidate list for this query",
+        ] = None,
+        where: Annotated[Optional[dict], "Metadata filter expression"] = None,
+        filter_strategy: Annotated[str, "Filter strategy, pre or post"] = "pre",
+        min_score: Annotated[
+            Optional[float],
+            "Minimum similarity score of the results",
+        ] = None,
+    ) -> list[Tuple[Document, float]]:
+        """
+        Search every shard in parallel and merge the top-k
+
+        The query is embedded once. A search filtered by reference ID only
+        goes to the owning shard.
+
+        Args:
+            query (str): Query string
+            reference_id (str): Reference ID
+            k (int): Number of result documents
+            search_ef (int): Search effort, size of the HNSW candidate list
+                for this query
+            where (dict): Metadata filter expression
+            filter_strategy (str): Filter strategy, pre or post
+            min_score (float): Minimum similarity score of the results
+
+        Returns:
+            list[Tuple[Document, float]]: List of documents and their scores,
+                best first
+        """
+        embedding = self.shards[0].embed([query])[0]
+        options = {
+            "k": k,
+            "search_ef": search_ef,
+            "where": where,
+            "filter_strategy": filter_strategy,
+            "min_score": min_score,
+        }
+        if reference_id is not None:
+            return self.shard_of(reference_id).similarity_search_by_vector(
+                embedding, reference_id=reference_id, **options
+            )
+        with ThreadPoolExecutor(max_workers=self.shard_count) as executor:
+            results = executor.map(
+                lambda shard: shard.similarity_search_by_vector(embedding, **options),
+                self.shards,
+            )
+            return heapq.nlargest(
+                k,
+                (hit for result in results for hit in result),
+                key=lambda hit: hit[1],
+            )
+
+    def delete_by_reference_id(
+        self,
+        reference_id: Annotated[str, "Reference ID"],
+    ) -> None:
+        """
+        Delete documents by reference_id from the owning shard
+
+        Args:
+            reference_id (str): Reference ID
+        """
+        self.shard_of(reference_id).delete_by_reference_id(reference_id=reference_id)
@@ -0,0 +1,119 @@
+import threading
+from typing import Annotated, Any, Callable, Hashable, Optional
+
+from core.cache import LRUCache
+
+_MISSING = object()
+
+
+class _Call:
+    """In-flight computation shared by the callers of the same key"""
+
+    def __init__(self) -> None:
+        """Create a pending call"""
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into one computation
+
+    The first caller of a key runs the function, callers arriving while it is
+    in flight wait for it and get the same result. With a TTL, results are
+    also cached for that many seconds. Keys live in namespaces, e.g. a
+    collection name, and `invalidate` drops every cached result of a
+    namespace so writes are visible to the next call.
+
+    Results are shared between callers and must not be modified.
+
+    Attributes:
+        ttl (float): Seconds a result is cached, None or 0 to only coalesce
+            in-flight calls
+    """
+
+    def __init__(
+        self,
+        ttl: Annotated[Optional[float], "Seconds a result is cached"] = None,
+        max_entries: Annotated[int, "Maximum number of cached results"] = 1024,
+    ) -> None:
+        """
+        Create a single-flight group
+
+        Args:
+            ttl (float): Seconds a result is cached, None or 0 to only
+                coalesce in-flight calls
+            max_entries (int): Maximum number of cached results
+        """
+        self.ttl = ttl
+        self.results = LRUCache(max_entries=max_entries, ttl=ttl) if ttl else None
+        self._calls: dict[Hashable, _Call] = {}
+        self._generations: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self,
+        key: Annotated[Hashable, "Key of the call"],
+        fn: Annotated[Callable[[], Any], "Computation"],
+        namespace: Annotated[Hashable, "Namespace of the key"] = None,
+    ) -> Annotated[Any, "Result of the computation"]:
+        """
+        Run `fn` once for every concurrent caller of the same key
+
+        Args:
+            key (Hashable): Key of the call
+            fn (Callable[[], Any]): Computation
+            namespace (Hashable): Namespace of the key, invalidated together
+
+        Returns:
+            Any: Result of the computation, shared between the callers
+
+        Raises:
+            BaseException: The error raised by `fn`, to every waiting caller
+        """
+        with self._lock:
+            full_key = (namespace, self._generations.get(namespace, 0), key)
+            if self.results is not None:
+                result = self.results.get(full_key, _MISSING)
+                if result is not _MISSING:
+                    return result
+            call = self._calls.get(full_key)
+            leader = call is None
+            if leader:
+                call = self._calls[full_key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[full_key]
+                current = full_key[1] == self._generations.get(namespace, 0)
+                if self.results is not None and call.error is None and current:
+                    self.results.set(full_key, call.result)
+            call.done.set()
+        return call.result
+
+    def invalidate(
+        self,
+        namespace: Annotated[Hashable, "Namespace to invalidate"] = None,
+    ) -> None:
+        """
+        Drop the cached results of a namespace
+
+        Calls started before the invalidation are not joined by later callers.
+
+        Args:
+            namespace (Hashable): Namespace to invalidate
+        """
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
@@ -0,0 +1,303 @@
+import json
+import os
+from itertools import islice
+from typing import Annotated, BinaryIO, Iterator, Optional, Tuple
+
+import chromadb
+import chromadb.api.client
+import numpy as np
+from pydantic import BaseModel, Field
+
+from core.models.index import HnswIndexParams
+from core.vector_store import VectorStore
+
+MANIFEST_FILE = "manifest.json"
+RECORDS_FILE = "records.jsonl"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+#: Version of the export format, bumped on incompatible changes
+FORMAT_VERSION = 1
+
+#: Bytes reserved for the header of the embeddings file, the shape is only
+#: known once every page is written
+NPY_HEADER_SIZE = 128
+
+
+class ExportManifest(BaseModel):
+    """
+    Manifest of an exported collection
+
+    Attributes:
+        format_version (int): Version of the export format
+        collection_name (str): Name of the exported collection
+        count (int): Number of exported records
+        dimensions (int): Dimensions of the embeddings
+        index_params (HnswIndexParams): HNSW index parameters of the collection
+        metadata (dict): Other collection metadata
+    """
+
+    model_config = {
+        "title": "Export Manifest",
+    }
+    format_version: int = Field(
+        FORMAT_VERSION,
+        title="Format version",
+        description="Version of the export format",
+    )
+    collection_name: str = Field(
+        ...,
+        title="Collection name",
+        description="Name of the exported collection",
+        examples=["geography"],
+    )
+    count: int = Field(
+        ...,
+        title="Count",
+        description="Number of exported records",
+        examples=[1000],
+    )
+    dimensions: int = Field(
+        ...,
+        title="Dimensions",
+        description="Dimensions of the embeddings, 0 when the collection is empty",
+        examples=[768],
+    )
+    index_params: HnswIndexParams = Field(
+        default_factory=HnswIndexParams,
+        title="Index parameters",
+        description="HNSW index parameters of the collection",
+    )
+    metadata: dict = Field(
+        default_factory=dict,
+        title="Metadata",
+        description="Collection metadata other than the index parameters",
+    )
+
+
+def write_npy_header(
+    file: Annotated[BinaryIO, "Embeddings file, positioned at its start"],
+    shape: Annotated[Tuple[int, int], "Shape of the float32 matrix"],
+) -> None:
+    """
+    Write a version 1.0 `.npy` header of exactly NPY_HEADER_SIZE bytes
+
+    The header is padded with spaces so it can be rewritten in place once the
+    number of rows is known.
+
+    Args:
+        file (BinaryIO): Embeddings file, positioned at its start
+        shape (Tuple[int, int]): Shape of the float32 matrix
+    """
+    magic = np.lib.format.magic(1, 0)
+    header = repr({"descr": "<f4", "fortran_order": False, "shape": shape})
+    length = NPY_HEADER_SIZE - len(magic) - 2
+    file.write(magic)
+    file.write(length.to_bytes(2, "little"))
+    file.write(header.ljust(length - 1).encode("latin1") + b"\n")
+
+
+def export_collection(
+    vector_store: Annotated[VectorStore, "Vector store to export"],
+    path: Annotated[str, "Export directory"],
+    page_size: Annotated[int, "Records read from Chroma at once"] = 1000,
+) -> Annotated[ExportManifest, "Manifest of the export"]:
+    """
+    Stream a collection into a directory, one page at a time
+
+    The directory holds `records.jsonl` with the id, document and metadata of
+    each record, `embeddings.npy` with the float32 embeddings in the same
+    order, and `manifest.json`, written last, so an export without a manifest
+    is incomplete. Memory use is bounded by one page.
+
+    Args:
+        vector_store (VectorStore): Vector store to export
+        path (str): Export directory, created if missing
+        page_size (int): Records read from Chroma at once
+
+    Returns:
+        ExportManifest: Manifest of the export
+    """
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    count = 0
+    dimensions = 0
+    with (
+        open(os.path.join(path, RECORDS_FILE), "w", encoding="utf-8") as records,
+        open(os.path.join(path, EMBEDDINGS_FILE), "wb") as embeddings,
+    ):
+        write_npy_header(embeddings, (0, 0))
+        while True:
+            page = vector_store.collection.get(
+                limit=page_size,
+                offset=count,
+                include=["documents", "metadatas", "embeddings"],
+            )
+            if len(page["ids"]) == 0:
+                break
+            matrix = np.asarray(page["embeddings"], dtype="<f4")
+            dimensions = matrix.shape[1]
+            embeddings.write(np.ascontiguousarray(matrix).tobytes())
+            for id, document, metadata in zip(
+                page["ids"], page["documents"], page["metadatas"]
+            ):
+                records.write(
+                    json.dumps(
+                        {"id": id, "document": document, "metadata": metadata},
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+            count += len(page["ids"])
+            if len(page["ids"]) < page_size:
+                break
+        embeddings.seek(0)
+        write_npy_header(embeddings, (count, dimensions))
+
+    metadata = vector_store.collection.metadata or {}
+    manifest = ExportManifest(
+        collection_name=vector_store.collection.name,
+        count=count,
+        dimensions=dimensions,
+        index_params=HnswIndexParams.from_metadata(metadata),
+        metadata={
+            key: value for key, value in metadata.items() if not key.startswith("hnsw:")
+        },
+    )
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        file.write(manifest.model_dump_json(indent=2))
+    return manifest
+
+
+def read_manifest(
+    path: Annotated[str, "Export directory"],
+) -> Annotated[ExportManifest, "Manifest of the export"]:
+    """
+    Read the manifest of an export
+
+    Args:
+        path (str): Export directory
+
+    Returns:
+        ExportManifest: Manifest of the export
+
+    Raises:
+        FileNotFoundError: If the export is missing or incomplete
+        ValueError: If the export format is not supported
+    """
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as file:
+        manifest = ExportManifest.model_validate_json(file.read())
+    if manifest.format_version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported export format version {manifest.format_version}")
+    return manifest
+
+
+def iter_batches(
+    path: Annotated[str, "Export directory"],
+    batch_size: Annotated[int, "Records per batch"] = 1000,
+) -> Iterator[Tuple[list[dict], np.ndarray]]:
+    """
+    Read the records of an export in batches, with their embeddings
+
+    Embeddings are memory mapped, only one batch is copied at a time.
+
+    Args:
+        path (str): Export directory
+        batch_size (int): Records per batch
+
+    Yields:
+        Tuple[list[dict], np.ndarray]: Records and their float32 embeddings
+
+    Raises:
+        ValueError: If the records and embeddings do not match the manifest
+    """
+    manifest = read_manifest(path)
+    if manifest.count == 0:
+        return
+    embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+    if embeddings.shape[0] != manifest.count:
+        raise ValueError(
+            f"Expected {manifest.count} embeddings, found {embeddings.shape[0]}"
+        )
+    start = 0
+    with open(os.path.join(path, RECORDS_FILE), encoding="utf-8") as file:
+        while True:
+            records = [json.loads(line) for line in islice(file, batch_size)]
+            if len(records) == 0:
+                break
+            yield records, np.array(embeddings[start : start + len(records)])
+            start += len(records)
+    if start != manifest.count:
+        raise ValueError(f"Expected {manifest.count} records, found {start}")
+
+
+def import_collection(
+    vector_store: Annotated[VectorStore, "Vector store to load into"],
+    path: Annotated[str, "Export directory"],
+    batch_size: Annotated[int, "Records written to Chroma at once"] = 1000,
+) -> Annotated[int, "Number of imported records"]:
+    """
+    Bulk load an export into a collection without calling the embedder
+
+    Records are upserted, so an interrupted import can be run again. Create
+    the vector store with the index parameters and metadata of the manifest
+    to rebuild the same index.
+
+    Args:
+        vector_store (VectorStore): Vector store to load into
+        path (str): Export directory
+        batch_size (int): Records written to Chroma at once
+
+    Returns:
+        int: Number of imported records
+    """
+    count = 0
+    for records, embeddings in iter_batches(path, batch_size):
+        vector_store.collection.upsert(
+            ids=[record["id"] for record in records],
+            documents=[record["document"] for record in records],
+            metadatas=[record["metadata"] or None for record in records],
+            embeddings=list(embeddings),
+        )
+        count += len(records)
+    if vector_store.quantized_index is not None:
+        # The upserts bypass the quantized index, its codes are rebuilt
+        vector_store.quantized_index.build()
+    vector_store.invalidate()
+    return count
+
+
+def open_import_target(
+    path: Annotated[str, "Export directory"],
+    client: Annotated[chromadb.api.client.Client, "Chroma client"],
+    collection_name: Annotated[
+        Optional[str],
+        "Target collection, the exported name when not set",
+    ] = None,
+    embeddings: Annotated[
+        Optional[chromadb.Embeddings],
+        "Embeddings function of the target, used by later queries",
+    ] = None,
+) -> Annotated[VectorStore, "Vector store with the exported index settings"]:
+    """
+    Open the vector store an export is imported into, with the exported
+    index parameters and collection metadata
+
+    Args:
+        path (str): Export directory
+        client (chromadb.api.client.Client): Chroma client
+        collection_name (str): Target collection, the exported name when not set
+        embeddings (chromadb.Embeddings): Embeddings function of the target
+
+    Returns:
+        VectorStore: Vector store with the exported index settings
+    """
+    manifest = read_manifest(path)
+    return VectorStore(
+        collection_name=collection_name or manifest.collection_name,
+        client=client,
+        embeddings=embeddings,
+        index_params=manifest.index_params,
+        metadata=manifest.metadata,
+    )
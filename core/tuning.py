@@ -0,0 +1,132 @@
+import itertools
+import time
+from typing import Annotated, Sequence
+
+import chromadb
+import chromadb.api.client
+import numpy as np
+from pydantic import BaseModel, Field
+
+from core.evaluation import exact_top_k, latency_summary, recall_at_k
+from core.models.index import HnswIndexParams
+
+
+class HnswTuningReport(BaseModel):
+    """
+    Recall and latency of one HNSW parameter combination
+
+    Attributes:
+        M (int): Maximum number of neighbours of each node
+        construction_ef (int): Size of the candidate list while building
+        search_ef (int): Size of the candidate list while searching
+        build_seconds (float): Time spent inserting the documents
+        recall_at_k (float): Recall against exact search
+        mean_ms (float): Mean query latency in milliseconds
+        p95_ms (float): 95th percentile query latency in milliseconds
+    """
+
+    M: int = Field(..., title="M", description="Neighbours of each node")
+    construction_ef: int = Field(
+        ..., title="Construction ef", description="Build candidate list size"
+    )
+    search_ef: int = Field(
+        ..., title="Search ef", description="Search candidate list size"
+    )
+    build_seconds: float = Field(
+        ..., title="Build time", description="Time spent inserting the documents"
+    )
+    recall_at_k: float = Field(..., title="Recall@k", description="Recall@k")
+    mean_ms: float = Field(..., title="Mean latency", description="Mean latency (ms)")
+    p95_ms: float = Field(..., title="p95 latency", description="p95 latency (ms)")
+
+
+def sweep_hnsw_params(
+    client: Annotated[chromadb.api.client.Client, "Chroma client"],
+    embeddings: Annotated[chromadb.EmbeddingFunction, "Embeddings function"],
+    documents: Annotated[Sequence[str], "Documents to index"],
+    queries: Annotated[Sequence[str], "Held-out queries"],
+    m_values: Annotated[Sequence[int], "Values of M to try"] = (16, 32),
+    construction_ef_values: Annotated[
+        Sequence[int], "Values of construction_ef to try"
+    ] = (100, 200),
+    search_ef_values: Annotated[Sequence[int], "Values of search_ef to try"] = (
+        10,
+        50,
+        100,
+    ),
+    k: Annotated[int, "Number of result documents"] = 10,
+    space: Annotated[str, "Distance space"] = "cosine",
+    collection_prefix: Annotated[
+        str, "Prefix of temporary collections"
+    ] = "hnsw_tuning",
+) -> Annotated[list[HnswTuningReport], "One report per parameter combination"]:
+    """
+    Sweep HNSW parameters and report the recall vs. latency trade-off
+
+    Documents and queries are embedded once. For each (M, construction_ef) a
+    temporary collection is built, searched with each search_ef, then deleted.
+
+    Args:
+        client (chromadb.api.client.Client): Chroma client
+        embeddings (chromadb.EmbeddingFunction): Embeddings function
+        documents (Sequence[str]): Documents to index
+        queries (Sequence[str]): Held-out queries
+        m_values (Sequence[int]): Values of M to try
+        construction_ef_values (Sequence[int]): Values of construction_ef to try
+        search_ef_values (Sequence[int]): Values of search_ef to try
+        k (int): Number of result documents
+        space (str): Distance space
+        collection_prefix (str): Prefix of the temporary collections
+
+    Returns:
+        list[HnswTuningReport]: One report per parameter combination
+    """
+    document_vectors = np.asarray(embeddings(list(documents)), dtype=np.float32)
+    query_vectors = np.asarray(embeddings(list(queries)), dtype=np.float32)
+    ids = [str(i) for i in range(len(documents))]
+    truth = [
+        [ids[i] for i in row]
+        for row in exact_top_k(document_vectors, query_vectors, k, space)
+    ]
+    reports = []
+    for m, construction_ef in itertools.product(m_values, construction_ef_values):
+        name = f"{collection_prefix}_{m}_{construction_ef}"
+        collection = client.get_or_create_collection(
+            name=name,
+            embedding_function=embeddings,
+            metadata=HnswIndexParams(
+                space=space, M=m, construction_ef=construction_ef
+            ).to_metadata(),
+        )
+        try:
+            start = time.perf_counter()
+            collection.add(
+                ids=ids, embeddings=document_vectors, documents=list(documents)
+            )
+            build_seconds = time.perf_counter() - start
+            for search_ef in search_ef_values:
+                found, samples = [], []
+                for query_vector in query_vectors:
+                    start = time.perf_counter()
+                    res = collection.query(
+                        query_embeddings=[query_vector],
+                        n_results=max(k, search_ef),
+                        include=["distances"],
+                    )
+                    samples.append(time.perf_counter() - start)
+                    found.append(res["ids"][0][:k])
+                latency = latency_summary(samples)
+                reports.append(
+                    HnswTuningReport(
+                        M=m,
+                        construction_ef=construction_ef,
+                        search_ef=search_ef,
+                        build_seconds=build_seconds,
+                        recall_at_k=recall_at_k(found, truth),
+                        mean_ms=latency["mean_ms"],
+                        p95_ms=latency["p95_ms"],
+                    )
+                )
+        finally:
+            client.delete_collection(name)
+    return reports
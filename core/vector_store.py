@@ -1,17 +1,46 @@
-from typing import Annotated, Optional, Tuple
+import json
+import re
+from typing import Annotated, Optional, Sequence, Tuple, Union
 
 import chromadb
 import chromadb.api
 import chromadb.api.client
 import nanoid
+import numpy as np
 from chromadb.utils import embedding_functions
 
+from core.embeddings import as_float32_matrix
+from core.expansion import (
+    CHUNK_COUNT_KEY,
+    CHUNK_KEY,
+    PARENT_ID_KEY,
+    chunk_id,
+    chunk_window,
+    merge_windows,
+)
+from core.filters import FILTER_STRATEGIES, build_where, matches
+from core.models.diversity import DiversityParams
 from core.models.documents import Document
+from core.models.expansion import ExpansionParams
+from core.models.index import HnswIndexParams
+from core.quantization import QuantizedIndexes
+from core.query_cache import QueryCache
+from core.scoring import distance_to_score, distances, mmr_select
+from core.singleflight import SingleFlight
 
 
 class VectorStore:
     """Vector store class"""
 
+    #: Candidates fetched per requested document with the "post" filter strategy
+    post_filter_factor: int = 4
+
+    #: Candidates fetched per requested document when diversifying the results
+    fetch_factor: int = 4
+
+    #: Separator between the chunks of an expanded hit
+    chunk_separator: str = "\n"
+
     def __init__(
         self,
         collection_name: Annotated[
@@ -26,6 +55,26 @@ class VectorStore:
             Optional[chromadb.Embeddings],
             "Embeddings function",
         ] = embedding_functions.DefaultEmbeddingFunction(),
+        index_params: Annotated[
+            Optional[HnswIndexParams],
+            "HNSW index parameters, used when the collection is created",
+        ] = None,
+        metadata: Annotated[
+            Optional[dict],
+            "Additional collection metadata, used when the collection is created",
+        ] = None,
+        single_flight: Annotated[
+            Optional[SingleFlight],
+            "Coalesces identical concurrent searches",
+        ] = None,
+        query_cache: Annotated[
+            Optional[QueryCache],
+            "Cache of search results",
+        ] = None,
+        quantized_indexes: Annotated[
+            Optional[QuantizedIndexes],
+            "Quantized indexes of the collections that enable quantization",
+        ] = None,
     ):
         """
         Initialize the vector store
@@ -34,12 +83,79 @@ class VectorStore:
             collection_name (str): Collection name
             client (chromadb.api.client.Client): ChromaDB client
             embeddings (chromadb.Embeddings): Embeddings function
+            index_params (HnswIndexParams): HNSW index parameters, used when
+                the collection is created
+            metadata (dict): Additional collection metadata, used when the
+                collection is created
+            single_flight (SingleFlight): Coalesces identical concurrent
+                searches, invalidated by writes to the collection
+            query_cache (QueryCache): Cache of search results, invalidated by
+                writes to the collection
+            quantized_indexes (QuantizedIndexes): Quantized indexes, searched
+                instead of the HNSW index when the collection enables
+                quantization with `HnswIndexParams.quantization`
         """
+        self.embeddings = embeddings
+        self.single_flight = single_flight
+        self.query_cache = query_cache
         self.collection = client.get_or_create_collection(
             name=collection_name,
             embedding_function=embeddings,
-            metadata={"hnsw:space": "cosine"},
+            metadata={
+                **(metadata or {}),
+                **(index_params or HnswIndexParams()).to_metadata(),
+            },
         )
+        self.quantized_index = (
+            None
+            if quantized_indexes is None
+            else quantized_indexes.open(self.collection)
+        )
+
+    @property
+    def space(self) -> Annotated[str, "Distance space of the collection"]:
+        """
+        Distance space of the collection
+
+        Returns:
+            str: Distance space, one of "cosine", "l2" or "ip"
+        """
+        return (self.collection.metadata or {}).get("hnsw:space", "l2")
+
+    def to_score(
+        self,
+        distance: Annotated[float, "Distance returned by Chroma"],
+    ) -> Annotated[float, "Score of the document"]:
+        """
+        Convert a distance returned by Chroma to the similarity score of a
+        document in the distance space of the collection, higher is more
+        similar
+
+        Args:
+            distance (float): Distance returned by Chroma
+
+        Returns:
+            float: Similarity score of the document
+        """
+        return float(distance_to_score(float(distance), self.space))
+
+    def embed(
+        self,
+        texts: Annotated[list[str], "Texts"],
+    ) -> Annotated[np.ndarray, "float32 matrix, one row per text"]:
+        """
+        Embed texts as one contiguous float32 matrix
+
+        Embeddings functions returning float32 arrays are used without
+        converting the vectors to Python floats.
+
+        Args:
+            texts (list[str]): Texts
+
+        Returns:
+            np.ndarray: float32 matrix, one row per text
+        """
+        return as_float32_matrix(self.embeddings(texts))
 
     def add_documents(
         self,
@@ -51,6 +167,30 @@ class VectorStore:
             Optional[str],
             "Reference ID",
         ] = None,
+        metadata: Annotated[
+            Optional[dict],
+            "Metadata of the documents",
+        ] = None,
+        embeddings: Annotated[
+            Optional[np.ndarray],
+            "Embeddings of the documents",
+        ] = None,
+        ids: Annotated[
+            Optional[list[str]],
+            "IDs of the documents",
+        ] = None,
+        parent_id: Annotated[
+            Optional[str],
+            "Parent document ID of the chunks",
+        ] = None,
+        chunk_ordinals: Annotated[
+            Optional[list[int]],
+            "Position of each document in its parent",
+        ] = None,
+        chunk_count: Annotated[
+            Optional[int],
+            "Number of chunks of the parent",
+        ] = None,
     ) -> Annotated[
         list[str],
         "List of document IDs",
@@ -58,32 +198,280 @@ class VectorStore:
         """
         Add documents to the vector store
 
+        The documents are the chunks of one parent document, in order. The
+        parent ID, the position of each chunk and the number of chunks are
+        recorded in the metadata, and each chunk gets the ID
+        `{parent_id}:{position}`, so search hits can be expanded to their
+        neighbours or parent by ID.
+
         Args:
             documents (list[Document]): List of documents
             reference_id (str): Reference id
+            metadata (dict): Metadata of the documents, values must be
+                strings, integers, floats or booleans
+            embeddings (np.ndarray): float32 matrix of the embeddings, one row
+                per document, computed with the embeddings function when not
+                set
+            ids (list[str]): IDs of the documents, derived from the parent ID
+                when not set
+            parent_id (str): Parent document ID, generated when not set
+            chunk_ordinals (list[int]): Position of each document in its
+                parent, the order of the documents when not set
+            chunk_count (int): Number of chunks of the parent, the number of
+                documents when not set
 
         Returns:
             list[str]: List of document IDs
         """
-        metadatas = (
-            [
-                {
-                    "reference_id": reference_id,
-                }
-                for _ in range(len(documents))
-            ]
-            if reference_id is not None
-            else [{} for _ in range(len(documents))]
-        )
-        ids = [nanoid.generate() for _ in range(len(documents))]
+        document_metadata = {
+            key: value for key, value in (metadata or {}).items() if value is not None
+        }
+        if reference_id is not None:
+            document_metadata["reference_id"] = reference_id
+        if parent_id is None:
+            parent_id = nanoid.generate()
+        if chunk_ordinals is None:
+            chunk_ordinals = list(range(len(documents)))
+        document_metadata[PARENT_ID_KEY] = parent_id
+        document_metadata[CHUNK_COUNT_KEY] = chunk_count or len(documents)
+        metadatas = [
+            {**document_metadata, CHUNK_KEY: ordinal} for ordinal in chunk_ordinals
+        ]
+        if embeddings is None and self.embeddings is not None:
+            embeddings = self.embed(documents)
+        if ids is None:
+            ids = [chunk_id(parent_id, ordinal) for ordinal in chunk_ordinals]
         self.collection.add(
             documents=documents,
             ids=ids,
             metadatas=metadatas,
+            embeddings=embeddings,
         )
+        if self.quantized_index is not None:
+            self.quantized_index.add(ids, embeddings, metadatas)
+        self.invalidate()
         return ids
 
+    def add_columns(
+        self,
+        contents: Annotated[
+            list[str],
+            "Contents of the documents",
+        ],
+        reference_ids: Annotated[
+            Optional[list[Optional[str]]],
+            "Reference ID of each document",
+        ] = None,
+        metadata: Annotated[
+            Optional[dict[str, list]],
+            "Metadata columns, one value per document",
+        ] = None,
+        embeddings: Annotated[
+            Optional[np.ndarray],
+            "Embeddings of the documents",
+        ] = None,
+        parent_ids: Annotated[
+            Optional[list[str]],
+            "Parent ID of each document",
+        ] = None,
+    ) -> Annotated[
+        list[str],
+        "List of document IDs",
+    ]:
+        """
+        Add independent documents given as columns
+
+        Each document is its own parent with a single chunk. The metadata of
+        every document is built from the columns in one pass, with one call
+        to the embeddings function and one write to Chroma.
+
+        Args:
+            contents (list[str]): Contents of the documents
+            reference_ids (list[str]): Reference ID of each document, None
+                for no reference ID
+            metadata (dict[str, list]): Metadata columns, one value per
+                document, None values are left out
+            embeddings (np.ndarray): float32 matrix of the embeddings, one row
+                per document, computed with the embeddings function when not
+                set
+            parent_ids (list[str]): Parent ID of each document, generated
+                when not set
+
+        Returns:
+            list[str]: List of document IDs
+
+        Raises:
+            ValueError: If a column does not have one value per document
+        """
+        columns = dict(metadata or {})
+        if reference_ids is not None:
+            columns["reference_id"] = reference_ids
+        for name, column in [*columns.items(), ("parent_ids", parent_ids or contents)]:
+            if len(column) != len(contents):
+                raise ValueError(
+                    f"Column {name} has {len(column)} values, expected {len(contents)}"
+                )
+        if len(contents) == 0:
+            return []
+        if parent_ids is None:
+            parent_ids = [nanoid.generate() for _ in contents]
+        metadatas = [{} for _ in contents]
+        for name, column in columns.items():
+            for document_metadata, value in zip(metadatas, column):
+                if value is not None:
+                    document_metadata[name] = value
+        for document_metadata, parent_id in zip(metadatas, parent_ids):
+            document_metadata[PARENT_ID_KEY] = parent_id
+            document_metadata[CHUNK_KEY] = 0
+            document_metadata[CHUNK_COUNT_KEY] = 1
+        if embeddings is None and self.embeddings is not None:
+            embeddings = self.embed(contents)
+        ids = [chunk_id(parent_id, 0) for parent_id in parent_ids]
+        self.collection.add(
+            documents=contents,
+            ids=ids,
+            metadatas=metadatas,
+            embeddings=embeddings,
+        )
+        if self.quantized_index is not None:
+            self.quantized_index.add(ids, embeddings, metadatas)
+        self.invalidate()
+        return ids
+
+    def invalidate(self) -> None:
+        """Drop the coalesced and cached search results of the collection"""
+        if self.single_flight is not None:
+            self.single_flight.invalidate(self.collection.name)
+        if self.query_cache is not None:
+            self.query_cache.invalidate(self.collection.name)
+
     def similarity_search(
+        self,
+        query: Annotated[
+            Optional[str],
+            "Query string",
+        ] = None,
+        reference_id: Annotated[
+            Optional[str],
+            "Reference ID",
+        ] = None,
+        k: Annotated[
+            int,
+            "Number of result documents",
+        ] = 3,
+        search_ef: Annotated[
+            Optional[int],
+            "Search effort, size of the HNSW candidate list for this query",
+        ] = None,
+        where: Annotated[
+            Optional[dict],
+            "Metadata filter expression",
+        ] = None,
+        filter_strategy: Annotated[
+            str,
+            "Filter strategy, pre or post",
+        ] = "pre",
+        query_embedding: Annotated[
+            Optional[Union[np.ndarray, Sequence[float]]],
+            "Precomputed query embedding",
+        ] = None,
+        min_score: Annotated[
+            Optional[float],
+            "Minimum similarity score of the results",
+        ] = None,
+        diversity: Annotated[
+            Optional[DiversityParams],
+            "Diversification of the results",
+        ] = None,
+    ) -> list[Tuple[Document, float]]:
+        """
+        Search for similar documents
+
+        HNSW searches with a candidate list of max(search_ef, n_results), so a
+        higher search effort is applied by asking Chroma for `search_ef`
+        results and keeping the best `k`.
+
+        Args:
+            query (str): Query string
+            reference_id (str): Reference ID
+            k (int): Number of result documents
+            search_ef (int): Search effort, size of the HNSW candidate list
+                for this query
+            where (dict): Metadata filter expression, e.g.
+                {"language": "vi", "year": {"$gte": 2020}}
+            filter_strategy (str): "pre" pushes the filter down into Chroma,
+                best for selective filters. "post" over-fetches without the
+                filter and applies it on the client side, best for filters
+                matching most documents
+            query_embedding (Union[np.ndarray, Sequence[float]]): Precomputed
+                query embedding, the query is not embedded when set
+            min_score (float): Minimum similarity score, worse candidates are
+                dropped before diversifying
+            diversity (DiversityParams): Selects the results among more
+                candidates by maximal marginal relevance and caps the results
+                of one reference ID
+
+        Returns:
+            list[Tuple[Document, float]]: List of documents and their similarity scores
+        """
+        if query_embedding is not None:
+            query_embedding = np.asarray(query_embedding, dtype=np.float32)
+        elif query is None:
+            raise ValueError("Either query or query_embedding is required")
+
+        def search() -> list[Tuple[Document, float]]:
+            """
+            Embed the query and search
+
+            Returns:
+                list[Tuple[Document, float]]: Documents and their scores
+            """
+            return self.similarity_search_by_vector(
+                embedding=(
+                    query_embedding
+                    if query_embedding is not None
+                    else self.embed([query])[0]
+                ),
+                reference_id=reference_id,
+                k=k,
+                search_ef=search_ef,
+                where=where,
+                filter_strategy=filter_strategy,
+                min_score=min_score,
+                diversity=diversity,
+            )
+
+        if self.single_flight is None and self.query_cache is None:
+            return search()
+        key = (
+            query if query_embedding is None else query_embedding.tobytes(),
+            reference_id,
+            k,
+            search_ef,
+            json.dumps(where, sort_keys=True),
+            filter_strategy,
+            min_score,
+            diversity.model_dump_json() if diversity is not None else None,
+        )
+
+        def coalesced_search() -> list[Tuple[Document, float]]:
+            """
+            Search, sharing the results of identical concurrent searches
+
+            Returns:
+                list[Tuple[Document, float]]: Documents and their scores
+            """
+            if self.single_flight is None:
+                return search()
+            return self.single_flight.do(key, search, self.collection.name)
+
+        if self.query_cache is None:
+            return list(coalesced_search())
+        return list(
+            self.query_cache.get_or_compute(self.collection.name, key, coalesced_search)
+        )
+
+    def keyword_search(
         self,
         query: Annotated[
             str,
@@ -97,35 +485,617 @@ class VectorStore:
             int,
             "Number of result documents",
         ] = 3,
+        where: Annotated[
+            Optional[dict],
+            "Metadata filter expression",
+        ] = None,
     ) -> list[Tuple[Document, float]]:
         """
-        Search for similar documents
+        Search for documents containing the words of the query
+
+        Chroma matches each word of at least 3 characters as a substring, in
+        lower case or capitalized, and returns up to `fetch_factor * k`
+        candidates in storage order. The candidates are scored by the share
+        of query words they contain, ignoring case.
 
         Args:
             query (str): Query string
             reference_id (str): Reference ID
             k (int): Number of result documents
+            where (dict): Metadata filter expression
+
+        Returns:
+            list[Tuple[Document, float]]: Documents and the share of query
+                words they contain, best first
+        """
+        terms = list(dict.fromkeys(re.findall(r"\w{3,}", query.lower())))
+        if len(terms) == 0:
+            return []
+        contains = [
+            {"$contains": variant}
+            for term in terms
+            for variant in dict.fromkeys([term, term.capitalize()])
+        ]
+        res = self.collection.get(
+            where=build_where(reference_id, where),
+            where_document=contains[0] if len(contains) == 1 else {"$or": contains},
+            limit=k * self.fetch_factor,
+            include=["documents", "metadatas"],
+        )
+        results = []
+        for id, document, metadata in zip(
+            res["ids"], res["documents"], res["metadatas"]
+        ):
+            text = document.lower()
+            results.append(
+                (
+                    Document(id=id, page_content=document, metadata=metadata or {}),
+                    sum(term in text for term in terms) / len(terms),
+                )
+            )
+        results.sort(key=lambda result: result[1], reverse=True)
+        return results[:k]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: Annotated[
+            Union[np.ndarray, Sequence[float]],
+            "Query embedding",
+        ],
+        reference_id: Annotated[
+            Optional[str],
+            "Reference ID",
+        ] = None,
+        k: Annotated[
+            int,
+            "Number of result documents",
+        ] = 3,
+        search_ef: Annotated[
+            Optional[int],
+            "Search effort, size of the HNSW candidate list for this query",
+        ] = None,
+        where: Annotated[
+            Optional[dict],
+            "Metadata filter expression",
+        ] = None,
+        filter_strategy: Annotated[
+            str,
+            "Filter strategy, pre or post",
+        ] = "pre",
+        min_score: Annotated[
+            Optional[float],
+            "Minimum similarity score of the results",
+        ] = None,
+        diversity: Annotated[
+            Optional[DiversityParams],
+            "Diversification of the results",
+        ] = None,
+    ) -> list[Tuple[Document, float]]:
+        """
+        Search for documents similar to an already embedded query
+
+        Args:
+            embedding (Union[np.ndarray, Sequence[float]]): Query embedding,
+                float32 arrays are passed to Chroma without conversion
+            reference_id (str): Reference ID
+            k (int): Number of result documents
+            search_ef (int): Search effort, size of the HNSW candidate list
+                for this query
+            where (dict): Metadata filter expression, e.g.
+                {"language": "vi", "year": {"$gte": 2020}}
+            filter_strategy (str): "pre" pushes the filter down into Chroma,
+                best for selective filters. "post" over-fetches without the
+                filter and applies it on the client side, best for filters
+                matching most documents
+            min_score (float): Minimum similarity score, worse candidates are
+                dropped before diversifying
+            diversity (DiversityParams): Selects the results among more
+                candidates by maximal marginal relevance and caps the results
+                of one reference ID
 
         Returns:
             list[Tuple[Document, float]]: List of documents and their similarity scores
         """
-        where = {"reference_id": reference_id} if reference_id is not None else None
+        return self.similarity_search_by_vectors(
+            embeddings=np.asarray(embedding, dtype=np.float32)[np.newaxis],
+            reference_id=reference_id,
+            k=k,
+            search_ef=search_ef,
+            where=where,
+            filter_strategy=filter_strategy,
+            min_score=min_score,
+            diversity=diversity,
+        )[0]
+
+    def similarity_search_batch(
+        self,
+        queries: Annotated[
+            Optional[list[str]],
+            "Query strings",
+        ] = None,
+        query_embeddings: Annotated[
+            Optional[Union[np.ndarray, Sequence[Sequence[float]]]],
+            "Precomputed query embeddings",
+        ] = None,
+        reference_id: Annotated[
+            Optional[str],
+            "Reference ID",
+        ] = None,
+        k: Annotated[
+            int,
+            "Number of result documents per query",
+        ] = 3,
+        search_ef: Annotated[
+            Optional[int],
+            "Search effort, size of the HNSW candidate list for each query",
+        ] = None,
+        where: Annotated[
+            Optional[dict],
+            "Metadata filter expression",
+        ] = None,
+        filter_strategy: Annotated[
+            str,
+            "Filter strategy, pre or post",
+        ] = "pre",
+        min_score: Annotated[
+            Optional[float],
+            "Minimum similarity score of the results",
+        ] = None,
+        diversity: Annotated[
+            Optional[DiversityParams],
+            "Diversification of the results",
+        ] = None,
+    ) -> list[list[Tuple[Document, float]]]:
+        """
+        Search for the documents similar to several queries in one call
+
+        The queries are embedded in one call to the embeddings function, or
+        not at all when `query_embeddings` is set.
+
+        Args:
+            queries (list[str]): Query strings, ignored when query_embeddings
+                is set
+            query_embeddings (Union[np.ndarray, Sequence[Sequence[float]]]):
+                Precomputed query embeddings, one row per query
+            reference_id (str): Reference ID
+            k (int): Number of result documents per query
+            search_ef (int): Search effort, size of the HNSW candidate list
+                for each query
+            where (dict): Metadata filter expression
+            filter_strategy (str): Filter strategy, pre or post
+            min_score (float): Minimum similarity score, worse candidates are
+                dropped before diversifying
+            diversity (DiversityParams): Selects the results among more
+                candidates by maximal marginal relevance and caps the results
+                of one reference ID
+
+        Returns:
+            list[list[Tuple[Document, float]]]: Documents and their similarity
+                scores, one list per query
+        """
+        if query_embeddings is not None:
+            embeddings = as_float32_matrix(query_embeddings)
+        elif queries is not None:
+            embeddings = self.embed(queries)
+        else:
+            raise ValueError("Either queries or query_embeddings is required")
+        return self.similarity_search_by_vectors(
+            embeddings=embeddings,
+            reference_id=reference_id,
+            k=k,
+            search_ef=search_ef,
+            where=where,
+            filter_strategy=filter_strategy,
+            min_score=min_score,
+            diversity=diversity,
+        )
+
+    def similarity_search_by_vectors(
+        self,
+        embeddings: Annotated[
+            np.ndarray,
+            "Query embeddings",
+        ],
+        reference_id: Annotated[
+            Optional[str],
+            "Reference ID",
+        ] = None,
+        k: Annotated[
+            int,
+            "Number of result documents per query",
+        ] = 3,
+        search_ef: Annotated[
+            Optional[int],
+            "Search effort, size of the HNSW candidate list for each query",
+        ] = None,
+        where: Annotated[
+            Optional[dict],
+            "Metadata filter expression",
+        ] = None,
+        filter_strategy: Annotated[
+            str,
+            "Filter strategy, pre or post",
+        ] = "pre",
+        min_score: Annotated[
+            Optional[float],
+            "Minimum similarity score of the results",
+        ] = None,
+        diversity: Annotated[
+            Optional[DiversityParams],
+            "Diversification of the results",
+        ] = None,
+    ) -> list[list[Tuple[Document, float]]]:
+        """
+        Search for the documents similar to several embedded queries in one
+        query to Chroma
+
+        When the collection has a quantized index, searches without a
+        metadata filter or diversification scan its codes instead, see
+        `_query_quantized`, and `search_ef` is not used.
+
+        Args:
+            embeddings (np.ndarray): float32 matrix, one row per query
+            reference_id (str): Reference ID
+            k (int): Number of result documents per query
+            search_ef (int): Search effort, size of the HNSW candidate list
+                for each query
+            where (dict): Metadata filter expression
+            filter_strategy (str): Filter strategy, pre or post
+            min_score (float): Minimum similarity score, worse candidates are
+                dropped before diversifying
+            diversity (DiversityParams): Selects the results among more
+                candidates by maximal marginal relevance and caps the results
+                of one reference ID
+
+        Returns:
+            list[list[Tuple[Document, float]]]: Documents and their similarity
+                scores, one list per query
+        """
+        if filter_strategy not in FILTER_STRATEGIES:
+            raise ValueError(f"Unsupported filter strategy: {filter_strategy}")
+        if len(embeddings) == 0:
+            return []
+        embeddings = as_float32_matrix(embeddings)
+        if diversity is not None and not diversity.enabled:
+            diversity = None
+        if self.quantized_index is not None and where is None and diversity is None:
+            res = self._query_quantized(embeddings, reference_id, k)
+            return [
+                self._to_results(res, q, None, k, min_score=min_score)
+                for q in range(len(embeddings))
+            ]
+        where = build_where(reference_id, where)
+        post_filter = where if filter_strategy == "post" else None
+        n_results = max(k, search_ef or 0)
+        if diversity is not None:
+            n_results = max(n_results, diversity.fetch_k or k * self.fetch_factor)
+        if post_filter is not None:
+            n_results *= self.post_filter_factor
+        if n_results > k and diversity is None and post_filter is None:
+            # Only the best k candidates are returned, the others are ranked
+            # by their distances alone
+            res = self._query_top_k(embeddings, n_results, where, k)
+        else:
+            res = self.collection.query(
+                query_embeddings=list(embeddings),
+                n_results=n_results,
+                where=None if post_filter is not None else where,
+                include=["documents", "metadatas", "distances"]
+                + (["embeddings"] if diversity is not None else []),
+            )
+        return [
+            self._to_results(
+                res, q, post_filter, k, embeddings[q], diversity, min_score
+            )
+            for q in range(len(embeddings))
+        ]
+
+    def _query_top_k(
+        self,
+        embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[dict],
+        k: int,
+    ) -> chromadb.QueryResult:
+        """
+        Query a long candidate list, fetching the content of the best k only
+
+        The query returns the IDs and distances of the candidates, then the
+        documents and metadatas of the best k of each query are fetched in
+        one `get` by ID.
+
+        Args:
+            embeddings (np.ndarray): float32 matrix, one row per query
+            n_results (int): Candidates of each query
+            where (dict): Metadata filter expression
+            k (int): Number of result documents per query
+
+        Returns:
+            chromadb.QueryResult: Best k candidates of each query, with their
+                documents, metadatas and distances
+        """
         res = self.collection.query(
-            query_texts=[query],
-            n_results=k,
+            query_embeddings=list(embeddings),
+            n_results=n_results,
             where=where,
+            include=["distances"],
+        )
+        ids = [query_ids[:k] for query_ids in res["ids"]]
+        unique_ids = list(
+            dict.fromkeys(doc_id for query_ids in ids for doc_id in query_ids)
+        )
+        if len(unique_ids) == 0:
+            contents = {}
+        else:
+            found = self.collection.get(
+                ids=unique_ids, include=["documents", "metadatas"]
+            )
+            contents = {
+                doc_id: (document, metadata)
+                for doc_id, document, metadata in zip(
+                    found["ids"], found["documents"], found["metadatas"]
+                )
+            }
+        # A document deleted between the two calls is dropped
+        hits = [
+            [i for i, doc_id in enumerate(query_ids) if doc_id in contents]
+            for query_ids in ids
+        ]
+        return {
+            "ids": [[ids[q][i] for i in hits[q]] for q in range(len(ids))],
+            "distances": [
+                [res["distances"][q][i] for i in hits[q]] for q in range(len(ids))
+            ],
+            "documents": [
+                [contents[ids[q][i]][0] for i in hits[q]] for q in range(len(ids))
+            ],
+            "metadatas": [
+                [contents[ids[q][i]][1] for i in hits[q]] for q in range(len(ids))
+            ],
+        }
+
+    def _query_quantized(
+        self,
+        embeddings: np.ndarray,
+        reference_id: Optional[str],
+        k: int,
+    ) -> chromadb.QueryResult:
+        """
+        Search the quantized index, then rescore the candidates exactly
+
+        The codes give `k * rescore_factor` candidates per query, whose
+        full-precision embeddings, documents and metadatas are fetched in one
+        `get` by ID to rank them by their exact distances.
+
+        Args:
+            embeddings (np.ndarray): float32 matrix, one row per query
+            reference_id (str): Reference ID
+            k (int): Number of result documents per query
+
+        Returns:
+            chromadb.QueryResult: Best k candidates of each query, with their
+                documents, metadatas and distances
+        """
+        ids = [
+            self.quantized_index.candidates(query, k, reference_id, self.space)
+            for query in embeddings
+        ]
+        unique_ids = list(
+            dict.fromkeys(doc_id for query_ids in ids for doc_id in query_ids)
         )
+        contents = {}
+        if len(unique_ids) > 0:
+            found = self.collection.get(
+                ids=unique_ids, include=["embeddings", "documents", "metadatas"]
+            )
+            contents = {
+                doc_id: (embedding, document, metadata)
+                for doc_id, embedding, document, metadata in zip(
+                    found["ids"],
+                    found["embeddings"],
+                    found["documents"],
+                    found["metadatas"],
+                )
+            }
+        res = {"ids": [], "distances": [], "documents": [], "metadatas": []}
+        for query, query_ids in zip(embeddings, ids):
+            # A document deleted since its code was read is dropped
+            query_ids = [doc_id for doc_id in query_ids if doc_id in contents]
+            exact = np.empty(0)
+            if len(query_ids) > 0:
+                exact = distances(
+                    query,
+                    np.asarray(
+                        [contents[doc_id][0] for doc_id in query_ids], dtype=np.float32
+                    ),
+                    self.space,
+                )
+            best = np.argsort(exact, kind="stable")[:k]
+            res["ids"].append([query_ids[i] for i in best])
+            res["distances"].append([float(exact[i]) for i in best])
+            res["documents"].append([contents[query_ids[i]][1] for i in best])
+            res["metadatas"].append([contents[query_ids[i]][2] for i in best])
+        return res
+
+    def _to_results(
+        self,
+        res: chromadb.QueryResult,
+        q: int,
+        post_filter: Optional[dict],
+        k: int,
+        query_embedding: Optional[np.ndarray] = None,
+        diversity: Optional[DiversityParams] = None,
+        min_score: Optional[float] = None,
+    ) -> list[Tuple[Document, float]]:
+        """
+        Map the Chroma results of one query to documents and scores
+
+        Candidates below `min_score` are dropped before building documents.
+
+        Args:
+            res (chromadb.QueryResult): Chroma query result
+            q (int): Position of the query in the batch
+            post_filter (dict): Filter applied on the client side, None for
+                no filter
+            k (int): Number of result documents
+            query_embedding (np.ndarray): Query embedding, used to diversify
+            diversity (DiversityParams): Diversification of the results, the
+                query result must include the embeddings
+            min_score (float): Minimum similarity score, None for no minimum
+
+        Returns:
+            list[Tuple[Document, float]]: Documents and their similarity scores
+        """
+        scores = distance_to_score(
+            np.asarray(res["distances"][q], dtype=np.float64), self.space
+        )
+        hits = [
+            i
+            for i in range(len(res["documents"][q]))
+            if (min_score is None or scores[i] >= min_score)
+            and matches(res["metadatas"][q][i], post_filter)
+        ]
+        if diversity is not None and len(hits) > 0:
+            selected = mmr_select(
+                query_embedding,
+                np.asarray(res["embeddings"][q], dtype=np.float32)[hits],
+                k,
+                lambda_mult=(
+                    1.0 if diversity.mmr_lambda is None else diversity.mmr_lambda
+                ),
+                groups=[
+                    (res["metadatas"][q][i] or {}).get("reference_id")
+                    or res["ids"][q][i]
+                    for i in hits
+                ],
+                max_per_group=diversity.max_per_reference,
+            )
+            hits = [hits[position] for position in selected]
         return [
             (
                 Document(
-                    page_content=res["documents"][0][i],
-                    metadata=res["metadatas"][0][i],
+                    id=res["ids"][q][i],
+                    page_content=res["documents"][q][i],
+                    metadata=res["metadatas"][q][i] or {},
                 ),
-                res["distances"][0][i] / 100,
+                float(scores[i]),
             )
-            for i in range(len(res["documents"][0]))
+            for i in hits[:k]
         ]
 
+    def expand_results(
+        self,
+        results: Annotated[
+            list[list[Tuple[Document, float]]],
+            "Documents and their scores, one list per query",
+        ],
+        expansion: Annotated[ExpansionParams, "Expansion of the hits"],
+    ) -> Annotated[
+        list[list[Tuple[Document, float]]],
+        "Expanded documents and their scores, one list per query",
+    ]:
+        """
+        Expand search hits into their neighbouring chunks or whole parent
+
+        The chunks of every query are fetched in one batched `get` by ID.
+        Hits of the same parent whose windows overlap or touch are merged
+        into one document, which keeps the ID, metadata and score of its best
+        hit and records its chunk range in `chunk_start` and `chunk_end`.
+        Hits ingested without chunk metadata are returned as they are.
+
+        Args:
+            results (list[list[Tuple[Document, float]]]): Documents and their
+                scores, one list per query
+            expansion (ExpansionParams): Expansion of the hits
+
+        Returns:
+            list[list[Tuple[Document, float]]]: Expanded documents and their
+                scores, one list per query, best first
+        """
+        if not expansion.enabled:
+            return results
+        merged = []
+        for hits in results:
+            windows = []
+            for position, (document, _) in enumerate(hits):
+                window = chunk_window(
+                    document.metadata.model_dump(), expansion.window, expansion.parent
+                )
+                if window is not None:
+                    windows.append((*window, position))
+            merged.append(merge_windows(windows))
+        ids = list(
+            dict.fromkeys(
+                chunk_id(parent_id, ordinal)
+                for windows in merged
+                for parent_id, start, end, _ in windows
+                for ordinal in range(start, end + 1)
+            )
+        )
+        chunks = {}
+        if len(ids) > 0:
+            res = self.collection.get(ids=ids, include=["documents"])
+            chunks = dict(zip(res["ids"], res["documents"]))
+
+        expanded = []
+        for hits, windows in zip(results, merged):
+            replaced = {}
+            for parent_id, start, end, positions in windows:
+                best = min(positions)
+                document, score = hits[best]
+                content = [
+                    chunks.get(chunk_id(parent_id, ordinal))
+                    for ordinal in range(start, end + 1)
+                ]
+                replaced.update({position: None for position in positions})
+                replaced[best] = (
+                    document.model_copy(
+                        update={
+                            "page_content": self.chunk_separator.join(
+                                chunk for chunk in content if chunk is not None
+                            ),
+                            "metadata": document.metadata.model_copy(
+                                update={"chunk_start": start, "chunk_end": end}
+                            ),
+                        }
+                    ),
+                    score,
+                )
+            expanded.append(
+                [
+                    replaced.get(position, hit)
+                    for position, hit in enumerate(hits)
+                    if replaced.get(position, hit) is not None
+                ]
+            )
+        return expanded
+
+    def get_embeddings(
+        self,
+        ids: Annotated[
+            list[str],
+            "List of document IDs",
+        ],
+    ) -> Annotated[
+        np.ndarray,
+        "Embeddings of the documents",
+    ]:
+        """
+        Get the stored embeddings of documents in one batched call
+
+        Args:
+            ids (list[str]): List of document IDs
+
+        Returns:
+            np.ndarray: float32 matrix, one row per ID in the order of `ids`
+        """
+        if len(ids) == 0:
+            return np.empty((0, 0), dtype=np.float32)
+        res = self.collection.get(ids=ids, include=["embeddings"])
+        position = {id: i for i, id in enumerate(res["ids"])}
+        embeddings = np.asarray(res["embeddings"], dtype=np.float32)
+        return embeddings[[position[id] for id in ids]]
+
     def delete_by_reference_id(
         self,
         reference_id: Annotated[
@@ -143,3 +1113,6 @@ class VectorStore:
             None
         """
         self.collection.delete(where={"reference_id": reference_id})
+        if self.quantized_index is not None:
+            self.quantized_index.delete_by_reference_id(reference_id)
+        self.invalidate()
@@ -0,0 +1,5 @@
+"""loadtest package.
+
+Local stand-ins for the upstream services of FlexibleRAG, for load testing
+without network access.
+"""
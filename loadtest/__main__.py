@@ -0,0 +1,149 @@
+"""Run a local stand-in of an upstream service for load tests.
+
+    python -m loadtest cohere --port 9001 --latency lognormal:0.05:0.5 \
+        --latency chat=lognormal:1.5:0.4 --error-rate 0.01 --rate-limit 100
+    python -m loadtest chroma --port 9002 --upstream http://localhost:8000 \
+        --latency normal:0.01:0.002
+
+Options taking `[ENDPOINT=]VALUE` apply to one endpoint of the Cohere mock
+(embed, rerank or chat) when prefixed, to every endpoint otherwise.
+"""
+
+import argparse
+from typing import Annotated, Callable, Optional, Sequence
+
+import uvicorn
+
+from . import chroma_proxy, cohere_mock
+from .faults import FaultInjector, LatencyModel
+
+
+def per_endpoint(
+    values: Annotated[list[str], "[ENDPOINT=]VALUE options"],
+    endpoints: Annotated[Sequence[str], "Endpoints"],
+    convert: Annotated[Callable[[str], object], "Converts a value"],
+) -> Annotated[dict[str, object], "Value of each endpoint"]:
+    """
+    Resolve `[ENDPOINT=]VALUE` options, the prefixed ones taking precedence
+
+    Args:
+        values (list[str]): Options in the order given
+        endpoints (Sequence[str]): Endpoints
+        convert (Callable[[str], object]): Converts a value
+
+    Returns:
+        dict[str, object]: Value of each endpoint with one
+
+    Raises:
+        ValueError: If an endpoint is unknown
+    """
+    defaults, prefixed = {}, {}
+    for value in values:
+        endpoint, _, setting = value.rpartition("=")
+        if endpoint == "":
+            defaults = dict.fromkeys(endpoints, convert(setting))
+        elif endpoint in endpoints:
+            prefixed[endpoint] = convert(setting)
+        else:
+            raise ValueError(
+                f"Unknown endpoint {endpoint}, expected one of {endpoints}"
+            )
+    return {**defaults, **prefixed}
+
+
+def parse_args(
+    argv: Annotated[Optional[Sequence[str]], "Command line arguments"] = None,
+) -> argparse.Namespace:
+    """
+    Parse the command line
+
+    Args:
+        argv (Sequence[str]): Command line arguments, sys.argv when not set
+
+    Returns:
+        argparse.Namespace: service, host, port, fault and service options
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest",
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(__doc__.splitlines()[1:]),
+    )
+    parser.add_argument("service", choices=["cohere", "chroma"])
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=9001, help="Bind port")
+    parser.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        metavar="[ENDPOINT=]SPEC",
+        help=(
+            "Latency distribution in seconds, such as constant:0.1,"
+            " uniform:0.05:0.2, normal:0.1:0.02, lognormal:0.08:0.5 or pareto:0.05:2"
+        ),
+    )
+    parser.add_argument(
+        "--error-rate",
+        action="append",
+        default=[],
+        metavar="[ENDPOINT=]RATE",
+        help="Share of requests failing with 500 or 503",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        action="append",
+        default=[],
+        metavar="[ENDPOINT=]RATE",
+        help="Requests per second over which requests get 429",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="Seed of the latencies and errors"
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        default=cohere_mock.DIMENSIONS,
+        help="Dimensions of the mock embeddings",
+    )
+    parser.add_argument(
+        "--upstream",
+        default="http://localhost:8000",
+        help="URL of the local Chroma server behind the proxy",
+    )
+    return parser.parse_args(argv)
+
+
+def main(
+    argv: Annotated[Optional[Sequence[str]], "Command line arguments"] = None,
+) -> None:
+    """
+    Run the Cohere mock or the Chroma proxy
+
+    Args:
+        argv (Sequence[str]): Command line arguments, sys.argv when not set
+    """
+    args = parse_args(argv)
+    endpoints = cohere_mock.ENDPOINTS if args.service == "cohere" else ("chroma",)
+    latencies = per_endpoint(
+        args.latency, endpoints, lambda spec: LatencyModel.parse(spec, args.seed)
+    )
+    error_rates = per_endpoint(args.error_rate, endpoints, float)
+    rate_limits = per_endpoint(args.rate_limit, endpoints, float)
+    faults = {
+        endpoint: FaultInjector(
+            latency=latencies.get(endpoint),
+            error_rate=error_rates.get(endpoint, 0.0),
+            rate_limit=rate_limits.get(endpoint, 0.0),
+            seed=args.seed,
+        )
+        for endpoint in endpoints
+    }
+    if args.service == "cohere":
+        app = cohere_mock.create_app(faults, dimensions=args.dimensions)
+    else:
+        app = chroma_proxy.create_app(args.upstream, faults["chroma"])
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
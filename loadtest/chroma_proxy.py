@@ -0,0 +1,99 @@
+from typing import Annotated, Optional
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+from .faults import FaultInjector
+
+#: Hop-by-hop headers, not forwarded by the proxy
+HOP_HEADERS = {
+    "connection",
+    "content-encoding",
+    "content-length",
+    "host",
+    "keep-alive",
+    "transfer-encoding",
+}
+
+
+def create_app(
+    upstream: Annotated[str, "URL of the Chroma server"],
+    faults: Annotated[Optional[FaultInjector], "Faults of the requests"] = None,
+    transport: Annotated[
+        Optional[httpx.AsyncBaseTransport],
+        "Transport to the Chroma server, for tests",
+    ] = None,
+) -> Annotated[FastAPI, "Chroma compatible proxy"]:
+    """
+    Create a Chroma compatible server injecting faults in front of a local one
+
+    Every request is delayed, failed or rate limited like `faults` says, then
+    forwarded unchanged to a local Chroma server, such as `chroma run --path
+    /tmp/chroma`. The API talks to the proxy with `CHROMA_HOST` and
+    `CHROMA_PORT`, so its Chroma client and the stored data are real while the
+    network behaves like a remote deployment. The heartbeat is never faulted,
+    so clients can still connect.
+
+    Args:
+        upstream (str): URL of the Chroma server
+        faults (FaultInjector): Faults of the requests, none when not set
+        transport (httpx.AsyncBaseTransport): Transport to the Chroma server,
+            a network connection when not set
+
+    Returns:
+        FastAPI: Chroma compatible proxy
+    """
+    faults = faults or FaultInjector()
+    client = httpx.AsyncClient(base_url=upstream, transport=transport, timeout=None)
+    app = FastAPI(title="Chroma proxy", openapi_url=None)
+
+    @app.get("/proxy/stats")
+    def stats():
+        """
+        Counters of the injected faults
+
+        Returns:
+            dict: Calls, errors and rate limited calls
+        """
+        return faults.stats()
+
+    @app.api_route(
+        "/{path:path}",
+        methods=["GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"],
+    )
+    async def proxy(path: str, request: Request):
+        """
+        Forward a request to the Chroma server after the faults
+
+        Args:
+            path (str): Path of the request
+            request (Request): Request to forward
+
+        Returns:
+            Response: Response of the Chroma server, or the injected error
+        """
+        if not path.endswith("heartbeat"):
+            if error := await faults.apply():
+                return error
+        response = await client.request(
+            request.method,
+            f"/{path}",
+            params=request.query_params,
+            headers={
+                key: value
+                for key, value in request.headers.items()
+                if key.lower() not in HOP_HEADERS
+            },
+            content=await request.body(),
+        )
+        return Response(
+            content=response.content,
+            status_code=response.status_code,
+            headers={
+                key: value
+                for key, value in response.headers.items()
+                if key.lower() not in HOP_HEADERS
+            },
+        )
+
+    return app
@@ -0,0 +1,243 @@
+import hashlib
+import re
+import uuid
+from functools import lru_cache
+from typing import Annotated, Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+
+from .faults import FaultInjector
+
+#: Endpoints of the mock, each with its own faults
+ENDPOINTS = ("embed", "rerank", "chat")
+
+#: Dimensions of embed-multilingual-v2.0, the default embeddings model
+DIMENSIONS = 768
+
+
+def tokenize(
+    text: Annotated[str, "Text"],
+) -> Annotated[list[str], "Lowercase words"]:
+    """
+    Split a text into lowercase words
+
+    Args:
+        text (str): Text
+
+    Returns:
+        list[str]: Lowercase words
+    """
+    return re.findall(r"\w+", text.lower())
+
+
+@lru_cache(maxsize=65536)
+def word_vector(
+    word: Annotated[str, "Word"],
+    dimensions: Annotated[int, "Dimensions"],
+) -> Annotated[np.ndarray, "Unit vector of the word"]:
+    """
+    Deterministic unit vector of a word, seeded by its hash
+
+    Args:
+        word (str): Word
+        dimensions (int): Dimensions of the vector
+
+    Returns:
+        np.ndarray: Unit vector of the word
+    """
+    seed = int.from_bytes(hashlib.md5(word.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions)
+    return vector / np.linalg.norm(vector)
+
+
+def embed_text(
+    text: Annotated[str, "Text"],
+    dimensions: Annotated[int, "Dimensions"] = DIMENSIONS,
+) -> Annotated[list[float], "Unit embedding of the text"]:
+    """
+    Deterministic embedding of a text, the normalized sum of its word vectors
+
+    Texts sharing words get close embeddings, so similarity search returns
+    plausible neighbours, and the same text always gets the same embedding.
+
+    Args:
+        text (str): Text
+        dimensions (int): Dimensions of the embedding
+
+    Returns:
+        list[float]: Unit embedding of the text
+    """
+    vector = np.zeros(dimensions)
+    for word in tokenize(text) or [""]:
+        vector += word_vector(word, dimensions)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def relevance_score(
+    query: Annotated[str, "Query"],
+    document: Annotated[str, "Document"],
+) -> Annotated[float, "Relevance score within [0, 1]"]:
+    """
+    Deterministic relevance score, the share of query words in the document
+
+    Args:
+        query (str): Query
+        document (str): Document
+
+    Returns:
+        float: Relevance score within [0, 1]
+    """
+    terms = set(tokenize(query))
+    if len(terms) == 0:
+        return 0.0
+    return len(terms & set(tokenize(document))) / len(terms)
+
+
+def message_text(
+    message: Annotated[dict, "Chat message"],
+) -> Annotated[str, "Text of the message"]:
+    """
+    Text of a chat message, whose content is a string or a list of parts
+
+    Args:
+        message (dict): Chat message
+
+    Returns:
+        str: Text of the message
+    """
+    content = message.get("content") or ""
+    if isinstance(content, str):
+        return content
+    return " ".join(part.get("text", "") for part in content)
+
+
+def create_app(
+    faults: Annotated[
+        Optional[dict[str, FaultInjector]],
+        "Faults of each endpoint",
+    ] = None,
+    dimensions: Annotated[int, "Dimensions of the embeddings"] = DIMENSIONS,
+) -> Annotated[FastAPI, "Mock Cohere API"]:
+    """
+    Create a mock of the Cohere v2 API for load tests
+
+    The responses have the shape the Cohere SDK expects, so the API runs
+    unchanged against the mock with `COHERE_BASE_URL` pointing at it.
+
+    Args:
+        faults (dict[str, FaultInjector]): Faults of the "embed", "rerank"
+            and "chat" endpoints, none when not set
+        dimensions (int): Dimensions of the embeddings
+
+    Returns:
+        FastAPI: Mock Cohere API
+    """
+    faults = {
+        endpoint: (faults or {}).get(endpoint) or FaultInjector()
+        for endpoint in ENDPOINTS
+    }
+    app = FastAPI(title="Mock Cohere API")
+
+    @app.post("/v2/embed")
+    async def embed(request: Request):
+        """
+        Embed texts with deterministic vectors
+
+        Args:
+            request (Request): Embed request of the Cohere SDK
+
+        Returns:
+            dict: Embeddings by type
+        """
+        if error := await faults["embed"].apply():
+            return error
+        body = await request.json()
+        texts = body.get("texts") or []
+        embeddings = [embed_text(text, dimensions) for text in texts]
+        return {
+            "id": str(uuid.uuid4()),
+            "response_type": "embeddings_by_type",
+            "embeddings": {
+                embedding_type: embeddings
+                for embedding_type in body.get("embedding_types") or ["float"]
+            },
+            "texts": texts,
+            "meta": {"billed_units": {"input_tokens": len(" ".join(texts)) // 4}},
+        }
+
+    @app.post("/v2/rerank")
+    async def rerank(request: Request):
+        """
+        Rerank documents by the share of query words they contain
+
+        Args:
+            request (Request): Rerank request of the Cohere SDK
+
+        Returns:
+            dict: Results, best first
+        """
+        if error := await faults["rerank"].apply():
+            return error
+        body = await request.json()
+        scores = [
+            relevance_score(
+                body["query"],
+                document if isinstance(document, str) else document.get("text", ""),
+            )
+            for document in body.get("documents") or []
+        ]
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return {
+            "id": str(uuid.uuid4()),
+            "results": [
+                {"index": i, "relevance_score": scores[i]}
+                for i in order[: body.get("top_n") or len(order)]
+            ],
+            "meta": {"billed_units": {"search_units": 1}},
+        }
+
+    @app.post("/v2/chat")
+    async def chat(request: Request):
+        """
+        Answer with a fixed template quoting the last message
+
+        Args:
+            request (Request): Chat request of the Cohere SDK
+
+        Returns:
+            dict: Assistant message
+        """
+        if error := await faults["chat"].apply():
+            return error
+        body = await request.json()
+        messages = body.get("messages") or []
+        question = message_text(messages[-1]) if messages else ""
+        text = f"Mock answer to: {question}"
+        input_tokens = sum(len(message_text(message)) for message in messages) // 4
+        return {
+            "id": str(uuid.uuid4()),
+            "finish_reason": "COMPLETE",
+            "message": {
+                "role": "assistant",
+                "content": [{"type": "text", "text": text}],
+            },
+            "usage": {
+                "billed_units": {
+                    "input_tokens": input_tokens,
+                    "output_tokens": len(text) // 4,
+                },
+            },
+        }
+
+    @app.get("/stats")
+    def stats():
+        """
+        Counters of the injected faults of each endpoint
+
+        Returns:
+            dict: Counters of each endpoint
+        """
+        return {endpoint: fault.stats() for endpoint, fault in faults.items()}
+
+    return app
@@ -0,0 +1,189 @@
+import threading
+from typing import Annotated, Optional
+
+import anyio
+import numpy as np
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from core.resilience import TokenBucket
+
+#: Parameters of each latency distribution, in seconds except the shapes
+DISTRIBUTIONS = {
+    "constant": ("seconds",),
+    "uniform": ("low", "high"),
+    "normal": ("mean", "std"),
+    "lognormal": ("median", "sigma"),
+    "pareto": ("minimum", "shape"),
+}
+
+
+class LatencyModel:
+    """
+    Latency distribution of an upstream call
+
+    Attributes:
+        distribution (str): One of DISTRIBUTIONS
+        params (tuple[float, ...]): Parameters of the distribution
+    """
+
+    def __init__(
+        self,
+        distribution: Annotated[str, "Name of the distribution"] = "constant",
+        params: Annotated[tuple[float, ...], "Parameters"] = (0.0,),
+        seed: Annotated[Optional[int], "Seed of the random generator"] = None,
+    ) -> None:
+        """
+        Create a latency model
+
+        Args:
+            distribution (str): "constant", "uniform", "normal", "lognormal"
+                or "pareto"
+            params (tuple[float, ...]): Parameters of the distribution, see
+                DISTRIBUTIONS
+            seed (int): Seed of the random generator, for repeatable runs
+
+        Raises:
+            ValueError: If the distribution or its parameters are invalid
+        """
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(
+                f"Unknown distribution {distribution},"
+                f" expected one of {tuple(DISTRIBUTIONS)}"
+            )
+        if len(params) != len(DISTRIBUTIONS[distribution]):
+            raise ValueError(
+                f"{distribution} takes {', '.join(DISTRIBUTIONS[distribution])}"
+            )
+        self.distribution = distribution
+        self.params = tuple(float(param) for param in params)
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(
+        cls,
+        spec: Annotated[str, "Distribution and parameters"],
+        seed: Annotated[Optional[int], "Seed of the random generator"] = None,
+    ) -> Annotated["LatencyModel", "Latency model"]:
+        """
+        Parse a latency specification such as `lognormal:0.05:0.5`
+
+        Args:
+            spec (str): Distribution name and parameters separated by colons
+            seed (int): Seed of the random generator
+
+        Returns:
+            LatencyModel: Latency model
+        """
+        distribution, *params = spec.split(":")
+        return cls(distribution, tuple(float(param) for param in params), seed)
+
+    def sample(self) -> Annotated[float, "Latency in seconds"]:
+        """
+        Draw one latency
+
+        Returns:
+            float: Latency in seconds, never negative
+        """
+        with self._lock:
+            if self.distribution == "constant":
+                value = self.params[0]
+            elif self.distribution == "uniform":
+                value = self._rng.uniform(*self.params)
+            elif self.distribution == "normal":
+                value = self._rng.normal(*self.params)
+            elif self.distribution == "lognormal":
+                median, sigma = self.params
+                value = median * np.exp(sigma * self._rng.standard_normal())
+            else:
+                minimum, shape = self.params
+                value = minimum * (1 + self._rng.pareto(shape))
+        return max(0.0, float(value))
+
+
+class FaultInjector:
+    """
+    Latency, errors and rate limiting of an upstream endpoint
+
+    Attributes:
+        latency (LatencyModel): Latency of each call
+        error_rate (float): Share of calls failing with a 5xx status
+        rate_limiter (TokenBucket): Calls over the rate get a 429 status
+        calls (int): Calls received
+        errors (int): Calls failed on purpose
+        rate_limited (int): Calls rejected by the rate limit
+    """
+
+    def __init__(
+        self,
+        latency: Annotated[Optional[LatencyModel], "Latency of each call"] = None,
+        error_rate: Annotated[float, "Share of calls failing"] = 0.0,
+        rate_limit: Annotated[float, "Calls per second, 0 for no limit"] = 0.0,
+        seed: Annotated[Optional[int], "Seed of the random generator"] = None,
+    ) -> None:
+        """
+        Create a fault injector
+
+        Args:
+            latency (LatencyModel): Latency of each call, none when not set
+            error_rate (float): Share of calls failing with 500 or 503
+            rate_limit (float): Calls per second, 0 for no limit
+            seed (int): Seed of the random generator of the errors
+
+        Raises:
+            ValueError: If the error rate is not within [0, 1]
+        """
+        if not 0 <= error_rate <= 1:
+            raise ValueError("error_rate must be within [0, 1]")
+        self.latency = latency or LatencyModel()
+        self.error_rate = error_rate
+        self.rate_limiter = TokenBucket(rate=rate_limit) if rate_limit > 0 else None
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    async def apply(self) -> Annotated[Optional[Response], "Error response"]:
+        """
+        Wait for the sampled latency, then maybe fail the call
+
+        Rate limited calls are rejected at once, like a real API gateway.
+
+        Returns:
+            Optional[Response]: Error response, None when the call succeeds
+        """
+        with self._lock:
+            self.calls += 1
+        if self.rate_limiter is not None and not self.rate_limiter.try_acquire():
+            with self._lock:
+                self.rate_limited += 1
+            return JSONResponse(
+                status_code=429,
+                content={"message": "rate limit exceeded"},
+                headers={"Retry-After": "1"},
+            )
+        await anyio.sleep(self.latency.sample())
+        with self._lock:
+            if self._rng.random() >= self.error_rate:
+                return None
+            self.errors += 1
+            status_code = 503 if self._rng.random() < 0.5 else 500
+        return JSONResponse(
+            status_code=status_code, content={"message": "injected failure"}
+        )
+
+    def stats(self) -> Annotated[dict, "Counters"]:
+        """
+        Counters of the injected faults
+
+        Returns:
+            dict: Calls, errors and rate limited calls
+        """
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "rate_limited": self.rate_limited,
+            }
@@ -0,0 +1,131 @@
+"""Compare the throughput and latency of the API with 1 and N workers.
+
+Starts the server once per worker count, waits until it answers, then sends
+concurrent requests to one path and prints the startup time, throughput and
+latency percentiles of each run.
+
+    uv run python scripts/benchmark_workers.py --workers 1 4 --requests 2000 \
+        --path "/vector_store?collection_name=geography&query=capital"
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root))
+
+from core.evaluation import latency_summary  # noqa: E402
+
+
+def free_port() -> int:
+    """Find a free TCP port on localhost."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, timeout: float) -> float:
+    """Wait until the server answers, return the seconds it took."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            httpx.get(url, timeout=1)
+            return time.perf_counter() - start
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise TimeoutError(f"Server not ready after {timeout} seconds")
+
+
+def shared_state_env(directory: str) -> dict:
+    """Environment putting the state shared by the workers under a directory."""
+    return {
+        "CHAT_SESSION_DB": os.path.join(directory, "sessions.db"),
+        "COLLECTION_REGISTRY_DB": os.path.join(directory, "registry.db"),
+        "QUERY_CACHE_DB": os.path.join(directory, "query_cache.db"),
+        "QUANTIZED_INDEX_DB": os.path.join(directory, "quantized.db"),
+    }
+
+
+def run(workers: int, args: argparse.Namespace) -> dict:
+    """Start the server with a number of workers and benchmark one path."""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    state = tempfile.TemporaryDirectory()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "api.server",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+        ],
+        cwd=root,
+        env={**os.environ, **shared_state_env(state.name)},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup = wait_ready(f"{base_url}/metrics", args.startup_timeout)
+        with httpx.Client(base_url=base_url, timeout=30) as client:
+
+            def request(_: int) -> tuple[float, int]:
+                start = time.perf_counter()
+                response = client.get(args.path)
+                return time.perf_counter() - start, response.status_code
+
+            for _ in range(args.warmup):
+                request(0)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                results = list(executor.map(request, range(args.requests)))
+            elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        state.cleanup()
+
+    errors = sum(1 for _, status in results if status >= 400)
+    return {
+        "workers": workers,
+        "startup_s": round(startup, 3),
+        "requests_per_s": round(len(results) / elapsed, 1),
+        "errors": errors,
+        **{
+            key: round(value, 2)
+            for key, value in latency_summary(
+                [latency for latency, _ in results]
+            ).items()
+        },
+    }
+
+
+def main() -> None:
+    """Parse the arguments and print one JSON line per worker count."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--path", default="/metrics", help="Path to request")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    args = parser.parse_args()
+    for workers in args.workers:
+        print(json.dumps(run(workers, args)), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Load test the API against local stand-ins of Cohere and Chroma.
+
+Starts the Cohere mock and the Chroma fault proxy of `loadtest`, then the API
+pointed at them, seeds a collection and sends a mixed workload of searches,
+reranks, ingests and RAG answers. Prints one JSON line per operation with its
+throughput, errors and latency percentiles, then the faults the stand-ins
+injected. Needs a local Chroma server behind the proxy, such as
+`chroma run --path /tmp/chroma --port 8000`, where the seeded collection is
+kept. No request leaves the machine.
+
+    uv run python scripts/load_test.py --requests 2000 --concurrency 32 \
+        --cohere-latency lognormal:0.05:0.5 --cohere-latency chat=lognormal:1:0.3 \
+        --cohere-error-rate 0.01 --chroma-latency normal:0.005:0.001
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root))
+
+from core.evaluation import latency_summary  # noqa: E402
+from scripts.benchmark_workers import (  # noqa: E402
+    free_port,
+    shared_state_env,
+    wait_ready,
+)
+
+WORDS = (
+    "river mountain city capital island coast border harbour valley desert"
+    " forest lake bridge railway market museum province climate history"
+).split()
+
+
+def sentence(rng: random.Random, words: int = 12) -> str:
+    """Draw a sentence of random words."""
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def start(command: list[str], env: dict) -> subprocess.Popen:
+    """Start a server process from the repository root."""
+    return subprocess.Popen(
+        [sys.executable, *command],
+        cwd=root,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def faults(prefix: str, args: argparse.Namespace) -> list[str]:
+    """Command line options of the faults of one stand-in."""
+    options = ["--seed", str(args.seed)]
+    for name in ("latency", "error_rate", "rate_limit"):
+        for value in getattr(args, f"{prefix}_{name}"):
+            options += [f"--{name.replace('_', '-')}", value]
+    return options
+
+
+def operations(args: argparse.Namespace) -> dict:
+    """Requests of each operation of the workload, from a random generator."""
+
+    def search(rng: random.Random) -> tuple[str, str, dict]:
+        params = {"collection_name": args.collection, "query": sentence(rng, 4)}
+        return "GET", "/vector_store", {"params": params}
+
+    def rerank(rng: random.Random) -> tuple[str, str, dict]:
+        contents = [sentence(rng) for _ in range(args.rerank_documents)]
+        body = {"query": sentence(rng, 4), "contents": contents, "top_n": 3}
+        return "POST", "/rerank/columns", {"json": body}
+
+    def ingest(rng: random.Random) -> tuple[str, str, dict]:
+        contents = [sentence(rng) for _ in range(args.ingest_documents)]
+        body = {
+            "collection_name": args.collection,
+            "contents": contents,
+            "reference_ids": [str(rng.randrange(100)) for _ in contents],
+        }
+        return "POST", "/vector_store/columns", {"json": body}
+
+    def rag(rng: random.Random) -> tuple[str, str, dict]:
+        body = {"query": sentence(rng, 6), "collection_names": [args.collection]}
+        return "POST", "/chat_llm/rag", {"json": body}
+
+    return {"search": search, "rerank": rerank, "ingest": ingest, "rag": rag}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Parse weights such as search=6,rerank=2,ingest=1,rag=1."""
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def run(args: argparse.Namespace) -> list[dict]:
+    """Start the stand-ins and the API, then run the workload."""
+    cohere_port, chroma_port, api_port = free_port(), free_port(), free_port()
+    state = tempfile.TemporaryDirectory()
+    servers = [
+        start(
+            ["-m", "loadtest", "cohere", "--port", str(cohere_port)]
+            + faults("cohere", args),
+            os.environ.copy(),
+        ),
+        start(
+            ["-m", "loadtest", "chroma", "--port", str(chroma_port)]
+            + ["--upstream", args.chroma_upstream]
+            + faults("chroma", args),
+            os.environ.copy(),
+        ),
+    ]
+    try:
+        wait_ready(f"http://127.0.0.1:{cohere_port}/stats", args.startup_timeout)
+        wait_ready(f"http://127.0.0.1:{chroma_port}/proxy/stats", args.startup_timeout)
+        servers.append(
+            start(
+                ["-m", "api.server", "--host", "127.0.0.1", "--port", str(api_port)]
+                + ["--workers", str(args.workers)],
+                {
+                    **os.environ,
+                    "COHERE_API_KEY": "loadtest",
+                    "COHERE_BASE_URL": f"http://127.0.0.1:{cohere_port}",
+                    "CHROMA_HOST": "127.0.0.1",
+                    "CHROMA_PORT": str(chroma_port),
+                    **shared_state_env(state.name),
+                },
+            )
+        )
+        base_url = f"http://127.0.0.1:{api_port}"
+        wait_ready(f"{base_url}/metrics", args.startup_timeout)
+        ops = operations(args)
+        weights = parse_mix(args.mix)
+        unknown = set(weights) - set(ops)
+        if unknown:
+            raise ValueError(f"Unknown operations {unknown}, expected {set(ops)}")
+        rng = random.Random(args.seed)
+        names = rng.choices(
+            list(weights), weights=list(weights.values()), k=args.requests
+        )
+        requests = [(name, *ops[name](rng)) for name in names]
+
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            for _ in range(args.seed_batches):
+                method, path, options = ops["ingest"](rng)
+                client.request(method, path, **options)
+
+            def request(item: tuple) -> tuple[str, float, int]:
+                name, method, path, options = item
+                start = time.perf_counter()
+                try:
+                    status = client.request(method, path, **options).status_code
+                except httpx.HTTPError:
+                    status = 599
+                return name, time.perf_counter() - start, status
+
+            begin = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                results = list(executor.map(request, requests))
+            elapsed = time.perf_counter() - begin
+        stats = {
+            "cohere": httpx.get(f"http://127.0.0.1:{cohere_port}/stats").json(),
+            "chroma": httpx.get(f"http://127.0.0.1:{chroma_port}/proxy/stats").json(),
+        }
+    finally:
+        for server in reversed(servers):
+            server.terminate()
+            server.wait(timeout=30)
+        state.cleanup()
+
+    lines = []
+    for name in ["all", *weights]:
+        selected = [r for r in results if name == "all" or r[0] == name]
+        if len(selected) == 0:
+            continue
+        lines.append(
+            {
+                "operation": name,
+                "requests": len(selected),
+                "requests_per_s": round(len(selected) / elapsed, 1),
+                "errors": sum(1 for _, _, status in selected if status >= 400),
+                **{
+                    key: round(value, 2)
+                    for key, value in latency_summary(
+                        [latency for _, latency, _ in selected]
+                    ).items()
+                },
+            }
+        )
+    lines.append({"injected_faults": stats})
+    return lines
+
+
+def main() -> None:
+    """Parse the arguments and print one JSON line per operation."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--collection", default="loadtest")
+    parser.add_argument("--mix", default="search=6,rerank=2,ingest=1,rag=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seed-batches", type=int, default=10)
+    parser.add_argument("--ingest-documents", type=int, default=20)
+    parser.add_argument("--rerank-documents", type=int, default=20)
+    parser.add_argument("--chroma-upstream", default="http://localhost:8000")
+    for service in ("cohere", "chroma"):
+        for option in ("latency", "error-rate", "rate-limit"):
+            parser.add_argument(
+                f"--{service}-{option}",
+                action="append",
+                default=[],
+                help=f"--{option} of the {service} stand-in, see python -m loadtest",
+            )
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    args = parser.parse_args()
+    for line in run(args):
+        print(json.dumps(line), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Export a collection to a directory or import it into a Chroma server.
+
+Embeddings are copied as they are, nothing is re-embedded, so a collection can
+be moved between servers or rebuilt under a new name for a blue/green swap.
+
+    uv run python scripts/transfer_collection.py export geography /tmp/geography
+    uv run python scripts/transfer_collection.py import /tmp/geography \
+        --collection geography_v2 --host chroma-green
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+import chromadb
+
+root = Path(__file__).parent.parent
+sys.path.insert(0, str(root))
+
+from api.config import CHROMA_HOST, CHROMA_PORT  # noqa: E402
+from core.transfer import (  # noqa: E402
+    export_collection,
+    import_collection,
+    open_import_target,
+)
+from core.vector_store import VectorStore  # noqa: E402
+
+
+def main() -> None:
+    """Parse the arguments, run the transfer and print a JSON summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=CHROMA_HOST, help="Chroma host")
+    parser.add_argument("--port", type=int, default=int(CHROMA_PORT))
+    parser.add_argument("--batch-size", type=int, default=1000)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Export a collection")
+    export_parser.add_argument("collection")
+    export_parser.add_argument("path")
+    import_parser = commands.add_parser("import", help="Import an export")
+    import_parser.add_argument("path")
+    import_parser.add_argument(
+        "--collection", help="Target collection, the exported name by default"
+    )
+    args = parser.parse_args()
+
+    client = chromadb.HttpClient(host=args.host, port=args.port)
+    if args.command == "export":
+        vector_store = VectorStore(
+            collection_name=args.collection, client=client, embeddings=None
+        )
+        manifest = export_collection(vector_store, args.path, args.batch_size)
+        print(manifest.model_dump_json())
+    else:
+        vector_store = open_import_target(args.path, client, args.collection)
+        count = import_collection(vector_store, args.path, args.batch_size)
+        print(json.dumps({"collection": vector_store.collection.name, "count": count}))
+
+
+if __name__ == "__main__":
+    main()
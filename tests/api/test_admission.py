@@ -0,0 +1,118 @@
+import anyio
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from api.admission import (
+    AdaptiveLimiter,
+    AdmissionController,
+    AdmissionMiddleware,
+    RouteClass,
+)
+
+
+def test_adaptive_limiter_aimd():
+    limiter = AdaptiveLimiter(initial_limit=10, target_latency=1, backoff=0.5)
+    limiter.on_complete(0.1)
+    assert limiter.limit == pytest.approx(10.1)
+    limiter.on_complete(2)
+    assert limiter.limit == pytest.approx(5.05)
+    limiter.on_complete(2)
+    assert limiter.limit == pytest.approx(5.05)
+    limiter.on_complete(0, dropped=True)
+    assert limiter.limit == pytest.approx(5.05)
+
+
+def make_controller(max_queue=4, queue_timeout=1):
+    return AdmissionController(
+        [
+            RouteClass(
+                "search",
+                priority=0,
+                routes=[("GET", "/search")],
+                max_queue=max_queue,
+                queue_timeout=queue_timeout,
+                limiter=AdaptiveLimiter(initial_limit=1),
+            ),
+            RouteClass(
+                "ingest",
+                priority=1,
+                routes=[("POST", "/search")],
+                max_queue=max_queue,
+                queue_timeout=queue_timeout,
+                limiter=AdaptiveLimiter(initial_limit=1),
+            ),
+        ],
+        max_concurrency=1,
+    )
+
+
+@pytest.mark.anyio
+async def test_admission_in_priority_order():
+    controller = make_controller()
+    search, ingest = controller.route_classes
+    assert controller.classify("POST", "/search") is ingest
+    assert controller.classify("GET", "/metrics") is None
+    assert await controller.acquire(search)
+    admitted = []
+
+    async def wait(route_class):
+        if await controller.acquire(route_class):
+            admitted.append(route_class.name)
+            controller.release(route_class, latency=0)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(wait, ingest)
+        await anyio.sleep(0.01)
+        tg.start_soon(wait, search)
+        await anyio.sleep(0.01)
+        assert controller.stats()["search"]["queued"] == 1
+        controller.release(search, latency=0)
+    assert admitted == ["search", "ingest"]
+    assert controller.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_admission_sheds_when_queue_is_full_or_too_slow():
+    controller = make_controller(max_queue=1, queue_timeout=0.05)
+    search = controller.route_classes[0]
+    assert await controller.acquire(search)
+    results = []
+
+    async def wait():
+        results.append(await controller.acquire(search))
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(wait)
+        await anyio.sleep(0.01)
+        assert not await controller.acquire(search)
+    assert results == [False]
+    assert controller.stats()["search"] == {
+        "limit": 1,
+        "in_flight": 1,
+        "queued": 0,
+        "shed": 2,
+    }
+
+
+@pytest.mark.anyio
+async def test_admission_middleware_returns_503():
+    controller = make_controller(max_queue=0, queue_timeout=0)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async with AsyncClient(
+        transport=ASGITransport(app=AdmissionMiddleware(app, controller)),
+        base_url="http://test",
+    ) as ac:
+        response = await ac.get("/search")
+        assert response.status_code == 200
+        assert controller.in_flight == 0
+
+        await controller.acquire(controller.route_classes[0])
+        response = await ac.get("/search")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        response = await ac.get("/metrics")
+        assert response.status_code == 200
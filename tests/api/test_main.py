@@ -1,15 +1,25 @@
+import base64
+
+import anyio
 import chromadb
+import numpy as np
 import pytest
 from chromadb.utils import embedding_functions
+from fastapi import HTTPException
 from httpx import ASGITransport, AsyncClient
 
 from api.dependencies import (
     get_chat_model,
     get_chroma_client,
+    get_collection_router,
     get_embeddings_function,
     get_rerank_model,
 )
 from api.main import app
+from api.serialization import decode_embedding, encode_embedding
+from api.validation import check_columns
+from core.migration import CollectionRegistry, CollectionRouter
+from tests.fake.embeddings import FakeEmbeddingsFunction
 from tests.fake.llm_chat import FakeLLMChatModel
 from tests.fake.rerank import FakeRerankModel
 
@@ -37,10 +47,21 @@ def get_rerank_model_override():
     return FakeRerankModel()
 
 
+collection_router = CollectionRouter(
+    CollectionRegistry(),
+    embeddings_for=lambda model_name: FakeEmbeddingsFunction(),
+)
+
+
+def get_collection_router_override():
+    return collection_router
+
+
 app.dependency_overrides[get_chroma_client] = get_chroma_client_override
 app.dependency_overrides[get_embeddings_function] = get_embeddings_function_override
 app.dependency_overrides[get_chat_model] = get_chat_model_override
 app.dependency_overrides[get_rerank_model] = get_rerank_model_override
+app.dependency_overrides[get_collection_router] = get_collection_router_override
 
 
 @pytest.mark.anyio
@@ -80,6 +101,7 @@ async def test_similarity_search():
             assert type(doc["page_content"]) is str
             assert type(doc["metadata"]) is dict
             assert type(doc["metadata"]["reference_id"]) is str
+            assert not {"parent_id", "chunk", "chunk_count"} & set(doc["metadata"])
             assert doc["reference"] is None
 
 
@@ -111,6 +133,320 @@ async def test_similarity_search_with_reference_callback():
             assert doc["reference"]["id"] == doc["metadata"]["reference_id"]
 
 
+@pytest.mark.anyio
+async def test_similarity_search_with_projection():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get(
+            "/vector_store",
+            params={
+                "query": "Hoàng Sa",
+                "collection_name": "geography",
+                "fields": "ids",
+            },
+        )
+        assert response.status_code == 200
+        for doc in response.json()["documents"]:
+            assert set(doc.keys()) == {"id", "score"}
+            assert type(doc["id"]) is str
+
+        response = await ac.get(
+            "/vector_store",
+            params={
+                "query": "Hoàng Sa",
+                "collection_name": "geography",
+                "fields": "snippet",
+                "snippet_length": 5,
+            },
+        )
+        assert response.status_code == 200
+        for doc in response.json()["documents"]:
+            assert len(doc["page_content"]) <= 5
+
+
+@pytest.mark.anyio
+async def test_similarity_search_with_embeddings():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        params = {
+            "query": "Hoàng Sa",
+            "collection_name": "geography",
+            "fields": "ids",
+            "include_embeddings": True,
+        }
+        response = await ac.get("/vector_store", params=params)
+        floats = [doc["embedding"] for doc in response.json()["documents"]]
+        assert len(floats) > 0
+        assert all(type(embedding) is list for embedding in floats)
+
+        response = await ac.get(
+            "/vector_store", params={**params, "embedding_format": "base64"}
+        )
+        encoded = [doc["embedding"] for doc in response.json()["documents"]]
+        decoded = [
+            np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+            for embedding in encoded
+        ]
+        assert np.allclose(decoded, floats)
+
+
+@pytest.mark.anyio
+async def test_similarity_search_with_query_embedding():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        params = {"query": "Hoàng Sa", "collection_name": "geography"}
+        expected = (await ac.get("/vector_store", params=params)).json()
+        embedding = get_embeddings_function_override()(["Hoàng Sa"])[0]
+        response = await ac.get(
+            "/vector_store",
+            params={
+                "collection_name": "geography",
+                "query_embedding": encode_embedding(embedding),
+            },
+        )
+        assert response.status_code == 200
+        assert [doc["id"] for doc in response.json()["documents"]] == [
+            doc["id"] for doc in expected["documents"]
+        ]
+
+        response = await ac.get(
+            "/vector_store",
+            params={"collection_name": "geography", "query_embedding": "abc"},
+        )
+        assert response.status_code == 422
+        response = await ac.get(
+            "/vector_store", params={"collection_name": "geography"}
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_similarity_search_bounds():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        for params in ({"k": 0}, {"k": 100000}, {"search_ef": 10**9}):
+            response = await ac.get(
+                "/vector_store",
+                params={"query": "Hoàng Sa", "collection_name": "geography", **params},
+            )
+            assert response.status_code == 422
+        response = await ac.post(
+            "/vector_store/search",
+            json={
+                "collection_name": "geography",
+                "queries": ["Hoàng Sa"],
+                "search_ef": 10**9,
+            },
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_batch_similarity_search():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        queries = ["Hoàng Sa", "Trường Sa"]
+        embeddings = get_embeddings_function_override()(queries)
+        response = await ac.post(
+            "/vector_store/search",
+            json={
+                "collection_name": "geography",
+                "queries": queries,
+                "k": 2,
+                "fields": "ids",
+            },
+        )
+        assert response.status_code == 200
+        by_query = response.json()["results"]
+        assert [result["query"] for result in by_query] == queries
+
+        response = await ac.post(
+            "/vector_store/search",
+            json={
+                "collection_name": "geography",
+                "query_embeddings": [
+                    encode_embedding(embeddings[0]),
+                    [float(x) for x in embeddings[1]],
+                ],
+                "k": 2,
+                "fields": "ids",
+            },
+        )
+        assert response.status_code == 200
+        by_embedding = response.json()["results"]
+        assert [
+            [doc["id"] for doc in result["documents"]] for result in by_embedding
+        ] == [[doc["id"] for doc in result["documents"]] for result in by_query]
+
+        response = await ac.post(
+            "/vector_store/search", json={"collection_name": "geography"}
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_federated_similarity_search():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        for collection_name, content in [
+            ("test_federated_islands", "Hoàng Sa và Trường Sa là của Việt Nam"),
+            ("test_federated_cities", "Hà Nội là thủ đô của Việt Nam"),
+        ]:
+            response = await ac.post(
+                "/vector_store",
+                json={
+                    "collection_name": collection_name,
+                    "content": content,
+                    "reference_id": "1",
+                },
+            )
+            assert response.status_code == 200
+
+        response = await ac.post(
+            "/vector_store/federated_search",
+            json={
+                "query": "Hoàng Sa",
+                "collections": [
+                    {"name": "test_federated_cities"},
+                    {"name": "test_federated_islands", "weight": 2, "timeout": 5},
+                ],
+                "k": 2,
+            },
+        )
+        assert response.status_code == 200
+        documents = response.json()["documents"]
+        assert [document["collection_name"] for document in documents] == [
+            "test_federated_islands",
+            "test_federated_cities",
+        ]
+        assert [document["score"] for document in documents] == [2, 1]
+        assert response.json()["skipped_collections"] == []
+        for collection_name in ["test_federated_islands", "test_federated_cities"]:
+            response = await ac.delete(
+                "/vector_store/1", params={"collection_name": collection_name}
+            )
+            assert response.status_code == 204
+
+        response = await ac.post(
+            "/vector_store/federated_search",
+            json={"query": "Hoàng Sa", "collections": [{"name": "a"}, {"name": "a"}]},
+        )
+        assert response.status_code == 422
+        response = await ac.post(
+            "/vector_store/federated_search",
+            json={"collections": [{"name": "geography"}]},
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_similarity_search_with_diversity():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        params = {"query": "Hoàng Sa", "collection_name": "geography", "k": 5}
+        response = await ac.get(
+            "/vector_store", params={**params, "max_per_reference": 1}
+        )
+        assert response.status_code == 200
+        references = [
+            doc["metadata"]["reference_id"] for doc in response.json()["documents"]
+        ]
+        assert len(references) == len(set(references))
+
+        response = await ac.get("/vector_store", params={**params, "mmr_lambda": 2})
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_similarity_search_with_min_score():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        params = {"query": "Hoàng Sa", "collection_name": "geography", "k": 10}
+        scores = [
+            doc["score"]
+            for doc in (await ac.get("/vector_store", params=params)).json()[
+                "documents"
+            ]
+        ]
+        assert scores == sorted(scores, reverse=True)
+        response = await ac.get(
+            "/vector_store", params={**params, "min_score": scores[0] + 1e-3}
+        )
+        assert response.json()["documents"] == []
+
+
+@pytest.mark.anyio
+async def test_similarity_search_with_expansion():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/vector_store",
+            json={
+                "collection_name": "chunked",
+                "content": ["Chunk one", "Chunk two", "Chunk three"],
+                "reference_id": "1",
+            },
+        )
+        assert len(response.json()["ids"]) == 3
+        params = {"query": "Chunk two", "collection_name": "chunked", "k": 1}
+        response = await ac.get("/vector_store", params={**params, "expand_window": 1})
+        (document,) = response.json()["documents"]
+        assert "Chunk two" in document["page_content"]
+        assert document["page_content"].count("Chunk") >= 2
+
+        response = await ac.get(
+            "/vector_store", params={**params, "expand_parent": True}
+        )
+        (document,) = response.json()["documents"]
+        assert document["page_content"] == "Chunk one\nChunk two\nChunk three"
+
+        response = await ac.get("/vector_store", params={**params, "expand_window": -1})
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_similarity_search_with_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get(
+            "/vector_store",
+            params={"query": "Hoàng Sa", "collection_name": "geography"},
+            headers={"Accept": "application/x-msgpack"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-msgpack"
+        res = msgpack.unpackb(response.content)
+        assert res["query"] == "Hoàng Sa"
+        assert len(res["documents"]) > 0
+
+
+@pytest.mark.anyio
+async def test_similarity_search_with_invalid_where():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get(
+            "/vector_store",
+            params={
+                "query": "Hoàng Sa",
+                "collection_name": "geography",
+                "where": '{"year": {"$between": [2000, 2020]}}',
+            },
+        )
+        assert response.status_code == 422
+
+
 @pytest.mark.anyio
 async def test_delete_documents():
     async with AsyncClient(
@@ -143,6 +479,78 @@ async def test_chat():
         assert type(response.json()["content"]) is str
 
 
+@pytest.mark.anyio
+async def test_rag():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/vector_store",
+            json={
+                "collection_name": "test_rag",
+                "content": "Hoang Sa and Truong Sa belong to Vietnam",
+                "reference_id": "1",
+            },
+        )
+        assert response.status_code == 200
+
+        response = await ac.post(
+            "/chat_llm/rag",
+            json={
+                "query": "Which country do Hoang Sa and Truong Sa belong to?",
+                "collection_names": ["test_rag"],
+                "top_n": 1,
+            },
+        )
+        assert response.status_code == 200
+        assert type(response.json()["answer"]) is str
+        assert len(response.json()["documents"]) == 1
+        assert response.json()["skipped_sources"] == []
+
+        response = await ac.post(
+            "/chat_llm/rag",
+            json={"query": "Vietnam", "where": {"year": {"$unknown": 1}}},
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_chat_session():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/chat_llm/sessions",
+            json={"messages": [{"role": "system", "content": "Be helpful"}]},
+        )
+        assert response.status_code == 200
+        session_id = response.json()["id"]
+
+        response = await ac.post(
+            f"/chat_llm/sessions/{session_id}/messages",
+            json={"role": "human", "content": "What is the capital of France?"},
+        )
+        assert response.status_code == 200
+        assert response.json()["session_id"] == session_id
+        assert type(response.json()["content"]) is str
+
+        response = await ac.get(f"/chat_llm/sessions/{session_id}")
+        assert response.status_code == 200
+        assert [m["role"] for m in response.json()["messages"]] == [
+            "system",
+            "human",
+            "ai",
+        ]
+
+        response = await ac.delete(f"/chat_llm/sessions/{session_id}")
+        assert response.status_code == 204
+        response = await ac.post(
+            f"/chat_llm/sessions/{session_id}/messages",
+            json={"role": "human", "content": "Hello"},
+        )
+        assert response.status_code == 404
+
+
 @pytest.mark.anyio
 async def test_rerank():
     async with AsyncClient(
@@ -171,3 +579,136 @@ async def test_rerank():
             assert type(doc["page_content"]) is str
             assert type(doc["metadata"]) is dict
             assert type(doc["metadata"]["reference_id"]) is str
+
+
+@pytest.mark.anyio
+async def test_rerank_columns():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/rerank/columns",
+            json={
+                "query": "Which country has the largest population?",
+                "contents": ["Document 1", "Document 2", "Document 3", "Document 4"],
+                "reference_ids": ["1", "2", "3", "4"],
+                "top_n": 3,
+            },
+        )
+        assert response.status_code == 200
+        assert response.json()["indices"] == [2, 3, 0]
+        assert response.json()["scores"] == [0.4, 0.3, 0.2]
+        assert response.json()["reference_ids"] == ["3", "4", "1"]
+
+        response = await ac.post(
+            "/rerank/columns",
+            json={"query": "query", "contents": ["a", "b"], "reference_ids": ["1"]},
+        )
+        assert response.status_code == 422
+
+
+@pytest.mark.anyio
+async def test_add_documents_from_columns():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.post(
+            "/vector_store/columns",
+            json={
+                "collection_name": "test_columns",
+                "contents": ["Hoàng Sa là của Việt Nam", "Trường Sa là của Việt Nam"],
+                "reference_ids": ["1", "2"],
+                "metadata": {"language": ["vi", "vi"], "year": [2024, None]},
+            },
+        )
+        assert response.status_code == 200
+        assert len(response.json()["ids"]) == 2
+
+        response = await ac.post(
+            "/vector_store/columns",
+            json={
+                "collection_name": "test_columns",
+                "contents": ["Hoàng Sa"],
+                "reference_ids": ["1"],
+                "metadata": {"year": [2024, 2025]},
+            },
+        )
+        assert response.status_code == 422
+
+
+def test_check_columns_token_budget():
+    check_columns(["a" * 8], max_tokens=2)
+    with pytest.raises(HTTPException) as error:
+        check_columns(["a" * 9], max_tokens=2)
+    assert error.value.status_code == 413
+
+
+@pytest.mark.anyio
+async def test_metrics():
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        response = await ac.get("/metrics")
+        assert response.status_code == 200
+        providers = response.json()["providers"]
+        assert set(providers) == {"cohere", "chroma"}
+        assert providers["cohere"]["circuit"] == "closed"
+        assert set(response.json()["admission"]) == {"search", "chat", "ingest"}
+        assert 0 <= response.json()["query_cache"]["hit_ratio"] <= 1
+
+
+@pytest.mark.anyio
+async def test_migration(anyio_backend):
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as ac:
+        collection_name = f"migration_{anyio_backend}"
+        for i in range(5):
+            await ac.post(
+                "/vector_store",
+                json={
+                    "collection_name": collection_name,
+                    "content": f"Migrated document {i}",
+                    "reference_id": str(i),
+                },
+            )
+        response = await ac.post(
+            "/migrations",
+            json={
+                "collection_name": collection_name,
+                "model_name": "fake",
+                "page_size": 2,
+            },
+        )
+        assert response.status_code == 202
+        assert response.json()["total"] == 5
+
+        for _ in range(100):
+            migration = (await ac.get(f"/migrations/{collection_name}")).json()
+            if migration["status"] != "running":
+                break
+            await anyio.sleep(0.05)
+        assert migration["status"] == "completed"
+        assert migration["migrated"] == 5
+
+        response = await ac.get(
+            "/vector_store",
+            params={"collection_name": collection_name, "query": "Migrated"},
+        )
+        assert len(response.json()["documents"]) == 5
+        response = await ac.delete(f"/migrations/{collection_name}")
+        assert response.status_code == 404
+        response = await ac.post(
+            "/migrations",
+            json={"collection_name": "missing_collection", "model_name": "fake"},
+        )
+        assert response.status_code == 422
+
+
+def test_decode_embedding():
+    embedding = np.array([0.5, -1.25, 3.0], dtype=np.float32)
+    np.testing.assert_array_equal(
+        decode_embedding(encode_embedding(embedding)), embedding
+    )
+    with pytest.raises(ValueError):
+        decode_embedding("abc")
@@ -0,0 +1,20 @@
+import pytest
+
+from api.server import in_memory_state, main, parse_args
+
+
+def test_parse_args():
+    args = parse_args(["--workers", "4", "--preload", "--port", "9000"])
+    assert args.workers == 4
+    assert args.preload is True
+    assert args.port == 9000
+    assert parse_args([]).workers >= 1
+
+
+def test_workers_require_shared_state():
+    assert in_memory_state(
+        {"CHAT_SESSION_DB": "", "COLLECTION_REGISTRY_DB": ":memory:"}
+    ) == ["CHAT_SESSION_DB", "COLLECTION_REGISTRY_DB"]
+    assert in_memory_state({"QUERY_CACHE_DB": "/data/query_cache.db"}) == []
+    with pytest.raises(SystemExit, match="COLLECTION_REGISTRY_DB"):
+        main(["--workers", "2", "--no-preload"])
@@ -0,0 +1,31 @@
+from core.cache import LRUCache, SQLiteCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+
+
+def test_sqlite_cache(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"))
+    cache.set_many({"a": 1.5, "b": [1, 2]})
+    assert cache.get("a") == 1.5
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1.5, "b": [1, 2]}
+    cache.delete("a")
+    assert cache.get("a", "missing") == "missing"
+    cache.clear()
+    assert cache.get_many(["b"]) == {}
+
+
+def test_sqlite_cache_ttl_and_batches(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), ttl=60)
+    cache.batch_size = 2
+    cache.set_many({str(i): i for i in range(5)})
+    assert len(cache.get_many(str(i) for i in range(5))) == 5
+    cache.ttl = -1
+    cache.set("expired", 1)
+    assert cache.get("expired") is None
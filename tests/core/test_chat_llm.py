@@ -1,6 +1,6 @@
-from core.chat_llm import ChatLLM
+from core.chat_llm import ChatContextManager, ChatInput, ChatLLM, count_tokens
 from core.models.chat import ChatMessage, ChatMessageRole
-from tests.fake.llm_chat import FakeLLMChatModel
+from tests.fake.llm_chat import FakeLLMChatModel, FakeSummaryChatModel
 
 chat_model = FakeLLMChatModel()
 
@@ -17,3 +17,101 @@ def test_chat():
     messages = [ChatMessage(role=ChatMessageRole.Human, content="Hello")]
     response = chat_llm.chat(messages)
     assert type(response) is str
+
+
+def make_messages(count):
+    return [ChatMessage(role=ChatMessageRole.System, content="Be helpful")] + [
+        ChatMessage(
+            role=ChatMessageRole.Human if i % 2 == 0 else ChatMessageRole.Ai,
+            content=f"message {i} " + "x" * 30,
+        )
+        for i in range(count)
+    ]
+
+
+def test_context_manager_within_budget():
+    summarizer = FakeSummaryChatModel()
+    context_manager = ChatContextManager(max_tokens=1000, summarizer=summarizer)
+    chat_input = ChatInput(messages=make_messages(4))
+    assert context_manager.prepare(chat_input, chat_model) is chat_input
+    assert summarizer.inputs == []
+
+
+def test_context_manager_trims_and_caches_summary():
+    summarizer = FakeSummaryChatModel()
+    context_manager = ChatContextManager(
+        max_tokens=60, summary_max_tokens=10, summarizer=summarizer
+    )
+    prepared = context_manager.prepare(
+        ChatInput(messages=make_messages(10), conversation_id="1"), chat_model
+    )
+    assert prepared.messages[0].content == "Be helpful"
+    assert prepared.messages[1].role == ChatMessageRole.System
+    assert prepared.messages[1].content.endswith("summary 1")
+    assert prepared.messages[-1].content.startswith("message 9")
+    assert sum(count_tokens(m.content) for m in prepared.messages) <= 60
+    assert len(summarizer.inputs) == 1
+
+    context_manager.prepare(
+        ChatInput(messages=make_messages(10), conversation_id="1"), chat_model
+    )
+    assert len(summarizer.inputs) == 1
+
+    context_manager.prepare(
+        ChatInput(messages=make_messages(12), conversation_id="1"), chat_model
+    )
+    assert len(summarizer.inputs) == 2
+    transcript = summarizer.inputs[1].messages[1].content
+    assert "summary 1" in transcript
+    assert "message 0" not in transcript
+
+
+def test_context_manager_ignores_summary_of_other_messages():
+    summarizer = FakeSummaryChatModel()
+    context_manager = ChatContextManager(
+        max_tokens=60, summary_max_tokens=10, summarizer=summarizer
+    )
+    context_manager.prepare(
+        ChatInput(messages=make_messages(10), conversation_id="1"), chat_model
+    )
+    other = [
+        m.model_copy(update={"content": m.content.replace("message", "secret")})
+        for m in make_messages(10)
+    ]
+    context_manager.prepare(ChatInput(messages=other, conversation_id="1"), chat_model)
+    assert len(summarizer.inputs) == 2
+    transcript = summarizer.inputs[1].messages[1].content
+    assert "summary 1" not in transcript
+    assert "secret 0" in transcript
+
+
+def test_context_manager_truncates_oversize_newest_turn():
+    summarizer = FakeSummaryChatModel()
+    context_manager = ChatContextManager(
+        max_tokens=60, summary_max_tokens=10, summarizer=summarizer
+    )
+    huge = ChatMessage(role=ChatMessageRole.Human, content="y" * 1000)
+    prepared = context_manager.prepare(ChatInput(messages=[huge]), chat_model)
+    assert len(prepared.messages) == 1
+    assert count_tokens(prepared.messages[0].content) == 60
+    assert summarizer.inputs == []
+
+    prepared = context_manager.prepare(
+        ChatInput(messages=[*make_messages(4), huge]), chat_model
+    )
+    assert prepared.messages[0].content == "Be helpful"
+    assert prepared.messages[1].content.endswith("summary 1")
+    assert prepared.messages[-1].content.startswith("yyy")
+    assert sum(count_tokens(m.content) for m in prepared.messages) <= 60
+    assert len(summarizer.inputs) == 1
+
+
+def test_chat_with_context_manager():
+    summarizer = FakeSummaryChatModel()
+    chat_llm = ChatLLM(
+        chat_model=summarizer,
+        context_manager=ChatContextManager(max_tokens=60, summary_max_tokens=10),
+    )
+    chat_llm.chat(ChatInput(messages=make_messages(10)))
+    assert len(summarizer.inputs) == 2
+    assert len(summarizer.inputs[1].messages) < 11
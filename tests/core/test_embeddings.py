@@ -0,0 +1,97 @@
+import chromadb
+import numpy as np
+
+from core.cache import SQLiteCache
+from core.embeddings import CachedEmbeddingsFunction, as_float32_matrix
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+
+class RecordingEmbeddingsFunction(FakeEmbeddingsFunction):
+    """Fake embeddings function recording its inputs."""
+
+    def __init__(self) -> None:
+        super().__init__(dimensions=4)
+        self.inputs = []
+
+    # skipcq: PYL-W0622
+    def __call__(self, input):
+        self.inputs.append(list(input))
+        return super().__call__(input)
+
+
+def test_cached_embeddings_function_embeds_uncached_texts_only():
+    backend = RecordingEmbeddingsFunction()
+    embeddings = CachedEmbeddingsFunction(backend)
+    first = np.asarray(embeddings(["a", "b"]))
+    second = np.asarray(embeddings(["b", "c", "a", "c"]))
+    assert backend.inputs == [["a", "b"], ["c"]]
+    np.testing.assert_array_equal(second[[0, 2]], first[[1, 0]])
+    np.testing.assert_array_equal(second[1], second[3])
+
+
+def test_cached_embeddings_function_shared_between_processes(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    backend = RecordingEmbeddingsFunction()
+    first = CachedEmbeddingsFunction(backend, persistent=SQLiteCache(path))(["a"])
+    other_worker = CachedEmbeddingsFunction(backend, persistent=SQLiteCache(path))
+    np.testing.assert_array_equal(other_worker(["a"]), first)
+    assert backend.inputs == [["a"]]
+
+
+def test_as_float32_matrix_does_not_copy_float32_matrices():
+    matrix = np.ones((3, 4), dtype=np.float32)
+    assert as_float32_matrix(matrix) is matrix
+    rows = as_float32_matrix([np.ones(4, dtype=np.float32)] * 2)
+    assert rows.dtype == np.float32 and rows.flags.c_contiguous
+    assert as_float32_matrix([]).shape == (0, 0)
+
+
+def test_cached_embeddings_are_float32(tmp_path):
+    embeddings = CachedEmbeddingsFunction(
+        RecordingEmbeddingsFunction(),
+        persistent=SQLiteCache(str(tmp_path / "embeddings.db")),
+    )
+    embeddings(["a"])
+    embeddings.memory.clear()
+    (embedding,) = embeddings(["a"])
+    assert embedding.dtype == np.float32
+
+
+def test_vector_store_add_documents_with_embeddings():
+    backend = RecordingEmbeddingsFunction()
+    vector_store = VectorStore(
+        collection_name="test_float32_embeddings",
+        client=chromadb.Client(),
+        embeddings=backend,
+    )
+    matrix = vector_store.embed(["first", "second"])
+    assert matrix.shape == (2, 4) and matrix.dtype == np.float32
+    ids = vector_store.add_documents(["first", "second"], embeddings=matrix)
+    assert len(backend.inputs) == 1
+    np.testing.assert_allclose(vector_store.get_embeddings(ids), matrix, rtol=1e-6)
+    (document, _), *_ = vector_store.similarity_search("first", k=1)
+    assert document.page_content == "first"
+
+
+def test_vector_store_search_with_query_embeddings():
+    backend = RecordingEmbeddingsFunction()
+    vector_store = VectorStore(
+        collection_name="test_query_embeddings",
+        client=chromadb.Client(),
+        embeddings=backend,
+    )
+    matrix = vector_store.embed(["first", "second", "third"])
+    vector_store.add_documents(["first", "second", "third"], embeddings=matrix)
+    (document, _), *_ = vector_store.similarity_search(query_embedding=matrix[1], k=1)
+    assert document.page_content == "second"
+    results = vector_store.similarity_search_batch(query_embeddings=matrix, k=1)
+    assert [docs[0][0].page_content for docs in results] == [
+        "first",
+        "second",
+        "third",
+    ]
+    assert len(backend.inputs) == 1
+    results = vector_store.similarity_search_batch(queries=["third", "first"], k=1)
+    assert [docs[0][0].page_content for docs in results] == ["third", "first"]
+    assert backend.inputs[-1] == ["third", "first"]
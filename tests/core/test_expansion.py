@@ -0,0 +1,67 @@
+import chromadb
+
+from core.expansion import chunk_window, merge_windows
+from core.models.expansion import ExpansionParams
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+vector_store = VectorStore(
+    collection_name="test_expansion",
+    client=chromadb.Client(),
+    embeddings=FakeEmbeddingsFunction(),
+)
+ids = vector_store.add_documents(
+    [f"chunk {i}" for i in range(6)], reference_id="1", parent_id="parent"
+)
+vector_store.collection.add(ids=["legacy"], documents=["legacy document"])
+
+
+def test_chunk_metadata():
+    assert ids == [f"parent:{i}" for i in range(6)]
+    metadata = vector_store.collection.get(ids=["parent:2"])["metadatas"][0]
+    assert metadata["parent_id"] == "parent"
+    assert metadata["chunk"] == 2
+    assert metadata["chunk_count"] == 6
+
+
+def test_chunk_window():
+    metadata = {"parent_id": "p", "chunk": 1, "chunk_count": 4}
+    assert chunk_window(metadata, window=2) == ("p", 0, 3)
+    assert chunk_window(metadata, parent=True) == ("p", 0, 3)
+    assert chunk_window({"reference_id": "1"}, window=1) is None
+
+
+def test_merge_windows():
+    windows = [("a", 4, 6, 0), ("b", 0, 1, 1), ("a", 1, 3, 2), ("a", 8, 9, 3)]
+    assert merge_windows(windows) == [
+        ("a", 1, 6, [2, 0]),
+        ("b", 0, 1, [1]),
+        ("a", 8, 9, [3]),
+    ]
+
+
+def test_expand_results():
+    hits = vector_store.similarity_search("chunk 2", k=1)
+    (document, score), *_ = vector_store.expand_results(
+        [hits], ExpansionParams(window=1)
+    )[0]
+    assert document.page_content == "chunk 1\nchunk 2\nchunk 3"
+    assert document.id == "parent:2"
+    assert document.metadata.chunk_start == 1
+    assert document.metadata.chunk_end == 3
+    assert score == hits[0][1]
+
+    hits = [
+        *vector_store.similarity_search("chunk 1", k=1),
+        *vector_store.similarity_search("chunk 3", k=1),
+        *vector_store.similarity_search("legacy document", k=1),
+    ]
+    expanded = vector_store.expand_results([hits], ExpansionParams(window=1))[0]
+    assert [document.page_content for document, _ in expanded] == [
+        "chunk 0\nchunk 1\nchunk 2\nchunk 3\nchunk 4",
+        "legacy document",
+    ]
+
+    expanded = vector_store.expand_results([hits[:1]], ExpansionParams(parent=True))
+    assert expanded[0][0][0].page_content == "\n".join(f"chunk {i}" for i in range(6))
+    assert vector_store.expand_results([hits], ExpansionParams()) == [hits]
@@ -0,0 +1,77 @@
+import time
+
+import chromadb
+import pytest
+
+from core.federation import FederatedVectorStore, normalize_scores
+from core.vector_store import VectorStore
+from tests.core.test_singleflight import CountingEmbeddingsFunction
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+
+class SlowVectorStore(VectorStore):
+    """Vector store answering similarity searches after a delay."""
+
+    def similarity_search(self, *args, **kwargs):
+        time.sleep(0.5)
+        return super().similarity_search(*args, **kwargs)
+
+
+def create_store(name, documents, embeddings, store_class=VectorStore):
+    store = store_class(
+        collection_name=name, client=chromadb.Client(), embeddings=embeddings
+    )
+    store.add_documents(documents, reference_id=name)
+    return store
+
+
+def test_normalize_scores():
+    assert normalize_scores([0.9, 0.5, 0.1], "none") == [0.9, 0.5, 0.1]
+    assert normalize_scores([0.9, 0.5, 0.1], "min_max") == pytest.approx(
+        [1.0, 0.5, 0.0]
+    )
+    assert normalize_scores([0.4, 0.4], "min_max") == [1.0, 1.0]
+    assert normalize_scores([0.9, 0.1], "rank") == [1 / 61, 1 / 62]
+    with pytest.raises(ValueError):
+        normalize_scores([0.9], "softmax")
+
+
+def test_federated_search_embeds_once_and_merges():
+    embeddings = CountingEmbeddingsFunction()
+    geography = create_store(
+        "test_federation_geography", ["Hanoi", "Hue", "Saigon"], embeddings
+    )
+    history = create_store(
+        "test_federation_history", ["Hanoi 1010", "Hue 1802"], embeddings
+    )
+    embeddings.calls = 0
+
+    federated = FederatedVectorStore(
+        {"geography": geography, "history": history}, weights={"history": 0.5}
+    )
+    hits, skipped = federated.similarity_search("Hanoi", k=4)
+    assert embeddings.calls == 1
+    assert skipped == []
+    assert len(hits) == 4
+    assert hits[0][0] == "geography"
+    assert hits[0][1].page_content == "Hanoi"
+    assert hits[0][2] == 1.0
+    assert [score for _, _, score in hits] == sorted(
+        [score for _, _, score in hits], reverse=True
+    )
+    assert max(score for name, _, score in hits if name == "history") == 0.5
+
+
+def test_slow_collections_are_skipped():
+    embeddings = FakeEmbeddingsFunction()
+    fast = create_store("test_federation_fast", ["Hanoi"], embeddings)
+    slow = create_store("test_federation_slow", ["Hue"], embeddings, SlowVectorStore)
+
+    federated = FederatedVectorStore(
+        {"fast": fast, "slow": slow}, timeouts={"slow": 0.1}
+    )
+    start = time.monotonic()
+    hits, skipped = federated.similarity_search("Hanoi", k=3)
+    assert time.monotonic() - start < 0.5
+    assert skipped == ["slow"]
+    assert [name for name, _, _ in hits] == ["fast"]
@@ -0,0 +1,55 @@
+import pytest
+
+from core.filters import build_where, matches, normalize_where
+
+
+def test_normalize_where():
+    assert normalize_where({"language": "vi"}) == {"language": {"$eq": "vi"}}
+    assert normalize_where({"language": "vi", "year": {"$gte": 2020}}) == {
+        "$and": [{"language": {"$eq": "vi"}}, {"year": {"$gte": 2020}}]
+    }
+    assert normalize_where({"$or": [{"type": "faq"}, {"type": {"$in": ["doc"]}}]}) == {
+        "$or": [{"type": {"$eq": "faq"}}, {"type": {"$in": ["doc"]}}]
+    }
+
+
+@pytest.mark.parametrize(
+    "where",
+    [
+        {},
+        {"year": {"$gte": "2020"}},
+        {"year": {"$between": [1, 2]}},
+        {"type": {"$in": []}},
+        {"type": ["faq"]},
+        {"$not": [{"type": "faq"}]},
+        {"$and": []},
+    ],
+)
+def test_normalize_where_invalid(where):
+    with pytest.raises(ValueError):
+        normalize_where(where)
+
+
+def test_build_where():
+    assert build_where() is None
+    assert build_where("1") == {"reference_id": {"$eq": "1"}}
+    assert build_where("1", {"language": "vi"}) == {
+        "$and": [{"reference_id": {"$eq": "1"}}, {"language": {"$eq": "vi"}}]
+    }
+
+
+def test_matches():
+    metadata = {"language": "vi", "year": 2022, "public": True}
+    assert matches(metadata, None)
+    assert matches(metadata, normalize_where({"language": "vi", "public": True}))
+    assert matches(
+        metadata,
+        normalize_where({"year": {"$gte": 2020}}),
+    )
+    assert not matches(metadata, normalize_where({"year": {"$lt": 2020}}))
+    assert matches(metadata, normalize_where({"language": {"$in": ["en", "vi"]}}))
+    assert not matches(metadata, normalize_where({"language": {"$nin": ["vi"]}}))
+    assert matches(
+        metadata, normalize_where({"$or": [{"language": "en"}, {"year": 2022}]})
+    )
+    assert not matches({}, normalize_where({"year": {"$gt": 0}}))
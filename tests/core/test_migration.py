@@ -0,0 +1,107 @@
+import chromadb
+import pytest
+
+from core.migration import (
+    CollectionRegistry,
+    CollectionRouter,
+    DualWriteVectorStore,
+    EmbeddingMigration,
+    MigrationInProgressError,
+    shadow_collection_name,
+)
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+old_embeddings = FakeEmbeddingsFunction(dimensions=8)
+new_embeddings = FakeEmbeddingsFunction(dimensions=4)
+
+
+def create_router(collection_name):
+    client = chromadb.Client()
+    source = VectorStore(
+        collection_name=collection_name, client=client, embeddings=old_embeddings
+    )
+    source.add_documents([f"document {i}" for i in range(25)], reference_id="1")
+    source.add_documents(["removed"], reference_id="2")
+    router = CollectionRouter(
+        CollectionRegistry(default_model="old"),
+        embeddings_for=lambda model_name: new_embeddings,
+    )
+    return client, router
+
+
+def test_shadow_collection_name():
+    assert shadow_collection_name("geography", "embed v3.0") == "geography-embed-v3.0"
+
+
+def test_migration_swaps_after_copying_every_document():
+    client, router = create_router("test_migration_source")
+    migration = EmbeddingMigration(
+        router.registry,
+        client,
+        "test_migration_source",
+        "new",
+        new_embeddings,
+        page_size=10,
+        rate=1000,
+    )
+    state = migration.begin()
+    assert state.total == 26
+
+    writer = router.open(
+        "test_migration_source", client, embeddings=old_embeddings, write=True
+    )
+    assert isinstance(writer, DualWriteVectorStore)
+    writer.add_documents(["added during the migration"], reference_id="3")
+    ids = writer.add_columns(["added as a column"], reference_ids=["4"])
+    assert writer.shadow.collection.get(ids=ids)["ids"] == ids
+    writer.delete_by_reference_id("2")
+    migration.target.collection.add(ids=["stale"], documents=["stale"])
+    reader = router.open("test_migration_source", client, embeddings=old_embeddings)
+    assert reader.collection.name == "test_migration_source"
+
+    state = migration.run()
+    assert state.status == "completed"
+    assert state.migrated >= 27
+    assert router.registry.resolve("test_migration_source") == (state.target, "new")
+
+    reader = router.open("test_migration_source", client, embeddings=old_embeddings)
+    assert reader.collection.name == state.target
+    assert reader.embeddings is new_embeddings
+    assert reader.collection.count() == 27
+    assert len(reader.collection.get(ids=["stale"])["ids"]) == 0
+    (document, _), *_ = reader.similarity_search("added during the migration", k=1)
+    assert document.page_content == "added during the migration"
+    assert isinstance(
+        router.open("test_migration_source", client, write=True), VectorStore
+    )
+
+
+def test_cancelled_migration_keeps_the_source():
+    client, router = create_router("test_migration_cancel")
+    migration = EmbeddingMigration(
+        router.registry, client, "test_migration_cancel", "new", new_embeddings
+    )
+    migration.begin()
+    with pytest.raises(MigrationInProgressError):
+        EmbeddingMigration(
+            router.registry, client, "test_migration_cancel", "new", new_embeddings
+        ).begin()
+    assert router.registry.cancel_migration("test_migration_cancel") is not None
+    assert migration.run().status == "cancelled"
+    assert router.registry.resolve("test_migration_cancel") == (
+        "test_migration_cancel",
+        "old",
+    )
+
+
+def test_migration_of_missing_collection():
+    _, router = create_router("test_migration_present")
+    with pytest.raises(ValueError):
+        EmbeddingMigration(
+            router.registry,
+            chromadb.Client(),
+            "test_migration_missing",
+            "new",
+            new_embeddings,
+        ).begin()
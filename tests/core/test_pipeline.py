@@ -0,0 +1,129 @@
+import time
+
+import chromadb
+
+from core.chat_llm import ChatLLM
+from core.models.pipeline import PipelineDeadlines
+from core.pipeline import RAGPipeline
+from core.rerank import Rerank
+from core.resilience import TokenBucket
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+from tests.fake.llm_chat import FakeSummaryChatModel
+from tests.fake.rerank import RecordingRerankModel
+
+
+class SlowVectorStore(VectorStore):
+    """Vector store answering similarity searches after a delay."""
+
+    delay = 0.3
+
+    def similarity_search(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return super().similarity_search(*args, **kwargs)
+
+
+def create_store(name, documents, store_class=VectorStore):
+    store = store_class(
+        collection_name=name,
+        client=chromadb.Client(),
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    store.add_documents(documents, reference_id=name)
+    return store
+
+
+def create_pipeline(vector_stores, **kwargs):
+    chat_model = FakeSummaryChatModel()
+    pipeline = RAGPipeline(
+        vector_stores=vector_stores,
+        rerank=Rerank(model=RecordingRerankModel()),
+        chat_llm=ChatLLM(chat_model=chat_model),
+        **kwargs,
+    )
+    return pipeline, chat_model
+
+
+def test_answers_from_every_source():
+    first = create_store("test_pipeline_first", ["Hoang Sa belongs to Vietnam"])
+    second = create_store("test_pipeline_second", ["Truong Sa is in Vietnam"])
+    pipeline, chat_model = create_pipeline([first, second], top_n=2)
+
+    result = pipeline.run("vietnam")
+    assert result.answer == "summary 1"
+    assert [doc.page_content for doc in result.documents] == [
+        "Hoang Sa belongs to Vietnam",
+        "Truong Sa is in Vietnam",
+    ]
+    assert result.skipped_sources == []
+    assert set(result.timings) == {"first_candidates", "context", "answer"}
+
+    messages = chat_model.inputs[0].messages
+    assert "[1] Hoang Sa belongs to Vietnam" in messages[0].content
+    assert messages[-1].content == "vietnam"
+    # Vector and keyword hits of the same document are reranked once
+    reranked = [doc for batch in pipeline.rerank.model.inputs for doc in batch]
+    assert len(reranked) == 2
+
+
+def test_stragglers_are_dropped_at_the_deadline():
+    fast = create_store("test_pipeline_fast", ["Hoang Sa belongs to Vietnam"])
+    slow = create_store(
+        "test_pipeline_slow", ["Truong Sa belongs to Vietnam"], SlowVectorStore
+    )
+    pipeline, _ = create_pipeline(
+        [fast, slow],
+        lexical=False,
+        deadlines=PipelineDeadlines(retrieval=0.1, rerank=1.0),
+    )
+
+    result = pipeline.run("vietnam")
+    assert result.skipped_sources == ["test_pipeline_slow/vector"]
+    assert [doc.page_content for doc in result.documents] == [
+        "Hoang Sa belongs to Vietnam"
+    ]
+    assert result.timings["answer"] < SlowVectorStore.delay
+
+
+def test_speculative_answer_is_kept_when_the_context_is_stable():
+    fast = create_store("test_pipeline_stable", ["Hoang Sa belongs to Vietnam"])
+    slow = create_store("test_pipeline_short", ["Vietnam"], SlowVectorStore)
+    pipeline, chat_model = create_pipeline([fast, slow], top_n=1, lexical=False)
+
+    result = pipeline.run("vietnam")
+    assert result.speculative
+    assert result.documents[0].page_content == "Hoang Sa belongs to Vietnam"
+    assert len(chat_model.inputs) == 1
+
+
+def test_speculative_answer_is_discarded_when_the_context_changes():
+    fast = create_store("test_pipeline_changed", ["Vietnam"])
+    slow = create_store(
+        "test_pipeline_long", ["Truong Sa belongs to Vietnam"], SlowVectorStore
+    )
+    pipeline, chat_model = create_pipeline([fast, slow], top_n=1, lexical=False)
+
+    result = pipeline.run("vietnam")
+    assert not result.speculative
+    assert result.documents[0].page_content == "Truong Sa belongs to Vietnam"
+    assert len(chat_model.inputs) == 2
+    assert "Truong Sa" in chat_model.inputs[-1].messages[0].content
+
+
+def test_speculation_is_skipped_when_the_rate_limit_is_low():
+    fast = create_store("test_pipeline_low_tokens", ["Vietnam"])
+    slow = create_store(
+        "test_pipeline_low_tokens_slow",
+        ["Truong Sa belongs to Vietnam"],
+        SlowVectorStore,
+    )
+    rate_limiter = TokenBucket(rate=0.01, capacity=2)
+    rate_limiter.try_acquire()
+    pipeline, chat_model = create_pipeline(
+        [fast, slow], top_n=1, lexical=False, rate_limiter=rate_limiter
+    )
+
+    result = pipeline.run("vietnam")
+    assert not result.speculative
+    assert result.documents[0].page_content == "Truong Sa belongs to Vietnam"
+    assert len(chat_model.inputs) == 1
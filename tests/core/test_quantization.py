@@ -0,0 +1,176 @@
+import numpy as np
+
+from core.models.index import HnswIndexParams
+from core.quantization import (
+    ProductQuantizer,
+    QuantizedIndexes,
+    ScalarQuantizer,
+    SQLiteCodeStore,
+    evaluate_quantizers,
+)
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+vector_store = VectorStore(
+    collection_name="test_quantization",
+    embeddings=FakeEmbeddingsFunction(),
+)
+vector_store.add_documents([f"document {i}" for i in range(200)], reference_id="1")
+vector_store.add_documents([f"other {i}" for i in range(50)], reference_id="2")
+
+
+def quantized_store(name, quantizer="int8", indexes=None, **kwargs):
+    return VectorStore(
+        collection_name=name,
+        embeddings=FakeEmbeddingsFunction(),
+        index_params=HnswIndexParams(quantization=quantizer),
+        quantized_indexes=indexes or QuantizedIndexes(**kwargs),
+    )
+
+
+def test_scalar_quantizer_round_trip():
+    vectors = np.random.default_rng(0).standard_normal((100, 16)).astype(np.float32)
+    quantizer = ScalarQuantizer().fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.dtype == np.int8
+    assert np.abs(quantizer.decode(codes) - vectors).max() < 0.05
+
+
+def test_product_quantizer_codes():
+    vectors = np.random.default_rng(0).standard_normal((300, 16)).astype(np.float32)
+    quantizer = ProductQuantizer(subspaces=4, centroids=16, iterations=5).fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.shape == (300, 4)
+    assert codes.dtype == np.uint8
+    assert quantizer.decode(codes).shape == vectors.shape
+    for space in ["l2", "ip"]:
+        assert np.allclose(
+            quantizer.distances(vectors[0], codes, space),
+            super(ProductQuantizer, quantizer).distances(vectors[0], codes, space),
+            atol=1e-3,
+        )
+
+
+def test_quantizer_state_round_trip():
+    vectors = np.random.default_rng(0).standard_normal((300, 16)).astype(np.float32)
+    for quantizer, empty in [
+        (ScalarQuantizer().fit(vectors), ScalarQuantizer()),
+        (ProductQuantizer(subspaces=4, centroids=16).fit(vectors), ProductQuantizer()),
+    ]:
+        restored = empty.load_bytes(quantizer.to_bytes())
+        assert restored.dimensions == 16
+        assert np.array_equal(restored.encode(vectors), quantizer.encode(vectors))
+
+
+def test_quantization_is_chosen_per_collection():
+    indexes = QuantizedIndexes()
+    assert indexes.open(vector_store.collection) is None
+    store = quantized_store("test_quantization_choice", "pq", indexes)
+    assert store.collection.metadata["quantization"] == "pq"
+    assert isinstance(store.quantized_index.quantizer, ProductQuantizer)
+    assert HnswIndexParams.from_metadata(store.collection.metadata).quantization == "pq"
+
+
+def test_quantized_similarity_search(monkeypatch):
+    store = quantized_store("test_quantization_search")
+    store.add_documents([f"document {i}" for i in range(200)], reference_id="1")
+    store.add_documents([f"other {i}" for i in range(50)], reference_id="2")
+    index = store.quantized_index
+    assert len(index.ids) == 250
+    assert index.memory_bytes * 4 == index.full_precision_bytes
+
+    def query(*args, **kwargs):
+        raise AssertionError("the HNSW index is searched")
+
+    monkeypatch.setattr(store.collection, "query", query)
+    docs = store.similarity_search("document 7", k=3)
+    assert docs[0][0].page_content == "document 7"
+    assert docs[0][1] > docs[1][1]
+
+    docs = store.similarity_search("document 7", reference_id="2", k=3)
+    assert len(docs) == 3
+    for doc, score in docs:
+        assert doc.metadata.reference_id == "2"
+        assert type(score) is float
+
+
+def test_quantized_codes_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "quantized.db")
+    first = quantized_store(
+        "test_quantization_workers", indexes=QuantizedIndexes(SQLiteCodeStore(path))
+    )
+    first.add_documents([f"document {i}" for i in range(20)], reference_id="1")
+
+    # Another process opening the same collection reads the persisted codes
+    second = quantized_store(
+        "test_quantization_workers", indexes=QuantizedIndexes(SQLiteCodeStore(path))
+    )
+    second.quantized_index.sync()
+    assert sorted(second.quantized_index.ids) == sorted(first.quantized_index.ids)
+    assert second.quantized_index.fitted_size == 20
+
+    second.add_documents(["added by the second worker"], reference_id="2")
+    docs = first.similarity_search("added by the second worker", k=1)
+    assert docs[0][0].page_content == "added by the second worker"
+
+    first.delete_by_reference_id("2")
+    second.quantized_index.sync()
+    assert len(second.quantized_index.ids) == 20
+
+
+def test_quantized_index_is_built_for_existing_documents():
+    store = VectorStore(
+        collection_name="test_quantization_existing",
+        embeddings=FakeEmbeddingsFunction(),
+        index_params=HnswIndexParams(quantization="int8"),
+    )
+    store.add_documents(["first", "second", "third"], reference_id="1")
+    store = quantized_store("test_quantization_existing")
+    assert store.similarity_search("second", k=1)[0][0].page_content == "second"
+    assert len(store.quantized_index.ids) == 3
+
+
+def test_quantized_add_and_delete():
+    store = quantized_store("test_quantization_writes")
+    store.add_documents(["first", "second"], reference_id="1")
+    store.add_documents(["third"], reference_id="2")
+    assert len(store.quantized_index.ids) == 3
+
+    store.delete_by_reference_id("1")
+    assert len(store.quantized_index.ids) == 1
+    assert store.similarity_search("first", k=3)[0][0].page_content == "third"
+
+
+def test_evaluate_quantizers():
+    reports = evaluate_quantizers(
+        vector_store,
+        [ScalarQuantizer(), ProductQuantizer(subspaces=8, centroids=16)],
+        ["document 1", "other 3", "unrelated"],
+        k=5,
+    )
+    assert [report.quantizer for report in reports] == ["int8", "pq"]
+    assert reports[0].recall_at_k > 0.9
+    assert reports[0].compression_ratio == 4
+    assert reports[1].compression_ratio == 16
+
+
+def test_quantizer_is_refit_as_the_collection_grows():
+    store = quantized_store("test_quantization_refit", "pq", train_size=64)
+    index = store.quantized_index
+    index.quantizer = ProductQuantizer(subspaces=4)
+    store.add_documents(["seed"], reference_id="1")
+    assert index.fitted_size == 1
+    for i in range(40):
+        store.add_documents([f"document {i}"], reference_id="1")
+    assert index.fitted_size == 32
+    decoded = index.quantizer.decode(index.codes)
+    stored = store.collection.get(ids=index.ids, include=["embeddings"])
+    by_id = dict(zip(stored["ids"], stored["embeddings"]))
+    vectors = np.asarray([by_id[id] for id in index.ids])
+    first_fit = ProductQuantizer(subspaces=4).fit(vectors[:1].astype(np.float32))
+    stale = first_fit.decode(first_fit.encode(vectors.astype(np.float32)))
+    assert np.abs(decoded - vectors).mean() < np.abs(stale - vectors).mean() / 2
+    for i in range(40, 80):
+        store.add_documents([f"document {i}"], reference_id="1")
+    assert index.fitted_size == 64
+    assert len(index.ids) == 81
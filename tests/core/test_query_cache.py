@@ -0,0 +1,82 @@
+import time
+
+import chromadb
+
+from core.query_cache import QueryCache, SQLiteGenerations
+from core.vector_store import VectorStore
+from tests.core.test_singleflight import CountingEmbeddingsFunction
+
+
+def test_hits_misses_and_invalidate():
+    cache = QueryCache(max_entries=10, ttl=60)
+    assert cache.get_or_compute("a", "key", lambda: 1) == 1
+    assert cache.get_or_compute("a", "key", lambda: 2) == 1
+    assert cache.get_or_compute("b", "key", lambda: 3) == 3
+    cache.invalidate("a")
+    assert cache.get_or_compute("a", "key", lambda: 4) == 4
+    assert cache.get_or_compute("b", "key", lambda: 5) == 3
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 3
+    assert stats["hit_ratio"] == 2 / 5
+    assert stats["invalidations"] == 1
+
+
+def test_ttl_and_size_bounds():
+    cache = QueryCache(max_entries=2, ttl=0.05)
+    cache.get_or_compute("a", 1, lambda: 1)
+    cache.get_or_compute("a", 2, lambda: 2)
+    cache.get_or_compute("a", 3, lambda: 3)
+    assert cache.stats()["entries"] == 2
+    assert cache.get_or_compute("a", 1, lambda: "evicted") == "evicted"
+    time.sleep(0.1)
+    assert cache.get_or_compute("a", 3, lambda: "expired") == "expired"
+
+
+def test_results_computed_during_a_write_are_not_cached():
+    cache = QueryCache()
+
+    def compute():
+        cache.invalidate("a")
+        return "stale"
+
+    assert cache.get_or_compute("a", "key", compute) == "stale"
+    assert cache.get_or_compute("a", "key", lambda: "fresh") == "fresh"
+
+
+def test_sqlite_generations_are_shared(tmp_path):
+    path = str(tmp_path / "query_cache.db")
+    first = QueryCache(generations=SQLiteGenerations(path))
+    second = QueryCache(generations=SQLiteGenerations(path))
+    assert first.get_or_compute("a", "key", lambda: 1) == 1
+    assert second.get_or_compute("a", "key", lambda: 1) == 1
+
+    second.invalidate("a")
+    assert first.generations.get("a") == 1
+    assert first.get_or_compute("a", "key", lambda: 2) == 2
+
+
+def test_vector_store_search_is_cached_until_write():
+    embeddings = CountingEmbeddingsFunction()
+    cache = QueryCache()
+    vector_store = VectorStore(
+        collection_name="test_query_cache",
+        client=chromadb.Client(),
+        embeddings=embeddings,
+        query_cache=cache,
+    )
+    vector_store.add_documents(["first document"], reference_id="1")
+    embeddings.calls = 0
+
+    assert len(vector_store.similarity_search("first", k=5)) == 1
+    assert len(vector_store.similarity_search("first", k=5)) == 1
+    assert len(vector_store.similarity_search("first", k=1)) == 1
+    assert embeddings.calls == 2
+
+    vector_store.add_documents(["second document"], reference_id="2")
+    assert len(vector_store.similarity_search("first", k=5)) == 2
+
+    vector_store.delete_by_reference_id("2")
+    assert len(vector_store.similarity_search("first", k=5)) == 1
+    assert cache.stats()["hits"] == 1
@@ -1,6 +1,7 @@
+from core.cache import SQLiteCache
 from core.models.documents import Document, DocumentMetadata
-from core.rerank import Rerank
-from tests.fake.rerank import FakeRerankModel
+from core.rerank import BatchedRerankModel, CachedRerankModel, Rerank
+from tests.fake.rerank import FakeRerankModel, RecordingRerankModel
 
 
 def test_create_rerank():
@@ -43,3 +44,53 @@ def test_rerank_2():
     assert reranked_documents[1].metadata.reference_id == "4"
     assert reranked_documents[2].metadata.reference_id == "1"
     assert reranked_documents[3].metadata.reference_id == "2"
+
+
+def test_cached_rerank_model_sends_uncached_documents_only():
+    model = RecordingRerankModel()
+    cached = CachedRerankModel(model)
+    assert cached.rerank_documents("query", ["a", "bb"]) == [1.0, 2.0]
+    assert cached.rerank_documents("query", ["ccc", "bb", "a", "ccc"]) == [
+        3.0,
+        2.0,
+        1.0,
+        3.0,
+    ]
+    assert model.inputs == [["a", "bb"], ["ccc"]]
+    cached.rerank_documents("other query", ["a"])
+    assert model.inputs[-1] == ["a"]
+
+
+def test_cached_rerank_model_persistent_tier(tmp_path):
+    path = str(tmp_path / "rerank.db")
+    model = RecordingRerankModel()
+    CachedRerankModel(model, persistent=SQLiteCache(path)).rerank_documents(
+        "query", ["a", "bb"]
+    )
+    restarted = CachedRerankModel(model, persistent=SQLiteCache(path))
+    assert restarted.rerank_documents("query", ["bb", "a"]) == [2.0, 1.0]
+    assert len(model.inputs) == 1
+
+
+def test_batched_rerank_model_keeps_order():
+    model = RecordingRerankModel()
+    batched = BatchedRerankModel(model, batch_size=2, max_concurrency=2)
+    docs = ["a" * i for i in range(1, 6)]
+    assert batched.rerank_documents("query", docs) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert sorted(model.inputs) == [["a", "aa"], ["aaa", "aaaa"], ["aaaaa"]]
+    assert batched.rerank_documents("query", []) == []
+
+
+def test_batched_rerank_model_truncates_documents():
+    model = RecordingRerankModel()
+    batched = BatchedRerankModel(model, max_tokens=2)
+    assert batched.rerank_documents("query", ["x" * 20, "y"]) == [8.0, 1.0]
+
+
+def test_rerank_contents():
+    rerank = Rerank(model=RecordingRerankModel())
+    order, scores = rerank.rerank_contents("query", ["a", "ccc", "bb"])
+    assert order.tolist() == [1, 2, 0]
+    assert scores.tolist() == [3.0, 2.0, 1.0]
+    order, scores = rerank.rerank_contents("query", [])
+    assert order.tolist() == [] and scores.tolist() == []
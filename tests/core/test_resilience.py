@@ -0,0 +1,185 @@
+import threading
+import time
+
+import chromadb
+import httpx
+import numpy as np
+import pytest
+from chromadb.errors import InvalidArgumentError, NotFoundError
+
+from core.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimitedError,
+    Resilience,
+    ResilientProxy,
+    TokenBucket,
+    is_retryable,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def flaky(failures, error=ConnectionError):
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error()
+        return "ok"
+
+    return call, calls
+
+
+def test_is_retryable():
+    assert is_retryable(ConnectionError())
+    assert is_retryable(StatusError(429))
+    assert is_retryable(StatusError(503))
+    assert not is_retryable(StatusError(400))
+    assert is_retryable(TimeoutError())
+    assert is_retryable(httpx.ReadTimeout("timed out"))
+    assert not is_retryable(ValueError())
+    assert not is_retryable(KeyError("id"))
+    assert not is_retryable(InvalidArgumentError("dimension"))
+    assert not is_retryable(NotFoundError("collection"))
+    assert not is_retryable(RuntimeError())
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, capacity=2)
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.acquire(timeout=1)
+    slow = TokenBucket(rate=0.1, capacity=1)
+    slow.try_acquire()
+    assert not slow.acquire(timeout=0.01)
+
+
+def test_retries_transient_errors():
+    resilience = Resilience("test", base_delay=0)
+    call, calls = flaky(2)
+    assert resilience.call(call) == "ok"
+    assert len(calls) == 3
+    assert resilience.stats()["retries"] == 2
+
+
+def test_does_not_retry_client_errors():
+    resilience = Resilience("test", base_delay=0)
+    call, calls = flaky(1, error=lambda: StatusError(400))
+    with pytest.raises(StatusError):
+        resilience.call(call)
+    assert len(calls) == 1
+
+
+def test_circuit_breaker_fails_fast_and_recovers():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    resilience = Resilience(
+        "test", circuit_breaker=breaker, max_attempts=1, base_delay=0
+    )
+    call, calls = flaky(2)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            resilience.call(call)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        resilience.call(call)
+    assert len(calls) == 2
+    time.sleep(0.06)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert resilience.call(call) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_rate_limited_calls_are_rejected():
+    resilience = Resilience(
+        "test",
+        rate_limiter=TokenBucket(rate=0.1, capacity=1),
+        acquire_timeout=0.01,
+    )
+    assert resilience.call(lambda: 1) == 1
+    with pytest.raises(RateLimitedError):
+        resilience.call(lambda: 2)
+    assert resilience.stats()["rejected"] == 1
+
+
+def test_hedged_call_uses_the_duplicate_when_the_first_request_fails():
+    resilience = Resilience("test", hedge_delay=0.01, max_attempts=1)
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.1)
+            raise ConnectionError()
+        return "hedge"
+
+    assert resilience.call(call, hedge=True) == "hedge"
+    assert resilience.stats()["hedges"] == 1
+    assert resilience.stats()["hedge_wins"] == 1
+    assert resilience.call(lambda: "quick", hedge=True) == "quick"
+    assert resilience.stats()["hedges"] == 1
+
+
+def test_hedged_calls_run_on_the_caller_thread():
+    resilience = Resilience("test", hedge_delay=5, max_workers=1)
+    threads = []
+
+    def call():
+        threads.append(threading.current_thread())
+        time.sleep(0.05)
+        return "ok"
+
+    start = time.monotonic()
+    callers = [
+        threading.Thread(target=resilience.call, args=(call,), kwargs={"hedge": True})
+        for _ in range(8)
+    ]
+    for caller in callers:
+        caller.start()
+    for caller in callers:
+        caller.join()
+    assert time.monotonic() - start < 0.3
+    assert set(threads) == set(callers)
+    assert resilience.stats()["hedges"] == 0
+
+
+def test_resilient_proxy_wraps_collections():
+    resilience = Resilience("chroma")
+    client = ResilientProxy(
+        chromadb.Client(),
+        resilience,
+        hedged=frozenset({"query"}),
+        proxied_results=frozenset({"get_or_create_collection"}),
+    )
+    collection = client.get_or_create_collection("test_resilient_proxy")
+    assert isinstance(collection, ResilientProxy)
+    assert collection.name == "test_resilient_proxy"
+    collection.add(ids=["1"], documents=["one"], embeddings=[[1.0, 0.0]])
+    assert collection.count() == 1
+    assert resilience.stats()["calls"] == 3
+
+
+def test_client_errors_leave_the_circuit_closed():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    resilience = Resilience("test", circuit_breaker=breaker, base_delay=0)
+    client = ResilientProxy(
+        chromadb.Client(),
+        resilience,
+        proxied_results=frozenset({"get_or_create_collection"}),
+    )
+    collection = client.get_or_create_collection("test_client_errors")
+    collection.add(ids=["1"], documents=["one"], embeddings=[[1.0, 0.0]])
+    for _ in range(2):
+        with pytest.raises((InvalidArgumentError, ValueError)):
+            collection.query(query_embeddings=np.ones((1, 3)), n_results=1)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert resilience.stats()["retries"] == 0
+    assert collection.query(query_embeddings=[[1.0, 0.0]], n_results=1)["ids"] == [
+        ["1"]
+    ]
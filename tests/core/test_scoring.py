@@ -0,0 +1,102 @@
+import warnings
+
+import chromadb
+import numpy as np
+
+from core.models.diversity import DiversityParams
+from core.models.index import HnswIndexParams
+from core.scoring import distance_to_score, distances, mmr_select
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+
+def test_mmr_select_skips_near_duplicates():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    candidates = np.array(
+        [[1.0, 0.1], [1.0, 0.11], [0.6, -0.8], [0.0, 1.0]], dtype=np.float32
+    )
+    assert mmr_select(query, candidates, 2, lambda_mult=1.0) == [0, 1]
+    assert mmr_select(query, candidates, 2, lambda_mult=0.5) == [0, 2]
+    assert mmr_select(query, candidates, 10) == [0, 2, 1, 3]
+    assert mmr_select(query, candidates[:0], 2) == []
+
+
+def test_mmr_select_caps_groups():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    candidates = np.array([[1.0, 0.0], [0.9, 0.1], [0.8, 0.2], [0.1, 0.9]])
+    selected = mmr_select(
+        query, candidates, 3, lambda_mult=1.0, groups="aabb", max_per_group=1
+    )
+    assert selected == [0, 2]
+
+
+def test_mmr_select_keeps_relevance_order_of_unsorted_candidates():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    candidates = np.array([[0.2, 1.0], [1.0, 0.0], [1.0, 0.2], [1.0, 0.5]])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert mmr_select(query, candidates, 3, lambda_mult=1.0) == [1, 2, 3]
+        selected = mmr_select(
+            query, candidates, 3, lambda_mult=1.0, groups="abab", max_per_group=1
+        )
+    assert selected == [1, 2]
+
+
+def test_similarity_search_with_diversity():
+    vector_store = VectorStore(
+        collection_name="test_diversity",
+        client=chromadb.Client(),
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    for reference_id in ("1", "2", "3"):
+        vector_store.add_documents(
+            [f"chunk {i}" for i in range(5)], reference_id=reference_id
+        )
+    results = vector_store.similarity_search(
+        "chunk 1", k=6, diversity=DiversityParams(max_per_reference=2)
+    )
+    references = [document.metadata.reference_id for document, _ in results]
+    assert len(results) == 6
+    assert all(references.count(reference_id) == 2 for reference_id in "123")
+
+    results = vector_store.similarity_search(
+        "chunk 1", k=3, diversity=DiversityParams(mmr_lambda=0.3, fetch_k=15)
+    )
+    assert len({document.page_content for document, _ in results}) == 3
+
+
+def test_distance_to_score():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    matrix = np.array([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]], dtype=np.float32)
+    np.testing.assert_allclose(
+        distance_to_score(distances(query, matrix, "cosine"), "cosine"), [1, 0, -1]
+    )
+    np.testing.assert_allclose(
+        distance_to_score(distances(query, matrix, "ip"), "ip"), [1, 0, -1]
+    )
+    np.testing.assert_allclose(
+        distance_to_score(distances(query, matrix, "l2"), "l2"), [1, 1 / 3, 1 / 5]
+    )
+    assert distance_to_score(0.25, "cosine") == 0.75
+
+
+def test_similarity_search_scores_by_space():
+    for space in ("cosine", "l2", "ip"):
+        vector_store = VectorStore(
+            collection_name=f"test_scores_{space}",
+            client=chromadb.Client(),
+            embeddings=FakeEmbeddingsFunction(),
+            index_params=HnswIndexParams(space=space),
+        )
+        vector_store.add_documents([f"document {i}" for i in range(10)])
+        results = vector_store.similarity_search("document 3", k=10)
+        scores = [score for _, score in results]
+        assert results[0][0].page_content == "document 3"
+        assert scores == sorted(scores, reverse=True)
+        if space != "ip":
+            assert abs(scores[0] - 1) < 1e-5
+
+        threshold = (scores[0] + scores[-1]) / 2
+        kept = vector_store.similarity_search("document 3", k=10, min_score=threshold)
+        assert 0 < len(kept) < 10
+        assert all(score >= threshold for _, score in kept)
@@ -0,0 +1,123 @@
+import time
+
+import pytest
+
+from core.models.chat import ChatMessage, ChatMessageRole
+from core.sessions import InMemorySessionStore, SQLiteSessionStore
+
+
+def human(content):
+    return ChatMessage(role=ChatMessageRole.Human, content=content)
+
+
+@pytest.fixture(params=["memory", "sqlite", "backed"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    return InMemorySessionStore(
+        backing=SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    )
+
+
+def test_create_append_and_get(store):
+    session = store.create([ChatMessage(role=ChatMessageRole.System, content="Hi")])
+    updated = store.append(session.id, [human("one")])
+    store.extend(session.id, [human("two")])
+    assert [m.content for m in updated.messages] == ["Hi", "one"]
+    assert [m.content for m in store.get(session.id).messages] == [
+        "Hi",
+        "one",
+        "two",
+    ]
+
+
+def test_returned_sessions_are_copies(store):
+    session = store.create()
+    store.get(session.id).messages.append(human("not stored"))
+    assert store.get(session.id).messages == []
+
+
+def test_missing_session(store):
+    assert store.get("missing") is None
+    with pytest.raises(KeyError):
+        store.append("missing", [human("one")])
+
+
+def test_delete(store):
+    session = store.create()
+    store.delete(session.id)
+    assert store.get(session.id) is None
+
+
+def test_ttl(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl=60)
+    session = store.create()
+    store.save(session.model_copy(update={"updated_at": time.time() - 120}))
+    assert store.get(session.id) is None
+    assert store.evict_expired() == 1
+
+
+def test_backing_store_survives_restart(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = InMemorySessionStore(backing=SQLiteSessionStore(path))
+    session = store.create()
+    store.append(session.id, [human("one")])
+    restarted = InMemorySessionStore(backing=SQLiteSessionStore(path))
+    assert [m.content for m in restarted.get(session.id).messages] == ["one"]
+
+
+def test_front_stores_share_the_backing_store(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker_a = InMemorySessionStore(backing=SQLiteSessionStore(path))
+    worker_b = InMemorySessionStore(backing=SQLiteSessionStore(path))
+    session = worker_a.create([human("hi")])
+    assert [m.content for m in worker_a.get(session.id).messages] == ["hi"]
+    assert [m.content for m in worker_b.get(session.id).messages] == ["hi"]
+    worker_b.append(session.id, [human("from worker B")])
+    assert [m.content for m in worker_a.get(session.id).messages] == [
+        "hi",
+        "from worker B",
+    ]
+    session = worker_a.append(session.id, [human("from worker A")])
+    contents = ["hi", "from worker B", "from worker A"]
+    assert [m.content for m in session.messages] == contents
+    assert [m.content for m in worker_b.get(session.id).messages] == contents
+    worker_b.delete(session.id)
+    assert worker_a.get(session.id) is None
+
+
+def test_front_store_reads_back_only_missing_messages(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    backing = SQLiteSessionStore(path)
+    reads = []
+    messages_from = backing.messages_from
+
+    def spy(session_id, start):
+        reads.append(start)
+        return messages_from(session_id, start)
+
+    backing.messages_from = spy
+    worker_a = InMemorySessionStore(backing=backing)
+    worker_b = InMemorySessionStore(backing=SQLiteSessionStore(path))
+    session = worker_a.create([human("hi")])
+    worker_a.append(session.id, [human("one")])
+    worker_a.extend(session.id, [human("two")])
+    assert [m.content for m in worker_a.get(session.id).messages] == [
+        "hi",
+        "one",
+        "two",
+    ]
+    assert reads == []
+
+    worker_b.extend(session.id, [human("from worker B")])
+    session = worker_a.append(session.id, [human("three")])
+    assert [m.content for m in session.messages] == [
+        "hi",
+        "one",
+        "two",
+        "from worker B",
+        "three",
+    ]
+    assert reads == [3]
@@ -0,0 +1,82 @@
+import chromadb
+import pytest
+
+from core.sharding import ShardedVectorStore, shard_for
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+client = chromadb.Client()
+store = ShardedVectorStore(
+    collection_name="test_sharding",
+    shard_count=3,
+    clients=[client],
+    embeddings=FakeEmbeddingsFunction(),
+)
+
+
+def test_shard_for_is_stable():
+    assert shard_for("reference", 8) == shard_for("reference", 8)
+    assert {shard_for(str(i), 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_add_documents():
+    for reference_id in ["1", "2", "3", "4", "5"]:
+        store.add_documents([f"document {reference_id}"], reference_id=reference_id)
+    owner = store.shard_of("1")
+    assert owner.collection.get(where={"reference_id": "1"})["ids"]
+    assert sum(shard.collection.count() for shard in store.shards) == 5
+
+
+def test_add_documents_without_reference_id():
+    unreferenced = ShardedVectorStore(
+        collection_name="test_sharding_unreferenced",
+        shard_count=4,
+        clients=[client],
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    owners = set()
+    for parent in range(16):
+        ids = unreferenced.add_documents([f"document {parent} {i}" for i in range(5)])
+        assert len(ids) == 5
+        owner = [
+            index
+            for index, shard in enumerate(unreferenced.shards)
+            if shard.collection.get(ids=ids)["ids"]
+        ]
+        assert len(owner) == 1
+        assert len(unreferenced.shards[owner[0]].collection.get(ids=ids)["ids"]) == 5
+        owners.update(owner)
+    assert len(owners) > 1
+
+
+def test_similarity_search():
+    docs = store.similarity_search("document 3", k=4)
+    assert len(docs) == 4
+    assert docs[0][0].page_content == "document 3"
+    assert [score for _, score in docs] == sorted(
+        (score for _, score in docs), reverse=True
+    )
+
+    docs = store.similarity_search("document 3", reference_id="2", k=4)
+    assert [doc.metadata.reference_id for doc, _ in docs] == ["2"]
+
+
+def test_delete_by_reference_id():
+    store.delete_by_reference_id("4")
+    docs = store.similarity_search("document 4", reference_id="4")
+    assert len(docs) == 0
+
+
+def test_shard_count_is_stored():
+    reopened = ShardedVectorStore(
+        collection_name="test_sharding",
+        clients=[client],
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    assert reopened.shard_count == 3
+    with pytest.raises(ValueError):
+        ShardedVectorStore(
+            collection_name="test_sharding",
+            shard_count=2,
+            clients=[client],
+            embeddings=FakeEmbeddingsFunction(),
+        )
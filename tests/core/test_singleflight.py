@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import chromadb
+import pytest
+
+from core.models.documents import Document, DocumentMetadata
+from core.rerank import Rerank
+from core.singleflight import SingleFlight
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+from tests.fake.rerank import FakeRerankModel
+
+
+class CountingEmbeddingsFunction(FakeEmbeddingsFunction):
+    """Fake embeddings function counting its calls."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    # skipcq: PYL-W0622
+    def __call__(self, input):
+        self.calls += 1
+        return super().__call__(input)
+
+
+def test_concurrent_calls_are_coalesced():
+    single_flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        leader = executor.submit(single_flight.do, "key", compute)
+        started.wait(5)
+        followers = [
+            executor.submit(single_flight.do, "key", compute) for _ in range(3)
+        ]
+        time.sleep(0.1)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert single_flight.do("key", lambda: "again") == "again"
+
+
+def test_errors_are_shared_and_not_cached():
+    single_flight = SingleFlight(ttl=60)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        single_flight.do("key", fail)
+    assert single_flight.do("key", lambda: 1) == 1
+
+
+def test_ttl_cache_and_invalidate():
+    single_flight = SingleFlight(ttl=60)
+    assert single_flight.do("key", lambda: 1, namespace="a") == 1
+    assert single_flight.do("key", lambda: 2, namespace="a") == 1
+    assert single_flight.do("key", lambda: 3, namespace="b") == 3
+    single_flight.invalidate("a")
+    assert single_flight.do("key", lambda: 4, namespace="a") == 4
+    assert single_flight.do("key", lambda: 5, namespace="b") == 3
+
+
+def test_vector_store_search_is_cached_until_write():
+    embeddings = CountingEmbeddingsFunction()
+    vector_store = VectorStore(
+        collection_name="test_single_flight",
+        client=chromadb.Client(),
+        embeddings=embeddings,
+        single_flight=SingleFlight(ttl=60),
+    )
+    vector_store.add_documents(["first document"], reference_id="1")
+    embeddings.calls = 0
+
+    assert len(vector_store.similarity_search("first", k=5)) == 1
+    assert len(vector_store.similarity_search("first", k=5)) == 1
+    assert embeddings.calls == 1
+
+    vector_store.add_documents(["second document"], reference_id="2")
+    embeddings.calls = 0
+    assert len(vector_store.similarity_search("first", k=5)) == 2
+    assert embeddings.calls == 1
+
+    vector_store.delete_by_reference_id("2")
+    assert len(vector_store.similarity_search("first", k=5)) == 1
+
+
+def test_rerank_is_cached():
+    model = FakeRerankModel()
+    rerank = Rerank(model=model, single_flight=SingleFlight(ttl=60))
+    documents = [
+        Document(page_content=f"Document {i}", metadata=DocumentMetadata())
+        for i in range(4)
+    ]
+    first = rerank.rerank_documents("query", documents)
+    second = rerank.rerank_documents("query", documents)
+    assert first == second
+    assert first is not second
@@ -0,0 +1,79 @@
+import chromadb
+import numpy as np
+import pytest
+
+from core.models.index import HnswIndexParams
+from core.transfer import (
+    EMBEDDINGS_FILE,
+    export_collection,
+    import_collection,
+    open_import_target,
+    read_manifest,
+)
+from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+
+class FailingEmbeddingsFunction(FakeEmbeddingsFunction):
+    """Embeddings function failing on every call."""
+
+    # skipcq: PYL-W0622
+    def __call__(self, input):
+        raise AssertionError("The embedder must not be called")
+
+
+def test_export_import_round_trip(tmp_path):
+    client = chromadb.Client()
+    source = VectorStore(
+        collection_name="test_transfer_source",
+        client=client,
+        embeddings=FakeEmbeddingsFunction(dimensions=8),
+        index_params=HnswIndexParams(space="ip", M=24),
+        metadata={"owner": "search"},
+    )
+    source.add_documents([f"document {i}" for i in range(25)], reference_id="1")
+    source.add_documents(["no metadata"])
+
+    manifest = export_collection(source, str(tmp_path), page_size=7)
+    assert manifest.count == 26
+    assert manifest.dimensions == 8
+    assert manifest.index_params.space == "ip"
+    assert manifest.metadata == {"owner": "search"}
+    assert np.load(tmp_path / EMBEDDINGS_FILE).shape == (26, 8)
+
+    target = open_import_target(
+        str(tmp_path),
+        client,
+        collection_name="test_transfer_target",
+        embeddings=FailingEmbeddingsFunction(),
+    )
+    assert target.space == "ip"
+    assert import_collection(target, str(tmp_path), batch_size=10) == 26
+    assert import_collection(target, str(tmp_path)) == 26
+    assert target.collection.count() == 26
+
+    expected = source.collection.get(include=["documents", "metadatas", "embeddings"])
+    actual = target.collection.get(
+        ids=expected["ids"], include=["documents", "metadatas", "embeddings"]
+    )
+    assert actual["documents"] == expected["documents"]
+    assert actual["metadatas"] == expected["metadatas"]
+    np.testing.assert_array_equal(actual["embeddings"], expected["embeddings"])
+
+
+def test_export_empty_collection(tmp_path):
+    source = VectorStore(
+        collection_name="test_transfer_empty",
+        client=chromadb.Client(),
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    assert export_collection(source, str(tmp_path)).count == 0
+    target = open_import_target(
+        str(tmp_path), chromadb.Client(), "test_transfer_empty_2"
+    )
+    assert import_collection(target, str(tmp_path)) == 0
+
+
+def test_incomplete_export(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_manifest(str(tmp_path))
@@ -0,0 +1,29 @@
+import chromadb
+
+from core.tuning import sweep_hnsw_params
+from tests.fake.embeddings import FakeEmbeddingsFunction
+
+
+def test_sweep_hnsw_params():
+    client = chromadb.Client()
+    reports = sweep_hnsw_params(
+        client,
+        FakeEmbeddingsFunction(),
+        documents=[f"document {i}" for i in range(100)],
+        queries=["document 1", "document 50", "query"],
+        m_values=[8, 16],
+        construction_ef_values=[50],
+        search_ef_values=[10, 100],
+        k=5,
+    )
+    assert len(reports) == 4
+    assert {(r.M, r.search_ef) for r in reports} == {
+        (8, 10),
+        (8, 100),
+        (16, 10),
+        (16, 100),
+    }
+    for report in reports:
+        assert 0 <= report.recall_at_k <= 1
+        assert report.mean_ms >= 0
+    assert all(not c.name.startswith("hnsw_tuning") for c in client.list_collections())
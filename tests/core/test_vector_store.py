@@ -1,4 +1,8 @@
+import pytest
+
+from core.models.index import HnswIndexParams
 from core.vector_store import VectorStore
+from tests.fake.embeddings import FakeEmbeddingsFunction
 
 collection_name = "test_collection"
 vector_store = VectorStore(collection_name=collection_name)
@@ -73,3 +77,130 @@ def test_delete_by_reference_id():
         reference_id="2",
     )
     assert len(docs_2) == 1
+
+
+def test_index_params():
+    tuned = VectorStore(
+        collection_name="test_index_params",
+        embeddings=FakeEmbeddingsFunction(),
+        index_params=HnswIndexParams(space="l2", M=32, construction_ef=200),
+    )
+    assert tuned.space == "l2"
+    assert tuned.collection.metadata["hnsw:M"] == 32
+    assert tuned.collection.metadata["hnsw:construction_ef"] == 200
+
+    tuned.add_documents([f"document {i}" for i in range(20)], reference_id="1")
+    docs = tuned.similarity_search(query="document 3", k=2, search_ef=50)
+    assert len(docs) == 2
+    assert docs[0][0].page_content == "document 3"
+
+
+def test_search_ef_fetches_content_of_k_documents_only():
+    store = VectorStore(
+        collection_name="test_search_ef_fetches_content",
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    store.add_documents([f"document {i}" for i in range(20)], reference_id="1")
+    expected = store.similarity_search(query="document 3", k=3)
+    calls = []
+    query, get = store.collection.query, store.collection.get
+
+    def spy_query(**kwargs):
+        calls.append(("query", kwargs["include"]))
+        return query(**kwargs)
+
+    def spy_get(**kwargs):
+        calls.append(("get", len(kwargs["ids"])))
+        return get(**kwargs)
+
+    store.collection.query, store.collection.get = spy_query, spy_get
+    docs = store.similarity_search(query="document 3", k=3, search_ef=15)
+    assert calls == [("query", ["distances"]), ("get", 3)]
+    assert [(d.id, d.page_content, d.metadata) for d, _ in docs] == [
+        (d.id, d.page_content, d.metadata) for d, _ in expected
+    ]
+    assert [score for _, score in docs] == pytest.approx(
+        [score for _, score in expected]
+    )
+
+
+def test_metadata_filters():
+    store = VectorStore(
+        collection_name="test_metadata_filters",
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    store.add_documents(
+        ["vi 2020"], reference_id="1", metadata={"lang": "vi", "year": 2020}
+    )
+    store.add_documents(
+        ["vi 2024"], reference_id="2", metadata={"lang": "vi", "year": 2024}
+    )
+    store.add_documents(
+        ["en 2024"], reference_id="3", metadata={"lang": "en", "year": 2024}
+    )
+
+    for strategy in ["pre", "post"]:
+        docs = store.similarity_search(
+            query="vi 2020",
+            k=10,
+            where={"lang": "vi", "year": {"$gte": 2022}},
+            filter_strategy=strategy,
+        )
+        assert [doc.metadata.reference_id for doc, _ in docs] == ["2"]
+        assert docs[0][0].metadata.lang == "vi"
+        assert docs[0][0].metadata.year == 2024
+
+        docs = store.similarity_search(
+            query="vi 2020",
+            reference_id="3",
+            k=10,
+            where={"year": {"$in": [2020, 2024]}},
+            filter_strategy=strategy,
+        )
+        assert [doc.metadata.reference_id for doc, _ in docs] == ["3"]
+
+
+def test_keyword_search():
+    store = VectorStore(
+        collection_name="test_keyword_search",
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    store.add_documents(["Hoang Sa belongs to Vietnam"], reference_id="1")
+    store.add_documents(["Truong Sa belongs to Vietnam"], reference_id="2")
+    store.add_documents(["Paris is in France"], reference_id="3")
+
+    docs = store.keyword_search("which islands belong to vietnam", k=5)
+    assert {doc.metadata.reference_id for doc, _ in docs} == {"1", "2"}
+    assert docs[0][1] == 2 / 4
+
+    docs = store.keyword_search("hoang vietnam", k=5)
+    assert docs[0][0].metadata.reference_id == "1"
+    assert docs[0][1] == 1.0
+    assert store.keyword_search("paris", reference_id="1") == []
+    assert store.keyword_search("a b") == []
+
+
+def test_add_columns():
+    store = VectorStore(
+        collection_name="test_add_columns",
+        embeddings=FakeEmbeddingsFunction(),
+    )
+    ids = store.add_columns(
+        ["Hoang Sa", "Truong Sa"],
+        reference_ids=["1", "2"],
+        metadata={"year": [2024, None], "parent_id": ["x", "y"]},
+    )
+    assert len(ids) == 2
+    res = store.collection.get(ids=ids, include=["metadatas"])
+    metadatas = dict(zip(res["ids"], res["metadatas"]))
+    assert metadatas[ids[0]]["reference_id"] == "1"
+    assert metadatas[ids[0]]["year"] == 2024
+    assert "year" not in metadatas[ids[1]]
+    assert metadatas[ids[1]]["parent_id"] != "y"
+    assert metadatas[ids[1]]["chunk_count"] == 1
+
+    docs = store.similarity_search("Truong Sa", k=1)
+    assert docs[0][0].metadata.reference_id == "2"
+    assert store.add_columns([]) == []
+    with pytest.raises(ValueError):
+        store.add_columns(["Hoang Sa"], reference_ids=["1", "2"])
@@ -0,0 +1,37 @@
+import hashlib
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction
+
+
+class FakeEmbeddingsFunction(EmbeddingFunction):
+    """Fake embeddings function returning deterministic vectors."""
+
+    def __init__(self, dimensions: int = 32) -> None:
+        """
+        Create a fake embeddings function
+
+        Args:
+            dimensions (int): Number of dimensions of each vector
+        """
+        self.dimensions = dimensions
+
+    # skipcq: PYL-W0622
+    def __call__(self, input: Documents) -> list[np.ndarray]:
+        """
+        Embed the documents, the same text always gives the same vector
+
+        Args:
+            input (Documents): embeddings input
+
+        Returns:
+            list[np.ndarray]: Embeddings output
+        """
+        return [
+            np.random.default_rng(
+                int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+            )
+            .standard_normal(self.dimensions)
+            .astype(np.float32)
+            for text in input
+        ]
@@ -15,3 +15,24 @@ class FakeLLMChatModel(ChatLLMModel):
             str: A fake chat response
         """
         return "Hello, how can I help you today?"
+
+
+class FakeSummaryChatModel(ChatLLMModel):
+    """A fake chat model recording the inputs it receives."""
+
+    def __init__(self) -> None:
+        """Create the fake model with no recorded inputs."""
+        self.inputs = []
+
+    def chat(self, chat_input) -> str:
+        """
+        Chat with the model.
+
+        Args:
+            chat_input (core.chat_llm.ChatInput): Chat input, recorded
+
+        Returns:
+            str: A fake summary
+        """
+        self.inputs.append(chat_input)
+        return f"summary {len(self.inputs)}"
@@ -27,3 +27,31 @@ class FakeRerankModel(RerankModel):
             0.4,
             0.3,
         ]  # => [3, 4, 1, 2]
+
+
+class RecordingRerankModel(RerankModel):
+    """Fake Rerank Model scoring by length and recording its inputs"""
+
+    model_name = "recording"
+
+    def __init__(self) -> None:
+        """Create the fake model with no recorded inputs"""
+        self.inputs = []
+
+    def rerank_documents(
+        self,
+        query: str,
+        docs: List[str],
+    ) -> List[float]:
+        """
+        Rerank the documents based on the query
+
+        Args:
+            query (str): The query use to rerank
+            docs (List[str]): List of documents, recorded
+
+        Returns:
+            List[float]: Length of each document
+        """
+        self.inputs.append(list(docs))
+        return [float(len(doc)) for doc in docs]
@@ -0,0 +1,137 @@
+import cohere
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from loadtest import chroma_proxy, cohere_mock
+from loadtest.__main__ import per_endpoint
+from loadtest.faults import FaultInjector, LatencyModel
+
+
+def test_latency_model():
+    assert LatencyModel.parse("constant:0.2").sample() == 0.2
+    first = LatencyModel.parse("lognormal:0.05:0.5", seed=1)
+    second = LatencyModel.parse("lognormal:0.05:0.5", seed=1)
+    samples = [first.sample() for _ in range(100)]
+    assert samples == [second.sample() for _ in range(100)]
+    assert all(sample >= 0 for sample in samples)
+    assert all(
+        0.1 <= LatencyModel.parse("uniform:0.1:0.3").sample() <= 0.3 for _ in range(100)
+    )
+    assert LatencyModel.parse("normal:-1:0.1").sample() == 0
+    assert min(LatencyModel.parse("pareto:0.05:2").sample() for _ in range(100)) >= 0.05
+    with pytest.raises(ValueError):
+        LatencyModel.parse("gamma:1:1")
+    with pytest.raises(ValueError):
+        LatencyModel.parse("uniform:0.1")
+
+
+def test_per_endpoint():
+    values = per_endpoint(
+        ["chat=0.5", "0.1", "embed=0.2"], cohere_mock.ENDPOINTS, float
+    )
+    assert values == {"embed": 0.2, "rerank": 0.1, "chat": 0.5}
+    with pytest.raises(ValueError):
+        per_endpoint(["search=0.1"], cohere_mock.ENDPOINTS, float)
+
+
+def test_cohere_mock():
+    client = TestClient(cohere_mock.create_app(dimensions=16))
+    co = cohere.ClientV2(
+        api_key="loadtest", base_url="http://testserver", httpx_client=client
+    )
+
+    embeddings = co.embed(
+        texts=["Paris is the capital of France", "The capital of France", "Hanoi"],
+        model="embed-multilingual-v2.0",
+        input_type="search_document",
+        embedding_types=["float"],
+    ).embeddings.float_
+    assert np.array(embeddings).shape == (3, 16)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1)
+    assert np.dot(embeddings[0], embeddings[1]) > np.dot(embeddings[0], embeddings[2])
+    assert (
+        co.embed(
+            texts=["Hanoi"],
+            model="embed-multilingual-v2.0",
+            input_type="search_query",
+            embedding_types=["float"],
+        ).embeddings.float_[0]
+        == embeddings[2]
+    )
+
+    results = co.rerank(
+        documents=["Hanoi", "Paris is the capital of France", "France"],
+        query="capital of France",
+        model="rerank-multilingual-v2.0",
+        top_n=2,
+    ).results
+    assert [result.index for result in results] == [1, 2]
+    assert results[0].relevance_score == 1
+
+    response = co.chat(
+        messages=[{"role": "user", "content": "What is the capital of France?"}],
+        model="command-r-plus-08-2024",
+    )
+    assert response.message.content[0].text.endswith("What is the capital of France?")
+
+
+def test_cohere_mock_faults():
+    client = TestClient(
+        cohere_mock.create_app(
+            {
+                "embed": FaultInjector(error_rate=1),
+                "rerank": FaultInjector(rate_limit=1),
+            }
+        )
+    )
+    response = client.post("/v2/embed", json={"texts": ["Hanoi"]})
+    assert response.status_code in (500, 503)
+    rerank = {"query": "Hanoi", "documents": ["Hanoi"]}
+    assert client.post("/v2/rerank", json=rerank).status_code == 200
+    response = client.post("/v2/rerank", json=rerank)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert client.post("/v2/chat", json={"messages": []}).status_code == 200
+    assert client.get("/stats").json() == {
+        "embed": {"calls": 1, "errors": 1, "rate_limited": 0},
+        "rerank": {"calls": 2, "errors": 0, "rate_limited": 1},
+        "chat": {"calls": 1, "errors": 0, "rate_limited": 0},
+    }
+
+
+def test_chroma_proxy():
+    requests = []
+
+    def upstream(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    client = TestClient(
+        chroma_proxy.create_app(
+            "http://chroma",
+            FaultInjector(error_rate=1),
+            transport=httpx.MockTransport(upstream),
+        )
+    )
+    response = client.get("/api/v2/heartbeat")
+    assert response.status_code == 200
+    assert response.json() == {"path": "/api/v2/heartbeat"}
+    response = client.post("/api/v2/tenants/default_tenant/databases", json={})
+    assert response.status_code in (500, 503)
+    assert len(requests) == 1
+    assert client.get("/proxy/stats").json() == {
+        "calls": 1,
+        "errors": 1,
+        "rate_limited": 0,
+    }
+
+    client = TestClient(
+        chroma_proxy.create_app(
+            "http://chroma", transport=httpx.MockTransport(upstream)
+        )
+    )
+    response = client.post("/api/v2/collections/1/query", params={"a": "b"}, json={})
+    assert response.status_code == 200
+    assert requests[-1].url.params["a"] == "b"